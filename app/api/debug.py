@@ -1,14 +1,19 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
 from app.db.database import execute_readonly_query
+from app.db.pools import POOL_MAINTENANCE, pool_class
+from app.core.http_cache import get_cache_stats
+from app.db.slow_queries import get_slow_query_log
+from app.core.loop_monitor import get_loop_monitor
+from app.core.profiling import is_authorized, list_profiles, profile_path
+from app.core.memory import memory_stats
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.get("/debug/test-users")
-async def get_test_users():
-    """Get list of users with booking/quotation data for testing."""
-    query = """
+TEST_USERS_SQL = """
         SELECT 
             qm.user_mobile, qm.user_name, qm.query_id,
             (SELECT COUNT(*) FROM query_flight_manages qf WHERE qf.query_id = qm.query_id) as flights,
@@ -18,9 +23,92 @@ async def get_test_users():
         ORDER BY qm.query_id DESC
         LIMIT 100
     """
+
+
+@router.get("/debug/test-users")
+@pool_class(POOL_MAINTENANCE)
+async def get_test_users():
+    """Get list of users with booking/quotation data for testing."""
     try:
-        users = await execute_readonly_query(query, {})
+        users = await execute_readonly_query(TEST_USERS_SQL, {})
         return {"users": users}
     except Exception as e:
-        logger.error(f"Failed to fetch test users: {e}")
+        logger.error("Failed to fetch test users: %s", e)
         return {"users": [], "error": str(e)}
+
+
+def require_admin_token(header_token: Optional[str], query_token: Optional[str]) -> None:
+    """403 unless the request carries PROFILE_TOKEN (X-Profile-Token header or ?profile_token=)."""
+    if not is_authorized(header_token or query_token):
+        raise HTTPException(status_code=403, detail="A valid admin token (PROFILE_TOKEN) is required")
+
+
+@router.get("/debug/cache-stats")
+async def cache_stats(
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """Report HTTP conditional-cache hit rates per endpoint (admin only)."""
+    require_admin_token(x_profile_token, profile_token)
+    return {"endpoints": get_cache_stats()}
+
+
+@router.get("/debug/slow-queries")
+async def slow_queries(
+    limit: int = 50,
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """Report statements over SLOW_QUERY_MS, aggregated by fingerprint (admin only)."""
+    require_admin_token(x_profile_token, profile_token)
+    slow_log = get_slow_query_log()
+    return {"threshold_ms": slow_log.threshold_ms, "statements": slow_log.report(limit)}
+
+
+@router.get("/debug/loop-blocks")
+async def loop_blocks(
+    limit: int = 20,
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """Report code sites that blocked the event loop longer than LOOP_BLOCK_THRESHOLD_MS (admin only)."""
+    require_admin_token(x_profile_token, profile_token)
+    monitor = get_loop_monitor()
+    if monitor is None:
+        return {"enabled": False, "sites": []}
+    return {"enabled": True, "threshold_ms": monitor.block_threshold * 1000, "sites": monitor.report(limit)}
+
+
+@router.get("/debug/profiles")
+async def profiles(
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """List stored request profiles, newest first (admin only)."""
+    require_admin_token(x_profile_token, profile_token)
+    return {"profiles": list_profiles()}
+
+
+@router.get("/debug/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """Download one profile: .pstats (cProfile) or .collapsed (folded stacks for flame graphs)."""
+    require_admin_token(x_profile_token, profile_token)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
+@router.get("/debug/memory")
+async def memory(
+    top: int = 10,
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """Current RSS, GC and tracemalloc stats, with top allocation sites while tracing (admin only)."""
+    require_admin_token(x_profile_token, profile_token)
+    return memory_stats(top=max(0, min(top, 50)))
@@ -0,0 +1,96 @@
+"""
+Export API endpoints: GET /admin/export/{dataset}
+Streams global admin data as NDJSON or CSV using server-side cursors.
+Every export requires the admin token (PROFILE_TOKEN).
+"""
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
+import csv
+import io
+import json
+import logging
+
+from app.config import get_settings
+from app.api.debug import require_admin_token
+from app.api.query import SENSITIVE_KEYS
+from app.core.response_formatter import format_row_values
+from app.core.results import RESULT_ROWS, Rows
+from app.db.database import stream_readonly_query
+from app.db.pools import POOL_ANALYTICS
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Exportable datasets: same tables as the global context, streamed in primary-key order
+EXPORT_DATASETS: dict[str, dict] = {
+    "bookings": {"table": "query_flight_manages"},
+    "payments": {"table": "query_payments"},
+    "queries": {"table": "query_masters"},
+    "activities": {"table": "query_activities"},
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def project_rows(batch: Rows, admin: bool) -> Rows:
+    """Apply field-level security (dropping columns from the header once) and JSON-friendly formatting to a batch."""
+    return format_row_values(batch if admin else batch.without(SENSITIVE_KEYS))
+
+
+async def export_rows(dataset: str, fmt: str, admin: bool, batch_size: int) -> AsyncIterator[bytes]:
+    """Yield the encoded export one cursor batch at a time."""
+    sql = f"SELECT * FROM {EXPORT_DATASETS[dataset]['table']} ORDER BY id"
+    writer = None
+    buffer = io.StringIO()
+    total = 0
+
+    # Consumed by StreamingResponse after the handler returned, so the pool is explicit.
+    # Batches stay tuples under one header until they are encoded (see app.core.results).
+    batches = stream_readonly_query(sql, {}, batch_size=batch_size, pool=POOL_ANALYTICS, result=RESULT_ROWS)
+    async for batch in batches:
+        rows = project_rows(batch, admin)
+        total += len(rows)
+        if fmt == "ndjson":
+            columns = rows.columns
+            yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows.rows).encode("utf-8")
+            continue
+
+        if writer is None:
+            writer = csv.writer(buffer)
+            writer.writerow(rows.columns)
+        writer.writerows(rows.rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    logger.info("Exported %d %s rows as %s", total, dataset, fmt)
+
+
+@router.get("/admin/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = "ndjson",
+    mode: str = "user",
+    x_profile_token: Optional[str] = Header(default=None),
+    profile_token: Optional[str] = None,
+):
+    """
+    Stream a full dataset (bookings, payments, queries, activities) to a caller holding the admin token.
+    Admin-only fields are removed unless that caller also asks for mode=admin.
+    """
+    require_admin_token(x_profile_token, profile_token)
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    return StreamingResponse(
+        export_rows(dataset, format, mode == "admin", settings.EXPORT_BATCH_SIZE),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="flyshop-{dataset}.{format}"'},
+    )
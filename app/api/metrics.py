@@ -0,0 +1,16 @@
+"""
+Metrics API endpoint: GET /metrics
+Prometheus text exposition of request, DB pool, query, LLM and cache metrics.
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import REGISTRY, CONTENT_TYPE
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Scrape endpoint for Prometheus."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -2,24 +2,53 @@
 Query API endpoint: POST /mvp/query
 Main endpoint for natural language customer queries.
 """
-from fastapi import APIRouter, HTTPException
-from typing import Union
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Union, Optional
 import logging
 import time
 import asyncio
-import json
 
 from app.models.requests import QueryRequest
 from app.models.responses import QueryResponse, ErrorResponse, ErrorCode
 from app.config import get_settings
-from app.core.intent_extractor import extract_intent_and_entities, generate_summary, get_model
-from app.core.query_planner import create_query_plan, QueryPlan, QueryPlanError
+from app.core.intent_extractor import (
+    IntentExtractionResult, extract_intent_and_entities, generate_summary, get_model, generate_content_async,
+)
+from app.core.query_planner import create_query_plan, cursor_intent, QueryPlanError
+from app.core.sql_templates import get_template
 from app.core.response_formatter import (
     create_success_response,
     create_error_response,
+    render_json_response,
     mask_mobile
 )
+from app.core.http_cache import revalidate, apply_cache_headers
+from app.core.context_sections import (
+    CONTEXT_SECTIONS,
+    PROFILE_SECTION,
+    build_section_query,
+    build_section_page_query,
+    section_sort,
+    normalize_table_watermarks,
+    encode_watermark,
+    USER_QUERY_IDS_SQL,
+    decode_watermark,
+    shown_row_ids,
+    diff_section,
+)
+from app.core.pagination import split_page, CursorError
+from app.core.tracing import span
+from app.core.metrics import label_request
+from app.core.request_journal import journal_note
+from app.core.offload import offload, payload_cells, encode_json
+from app.core.results import RESULT_ROWS, Rows
+from app.core.degraded import (
+    SOURCE_CACHED, cached_context, degraded_context, degraded_instruction, record_degraded, remember_context,
+)
 from app.db.database import validate_mobile_exists, execute_readonly_query
+from app.db.pools import POOL_ANALYTICS, DatabaseUnavailableError, pool_class, use_pool
+from app.db.liveness import readiness
+from app.db.postgres import CONTEXT_JSON_SQL, decode_context_row
 # from app.core.mock_data import validate_mock_mobile
 
 router = APIRouter()
@@ -28,15 +57,42 @@ settings = get_settings()
 
 
 
+# Admin-only fields stripped from every payload in User Mode
+SENSITIVE_KEYS = {
+    "supplier_price", "gross_profit", "markup_value", "markup_type",
+    "supplier_amount", "supplier_recieved", "supplier_pending",
+    "gross_markup_type", "gross_markup_value", "gst_on_markup",
+    "supplier_id", "onward_supplier_price", "return_supplier_price"
+}
+
+
+# Per-user profile (latest query) and assigned agent
+PROFILE_SQL = "SELECT * FROM query_masters WHERE user_mobile LIKE :m_wild ORDER BY created_at DESC LIMIT 1"
+AGENT_SQL = "SELECT * FROM master_admins WHERE m_code = :ref LIMIT 1"
+
+# Admin global context: recent activity across all users plus aggregates
+GLOBAL_CONTEXT_QUERIES = {
+    "recent_bookings": "SELECT * FROM query_flight_manages ORDER BY departure_datetime DESC LIMIT 20",
+    "recent_payments": "SELECT * FROM query_payments ORDER BY id DESC LIMIT 20",
+    "recent_queries": "SELECT * FROM query_masters ORDER BY created_at DESC LIMIT 20",
+    "recent_activities": "SELECT * FROM query_activities ORDER BY date DESC LIMIT 20",
+    "payment_totals": "SELECT SUM(recieved_amount) as total_revenue, SUM(pending_amount) as total_pending FROM query_payments",
+    "query_stages": "SELECT COUNT(*) as total_queries, query_stage, COUNT(query_id) as count FROM query_masters GROUP BY query_stage",
+}
+
+# Dropdown lists for the chat UI
+USERS_LIST_SQL = """
+        SELECT DISTINCT user_name, user_mobile, created_at
+        FROM query_masters 
+        WHERE user_mobile IS NOT NULL 
+        ORDER BY created_at DESC 
+        LIMIT 100
+        """
+ADMINS_LIST_SQL = "SELECT name, phone as mobile FROM master_admins LIMIT 100"
+
+
 def sanitize_for_user_mode(data: dict):
     """Recursively strip sensitive admin fields for User Mode."""
-    SENSITIVE_KEYS = {
-        "supplier_price", "gross_profit", "markup_value", "markup_type",
-        "supplier_amount", "supplier_recieved", "supplier_pending",
-        "gross_markup_type", "gross_markup_value", "gst_on_markup",
-        "supplier_id", "onward_supplier_price", "return_supplier_price"
-    }
-    
     # Remove top-level markups table
     data.pop("markups", None)
     
@@ -51,7 +107,10 @@ def sanitize_for_user_mode(data: dict):
                     current.pop(key)
                 else:
                     val = current[key]
-                    if isinstance(val, (dict, list)):
+                    if isinstance(val, Rows):
+                        # Compact results drop the columns from the header once
+                        current[key] = val.without(SENSITIVE_KEYS)
+                    elif isinstance(val, (dict, list)):
                         stack.append(val)
         elif isinstance(current, list):
             for item in current:
@@ -59,19 +118,27 @@ def sanitize_for_user_mode(data: dict):
                     stack.append(item)
 
 
+def non_empty_sections(data: dict) -> list[str]:
+    """Names of the context sections that returned data."""
+    return [name for name, value in data.items() if value]
+
+
 async def fetch_universal_context(mobile: str) -> dict:
     """Fetch all relevant user context from DB."""
     # Extract last 10 digits to handle prefix inconsistencies
     mobile_plain = mobile[-10:] if len(mobile) >= 10 else mobile
     params = {"m_wild": f"%{mobile_plain}"}
     
+    settings = get_settings()
+    if settings.DB_BACKEND == "postgresql" and settings.DB_PG_SINGLE_STATEMENT_CONTEXT:
+        # Every section in one statement: one round-trip, one connection (see app.db.postgres)
+        rows = await execute_readonly_query(CONTEXT_JSON_SQL, params)
+        return decode_context_row(rows[0]) if rows else decode_context_row({})
+    
     # Define queries using LIKE for last 10 digits
     # 1. Fetch Profile & Query IDs first
-    q_profile = "SELECT * FROM query_masters WHERE user_mobile LIKE :m_wild ORDER BY created_at DESC LIMIT 1"
-    q_ids = "SELECT query_id FROM query_masters WHERE user_mobile LIKE :m_wild"
-    
-    r_profile_list = await execute_readonly_query(q_profile, params)
-    r_ids_list = await execute_readonly_query(q_ids, params)
+    r_profile_list = await execute_readonly_query(PROFILE_SQL, params)
+    r_ids_list = await execute_readonly_query(USER_QUERY_IDS_SQL, params)
     
     profile = r_profile_list[0] if r_profile_list else {}
     query_ids = [str(row['query_id']) for row in r_ids_list]
@@ -82,28 +149,17 @@ async def fetch_universal_context(mobile: str) -> dict:
 
     ids_placeholder = ",".join([f"'{qid}'" for qid in query_ids]) if query_ids else "NULL"
     
-    # Data Tables
-    q_bookings = f"SELECT * FROM query_flight_manages WHERE query_id IN ({ids_placeholder}) ORDER BY departure_datetime DESC LIMIT 5"
-    q_payments = f"SELECT * FROM query_payments WHERE query_id IN ({ids_placeholder}) LIMIT 5"
-    q_quotes = f"SELECT * FROM query_quotations WHERE query_id IN ({ids_placeholder}) ORDER BY sent_at DESC LIMIT 5"
-    q_queries = f"SELECT * FROM query_masters WHERE query_id IN ({ids_placeholder}) ORDER BY created_at DESC LIMIT 5"
-    q_activities = f"SELECT * FROM query_activities WHERE query_id IN ({ids_placeholder}) ORDER BY date ASC LIMIT 5"
-    q_schedules = f"SELECT * FROM query_payment_schedulers WHERE query_id IN ({ids_placeholder}) ORDER BY payment_date ASC LIMIT 5"
-    q_markups = f"SELECT * FROM query_activity_markups WHERE query_id IN ({ids_placeholder}) LIMIT 10"
+    # Data Tables (see CONTEXT_SECTIONS for table, ordering and row caps)
+    section_names = list(CONTEXT_SECTIONS)
 
     # Agent info (linked via admin_ref from profile)
     agent_ref = profile.get("admin_ref")
-    q_agent = "SELECT * FROM master_admins WHERE m_code = :ref LIMIT 1" if agent_ref else None
+    q_agent = AGENT_SQL if agent_ref else None
 
     # Execute in parallel
     tasks = [
-        execute_readonly_query(q_bookings, {}),
-        execute_readonly_query(q_payments, {}),
-        execute_readonly_query(q_quotes, {}),
-        execute_readonly_query(q_queries, {}),
-        execute_readonly_query(q_activities, {}),
-        execute_readonly_query(q_schedules, {}),
-        execute_readonly_query(q_markups, {})
+        execute_readonly_query(build_section_query(name, ids_placeholder), {})
+        for name in section_names
     ]
     if q_agent:
         tasks.append(execute_readonly_query(q_agent, {"ref": agent_ref}))
@@ -111,45 +167,31 @@ async def fetch_universal_context(mobile: str) -> dict:
     results = await asyncio.gather(*tasks)
     
     # Unpack results
-    r_bookings, r_payments, r_quotes, r_queries, r_activities, r_schedules, r_markups = results[:7]
-    r_agent = results[7] if q_agent else []
+    sections = dict(zip(section_names, results))
+    r_agent = results[len(section_names)] if q_agent else []
 
     return {
         "profile": profile,
-        "recent_bookings": r_bookings,
-        "recent_payments": r_payments,
-        "recent_quotations": r_quotes,
-        "recent_queries": r_queries,
-        "recent_activities": r_activities,
-        "payment_schedules": r_schedules,
-        "markups": r_markups,
+        "recent_bookings": sections["recent_bookings"],
+        "recent_payments": sections["recent_payments"],
+        "recent_quotations": sections["recent_quotations"],
+        "recent_queries": sections["recent_queries"],
+        "recent_activities": sections["recent_activities"],
+        "payment_schedules": sections["payment_schedules"],
+        "markups": sections["markups"],
         "agent_info": r_agent[0] if r_agent else {}
     }
 
 
+@pool_class(POOL_ANALYTICS)
 async def fetch_global_context() -> dict:
     """Fetch GLOBAL context for All Users (Admin Mode)."""
     
-    # Recent Global Activity (Last 20 items across the board)
-    q_bookings = "SELECT * FROM query_flight_manages ORDER BY departure_datetime DESC LIMIT 20"
-    q_payments = "SELECT * FROM query_payments ORDER BY id DESC LIMIT 20"
-    q_queries =  "SELECT * FROM query_masters ORDER BY created_at DESC LIMIT 20"
-    q_activities = "SELECT * FROM query_activities ORDER BY date DESC LIMIT 20"
-    
-    # Aggregates
-    q_agg_payments = "SELECT SUM(recieved_amount) as total_revenue, SUM(pending_amount) as total_pending FROM query_payments"
-    q_agg_queries = "SELECT COUNT(*) as total_queries, query_stage, COUNT(query_id) as count FROM query_masters GROUP BY query_stage"
-    
-    tasks = [
-        execute_readonly_query(q_bookings, {}),
-        execute_readonly_query(q_payments, {}),
-        execute_readonly_query(q_queries, {}),
-        execute_readonly_query(q_activities, {}),
-        execute_readonly_query(q_agg_payments, {}),
-        execute_readonly_query(q_agg_queries, {})
-    ]
-    
-    results = await asyncio.gather(*tasks)
+    # Recent Global Activity (Last 20 items across the board) and aggregates,
+    # kept compact: they are only serialized (see app.core.results)
+    results = await asyncio.gather(*[
+        execute_readonly_query(sql, {}, result=RESULT_ROWS) for sql in GLOBAL_CONTEXT_QUERIES.values()
+    ])
     
     r_bookings, r_payments, r_queries, r_activities, r_agg_pay, r_agg_qry = results
     
@@ -167,38 +209,349 @@ async def fetch_global_context() -> dict:
     }
 
 
+def _watermark_select(table: str, where: str = "") -> str:
+    """One watermark row (row count, max id, max updated_at) for a table."""
+    return (
+        f"SELECT '{table}' AS section, COUNT(*) AS row_count, MAX(id) AS max_id, "
+        f"MAX(updated_at) AS max_updated FROM {table} {where}"
+    ).strip()
+
+
+# Cheap change-detection queries used for ETags: one round-trip each,
+# answered from the primary key / updated_at instead of full row reads.
+USERS_WATERMARK_SQL = _watermark_select("query_masters")
+ADMINS_WATERMARK_SQL = _watermark_select("master_admins")
+GLOBAL_WATERMARK_SQL = " UNION ALL ".join(
+    _watermark_select(table)
+    for table in ("query_flight_manages", "query_payments", "query_masters", "query_activities")
+)
+_USER_QUERY_IDS = "(SELECT query_id FROM query_masters WHERE user_mobile LIKE :m_wild)"
+USER_WATERMARK_SQL = " UNION ALL ".join(
+    [_watermark_select("query_masters", "WHERE user_mobile LIKE :m_wild")]
+    + [
+        _watermark_select(table, f"WHERE query_id IN {_USER_QUERY_IDS}")
+        for table in dict.fromkeys(spec["table"] for spec in CONTEXT_SECTIONS.values())
+        if table != "query_masters"
+    ]
+    + [_watermark_select(
+        "master_admins",
+        "WHERE m_code IN (SELECT admin_ref FROM query_masters WHERE user_mobile LIKE :m_wild)"
+    )]
+)
+
+
+async def fetch_user_watermark(mobile: str) -> list[dict]:
+    """Fetch the data watermark for everything fetch_universal_context reads."""
+    mobile_plain = mobile[-10:] if len(mobile) >= 10 else mobile
+    return await execute_readonly_query(USER_WATERMARK_SQL, {"m_wild": f"%{mobile_plain}"})
+
+
+async def fetch_context_delta(mobile: str, since: dict, watermark_rows: list[dict]) -> dict:
+    """
+    Fetch only what changed since a previous watermark.
+
+    Sections whose table watermark (row count, max id, max updated_at) is unchanged
+    cost nothing beyond the single watermark query. Changed sections re-read their
+    indexed top-N and are diffed against the ids the client holds.
+    """
+    tables = normalize_table_watermarks(watermark_rows)
+    previous_tables = since["t"]
+    previous_ids = since["ids"]
+
+    changed_sections = [
+        name for name, spec in CONTEXT_SECTIONS.items()
+        if tables.get(spec["table"]) != previous_tables.get(spec["table"])
+    ]
+    profile_changed = tables.get("query_masters") != previous_tables.get("query_masters")
+    agent_changed = profile_changed or tables.get("master_admins") != previous_tables.get("master_admins")
+
+    delta = {}
+    shown_ids = {name: list(previous_ids.get(name) or []) for name in CONTEXT_SECTIONS}
+
+    if changed_sections or agent_changed:
+        mobile_plain = mobile[-10:] if len(mobile) >= 10 else mobile
+        params = {"m_wild": f"%{mobile_plain}"}
+        r_profile_list = await execute_readonly_query(PROFILE_SQL, params)
+        profile = r_profile_list[0] if r_profile_list else {}
+
+        tasks = []
+        if changed_sections:
+            r_ids_list = await execute_readonly_query(USER_QUERY_IDS_SQL, params)
+            ids_placeholder = ",".join([f"'{row['query_id']}'" for row in r_ids_list]) or "NULL"
+            tasks = [
+                execute_readonly_query(build_section_query(name, ids_placeholder), {})
+                for name in changed_sections
+            ]
+        agent_ref = profile.get("admin_ref")
+        if agent_changed and agent_ref:
+            tasks.append(execute_readonly_query(AGENT_SQL, {"ref": agent_ref}))
+
+        results = await asyncio.gather(*tasks)
+        for name, rows in zip(changed_sections, results):
+            table = CONTEXT_SECTIONS[name]["table"]
+            delta[name] = diff_section(rows, shown_ids[name], previous_tables.get(table))
+            shown_ids[name] = delta[name]["order"]
+
+        if profile_changed:
+            delta["profile"] = profile
+        if agent_changed:
+            r_agent = results[len(changed_sections)] if agent_ref else []
+            delta["agent_info"] = r_agent[0] if r_agent else {}
+
+    return {"sections": delta, "tables": tables, "shown_ids": shown_ids}
+
+
+def degraded_panel(mobile: str, mode: str, error: Exception) -> dict:
+    """The last panel served for this user while the DB is unavailable, else the error."""
+    cached = cached_context(mobile, mode)
+    if cached is None:
+        logger.error("Error fetching user data: %s", error)
+        return {"success": False, "error": str(error)}
+    record_degraded("/mvp/user-data", SOURCE_CACHED, error)
+    journal_note(error=f"degraded:{SOURCE_CACHED}")
+    data, age = cached
+    return {"success": True, "degraded": SOURCE_CACHED, "stale_seconds": round(age), "data": data}
+
+
 @router.get("/mvp/user-data")
-async def get_user_data(mobile: str, mode: str = "user"):
-    """Fetch raw user data for the side panel."""
+async def get_user_data(
+    request: Request,
+    mobile: str,
+    mode: str = "user",
+    since: Optional[str] = None,
+):
+    """
+    Fetch raw user data for the side panel.
+
+    Every per-user response carries an opaque `watermark`. Passing it back as
+    `since` returns only the rows added or changed since then, plus tombstones
+    for rows the panel should drop.
+    """
     # Global Context Handling
     if mobile == "ALL":
+        label_request(mode="global", intent="side_panel")
+        journal_note(user="ALL")
         try:
+            with use_pool(POOL_ANALYTICS):  # The watermark counts whole tables too
+                not_modified, etag, _ = await revalidate(
+                    request, "user-data:ALL", "/mvp/user-data",
+                    lambda: execute_readonly_query(GLOBAL_WATERMARK_SQL, {})
+                )
+            if not_modified:
+                return not_modified
             data = await fetch_global_context()
-            return {"success": True, "data": data}
+            journal_note(sections=non_empty_sections(data))
+            remember_context(mobile, "admin", data)
+            rendered = await offload("user_data.render", payload_cells(data), render_json_response, {"success": True, "data": data})
+            apply_cache_headers(rendered, etag)
+            return rendered
+        except DatabaseUnavailableError as e:
+            return degraded_panel(mobile, "admin", e)
         except Exception as e:
-            logger.error(f"Error fetching global data: {e}")
+            logger.error("Error fetching global data: %s", e)
             return {"success": False, "error": str(e)}
 
     if settings.USE_MOCK_DATA:
         return {"mock": "data"}
-    
-    mobile_exists = await validate_mobile_exists(mobile)
-    if not mobile_exists and not len(mobile) >= 10:
-        pass 
 
+    # Field-level security changes the payload, so the mode is part of the cache key
+    panel_mode = "admin" if mode == "admin" else "user"
+    label_request(mode=panel_mode, intent="side_panel")
+    journal_note(user=mask_mobile(mobile))
+    previous = decode_watermark(since, mobile, panel_mode) if since else None
+    if previous is not None:
+        try:
+            watermark_rows = await fetch_user_watermark(mobile)
+            delta = await fetch_context_delta(mobile, previous, watermark_rows)
+            sections = delta["sections"]
+            journal_note(sections=non_empty_sections(sections))
+            if panel_mode != "admin":
+                sanitize_for_user_mode(sections)
+            return {
+                "success": True,
+                "delta": True,
+                "data": sections,
+                "watermark": encode_watermark(mobile, panel_mode, delta["tables"], delta["shown_ids"]),
+            }
+        except Exception as e:
+            logger.error("Error fetching user data delta: %s", e)
+            return {"success": False, "error": str(e)}
+
+    cache_key = f"user-data:{panel_mode}:{mobile[-10:]}"
     try:
+        not_modified, etag, watermark_rows = await revalidate(
+            request, cache_key, "/mvp/user-data",
+            lambda: fetch_user_watermark(mobile)
+        )
+        if not_modified:
+            return not_modified
+    except DatabaseUnavailableError as e:
+        return degraded_panel(mobile, panel_mode, e)
+    except Exception as e:
+        logger.error("Error fetching user data: %s", e)
+        return {"success": False, "error": str(e)}
+    
+    try:
+        mobile_exists = await validate_mobile_exists(mobile)
+        if not mobile_exists and not len(mobile) >= 10:
+            pass 
+
         data = await fetch_universal_context(mobile)
+        journal_note(sections=non_empty_sections(data))
         
         # Field-Level Security
         if mode != "admin":
             sanitize_for_user_mode(data)
+        remember_context(mobile, panel_mode, data)
             
-        return {"success": True, "data": data}
+        watermark = encode_watermark(
+            mobile, panel_mode, normalize_table_watermarks(watermark_rows), shown_row_ids(data)
+        )
+        rendered = await offload(
+            "user_data.render", payload_cells(data), render_json_response,
+            {"success": True, "data": data, "watermark": watermark},
+        )
+        apply_cache_headers(rendered, etag)
+        return rendered
+    except DatabaseUnavailableError as e:
+        return degraded_panel(mobile, panel_mode, e)
+    except Exception as e:
+        logger.error("Error fetching user data: %s", e)
+        return {"success": False, "error": str(e)}
+
+
+# Upper bound for one lazily loaded page of a side-panel section
+SECTION_PAGE_MAX = 50
+
+
+async def fetch_profile_section(mobile: str) -> dict:
+    """Fetch just the profile and assigned agent: the first thing the panel renders."""
+    mobile_plain = mobile[-10:] if len(mobile) >= 10 else mobile
+    r_profile_list = await execute_readonly_query(PROFILE_SQL, {"m_wild": f"%{mobile_plain}"})
+    profile = r_profile_list[0] if r_profile_list else {}
+
+    agent_ref = profile.get("admin_ref")
+    r_agent = []
+    if agent_ref:
+        r_agent = await execute_readonly_query(AGENT_SQL, {"ref": agent_ref})
+    return {"profile": profile, "agent_info": r_agent[0] if r_agent else {}}
+
+
+async def fetch_section_page(mobile: str, section: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    Fetch one keyset-paginated page of a context section.
+
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    mobile_plain = mobile[-10:] if len(mobile) >= 10 else mobile
+    sql, cursor_params, block = build_section_page_query(section, cursor)
+    rows = await execute_readonly_query(
+        sql, {"m_wild": f"%{mobile_plain}", "page_size": limit + 1, **cursor_params}
+    )
+    sort_column, direction = section_sort(section)
+    page, next_cursor = split_page(rows, limit, sort_column, "id", direction, block)
+    return {"rows": page, "next_cursor": next_cursor}
+
+
+@router.get("/mvp/user-data/{section}")
+async def get_user_data_section(
+    section: str,
+    mobile: str,
+    mode: str = "user",
+    cursor: Optional[str] = None,
+    limit: int = 5,
+):
+    """
+    Fetch one side-panel section on demand.
+
+    `profile` returns the profile and agent; every other section in
+    CONTEXT_SECTIONS is keyset-paginated via the returned `next_cursor`.
+    """
+    panel_mode = "admin" if mode == "admin" else "user"
+    if section != PROFILE_SECTION and section not in CONTEXT_SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown section: {section}")
+    label_request(mode=panel_mode, intent=f"section:{section}")
+    journal_note(user=mask_mobile(mobile), sections=[section])
+    if section == "markups" and panel_mode != "admin":
+        raise HTTPException(status_code=403, detail="Markups are only available in admin mode")
+
+    if settings.USE_MOCK_DATA:
+        return {"mock": "data"}
+
+    try:
+        if section == PROFILE_SECTION:
+            data = await fetch_profile_section(mobile)
+            if panel_mode != "admin":
+                sanitize_for_user_mode(data)
+            return {"success": True, "section": section, "data": data}
+
+        page = await fetch_section_page(mobile, section, max(1, min(limit, SECTION_PAGE_MAX)), cursor)
+        if panel_mode != "admin":
+            sanitize_for_user_mode(page)
+        return {"success": True, "section": section, "data": page["rows"], "next_cursor": page["next_cursor"]}
+    except CursorError as e:
+        return {"success": False, "error": str(e)}
     except Exception as e:
-        logger.error(f"Error fetching user data: {e}")
+        logger.error("Error fetching user data section %s: %s", section, e)
         return {"success": False, "error": str(e)}
 
 
+# A client that sends any of these is paging through a list answer
+PAGING_FIELDS = {"cursor", "limit", "offset"}
+
+
+async def answer_list_page(request: QueryRequest) -> Optional[Union[QueryResponse, ErrorResponse]]:
+    """
+    Answer one page of a list intent through the query planner, with
+    metadata.next_cursor for the next one. A cursor names its intent, so
+    follow-up pages skip intent extraction.
+    
+    Returns:
+        The page, or None when the question is not a list intent (the
+        universal context answers it instead)
+    """
+    if request.cursor:
+        try:
+            extraction = IntentExtractionResult(intent=cursor_intent(request.cursor), entities={})
+        except CursorError as e:
+            return create_error_response(ErrorCode.VALIDATION_ERROR, str(e))
+        language = request.preferred_language or "en"
+    else:
+        extraction = await extract_intent_and_entities(
+            request.query, request.conversation_context, request.preferred_language
+        )
+        template = get_template(extraction.intent)
+        if extraction.is_general_chat() or template is None or "keyset" not in template:
+            return None
+        language = extraction.response_language
+
+    plan = create_query_plan(extraction, request.mobile, request.limit, request.offset, request.cursor)
+    if isinstance(plan, QueryPlanError):
+        return create_error_response(plan.error_code, plan.message)
+    label_request(intent=plan.intent)
+    with span("context.fetch", {"context.intent": plan.intent}):
+        rows = await execute_readonly_query(plan.sql, plan.params)
+    page, next_cursor = plan.paginate(rows)
+    data = {"rows": page}
+    if request.mode != "admin":
+        sanitize_for_user_mode(data)
+    summary = await generate_summary(plan.intent, data["rows"], language)
+    return create_success_response(
+        intent=plan.intent,
+        entities=extraction.entities,
+        data=data["rows"],
+        sanitized_sql=plan.sanitized_sql,
+        summary=summary,
+        next_cursor=next_cursor,
+    )
+
+
+def serialize_prompt_data(context_data: dict, history: list) -> tuple[str, str]:
+    """JSON for the prompt's context and history sections (offloaded for large contexts)."""
+    return encode_json(context_data), encode_json(history)
+
+
 @router.post(
     "/mvp/query",
     response_model=Union[QueryResponse, ErrorResponse],
@@ -219,35 +572,53 @@ async def query(request: QueryRequest) -> Union[QueryResponse, ErrorResponse]:
     try:
         # Step 1: Validate mobile
         use_mock = settings.USE_MOCK_DATA
-        logger.info(f"Universal Query from {masked_mobile}: {request.query[:50]}...")
+        logger.info("Universal Query from %s: %.50s...", masked_mobile, request.query)
         
         is_global = (request.mobile == "ALL" and request.mode == "admin")
+        label_request(mode="global" if is_global else ("admin" if request.mode == "admin" else "user"), intent="universal_query")
+        journal_note(user="ALL" if is_global else masked_mobile)
 
-        if use_mock:
-            mobile_exists = True
-        elif is_global:
-            mobile_exists = True # Skip validation for global query
-        else:
-            mobile_exists = await validate_mobile_exists(request.mobile)
-        
-        if not mobile_exists:
-             return create_error_response(ErrorCode.UNAUTHORIZED, "Mobile number not registered.")
-
-        # Step 2: Fetch Context
-        context_data = {}
-        if not use_mock:
-            if is_global:
-                context_data = await fetch_global_context()
+        # Steps 1-2 read the DB; while it is unavailable, answer from the last context served (or none)
+        degraded, degraded_age = None, 0.0
+        try:
+            if use_mock:
+                mobile_exists = True
+            elif is_global:
+                mobile_exists = True # Skip validation for global query
             else:
-                context_data = await fetch_universal_context(request.mobile)
+                mobile_exists = await validate_mobile_exists(request.mobile)
+            
+            if not mobile_exists:
+                 return create_error_response(ErrorCode.UNAUTHORIZED, "Mobile number not registered.")
+
+            # List intents asked for page by page go through the query planner
+            if not use_mock and not is_global and request.model_fields_set & PAGING_FIELDS:
+                page = await answer_list_page(request)
+                if page is not None:
+                    return page
+
+            # Step 2: Fetch Context
+            context_data = {}
+            if not use_mock:
+                with span("context.fetch", {"context.global": is_global}):
+                    if is_global:
+                        context_data = await fetch_global_context()
+                    else:
+                        context_data = await fetch_universal_context(request.mobile)
+                journal_note(sections=non_empty_sections(context_data))
                 # Field-Level Security
-                if request.mode != 'admin':
-                    sanitize_for_user_mode(context_data)
-        else:
-            context_data = {
-                "profile": {"user_name": "Test User", "user_mobile": "+919999999999"},
-                "recent_bookings": [{"pnr": "ABCDEF", "destination": "Dubai", "date": "2025-12-30"}]
-            }
+                if not is_global and request.mode != 'admin':
+                    with span("context.sanitize"):
+                        sanitize_for_user_mode(context_data)
+                remember_context(request.mobile, request.mode, context_data)
+            else:
+                context_data = {
+                    "profile": {"user_name": "Test User", "user_mobile": "+919999999999"},
+                    "recent_bookings": [{"pnr": "ABCDEF", "destination": "Dubai", "date": "2025-12-30"}]
+                }
+        except DatabaseUnavailableError as e:
+            context_data, degraded, degraded_age = degraded_context(request.mobile, request.mode, "/mvp/query", e)
+            journal_note(error=f"degraded:{degraded}")
 
         # Step 3: Generate Response
         model = get_model()
@@ -278,15 +649,22 @@ async def query(request: QueryRequest) -> Union[QueryResponse, ErrorResponse]:
             - Do NOT discuss internal costs, supplier prices, or profits.
             """
 
-        prompt = f"""{system_role}
+        with span("prompt.build") as prompt_span:
+            history = request.conversation_context or []
+            degraded_note = f"\n6. {degraded_instruction(degraded, degraded_age)}" if degraded else ""
+            context_json, history_json = await offload(
+                "prompt.serialize", payload_cells(context_data) + payload_cells(history),
+                serialize_prompt_data, context_data, history,
+            )
+            prompt = f"""{system_role}
 {recipient_context}
 You have their COMPLETE data below.
 
 ## USER CONTEXT (Database):
-{json.dumps(context_data, default=str)}
+{context_json}
 
 ## CONVERSATION HISTORY:
-{json.dumps(request.conversation_context or [], default=str)}
+{history_json}
 
 ## USER QUESTION:
 "{request.query}"
@@ -300,29 +678,34 @@ You have their COMPLETE data below.
    - `recent_bookings`: Flight PNRs.
 3. {instructions.strip()}
 4. **No Robot Speak**: Do not say "Based on the database...".
-5. **Language**: Reply in the same language as the user's question.
+5. **Language**: Reply in the same language as the user's question.{degraded_note}
 
 Answer:"""
+            prompt_span.set_attribute("llm.prompt_chars", len(prompt))
         
-        loop = asyncio.get_running_loop()
-        response_obj = await loop.run_in_executor(None, lambda: model.generate_content(prompt))
+        response_obj = await generate_content_async(model, prompt, "universal_answer")
         answer_text = response_obj.text.strip() if response_obj.text else "I couldn't generate an answer."
         
-        # Log the raw results as requested
-        logger.info(f"DB QUERY RESULT (Universal Context):\n{str(context_data)[:1000]}...\n-------------------")
-        logger.info(f"GEMINI RAW RESPONSE:\n{answer_text}\n-------------------")
+        # Raw context and answer only at DEBUG; per-request accounting is in the request journal
+        logger.debug("DB QUERY RESULT (Universal Context):\n%.1000s...\n-------------------", context_json)
+        logger.debug("GEMINI RAW RESPONSE:\n%s\n-------------------", answer_text)
 
         # Create generic response
-        return create_success_response(
-            intent="universal_query",
-            entities={},
-            data=context_data, # Send full context to frontend for debugging context if needed
-            sanitized_sql="[UNIVERSAL FETCH]",
-            summary=answer_text
-        )
+        with span("response.format"):
+            response = await offload(
+                "response.format", payload_cells(context_data), create_success_response,
+                intent="universal_query",
+                entities={},
+                data=context_data, # Send full context to frontend for debugging context if needed
+                sanitized_sql="[UNIVERSAL FETCH]",
+                summary=answer_text
+            )
+            response.degraded = degraded
+            return response
 
     except Exception as e:
-        logger.exception(f"Universal Query Error: {e}")
+        logger.exception("Universal Query Error: %s", e)
+        journal_note(error=type(e).__name__)
         return create_error_response(ErrorCode.INTERNAL_ERROR, f"An error occurred: {str(e)}")
 
 
@@ -332,10 +715,20 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "flyshop-ai-chatbot",
-        "mock_mode": settings.USE_MOCK_DATA
+        "mock_mode": settings.USE_MOCK_DATA,
+        "db_backend": settings.DB_BACKEND
     }
 
 
+@router.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 503 until the connection pools are open to their minimum size."""
+    status = readiness()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+
 @router.get("/intents")
 async def list_intents():
     """List supported intents (for documentation/debugging)."""
@@ -355,12 +748,26 @@ async def list_intents():
 
 @router.get("/mock-users")
 async def list_mock_users():
-    """List available mock users for testing."""
-    return {"error": "Mock mode is disabled and mock data file is removed."}
+    """List the users available in the local stand-in database (DB_BACKEND=standin)."""
+    if settings.DB_BACKEND != "standin":
+        return {"error": "Mock mode is disabled and mock data file is removed."}
+    try:
+        rows = await execute_readonly_query(
+            "SELECT user_name, user_mobile, COUNT(*) AS queries FROM query_masters "
+            "WHERE user_mobile IS NOT NULL GROUP BY user_mobile, user_name ORDER BY queries DESC LIMIT 100",
+            {}
+        )
+        return {"backend": "standin", "users": [
+            {"name": row.get("user_name") or "Unknown", "mobile": row.get("user_mobile"), "queries": row.get("queries")}
+            for row in rows
+        ]}
+    except Exception as e:
+        logger.error("Error fetching stand-in users: %s", e)
+        return {"users": [], "error": str(e)}
 
 
 @router.get("/users")
-async def list_users():
+async def list_users(request: Request, response: Response):
     """Fetch real users from database for dropdown."""
     if settings.USE_MOCK_DATA:
         # Return hardcoded mock users for testing
@@ -370,15 +777,15 @@ async def list_users():
         ]}
         
     try:
+        not_modified, etag, _ = await revalidate(
+            request, "users", "/users",
+            lambda: execute_readonly_query(USERS_WATERMARK_SQL, {})
+        )
+        if not_modified:
+            return not_modified
+
         # Fetch distinct users, preferring most recent
-        query = """
-        SELECT DISTINCT user_name, user_mobile, created_at
-        FROM query_masters 
-        WHERE user_mobile IS NOT NULL 
-        ORDER BY created_at DESC 
-        LIMIT 100
-        """
-        rows = await execute_readonly_query(query, {})
+        rows = await execute_readonly_query(USERS_LIST_SQL, {})
         
         users = []
         seen_mobiles = set()
@@ -392,15 +799,16 @@ async def list_users():
                 })
                 seen_mobiles.add(mobile)
                 
+        apply_cache_headers(response, etag)
         return {"users": users}
         
     except Exception as e:
-        logger.error(f"Error fetching users: {e}")
+        logger.error("Error fetching users: %s", e)
         return {"users": [], "error": str(e)}
 
 
 @router.get("/admins")
-async def list_admins():
+async def list_admins(request: Request, response: Response):
     """Fetch admins from database for dropdown."""
     if settings.USE_MOCK_DATA:
         return {"users": [
@@ -408,9 +816,15 @@ async def list_admins():
         ]}
         
     try:
+        not_modified, etag, _ = await revalidate(
+            request, "admins", "/admins",
+            lambda: execute_readonly_query(ADMINS_WATERMARK_SQL, {})
+        )
+        if not_modified:
+            return not_modified
+
         # Fetch admins
-        query = "SELECT name, phone as mobile FROM master_admins LIMIT 100"
-        rows = await execute_readonly_query(query, {})
+        rows = await execute_readonly_query(ADMINS_LIST_SQL, {})
         
         admins = []
         for row in rows:
@@ -419,9 +833,10 @@ async def list_admins():
                 "mobile": row.get('mobile')
             })
                 
+        apply_cache_headers(response, etag)
         return {"users": admins}
         
     except Exception as e:
-        logger.error(f"Error fetching admins: {e}")
+        logger.error("Error fetching admins: %s", e)
         return {"users": [], "error": str(e)}
 
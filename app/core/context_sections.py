@@ -0,0 +1,188 @@
+"""
+Context Sections: Registry of the per-user data sections shown in the side panel
+and fed to the LLM, plus the opaque watermark used for incremental refreshes.
+"""
+from typing import Optional, Any
+import base64
+import binascii
+import hashlib
+import json
+
+from app.core.pagination import keyset_where, keyset_order_by
+
+
+# Section name -> source table, (sort column, direction) and row cap for the
+# full context. Every section is scoped to the user's query_ids.
+# Sections without a sort are paged by id (newest first).
+CONTEXT_SECTIONS: dict[str, dict] = {
+    "recent_bookings": {
+        "table": "query_flight_manages",
+        "sort": ("departure_datetime", "DESC"),
+        "limit": 5,
+    },
+    "recent_payments": {
+        "table": "query_payments",
+        "sort": None,
+        "limit": 5,
+    },
+    "recent_quotations": {
+        "table": "query_quotations",
+        "sort": ("sent_at", "DESC"),
+        "limit": 5,
+    },
+    "recent_queries": {
+        "table": "query_masters",
+        "sort": ("created_at", "DESC"),
+        "limit": 5,
+    },
+    "recent_activities": {
+        "table": "query_activities",
+        "sort": ("date", "ASC"),
+        "limit": 5,
+    },
+    "payment_schedules": {
+        "table": "query_payment_schedulers",
+        "sort": ("payment_date", "ASC"),
+        "limit": 5,
+    },
+    "markups": {
+        "table": "query_activity_markups",
+        "sort": None,
+        "limit": 10,
+    },
+}
+
+# The profile (latest query_masters row + assigned agent) is its own lazy section
+PROFILE_SECTION = "profile"
+
+WATERMARK_VERSION = 1
+
+# Subquery scoping any section to the user's queries (one round-trip per page)
+USER_QUERY_IDS_SQL = "SELECT query_id FROM query_masters WHERE user_mobile LIKE :m_wild"
+
+
+def build_section_query(section: str, ids_placeholder: str) -> str:
+    """Build the top-N SELECT for a section scoped to a list of query_ids."""
+    spec = CONTEXT_SECTIONS[section]
+    order = f" ORDER BY {spec['sort'][0]} {spec['sort'][1]}" if spec["sort"] else ""
+    return f"SELECT * FROM {spec['table']} WHERE query_id IN ({ids_placeholder}){order} LIMIT {spec['limit']}"
+
+
+def section_sort(section: str) -> tuple[str, str]:
+    """(sort column, direction) used for keyset paging of a section."""
+    return CONTEXT_SECTIONS[section]["sort"] or ("id", "DESC")
+
+
+def build_section_page_query(section: str, cursor: Optional[str] = None) -> tuple[str, dict, Optional[str]]:
+    """
+    Build a keyset-paginated SELECT for one section of one user.
+    Binds :m_wild and :page_size plus the returned cursor parameters.
+
+    Returns:
+        (sql, cursor bind params, block the query seeks in - see app/core/pagination)
+
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    spec = CONTEXT_SECTIONS[section]
+    sort_column, direction = section_sort(section)
+    seek, params, block = keyset_where(cursor, sort_column, "id", direction)
+    where = f"query_id IN ({USER_QUERY_IDS_SQL})"
+    if seek:
+        where += f" AND {seek}"
+    sql = (
+        f"SELECT * FROM {spec['table']} WHERE {where} "
+        f"ORDER BY {keyset_order_by(sort_column, 'id', direction)} LIMIT :page_size"
+    )
+    return sql, params, block
+
+
+def normalize_table_watermarks(rows: list[dict]) -> dict[str, list]:
+    """
+    Turn watermark query rows into {table: [row_count, max_id, max_updated]}.
+    Values are made JSON-stable so they can be compared after a round-trip.
+    """
+    result = {}
+    for row in rows:
+        max_updated = row.get("max_updated")
+        result[row["section"]] = [
+            int(row.get("row_count") or 0),
+            int(row["max_id"]) if row.get("max_id") is not None else None,
+            str(max_updated) if max_updated is not None else None,
+        ]
+    return result
+
+
+def _scope_key(mobile: str) -> str:
+    """Bind a token to a user without putting the mobile number in the URL."""
+    return hashlib.sha256(mobile[-10:].encode("utf-8")).hexdigest()[:12]
+
+
+def encode_watermark(mobile: str, mode: str, tables: dict[str, list], shown_ids: dict[str, list]) -> str:
+    """Pack table watermarks and the row ids the client holds into an opaque token."""
+    payload = {"v": WATERMARK_VERSION, "u": _scope_key(mobile), "m": mode, "t": tables, "ids": shown_ids}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_watermark(token: str, mobile: str, mode: str) -> Optional[dict[str, Any]]:
+    """
+    Unpack a watermark token.
+    Returns None if the token is malformed, from another version, user or mode,
+    in which case the caller should fall back to a full fetch.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("v") != WATERMARK_VERSION:
+        return None
+    if payload.get("u") != _scope_key(mobile) or payload.get("m") != mode:
+        return None
+    if not isinstance(payload.get("t"), dict) or not isinstance(payload.get("ids"), dict):
+        return None
+    return payload
+
+
+def shown_row_ids(data: dict) -> dict[str, list]:
+    """Collect the primary keys of the rows held in each section of a context."""
+    return {
+        section: [row.get("id") for row in data.get(section) or [] if row.get("id") is not None]
+        for section in CONTEXT_SECTIONS
+    }
+
+
+def diff_section(
+    rows: list[dict],
+    previous_ids: list,
+    previous_watermark: Optional[list],
+) -> dict[str, list]:
+    """
+    Diff a freshly read top-N section against what the client holds.
+
+    Upserts are rows the client doesn't have or that were added/updated after the
+    previous watermark; tombstones are ids the client holds that left the top-N
+    (deleted or pushed out). `order` lets the client re-sort without knowing the sort key.
+    """
+    previous = set(previous_ids)
+    _, prev_max_id, prev_max_updated = previous_watermark or [0, None, None]
+
+    upserts = []
+    for row in rows:
+        row_id = row.get("id")
+        updated = row.get("updated_at")
+        is_new = row_id not in previous or (
+            prev_max_id is not None and row_id is not None and row_id > prev_max_id
+        )
+        is_changed = updated is not None and (prev_max_updated is None or str(updated) > prev_max_updated)
+        if is_new or is_changed:
+            upserts.append(row)
+
+    current_ids = [row.get("id") for row in rows]
+    current = set(current_ids)
+    return {
+        "upserts": upserts,
+        "tombstones": [row_id for row_id in previous_ids if row_id not in current],
+        "order": current_ids,
+    }
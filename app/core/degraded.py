@@ -0,0 +1,114 @@
+"""
+Degraded answers while the database is unavailable (breaker open, deadline hit, pool saturated).
+
+The last context served for each user and mode is kept in a small LRU. When
+a DB read fails with DatabaseUnavailableError:
+
+- /mvp/query answers from that context, telling the model how old it is;
+  with nothing cached it asks the model without account data (llm_only);
+- /mvp/user-data serves the cached panel instead of an error.
+
+Both return at once instead of waiting on the database, and the response
+carries `degraded: "cached" | "llm_only"`.
+"""
+from collections import OrderedDict
+from typing import Optional
+import logging
+import threading
+import time
+
+from app.config import get_settings
+from app.core.metrics import DEGRADED_RESPONSES
+
+logger = logging.getLogger(__name__)
+
+SOURCE_CACHED = "cached"
+SOURCE_LLM_ONLY = "llm_only"
+
+
+def context_key(mobile: str, mode: str) -> str:
+    """Cache key: the context differs per mode (field-level security)."""
+    if mobile == "ALL":
+        return "global"
+    return f"{'admin' if mode == 'admin' else 'user'}:{mobile[-10:]}"
+
+
+class ContextCache:
+    """Last-known-good contexts, least recently used evicted first."""
+
+    def __init__(self, max_entries: int, max_age_s: float):
+        self.max_entries = max_entries
+        self.max_age_s = max_age_s
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, data: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (data, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[tuple[dict, float]]:
+        """(context, age in seconds), or None if missing or too old."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.time() - entry[1]
+            if age > self.max_age_s:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], age
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[ContextCache] = None
+
+
+def get_context_cache() -> ContextCache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = ContextCache(settings.DEGRADED_CONTEXT_CACHE_SIZE, settings.DEGRADED_CONTEXT_MAX_AGE_S)
+    return _cache
+
+
+def remember_context(mobile: str, mode: str, data: dict) -> None:
+    """Keep a context just served (already sanitized for its mode) for degraded answers."""
+    get_context_cache().put(context_key(mobile, mode), data)
+
+
+def cached_context(mobile: str, mode: str) -> Optional[tuple[dict, float]]:
+    """The last context served for this user and mode: (data, age in seconds), or None."""
+    return get_context_cache().get(context_key(mobile, mode))
+
+
+def record_degraded(endpoint: str, source: str, error: Exception) -> None:
+    DEGRADED_RESPONSES.inc(endpoint, source)
+    logger.warning("Database unavailable (%s), answering %s from %s", error, endpoint, source)
+
+
+def degraded_context(mobile: str, mode: str, endpoint: str, error: Exception) -> tuple[dict, str, float]:
+    """The context to answer with while the DB is unavailable: (data, source, age in seconds)."""
+    cached = cached_context(mobile, mode)
+    if cached is None:
+        record_degraded(endpoint, SOURCE_LLM_ONLY, error)
+        return {}, SOURCE_LLM_ONLY, 0.0
+    record_degraded(endpoint, SOURCE_CACHED, error)
+    return cached[0], SOURCE_CACHED, cached[1]
+
+
+def degraded_instruction(source: str, age_s: float) -> str:
+    """Extra prompt instruction for a degraded answer."""
+    if source == SOURCE_CACHED:
+        return (f"**Possibly outdated data**: The database is briefly unavailable; this data is from "
+                f"{max(1, round(age_s / 60))} minute(s) ago. If the answer depends on recent changes, say so.")
+    return ("**No account data**: The database is briefly unavailable, so no booking, payment or quotation "
+            "data is included. Do not guess any; answer what you can and say the details can be checked shortly.")
@@ -0,0 +1,282 @@
+"""
+HTTP Cache: Strong ETags, If-None-Match handling and precompressed static assets.
+Lets the chat UI revalidate /users, /admins, /mvp/user-data and static files cheaply.
+"""
+from typing import Optional, Any, Awaitable, Callable
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+import hashlib
+import gzip
+import json
+import mimetypes
+import os
+import time
+import logging
+
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Data endpoints must always revalidate, they carry per-user CRM data
+DATA_CACHE_CONTROL = "private, no-cache"
+# HTML shell revalidates on every load so UI deploys show up immediately
+HTML_CACHE_CONTROL = "no-cache"
+# Other static assets can be reused for a while before revalidating
+STATIC_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
+
+# Don't bother compressing tiny files
+MIN_COMPRESS_SIZE = 512
+
+# Per-endpoint counters: requests, 304s, and 304s answered without any DB round-trip
+_cache_stats: dict[str, dict[str, int]] = {}
+
+
+def record_cache_event(endpoint: str, not_modified: bool, db_skipped: bool = False) -> None:
+    """Record a request outcome for hit-rate reporting."""
+    stats = _cache_stats.setdefault(
+        endpoint, {"requests": 0, "not_modified": 0, "db_skipped": 0}
+    )
+    stats["requests"] += 1
+    if not_modified:
+        stats["not_modified"] += 1
+    if db_skipped:
+        stats["db_skipped"] += 1
+
+
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """Return per-endpoint counters with hit rates."""
+    report = {}
+    for endpoint, stats in _cache_stats.items():
+        requests = stats["requests"]
+        report[endpoint] = {
+            **stats,
+            "hit_rate": round(stats["not_modified"] / requests, 4) if requests else 0.0,
+        }
+    return report
+
+
+def reset_cache_stats() -> None:
+    """Clear all hit-rate counters."""
+    _cache_stats.clear()
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from a content hash.
+    Parts can be bytes, strings or any JSON-serializable watermark values.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            digest.update(part)
+        elif isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        else:
+            digest.update(json.dumps(part, default=str, sort_keys=True).encode("utf-8"))
+        digest.update(b"\x00")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+    Uses weak comparison as required for If-None-Match (RFC 9110 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified_response(etag: str, cache_control: str = DATA_CACHE_CONTROL) -> Response:
+    """Build an empty 304 response carrying the validators."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def apply_cache_headers(response: Response, etag: str, cache_control: str = DATA_CACHE_CONTROL) -> None:
+    """Attach validators to an outgoing (200) response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+class WatermarkCache:
+    """
+    Remembers the last ETag computed per resource key for a short TTL.
+    A matching If-None-Match inside the TTL is answered with 304 without any DB round-trip.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[str, float]] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a fresh ETag for a key, or None if missing/expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        etag, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._entries.pop(key, None)
+            return None
+        return etag
+
+    def set(self, key: str, etag: str) -> None:
+        """Store the ETag computed for a key."""
+        self._entries[key] = (etag, time.monotonic())
+
+    def clear(self) -> None:
+        """Forget all entries."""
+        self._entries.clear()
+
+
+_watermark_cache: Optional[WatermarkCache] = None
+
+
+def get_watermark_cache() -> WatermarkCache:
+    """Get the process-wide watermark ETag cache."""
+    global _watermark_cache
+    if _watermark_cache is None:
+        from app.config import get_settings
+        _watermark_cache = WatermarkCache(get_settings().HTTP_CACHE_TTL_SECONDS)
+    return _watermark_cache
+
+
+async def revalidate(
+    request: Request,
+    key: str,
+    endpoint: str,
+    load_watermark: Callable[[], Awaitable[Any]],
+) -> tuple[Optional[Response], str, Any]:
+    """
+    Conditional-request check driven by a data watermark.
+
+    1. If the client's ETag equals the one computed for `key` within the TTL,
+       answer 304 without touching the DB.
+    2. Otherwise run the (cheap) watermark query and derive the ETag from it;
+       a match still answers 304 without running the full data queries.
+
+    Returns:
+        (304 response or None, current ETag, watermark or None if it wasn't read)
+    """
+    if_none_match = request.headers.get("if-none-match")
+    cache = get_watermark_cache()
+
+    with span("cache.revalidate", {"cache.key": key}) as cache_span:
+        cached_etag = cache.get(key)
+        if cached_etag and etag_matches(if_none_match, cached_etag):
+            record_cache_event(endpoint, not_modified=True, db_skipped=True)
+            cache_span.set_attributes({"cache.hit": True, "cache.db_skipped": True})
+            return not_modified_response(cached_etag), cached_etag, None
+
+        watermark = await load_watermark()
+        etag = make_etag(key, watermark)
+        cache.set(key, etag)
+        if etag_matches(if_none_match, etag):
+            record_cache_event(endpoint, not_modified=True)
+            cache_span.set_attribute("cache.hit", True)
+            return not_modified_response(etag), etag, watermark
+
+        record_cache_event(endpoint, not_modified=False)
+        cache_span.set_attribute("cache.hit", False)
+        return None, etag, watermark
+
+
+class StaticAsset:
+    """An in-memory static file with its ETag and precompressed variants."""
+
+    def __init__(self, path: str, body: bytes, mtime_ns: int, size: int):
+        self.path = path
+        self.body = body
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.etag = make_etag(body)
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.variants: dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            try:
+                import brotli  # Optional: only used if installed
+                self.variants["br"] = brotli.compress(body)
+            except ImportError:
+                pass
+
+
+_static_assets: dict[str, StaticAsset] = {}
+
+
+def load_static_asset(path: str) -> StaticAsset:
+    """Load (or reuse) a static asset, reloading only when the file changes on disk."""
+    stat = os.stat(path)
+    asset = _static_assets.get(path)
+    if asset is None or asset.mtime_ns != stat.st_mtime_ns or asset.size != stat.st_size:
+        with open(path, "rb") as f:
+            body = f.read()
+        asset = StaticAsset(path, body, stat.st_mtime_ns, stat.st_size)
+        _static_assets[path] = asset
+    return asset
+
+
+def choose_encoding(accept_encoding: Optional[str], available: dict[str, bytes]) -> Optional[str]:
+    """Pick the best precompressed variant the client accepts (br > gzip)."""
+    if not accept_encoding or not available:
+        return None
+    accepted = set()
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def static_asset_response(
+    request: Request,
+    path: str,
+    endpoint: str,
+    cache_control: str = STATIC_CACHE_CONTROL,
+) -> Response:
+    """Serve a static file from memory with ETag revalidation and precompressed variants."""
+    asset = load_static_asset(path)
+    headers = {
+        "ETag": asset.etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), asset.etag):
+        record_cache_event(endpoint, not_modified=True, db_skipped=True)
+        return Response(status_code=304, headers=headers)
+
+    record_cache_event(endpoint, not_modified=False)
+    encoding = choose_encoding(request.headers.get("accept-encoding"), asset.variants)
+    body = asset.body
+    if encoding:
+        body = asset.variants[encoding]
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=asset.media_type, headers=headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles mount that serves files from memory with strong ETags and gzip/br variants."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is None or not os.path.isfile(full_path):
+            # Directories, html mode and 404s keep Starlette's behaviour
+            return await super().get_response(path, scope)
+        request = Request(scope)
+        cache_control = HTML_CACHE_CONTROL if full_path.endswith(".html") else STATIC_CACHE_CONTROL
+        return static_asset_response(request, full_path, endpoint="/static", cache_control=cache_control)
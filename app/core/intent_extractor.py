@@ -5,11 +5,16 @@ Supports all CRM models and general helpdesk queries.
 """
 import json
 import logging
+import re
 import asyncio
+import time
 from typing import Optional
 import google.generativeai as genai
 
 from app.config import get_settings
+from app.core.replay import get_replay_journal, MODE_REPLAY
+from app.core.tracing import span, prompt_attributes, annotate_llm_response, KIND_CLIENT
+from app.core.metrics import LLM_IN_FLIGHT, LLM_SECONDS, LLM_ERRORS, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -23,16 +28,52 @@ else:
 
 # Initialize the model
 MODEL_NAME = "gemini-2.5-flash"
+_model = None
 
 def get_model():
-    """Get the Gemini model instance."""
-    return genai.GenerativeModel(
-        model_name=MODEL_NAME,
-        generation_config={
-            "temperature": 0.4,
-            "max_output_tokens": 2048,
-        }
-    )
+    """
+    Get the Gemini model instance (wrapped for record/replay when REPLAY_MODE is set).
+    The model only holds configuration and a client, so one instance serves every request.
+    """
+    global _model
+    journal = get_replay_journal()
+    if journal is not None and journal.mode == MODE_REPLAY:
+        return journal.wrap_model(None, MODEL_NAME)
+    if _model is None:
+        _model = genai.GenerativeModel(
+            model_name=MODEL_NAME,
+            generation_config={
+                "temperature": 0.4,
+                "max_output_tokens": 2048,
+            }
+        )
+    return journal.wrap_model(_model, MODEL_NAME) if journal is not None else _model
+
+
+async def generate_content_async(model, prompt: str, operation: str):
+    """
+    Run model.generate_content in the default executor, traced and metered.
+    `operation` labels the call (intent, summary, universal_answer).
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    LLM_IN_FLIGHT.inc()
+    try:
+        with span("llm.generate", prompt_attributes(prompt, operation), KIND_CLIENT) as llm_span:
+            response = await loop.run_in_executor(None, lambda: model.generate_content(prompt))
+            annotate_llm_response(llm_span, response)
+    except Exception:
+        LLM_ERRORS.inc(operation)
+        raise
+    finally:
+        LLM_IN_FLIGHT.dec()
+    LLM_SECONDS.observe(time.perf_counter() - started, operation)
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or len(prompt) // 4
+    completion_tokens = getattr(usage, "candidates_token_count", None) or len(getattr(response, "text", None) or "") // 4
+    LLM_PROMPT_TOKENS.inc(operation, amount=prompt_tokens)
+    LLM_COMPLETION_TOKENS.inc(operation, amount=completion_tokens)
+    return response
 
 # Supported intents for structured data queries
 SUPPORTED_INTENTS = [
@@ -280,51 +321,33 @@ class IntentExtractionResult:
         return self.clarification_needed or len(self.missing_params) > 0
 
 
-async def extract_intent_and_entities(query: str, conversation_context: Optional[str] = None, preferred_language: Optional[str] = None) -> IntentExtractionResult:
-    """
-    Extract intent and entities from a natural language query using Gemini.
-    Multilingual and context-aware - understands Hindi, English, Hinglish, etc.
-    Can answer ANY type of question - both data lookups and general chat.
-    
-    Args:
-        query: User's natural language query
-        conversation_context: Optional conversation history for context
-        preferred_language: Optional language preference ('en', 'hi', 'hinglish'). 
-                           If set, all responses will be in this language.
-    """
-    if not settings.GEMINI_API_KEY:
-        logger.error("Gemini API key not configured")
-        return IntentExtractionResult(intent="unknown", entities={}, friendly_message="API not configured")
-
-    try:
-        model = get_model()
-        
-        # Build the full prompt with context
-        context_section = ""
-        if conversation_context:
-            context_section = f"""
+def build_intent_prompt(query: str, conversation_context: Optional[str] = None, preferred_language: Optional[str] = None) -> str:
+    """Build the full intent-extraction prompt (system prompt, language rule, history, message)."""
+    context_section = ""
+    if conversation_context:
+        context_section = f"""
 ## CONVERSATION HISTORY:
 {conversation_context}
 
 (Use this to understand what "that", "this", "it", "इसी", "वो", "उसका" etc. refer to. Extract entity values from context if user doesn't repeat them.)
 """
-        
-        # Add language enforcement if preferred_language is set
-        language_instruction = ""
-        if preferred_language:
-            lang_name = {
-                "en": "English",
-                "hi": "Hindi (हिंदी)",
-                "hinglish": "Hinglish (mix of Hindi and English)"
-            }.get(preferred_language, "English")
-            language_instruction = f"""
+    
+    # Add language enforcement if preferred_language is set
+    language_instruction = ""
+    if preferred_language:
+        lang_name = {
+            "en": "English",
+            "hi": "Hindi (हिंदी)",
+            "hinglish": "Hinglish (mix of Hindi and English)"
+        }.get(preferred_language, "English")
+        language_instruction = f"""
 ## IMPORTANT - LANGUAGE REQUIREMENT:
 The user has set their preferred language to: **{lang_name}**
 You MUST respond ONLY in {lang_name}. Do NOT switch to any other language.
 Set response_language to "{preferred_language}" in your JSON response.
 """
-        
-        full_prompt = f"""{SYSTEM_PROMPT}
+    
+    full_prompt = f"""{SYSTEM_PROMPT}
 
 {language_instruction}
 {context_section}
@@ -333,44 +356,69 @@ Set response_language to "{preferred_language}" in your JSON response.
 {query}
 
 ## YOUR JSON RESPONSE:"""
+    return full_prompt
+
+
+def repair_gemini_json(response_text: str) -> str:
+    """
+    Clean up common formatting issues in Gemini's JSON output
+    (markdown fences, surrounding text, single quotes, Python booleans, trailing commas).
+    """
+    # Clean up common JSON formatting issues
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    response_text = response_text.strip()
+    
+    # Try to extract JSON from response if it contains other text
+    json_match = re.search(r'\{[^{}]*\}', response_text, re.DOTALL)
+    if json_match and not response_text.startswith('{'):
+        response_text = json_match.group(0)
+    
+    # Fix common JSON issues: single quotes to double quotes (but not inside strings)
+    # Replace 'key': with "key":
+    response_text = re.sub(r"'(\w+)'(\s*:)", r'"\1"\2', response_text)
+    # Replace : 'value' with : "value" (for simple string values)
+    response_text = re.sub(r":\s*'([^']*)'", r': "\1"', response_text)
+    # Fix True/False to true/false
+    response_text = response_text.replace(': True', ': true').replace(': False', ': false')
+    response_text = response_text.replace(':True', ':true').replace(':False', ':false')
+    # Remove trailing commas before } or ]
+    response_text = re.sub(r',\s*}', '}', response_text)
+    response_text = re.sub(r',\s*]', ']', response_text)
+    return response_text
+
+
+async def extract_intent_and_entities(query: str, conversation_context: Optional[str] = None, preferred_language: Optional[str] = None) -> IntentExtractionResult:
+    """
+    Extract intent and entities from a natural language query using Gemini.
+    Multilingual and context-aware - understands Hindi, English, Hinglish, etc.
+    Can answer ANY type of question - both data lookups and general chat.
+    
+    Args:
+        query: User's natural language query
+        conversation_context: Optional conversation history for context
+        preferred_language: Optional language preference ('en', 'hi', 'hinglish'). 
+                           If set, all responses will be in this language.
+    """
+    if not settings.GEMINI_API_KEY:
+        logger.error("Gemini API key not configured")
+        return IntentExtractionResult(intent="unknown", entities={}, friendly_message="API not configured")
+
+    try:
+        model = get_model()
+        full_prompt = build_intent_prompt(query, conversation_context, preferred_language)
         
         # Generate response asynchronously
-        loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: model.generate_content(full_prompt)
-        )
+        response = await generate_content_async(model, full_prompt, "intent")
         
         # Parse the response
         response_text = response.text.strip() if response.text else "{}"
-        logger.info(f"GEMINI RAW RESPONSE:\n{response_text}\n-------------------")
-        
-        # Clean up common JSON formatting issues
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        # Try to extract JSON from response if it contains other text
-        import re
-        json_match = re.search(r'\{[^{}]*\}', response_text, re.DOTALL)
-        if json_match and not response_text.startswith('{'):
-            response_text = json_match.group(0)
-        
-        # Fix common JSON issues: single quotes to double quotes (but not inside strings)
-        # Replace 'key': with "key":
-        response_text = re.sub(r"'(\w+)'(\s*:)", r'"\1"\2', response_text)
-        # Replace : 'value' with : "value" (for simple string values)
-        response_text = re.sub(r":\s*'([^']*)'", r': "\1"', response_text)
-        # Fix True/False to true/false
-        response_text = response_text.replace(': True', ': true').replace(': False', ': false')
-        response_text = response_text.replace(':True', ':true').replace(':False', ':false')
-        # Remove trailing commas before } or ]
-        response_text = re.sub(r',\s*}', '}', response_text)
-        response_text = re.sub(r',\s*]', ']', response_text)
+        logger.debug("GEMINI RAW RESPONSE:\n%s\n-------------------", response_text)
+        response_text = repair_gemini_json(response_text)
         
         # Parse JSON
         data = json.loads(response_text)
@@ -398,7 +446,10 @@ Set response_language to "{preferred_language}" in your JSON response.
         else:
             missing_params = []
         
-        logger.info(f"Gemini: intent={intent}, lang={response_language}, needs_data={needs_data}, clarify={clarification_needed}, entities={list(entities.keys())}")
+        logger.info(
+            "Gemini: intent=%s, lang=%s, needs_data=%s, clarify=%s, entities=%s",
+            intent, response_language, needs_data, clarification_needed, ",".join(entities),
+        )
         
         return IntentExtractionResult(
             intent=intent, 
@@ -411,7 +462,7 @@ Set response_language to "{preferred_language}" in your JSON response.
         )
         
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse Gemini response as JSON: {e}")
+        logger.error("Failed to parse Gemini response as JSON: %s", e)
         # Smart fallback: try to infer intent from query keywords
         query_lower = query.lower()
         
@@ -441,7 +492,7 @@ Set response_language to "{preferred_language}" in your JSON response.
                 friendly_message="Hmm, I didn't quite catch that 😊 Were you asking about:\n• 💳 Payments\n• 📝 Quotations\n• ✈️ Bookings\n• 📋 Your travel queries\n\nJust let me know and I'll help!"
             )
     except Exception as e:
-        logger.error(f"Intent extraction failed: {e}")
+        logger.error("Intent extraction failed: %s", e)
         return IntentExtractionResult(
             intent="general_help", 
             entities={},
@@ -568,19 +619,15 @@ Format Requirements:
                 data=json.dumps(limited_data, default=str)
             )
         
-        loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: model.generate_content(prompt)
-        )
+        response = await generate_content_async(model, prompt, "summary")
         
         response_text = response.text.strip() if response.text else ""
-        logger.info(f"GEMINI SUMMARY RESPONSE:\n{response_text}\n-------------------")
+        logger.debug("GEMINI SUMMARY RESPONSE:\n%s\n-------------------", response_text)
         
         return response_text
         
     except Exception as e:
-        logger.error(f"Summary generation failed: {e}")
+        logger.error("Summary generation failed: %s", e)
         return None
 
 
@@ -0,0 +1,224 @@
+"""
+Logging: records are queued by the caller and formatted and written by a background listener.
+
+configure_logging() puts a QueueHandler on the root logger and reroutes
+uvicorn's loggers (access log included) to it. On the calling thread, usually
+the event loop, a record only passes the rate limiter, gets the current trace
+id and is put on a bounded queue. The QueueListener thread formats and writes
+it, so stdout or file I/O never adds to request latency. When the queue is
+full the record is dropped and counted rather than blocking.
+
+Formatting is lazy: use %-style arguments (`logger.info("x=%s", x)`), not
+f-strings, so a disabled level costs one level check and the message is built
+on the listener thread. Arguments that are not plain str/int/float/bool/None
+are formatted on the caller, since they could change before the listener
+reads them.
+
+Rate limiting and sampling work per message class: the call site (file and
+line), or an explicit `extra={"log_class": ...}`. Each class gets
+LOG_RATE_LIMIT_PER_S records per second with the same burst. The next record
+that gets through reports how many were suppressed. INFO and below are also
+sampled at LOG_SAMPLE_RATE, which a record can override with
+`extra={"sample_rate": ...}`. ERROR and above are never dropped.
+
+LOG_FORMAT selects "text" (the classic single line) or "json" (one object per
+line with ts, level, logger, msg, trace_id and exc).
+"""
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+
+from app.config import get_settings
+from app.core.tracing import current_trace
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Server loggers with their own synchronous handlers, rerouted through the queue
+ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+_LAZY_ARG_TYPES = (str, int, float, bool, type(None))
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per message class plus sampling of INFO and below."""
+
+    def __init__(self, rate_per_s: float, sample_rate: float = 1.0):
+        super().__init__()
+        self.rate_per_s = rate_per_s
+        self.sample_rate = sample_rate
+        self.stats = {"rate_limited": 0, "sampled": 0}
+        self._buckets: dict = {}  # class -> [tokens, last refill, suppressed since last pass]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        if record.levelno <= logging.INFO:
+            sample_rate = getattr(record, "sample_rate", self.sample_rate)
+            if sample_rate < 1.0 and random.random() >= sample_rate:
+                self.stats["sampled"] += 1
+                return False
+        if self.rate_per_s <= 0:
+            return True
+
+        key = getattr(record, "log_class", None) or (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.rate_per_s, now, 0]
+            bucket[0] = min(self.rate_per_s, bucket[0] + (now - bucket[1]) * self.rate_per_s)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.stats["rate_limited"] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueues records without formatting them; a full queue drops instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what is tied to the calling thread is resolved here
+        # A mapping (`%(name)s` args, or a lone dict argument) is itself mutable
+        args = record.args
+        if args and (isinstance(args, Mapping) or not all(isinstance(value, _LAZY_ARG_TYPES) for value in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        trace = current_trace()
+        record.trace_id = trace.trace_id if trace else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """The classic single-line format, noting suppressed repeats."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} [{suppressed} similar suppressed]" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def make_formatter(fmt: str) -> logging.Formatter:
+    return JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT)
+
+
+_listener: Optional[QueueListener] = None
+_root_handler: Optional[logging.Handler] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_rate_filter: Optional[RateLimitFilter] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream: Optional[TextIO] = None,
+                      queued: bool = True) -> None:
+    """
+    Install the queued pipeline on the root logger (settings by default).
+
+    Calling it again replaces the handler it installed before; handlers added
+    by others (pytest's log capture) are left alone.
+
+    queued=False writes synchronously from the caller, as logging.basicConfig
+    would (for comparison in benchmarks).
+    """
+    global _listener, _root_handler, _queue_handler, _rate_filter
+    settings = get_settings()
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(make_formatter(fmt or settings.LOG_FORMAT))
+    _rate_filter = RateLimitFilter(settings.LOG_RATE_LIMIT_PER_S, settings.LOG_SAMPLE_RATE)
+
+    root = logging.getLogger()
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+    for name in ROUTED_LOGGERS:
+        routed = logging.getLogger(name)
+        for handler in list(routed.handlers):
+            routed.removeHandler(handler)
+        routed.propagate = True
+    if queued:
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        _queue_handler.addFilter(_rate_filter)
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        _root_handler = _queue_handler
+    else:
+        output.addFilter(_rate_filter)
+        _root_handler = output
+    root.addHandler(_root_handler)
+
+
+def shutdown_logging() -> None:
+    """Detach the installed handler, then write queued records and stop the listener (at exit)."""
+    global _listener, _root_handler, _queue_handler
+    if _root_handler is not None:
+        logging.getLogger().removeHandler(_root_handler)
+        _root_handler = None
+    _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_stats() -> dict:
+    """Queue depth and records dropped by reason (empty before configure_logging)."""
+    stats = {}
+    if _queue_handler is not None:
+        stats["queued"] = _queue_handler.queue.qsize()
+        stats["queue_full"] = _queue_handler.dropped
+    if _rate_filter is not None:
+        stats.update(_rate_filter.stats)
+    return stats
+
+
+atexit.register(shutdown_logging)
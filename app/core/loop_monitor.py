@@ -0,0 +1,149 @@
+"""
+Event-loop lag monitor: measures scheduling delay and names the code that blocks the loop.
+
+A timer task sleeps LOOP_LAG_INTERVAL_MS and records how late it wakes up.
+A watchdog thread checks the timer's heartbeat. When the loop has not run it
+for LOOP_BLOCK_THRESHOLD_MS, the watchdog snapshots the loop thread's stack,
+which at that moment is the code holding the loop. When the timer next runs,
+the stall's duration is charged to that stack's innermost application frame.
+The per-site totals are exported as metrics and listed at GET /debug/loop-blocks.
+"""
+from pathlib import Path
+from typing import Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.config import get_settings
+from app.core.metrics import LOOP_LAG_SECONDS, LOOP_BLOCKS, LOOP_BLOCKED_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_APP_ROOT = str(Path(__file__).resolve().parents[1])
+_STACK_DEPTH = 12
+
+
+def blocking_site(stack: traceback.StackSummary) -> str:
+    """Innermost frame in application code (else the innermost frame) as 'path:function'."""
+    frames = [f for f in stack if f.filename.startswith(_APP_ROOT)] or list(stack)
+    if not frames:
+        return "unknown"
+    frame = frames[-1]
+    path = Path(frame.filename)
+    try:
+        path = path.relative_to(Path(_APP_ROOT).parent)
+    except ValueError:
+        path = Path(path.name)
+    return f"{path.as_posix()}:{frame.name}"
+
+
+class LoopLagMonitor:
+    """Timer task on the loop plus a watchdog thread that captures stalls."""
+
+    def __init__(self, interval_ms: float, block_threshold_ms: float, max_sites: int = 200):
+        self.interval = interval_ms / 1000
+        self.block_threshold = block_threshold_ms / 1000
+        self.max_sites = max_sites
+        self._sites: dict[str, dict] = {}
+        self._heartbeat = time.perf_counter()
+        self._pending: Optional[traceback.StackSummary] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start on the running loop (call from a coroutine)."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+    async def _tick(self) -> None:
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - self._heartbeat - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            stack, self._pending = self._pending, None
+            if stack is not None:
+                self._record(stack, lag)
+
+    def _watch(self) -> None:
+        """Watchdog thread: snapshot the loop thread's stack once per stall."""
+        while not self._stop.wait(self.interval):
+            stalled = time.perf_counter() - self._heartbeat - self.interval
+            if stalled < self.block_threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._pending = traceback.extract_stack(frame, limit=_STACK_DEPTH * 4)
+
+    def _record(self, stack: traceback.StackSummary, lag: float) -> None:
+        """Charge a finished stall to its site (runs on the loop, like every metric update)."""
+        site = blocking_site(stack)
+        LOOP_BLOCKS.inc(site)
+        LOOP_BLOCKED_SECONDS.inc(site, amount=lag)
+        logger.warning("Event loop blocked %.0f ms in %s", lag * 1000, site)
+        entry = self._sites.get(site)
+        if entry is None:
+            if len(self._sites) >= self.max_sites:
+                return
+            entry = self._sites[site] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "stack": []}
+        entry["count"] += 1
+        entry["total_ms"] += lag * 1000
+        if lag * 1000 >= entry["max_ms"]:
+            entry["max_ms"] = lag * 1000
+            entry["stack"] = [f"{f.filename}:{f.lineno} in {f.name}" for f in stack[-_STACK_DEPTH:]]
+
+    def report(self, limit: int = 20) -> list[dict]:
+        """Blocking sites sorted by total stalled time; the stack is from the longest stall."""
+        entries = [
+            {"site": site, **entry, "total_ms": round(entry["total_ms"], 1), "max_ms": round(entry["max_ms"], 1)}
+            for site, entry in self._sites.items()
+        ]
+        return sorted(entries, key=lambda e: e["total_ms"], reverse=True)[:limit]
+
+    def clear(self) -> None:
+        self._sites.clear()
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopLagMonitor]:
+    """The running monitor, or None when LOOP_MONITOR_ENABLED is off or it was not started."""
+    return _monitor
+
+
+async def start_loop_monitor() -> Optional[LoopLagMonitor]:
+    """Start the process-wide monitor on the current loop (called on startup)."""
+    global _monitor
+    settings = get_settings()
+    if _monitor is None and settings.LOOP_MONITOR_ENABLED:
+        _monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_MS, settings.LOOP_BLOCK_THRESHOLD_MS)
+        _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor() -> None:
+    """Stop the monitor (called on shutdown)."""
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
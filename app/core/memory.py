@@ -0,0 +1,134 @@
+"""
+Memory instrumentation: process RSS, GC state and tracemalloc allocation diffs.
+
+`memory_stats()` backs GET /debug/memory and the memory gauges on /metrics.
+Allocation sites are only known while tracemalloc is tracing. Start the
+process with PYTHONTRACEMALLOC=<frames> (or TRACEMALLOC_FRAMES) to enable it,
+then compare snapshots over time with AllocationTracker. Analysing a snapshot
+of a busy process takes seconds (more with deep tracebacks), so growth is
+watched through cheap counters (RSS, sys.getallocatedblocks()) and snapshots
+are taken sparingly. The soak benchmark (`python -m benchmarks.soak`) builds
+on the same pieces.
+"""
+from typing import Optional
+import gc
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+
+from app.config import get_settings
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Allocations by tracemalloc, this module's own baseline, imports and unknown code
+_IGNORED_FILES = (
+    tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>",
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc), else None."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> int:
+    """High-water RSS (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_tracing() -> bool:
+    """Start tracemalloc when TRACEMALLOC_FRAMES > 0; returns whether it is tracing."""
+    frames = get_settings().TRACEMALLOC_FRAMES
+    if frames > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return tracemalloc.is_tracing()
+
+
+def _sites(stats, limit: int) -> list:
+    """Drop groups allocated by tracemalloc itself or by unknown code."""
+    return [stat for stat in stats if stat.traceback[-1].filename not in _IGNORED_FILES][:limit]
+
+
+def top_allocators(limit: int = 10) -> list[dict]:
+    """Largest live allocation sites (needs tracemalloc)."""
+    if not tracemalloc.is_tracing():
+        return []
+    return [
+        {"site": str(stat.traceback[-1]), "kib": round(stat.size / 1024, 1), "blocks": stat.count}
+        for stat in _sites(tracemalloc.take_snapshot().statistics("lineno"), limit)
+    ]
+
+
+def memory_stats(top: int = 0) -> dict:
+    """Point-in-time memory view of this process."""
+    stats = {
+        "rss_bytes": rss_bytes(),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "allocated_blocks": sys.getallocatedblocks(),
+        "gc_objects": len(gc.get_objects()),
+        "gc_counts": list(gc.get_count()),
+        "gc_collections": [s["collections"] for s in gc.get_stats()],
+        "threads": threading.active_count(),
+        "tracemalloc": None,
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        stats["tracemalloc"] = {
+            "frames": tracemalloc.get_traceback_limit(),
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        }
+        if top:
+            stats["top_allocators"] = top_allocators(top)
+    return stats
+
+
+class AllocationTracker:
+    """
+    Compares tracemalloc snapshots against a baseline to find growing allocation sites.
+
+    Only compact per-site totals of the baseline are kept: a held snapshot of a
+    busy process is itself hundreds of thousands of blocks and would read as growth.
+    """
+
+    def __init__(self, key_type: str = "traceback"):
+        self.key_type = key_type
+        self.baseline: Optional[dict] = None
+
+    def _grouped(self) -> dict:
+        """{((filename, lineno), ...): (size, count)} per allocation traceback."""
+        return {
+            tuple((frame.filename, frame.lineno) for frame in stat.traceback): (stat.size, stat.count)
+            for stat in tracemalloc.take_snapshot().statistics(self.key_type)
+        }
+
+    def snapshot(self, limit: int = 10) -> list[dict]:
+        """Take a snapshot; the first becomes the baseline, later ones return the top growth since it."""
+        grouped = self._grouped()
+        if self.baseline is None:
+            self.baseline = grouped
+            return []
+        growth = []
+        for frames, (size, count) in grouped.items():
+            base_size, base_count = self.baseline.get(frames, (0, 0))
+            filename = frames[-1][0]
+            if size > base_size and filename not in _IGNORED_FILES:
+                growth.append((size - base_size, count - base_count, size, frames))
+        growth.sort(reverse=True)
+        return [
+            {
+                "site": f"{frames[-1][0]}:{frames[-1][1]}",
+                "size_diff_kib": round(size_diff / 1024, 1),
+                "count_diff": count_diff,
+                "kib": round(size / 1024, 1),
+                "traceback": [f"{filename}:{lineno}" for filename, lineno in frames][-5:],
+            }
+            for size_diff, count_diff, size, frames in growth[:limit]
+        ]
@@ -0,0 +1,416 @@
+"""
+Metrics: Counters, gauges and histograms rendered in the Prometheus text format.
+
+Updates are plain dict/list arithmetic with no locks: every instrumented path
+(middleware, execute_readonly_query, LLM calls awaited from the loop) runs on
+the event loop thread, so an observation costs a bisect and two additions.
+Values that already live elsewhere (pool state, HTTP cache counters) are read
+by collectors at scrape time instead of being mirrored on every request.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+import time
+
+# Latency buckets in seconds: 1 ms to 60 s (LLM calls dominate the tail)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base: a named family of series keyed by positional label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float) -> None:
+        self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):  # Above the last bound only counts towards +Inf
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+class Registry:
+    """Metric families plus scrape-time collectors."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], list[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], list[Metric]]) -> None:
+        """Register a callable that builds metrics from existing state at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families = list(self._metrics.values())
+        for collector in self._collectors:
+            families.extend(collector())
+        lines = []
+        for metric in families:
+            samples = metric.samples()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "flyshop_http_request_duration_seconds", "HTTP request latency",
+    ("endpoint", "method", "status", "mode", "intent"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("flyshop_http_requests_in_flight", "HTTP requests being served")
+
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "flyshop_db_query_duration_seconds", "execute_readonly_query latency by first table", ("table",), FAST_BUCKETS,
+)
+DB_ROWS = REGISTRY.counter("flyshop_db_rows_total", "Rows returned by execute_readonly_query", ("table",))
+DB_ERRORS = REGISTRY.counter("flyshop_db_query_errors_total", "Failed execute_readonly_query calls", ("table",))
+DB_SLOW_QUERIES = REGISTRY.counter(
+    "flyshop_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("table",),
+)
+DB_CHECKOUT_SECONDS = REGISTRY.histogram(
+    "flyshop_db_pool_checkout_seconds", "Time to obtain a pooled connection", ("pool",), FAST_BUCKETS,
+)
+DB_ROUTED_QUERIES = REGISTRY.counter(
+    "flyshop_db_queries_routed_total", "Queries by pool class and the node that ran them", ("pool", "node"),
+)
+DB_STATEMENT_TIMEOUTS = REGISTRY.counter(
+    "flyshop_db_statement_timeouts_total", "Statements stopped at their pool's deadline", ("pool",),
+)
+DEGRADED_RESPONSES = REGISTRY.counter(
+    "flyshop_degraded_responses_total", "Answers given without a live DB read, by source (cached, llm_only)",
+    ("endpoint", "source"),
+)
+
+LLM_IN_FLIGHT = REGISTRY.gauge("flyshop_llm_requests_in_flight", "Gemini calls awaiting a response")
+LLM_SECONDS = REGISTRY.histogram("flyshop_llm_request_duration_seconds", "Gemini call latency", ("operation",))
+LLM_ERRORS = REGISTRY.counter("flyshop_llm_errors_total", "Failed Gemini calls", ("operation",))
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    "flyshop_llm_prompt_tokens_total", "Prompt tokens (reported, else estimated at 4 chars/token)", ("operation",),
+)
+LLM_COMPLETION_TOKENS = REGISTRY.counter(
+    "flyshop_llm_completion_tokens_total", "Completion tokens (reported, else estimated)", ("operation",),
+)
+
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "flyshop_event_loop_lag_seconds", "Scheduling delay of a periodic event-loop timer", (), FAST_BUCKETS,
+)
+LOOP_BLOCKS = REGISTRY.counter(
+    "flyshop_event_loop_blocks_total", "Loop stalls over LOOP_BLOCK_THRESHOLD_MS by blocking code site", ("site",),
+)
+LOOP_BLOCKED_SECONDS = REGISTRY.counter(
+    "flyshop_event_loop_blocked_seconds_total", "Time the loop was stalled, by blocking code site", ("site",),
+)
+OFFLOAD_TASKS = REGISTRY.counter(
+    "flyshop_offload_tasks_total", "Serialization tasks by where they ran (inline or pool)", ("operation", "executor"),
+)
+OFFLOAD_SECONDS = REGISTRY.histogram(
+    "flyshop_offload_duration_seconds", "Serialization task latency as awaited by the handler", ("operation",),
+    FAST_BUCKETS,
+)
+
+
+def _pool_metrics() -> list[Metric]:
+    """Connection and admission state of each pool created so far (scraping never opens connections)."""
+    from app.db import database
+    from app.db.pools import pool_gates
+    connections = Gauge(
+        "flyshop_db_pool_connections", "DB pool connections by pool, node and state", ("pool", "node", "state"),
+    )
+    for key, engine in database._engines.items():
+        name, _, node = key.partition("@")
+        pool = engine.sync_engine.pool
+        for state in ("size", "checkedin", "checkedout", "overflow"):
+            reader = getattr(pool, state, None)
+            if reader is not None:
+                connections.set(name, node or "primary", state, value=reader())
+    gates = pool_gates()
+    if not gates:
+        return [connections]
+    admitted = Gauge("flyshop_db_pool_admitted", "Checkouts holding a pool slot, by pool", ("pool",))
+    waiting = Gauge("flyshop_db_pool_waiting", "Callers queued for a pool slot, by pool", ("pool",))
+    rejected = Counter(
+        "flyshop_db_pool_rejected_total", "Checkouts refused (queue_full, timeout), by pool", ("pool", "reason"),
+    )
+    for name, gate in gates.items():
+        admitted.set(name, value=gate.in_use)
+        waiting.set(name, value=gate.waiting)
+        for reason in ("queue_full", "timeout"):
+            rejected.inc(name, reason, amount=gate.stats[reason])
+    return [connections, admitted, waiting, rejected]
+
+
+def _liveness_metrics() -> list[Metric]:
+    """Idle-connection pings, disconnects and warmup readiness (see app.db.liveness)."""
+    from app.db.liveness import liveness_stats, is_ready
+    ready = Gauge("flyshop_db_ready", "1 once the pools are open to their minimum size")
+    ready.set(value=1 if is_ready() else 0)
+    stats = liveness_stats()
+    if not stats:
+        return [ready]
+    pings = Counter(
+        "flyshop_db_pings_total", "Checkout pings of idle connections, by outcome", ("pool", "node", "outcome"),
+    )
+    disconnects = Counter("flyshop_db_disconnects_total", "Disconnect errors seen by statements", ("pool", "node"))
+    for key, counts in stats.items():
+        name, _, node = key.partition("@")
+        node = node or "primary"
+        pings.inc(name, node, "ok", amount=counts["pings"] - counts["failed_pings"])
+        pings.inc(name, node, "failed", amount=counts["failed_pings"])
+        disconnects.inc(name, node, amount=counts["disconnects"])
+    return [ready, pings, disconnects]
+
+
+def _breaker_metrics() -> list[Metric]:
+    """Circuit breaker state and events per pool class (see app.db.breaker)."""
+    from app.db.breaker import breakers, STATES
+    current = breakers()
+    if not current:
+        return []
+    state = Gauge("flyshop_db_breaker_state", "1 for the breaker's current state, by pool", ("pool", "state"))
+    events = Counter("flyshop_db_breaker_events_total", "Breaker openings and queries refused", ("pool", "event"))
+    for name, breaker in current.items():
+        for value in STATES:
+            state.set(name, value, value=1 if breaker.state == value else 0)
+        events.inc(name, "opened", amount=breaker.stats["opened"])
+        events.inc(name, "rejected", amount=breaker.stats["rejected"])
+    return [state, events]
+
+
+def _replica_metrics() -> list[Metric]:
+    """Replica lag and rotation state from the last probes (none without DB_REPLICAS)."""
+    from app.db.replicas import get_replica_router
+    router = get_replica_router()
+    if router is None:
+        return []
+    lag = Gauge("flyshop_db_replica_lag_seconds", "Replication lag at the last successful probe", ("node",))
+    available = Gauge("flyshop_db_replica_in_rotation", "1 while a replica is not ejected", ("node",))
+    failures = Counter("flyshop_db_replica_failures_total", "Failed connects and probes by replica", ("node",))
+    ejections = Counter("flyshop_db_replica_ejections_total", "Times a replica was taken out of rotation", ("node",))
+    for status in router.status():
+        if status["lag_s"] is not None:
+            lag.set(status["name"], value=status["lag_s"])
+        available.set(status["name"], value=0 if status["ejected_for_s"] else 1)
+        failures.inc(status["name"], amount=status["failures"])
+        ejections.inc(status["name"], amount=status["ejections"])
+    return [lag, available, failures, ejections]
+
+
+def _cache_metrics() -> list[Metric]:
+    """HTTP conditional-cache counters kept by app.core.http_cache."""
+    from app.core.http_cache import get_cache_stats
+    requests = Counter("flyshop_http_cache_requests_total", "Conditional requests by outcome", ("endpoint", "outcome"))
+    ratio = Gauge("flyshop_http_cache_hit_ratio", "Share of conditional requests answered 304", ("endpoint",))
+    for endpoint, stats in get_cache_stats().items():
+        requests.inc(endpoint, "not_modified", amount=stats["not_modified"])
+        requests.inc(endpoint, "db_skipped", amount=stats["db_skipped"])
+        requests.inc(endpoint, "total", amount=stats["requests"])
+        ratio.set(endpoint, value=stats["hit_rate"])
+    return [requests, ratio]
+
+
+def _memory_metrics() -> list[Metric]:
+    """Process memory: RSS, live GC objects and, while tracing, tracemalloc totals."""
+    from app.core.memory import memory_stats
+    stats = memory_stats()
+    gauge = Gauge("flyshop_process_memory_bytes", "Process memory by kind", ("kind",))
+    if stats["rss_bytes"] is not None:
+        gauge.set("rss", value=stats["rss_bytes"])
+    gauge.set("peak_rss", value=stats["peak_rss_bytes"])
+    if stats["tracemalloc"]:
+        gauge.set("traced", value=stats["tracemalloc"]["current_bytes"])
+    objects = Gauge("flyshop_gc_objects", "Objects tracked by the garbage collector")
+    objects.set(value=stats["gc_objects"])
+    return [gauge, objects]
+
+
+def _log_metrics() -> list[Metric]:
+    """Log records dropped before output (queue full, rate limited, sampled) and the backlog."""
+    from app.core.logs import log_stats
+    stats = log_stats()
+    dropped = Counter("flyshop_log_records_dropped_total", "Log records not written, by reason", ("reason",))
+    for reason in ("queue_full", "rate_limited", "sampled"):
+        if reason in stats:
+            dropped.inc(reason, amount=stats[reason])
+    metrics = [dropped]
+    if "queued" in stats:
+        backlog = Gauge("flyshop_log_queue_depth", "Log records waiting for the writer thread")
+        backlog.set(value=stats["queued"])
+        metrics.append(backlog)
+    return metrics
+
+
+REGISTRY.add_collector(_pool_metrics)
+REGISTRY.add_collector(_liveness_metrics)
+REGISTRY.add_collector(_breaker_metrics)
+REGISTRY.add_collector(_replica_metrics)
+REGISTRY.add_collector(_cache_metrics)
+REGISTRY.add_collector(_memory_metrics)
+REGISTRY.add_collector(_log_metrics)
+
+
+# Request labels filled in by handlers (mode, intent) and read by the middleware
+
+_request_labels: ContextVar[Optional[dict]] = ContextVar("flyshop_request_labels", default=None)
+
+
+def label_request(**labels: str) -> None:
+    """Attach labels such as mode or intent to the current request's latency sample."""
+    current = _request_labels.get()
+    if current is not None:
+        current.update(labels)
+
+
+def request_labels() -> dict:
+    """The current request's labels so far (empty outside MetricsMiddleware)."""
+    return dict(_request_labels.get() or {})
+
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight gauge and latency histogram per endpoint, mode and intent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = {"mode": "", "intent": ""}
+        token = _request_labels.set(labels)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _request_labels.reset(token)
+            endpoint = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint, scope["method"], status, labels["mode"], labels["intent"],
+            )
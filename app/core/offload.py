@@ -0,0 +1,99 @@
+"""
+Offload: run CPU-heavy serialization off the event loop once a payload is large.
+
+Prompt JSON, response formatting and JSON rendering are pure CPU work. For a
+customer's context they take well under a millisecond, but an admin global
+context or a long conversation can hold the loop for tens of milliseconds and
+stall every other in-flight chat. `offload()` runs such work inline below
+OFFLOAD_MIN_CELLS and on a small thread pool above it.
+
+A worker thread still needs the GIL, so it only helps if the work yields
+between bytecodes. The formatters are plain Python and do. A single
+`json.dumps` of a whole payload is one C call, which would hold the GIL
+throughout, so `encode_json` encodes one row at a time instead.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import contextvars
+import functools
+import json
+import time
+
+from app.config import get_settings
+from app.core.metrics import OFFLOAD_TASKS, OFFLOAD_SECONDS
+from app.core.results import Rows, RowView
+
+# Values encode_json walks into instead of handing to the C encoder whole
+_CONTAINERS = (dict, list, Rows, RowView)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def payload_cells(data: Any) -> int:
+    """Cheap size estimate: scalar values in a context dict / list of row dicts or Rows (two levels deep)."""
+    if isinstance(data, Rows):
+        return len(data.rows) * len(data.columns)
+    if isinstance(data, dict):
+        return sum(payload_cells(v) if isinstance(v, (dict, list, Rows)) else 1 for v in data.values())
+    if isinstance(data, list):
+        return sum(len(item) if isinstance(item, (dict, list)) else 1 for item in data)
+    return 1
+
+
+def encode_json(data: Any) -> str:
+    """
+    Same output as json.dumps(data, default=str), but containers are joined in
+    Python and only leaf rows go through the C encoder, so a worker thread
+    releases the GIL between rows.
+    """
+    if isinstance(data, dict):
+        if not any(isinstance(v, _CONTAINERS) for v in data.values()):
+            return json.dumps(data, default=str)
+        # json.dumps({k: 0})[1:-4] is the key exactly as json.dumps writes it (ints, None, ...)
+        return "{" + ", ".join(f"{json.dumps({k: 0})[1:-4]}: {encode_json(v)}" for k, v in data.items()) + "}"
+    if isinstance(data, list):
+        if not any(isinstance(item, _CONTAINERS) for item in data):
+            return json.dumps(data, default=str)  # A list of scalars (a column) is one leaf
+        return "[" + ", ".join(encode_json(item) for item in data) + "]"
+    if isinstance(data, Rows):
+        # Row values are scalars, so each row goes to the C encoder directly
+        columns, dumps = data.columns, json.dumps
+        return "[" + ", ".join(dumps(dict(zip(columns, row)), default=str) for row in data.rows) + "]"
+    if isinstance(data, RowView):
+        return encode_json(data.to_dict())
+    return json.dumps(data, default=str)
+
+
+def get_offload_executor() -> ThreadPoolExecutor:
+    """Get or create the worker pool for large payloads."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=get_settings().OFFLOAD_WORKERS, thread_name_prefix="offload")
+    return _executor
+
+
+def shutdown_offload() -> None:
+    """Stop the worker pool (on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def offload(operation: str, cells: int, func: Callable, *args, **kwargs) -> Any:
+    """
+    Run func(*args, **kwargs) inline for small payloads, else on the worker pool.
+    The caller's context (trace, request labels) is copied into the worker.
+    """
+    started = time.perf_counter()
+    if cells < get_settings().OFFLOAD_MIN_CELLS:
+        result = func(*args, **kwargs)
+        OFFLOAD_TASKS.inc(operation, "inline")
+    else:
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        result = await asyncio.get_running_loop().run_in_executor(get_offload_executor(), call)
+        OFFLOAD_TASKS.inc(operation, "pool")
+    OFFLOAD_SECONDS.observe(time.perf_counter() - started, operation)
+    return result
@@ -0,0 +1,191 @@
+"""
+Keyset Pagination: Opaque cursors and seek predicates for (sort key, id) ordering.
+Pages are read with an indexed range seek instead of scanning and discarding OFFSET rows.
+
+NULL sort keys follow MySQL/SQLite ordering (first when ascending, last when
+descending). Each query only seeks inside one block - non-NULL values ("v") or
+the NULL block ("n") - so the predicate stays a single row-value range that the
+(sort column, id) index can serve. When a block runs out the cursor moves on to
+the start of the next block, so a page at the NULL boundary may be short; only a
+missing next cursor means the end.
+
+Cursors record the type of a datetime, date or Decimal sort key so it is bound
+back as that type: MySQL and SQLite compare a string with the column, but
+PostgreSQL (asyncpg) types the parameter from the column and rejects a str.
+"""
+from typing import Optional, Any
+from datetime import datetime, date
+from decimal import Decimal
+import base64
+import binascii
+import json
+
+VALUE_BLOCK = "v"
+NULL_BLOCK = "n"
+
+
+class CursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+    pass
+
+
+# Type tags for sort values that JSON carries as strings
+_DATETIME, _DATE, _DECIMAL = "dt", "d", "dec"
+_DECODERS = {
+    _DATETIME: datetime.fromisoformat,
+    _DATE: date.fromisoformat,
+    _DECIMAL: Decimal,
+}
+
+
+def _value_type(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return _DATETIME
+    if isinstance(value, date):
+        return _DATE
+    if isinstance(value, Decimal):
+        return _DECIMAL
+    return None
+
+
+def _encode_value(value: Any) -> Any:
+    """Make a sort-key value JSON-safe while keeping it comparable in SQL."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+def encode_cursor(block: str, sort_value: Any, row_id: Any) -> str:
+    """
+    Pack a position into an opaque URL-safe cursor.
+    A None row_id means "the start of this block".
+    """
+    position = [block, _encode_value(sort_value), _encode_value(row_id)]
+    value_type = _value_type(sort_value)
+    if value_type is not None:
+        position.append(value_type)
+    raw = json.dumps(position, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[str, Any, Any]:
+    """
+    Unpack a cursor into (block, sort key, id), with a datetime, date or
+    Decimal sort key rebuilt as that type.
+
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise CursorError("Invalid pagination cursor")
+    if not isinstance(value, list) or len(value) not in (3, 4) or value[0] not in (VALUE_BLOCK, NULL_BLOCK):
+        raise CursorError("Invalid pagination cursor")
+    block, sort_value, row_id = value[:3]
+    if isinstance(sort_value, (list, dict)) or isinstance(row_id, (list, dict)):
+        raise CursorError("Invalid pagination cursor")
+    if len(value) == 4:
+        decode = _DECODERS.get(value[3])
+        if decode is None or not isinstance(sort_value, str):
+            raise CursorError("Invalid pagination cursor")
+        try:
+            sort_value = decode(sort_value)
+        except (ValueError, ArithmeticError):
+            raise CursorError("Invalid pagination cursor")
+    return block, sort_value, row_id
+
+
+def keyset_order_by(sort_column: str, id_column: str, direction: str) -> str:
+    """ORDER BY clause matching the seek predicate (id breaks ties)."""
+    if sort_column == id_column:
+        return f"{id_column} {direction}"
+    return f"{sort_column} {direction}, {id_column} {direction}"
+
+
+def keyset_where(
+    cursor: Optional[str],
+    sort_column: str,
+    id_column: str,
+    direction: str,
+    sort_param: str = "cursor_sort",
+    id_param: str = "cursor_id",
+) -> tuple[str, dict, Optional[str]]:
+    """
+    Build the seek predicate for the rows after a cursor.
+
+    Returns:
+        (predicate or "" for the first page, bind params, block the query seeks in
+        or None when it reads across blocks)
+
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    if not cursor:
+        return "", {}, None
+    block, sort_value, row_id = decode_cursor(cursor)
+    op = "<" if direction == "DESC" else ">"
+
+    if sort_column == id_column:
+        if row_id is None:
+            raise CursorError("Invalid pagination cursor")
+        return f"{id_column} {op} :{id_param}", {id_param: row_id}, VALUE_BLOCK
+
+    if block == NULL_BLOCK:
+        if row_id is None:
+            return f"{sort_column} IS NULL", {}, NULL_BLOCK
+        return f"({sort_column} IS NULL AND {id_column} {op} :{id_param})", {id_param: row_id}, NULL_BLOCK
+
+    if row_id is None:
+        return f"{sort_column} IS NOT NULL", {}, VALUE_BLOCK
+    if sort_value is None:
+        raise CursorError("Invalid pagination cursor")
+    return (
+        f"({sort_column}, {id_column}) {op} (:{sort_param}, :{id_param})",
+        {sort_param: sort_value, id_param: row_id},
+        VALUE_BLOCK,
+    )
+
+
+def split_page(
+    rows: list[dict],
+    limit: int,
+    sort_key: str,
+    id_key: str,
+    direction: str = "DESC",
+    query_block: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Trim rows fetched with LIMIT limit + 1 to one page.
+
+    Args:
+        rows: Rows returned by the page query (at most limit + 1)
+        limit: Page size
+        sort_key / id_key: Row keys holding the sort value and the unique id
+        direction: Sort direction of the page query
+        query_block: Block the page query was confined to (from keyset_where)
+
+    Returns:
+        (page rows, cursor for the next page or None when this was the last page)
+    """
+    if len(rows) > limit:
+        page = rows[:limit]
+        last = page[-1]
+        sort_value = last.get(sort_key)
+        block = NULL_BLOCK if sort_value is None and sort_key != id_key else VALUE_BLOCK
+        return page, encode_cursor(block, sort_value, last.get(id_key))
+
+    # This block is exhausted; continue with the block that sorts after it
+    if sort_key != id_key:
+        if direction == "DESC" and query_block == VALUE_BLOCK:
+            return rows, encode_cursor(NULL_BLOCK, None, None)
+        if direction == "ASC" and query_block == NULL_BLOCK:
+            return rows, encode_cursor(VALUE_BLOCK, None, None)
+    return rows, None
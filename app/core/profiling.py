@@ -0,0 +1,223 @@
+"""
+On-demand profiling of a single request, authorized by an admin token.
+
+A request to /mvp/query or /mvp/user-data carrying the PROFILE_TOKEN (as the
+`X-Profile-Token` header or `profile_token` query parameter) is profiled and
+the result stored under PROFILE_DIR, keyed by request id (the trace id when
+tracing is on). The response reports the id in `X-Profile-Id`, and
+GET /debug/profiles/{id} downloads the file. Only the newest
+PROFILE_MAX_FILES profiles are kept.
+
+Two profilers, chosen by `X-Profile-Mode` / `profile_mode`:
+- "cprofile" (default): deterministic, written as `<id>.pstats` for pstats,
+  snakeviz or gprof2dot.
+- "sample": samples the loop thread's stack every PROFILE_SAMPLE_INTERVAL_MS,
+  written as `<id>.collapsed` (folded stacks for flamegraph.pl or speedscope).
+  The overhead is low enough for slow real-user requests.
+
+Both observe the event-loop thread, so other requests interleaved on the loop
+appear too. Work offloaded to worker threads is not included. One profile runs
+at a time; a second profiled request while one is running gets
+`X-Profile-Status: busy`.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+import cProfile
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from app.config import get_settings
+from app.core.tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+PROFILED_PATHS = ("/mvp/query", "/mvp/user-data")
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLE = "sample"
+EXTENSIONS = {MODE_CPROFILE: ".pstats", MODE_SAMPLE: ".collapsed"}
+
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{8,32}$")
+_busy = threading.Lock()
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Constant-time check against PROFILE_TOKEN (profiling is off while it is empty)."""
+    expected = get_settings().PROFILE_TOKEN
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def profile_dir() -> Path:
+    return Path(get_settings().PROFILE_DIR)
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Stored file for an id, or None (ids are validated, so no path traversal)."""
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    for extension in EXTENSIONS.values():
+        path = profile_dir() / f"{profile_id}{extension}"
+        if path.exists():
+            return path
+    return None
+
+
+def list_profiles() -> list[dict]:
+    """Stored profiles, newest first."""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    files = [p for p in directory.iterdir() if p.suffix in EXTENSIONS.values()]
+    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    return [
+        {"id": p.stem, "format": p.suffix[1:], "bytes": p.stat().st_size,
+         "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(p.stat().st_mtime))}
+        for p in files
+    ]
+
+
+def enforce_retention(max_files: int) -> None:
+    """Delete the oldest profiles beyond max_files."""
+    for stale in list_profiles()[max_files:]:
+        try:
+            (profile_dir() / f"{stale['id']}.{stale['format']}").unlink()
+        except OSError as e:
+            logger.warning("Could not delete profile %s: %s", stale["id"], e)
+
+
+class StackSampler:
+    """Samples one thread's stack on a background thread and folds the stacks."""
+
+    def __init__(self, thread_id: int, interval_s: float):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def dump(self, path: Path) -> None:
+        """Write folded stacks: 'root;...;leaf count' per line."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """One running profile: start, stop, then save under PROFILE_DIR."""
+
+    def __init__(self, profile_id: str, mode: str):
+        self.profile_id = profile_id
+        self.mode = mode
+        self._profiler = None
+
+    def start(self) -> None:
+        if self.mode == MODE_SAMPLE:
+            interval = get_settings().PROFILE_SAMPLE_INTERVAL_MS / 1000
+            self._profiler = StackSampler(threading.get_ident(), interval)
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        if self.mode == MODE_SAMPLE:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def save(self) -> Path:
+        settings = get_settings()
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.profile_id}{EXTENSIONS[self.mode]}"
+        if self.mode == MODE_SAMPLE:
+            self._profiler.dump(path)
+        else:
+            self._profiler.dump_stats(path)
+        enforce_retention(settings.PROFILE_MAX_FILES)
+        return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profile single /mvp/query and /mvp/user-data requests on admin request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PROFILED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        token = headers.get("x-profile-token") or (query.get("profile_token") or [None])[0]
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+        if not is_authorized(token):
+            logger.warning("Rejected profiling request for %s", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        mode = headers.get("x-profile-mode") or (query.get("profile_mode") or [MODE_CPROFILE])[0]
+        if mode not in EXTENSIONS:
+            mode = MODE_CPROFILE
+        if not _busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+
+        trace = current_trace()
+        profile = RequestProfile(trace.trace_id if trace else os.urandom(16).hex(), mode)
+        extra = [(b"x-profile-id", profile.profile_id.encode()), (b"x-profile-status", b"recorded")]
+        started = time.perf_counter()
+        try:
+            try:
+                profile.start()
+            except ValueError as e:  # Another profiler (debugger, coverage) owns the hook
+                logger.warning("Profiling unavailable: %s", e)
+                await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"unavailable")]))
+                return
+            try:
+                await self.app(scope, receive, self._with_headers(send, extra))
+            finally:
+                profile.stop()
+            path = profile.save()
+            logger.info(
+                "Profiled %s %s in %.0f ms -> %s",
+                scope["method"], scope["path"], (time.perf_counter() - started) * 1000, path,
+            )
+        finally:
+            _busy.release()
+
+    @staticmethod
+    def _with_headers(send, extra: list[tuple[bytes, bytes]]):
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+        return send_with_headers
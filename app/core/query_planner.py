@@ -1,12 +1,16 @@
 """
 Query Planner: Selects and prepares SQL templates based on intent and entities.
 Handles template selection, parameter binding, and query execution orchestration.
+
+Keyset pages hand out cursors of the form "<intent>.<keyset cursor>", so a
+follow-up page can be planned from the cursor alone (see cursor_intent).
 """
 from typing import Optional
 import logging
 
-from app.core.sql_templates import get_template, get_required_entities
+from app.core.sql_templates import get_template, get_required_entities, render_keyset_query, template_sql
 from app.core.sql_validator import validate_parameters, SQLValidationError
+from app.core.pagination import split_page, CursorError
 from app.core.intent_extractor import IntentExtractionResult
 from app.models.responses import ErrorCode
 
@@ -22,11 +26,46 @@ class QueryPlan:
         sql: str,
         sanitized_sql: str,
         params: dict,
+        pagination: str = "offset",
+        page_size: Optional[int] = None,
+        keyset: Optional[dict] = None,
+        seek_block: Optional[str] = None,
     ):
         self.intent = intent
         self.sql = sql
         self.sanitized_sql = sanitized_sql
         self.params = params
+        self.pagination = pagination
+        self.page_size = page_size
+        self.keyset = keyset
+        self.seek_block = seek_block
+
+    def paginate(self, rows: list[dict]) -> tuple[list[dict], Optional[str]]:
+        """
+        Trim executed rows to one page.
+        Keyset plans fetch one extra row to know whether a next cursor exists.
+        """
+        if self.pagination != "keyset":
+            return rows, None
+        page, cursor = split_page(
+            rows, self.page_size, self.keyset["sort_key"], self.keyset["id_key"],
+            self.keyset["direction"], self.seek_block
+        )
+        return page, f"{self.intent}.{cursor}" if cursor else None
+
+
+def cursor_intent(cursor: str) -> str:
+    """
+    The list intent a page cursor was issued for.
+    
+    Raises:
+        CursorError: If the cursor does not name a list intent with keyset pages
+    """
+    intent, dot, keyset_cursor = cursor.partition(".")
+    template = get_template(intent)
+    if not dot or not keyset_cursor or template is None or "keyset" not in template:
+        raise CursorError("Invalid pagination cursor")
+    return intent
 
 
 class QueryPlanError:
@@ -41,16 +80,21 @@ def create_query_plan(
     extraction_result: IntentExtractionResult,
     mobile: str,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ) -> QueryPlan | QueryPlanError:
     """
     Create a query plan from the intent extraction result.
     
+    List templates with a keyset variant are paged by cursor; an explicit
+    offset (without a cursor) falls back to the LIMIT/OFFSET query.
+    
     Args:
         extraction_result: Result from intent extraction
         mobile: User's mobile number for scoping
         limit: Result limit
-        offset: Result offset
+        offset: Result offset (fallback pagination)
+        cursor: next_cursor of the previous page (QueryPlan.paginate)
         
     Returns:
         QueryPlan if successful, QueryPlanError otherwise
@@ -113,9 +157,41 @@ def create_query_plan(
             message=str(e)
         )
     
+    use_keyset = "keyset" in template and (cursor or not validated_params.get("offset"))
+    if not use_keyset:
+        return QueryPlan(
+            intent=intent,
+            sql=template_sql(template),
+            sanitized_sql=template["sanitized"],
+            params=validated_params,
+        )
+    
+    try:
+        keyset_cursor = None
+        if cursor:
+            if cursor_intent(cursor) != intent:
+                raise CursorError(f"Cursor belongs to another list than {intent}")
+            keyset_cursor = cursor.partition(".")[2]
+        sql, cursor_params, seek_block = render_keyset_query(template, keyset_cursor)
+    except CursorError as e:
+        return QueryPlanError(
+            error_code=ErrorCode.VALIDATION_ERROR,
+            message=str(e)
+        )
+    
+    page_size = validated_params["limit"]
+    validated_params.pop("offset", None)
+    validated_params.update(validate_parameters(cursor_params))
+    # One extra row tells us whether there is a next page
+    validated_params["limit"] = page_size + 1
+    
     return QueryPlan(
         intent=intent,
-        sql=template["query"],
-        sanitized_sql=template["sanitized"],
+        sql=sql,
+        sanitized_sql=template["keyset_sanitized"],
         params=validated_params,
+        pagination="keyset",
+        page_size=page_size,
+        keyset=template["keyset"],
+        seek_block=seek_block,
     )
@@ -0,0 +1,232 @@
+"""
+Record/Replay: Deterministic capture of DB and Gemini interactions for performance runs.
+
+REPLAY_MODE=record appends every execute_readonly_query call and every Gemini
+generate_content call (request hash, result, measured latency) to a gzipped
+JSON-lines journal. REPLAY_MODE=replay serves the same calls from memory with
+no network, optionally sleeping for the recorded latency scaled by
+REPLAY_LATENCY_SCALE (1.0 = as recorded, 0.1 = 10x faster, 0 = no delay).
+
+Identical calls recorded several times are replayed in recorded order, then cycle.
+"""
+from datetime import datetime, date, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Any, Optional
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when a call was never recorded."""
+    pass
+
+
+def _encode(value: Any) -> Any:
+    """Tag non-JSON DB values so they replay with their original types."""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"$t": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"$td": value.total_seconds()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    if isinstance(value, bytes):
+        return {"$b": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    """Reverse of _encode for one value."""
+    if isinstance(value, dict) and len(value) == 1:
+        tag, raw = next(iter(value.items()))
+        if tag == "$dt":
+            return datetime.fromisoformat(raw)
+        if tag == "$d":
+            return date.fromisoformat(raw)
+        if tag == "$t":
+            return dt_time.fromisoformat(raw)
+        if tag == "$td":
+            return timedelta(seconds=raw)
+        if tag == "$dec":
+            return Decimal(raw)
+        if tag == "$b":
+            return base64.b64decode(raw)
+    return value
+
+
+def db_key(query: str, params: dict) -> str:
+    """Stable hash of a statement (whitespace-normalized) and its parameters."""
+    raw = " ".join(query.split()) + "\n" + json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def prompt_key(model_name: str, prompt: str) -> str:
+    """Stable hash of a model name and prompt."""
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()[:24]
+
+
+class ReplayResponse:
+    """Stand-in for a Gemini response object (only `.text` is used by the app)."""
+
+    def __init__(self, text: Optional[str]):
+        self.text = text
+
+
+class ReplayJournal:
+    """
+    Append-only journal of recorded calls, or an in-memory index of them for replay.
+    Thread-safe: Gemini calls are recorded from executor threads.
+    """
+
+    def __init__(self, mode: str, path: str, latency_scale: float = 1.0):
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._file = None
+        self._started = time.monotonic()
+        self._entries: dict[tuple[str, str], list[dict]] = {}
+        self._cursor: dict[tuple[str, str], int] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+        if mode == MODE_RECORD:
+            self._file = gzip.open(path, "at", encoding="utf-8")
+        elif mode == MODE_REPLAY:
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+        logger.info("Loaded %d replay entries from %s", sum(len(v) for v in self._entries.values()), self.path)
+
+    def _append(self, entry: dict) -> None:
+        entry["at_ms"] = round((time.monotonic() - self._started) * 1000, 3)
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.stats["recorded"] += 1
+
+    def _next(self, kind: str, key: str) -> dict:
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                self.stats["misses"] += 1
+                raise ReplayMissError(f"No recorded {kind} call for key {key}")
+            index = self._cursor.get((kind, key), 0)
+            self._cursor[(kind, key)] = index + 1
+            self.stats["replayed"] += 1
+            return entries[index % len(entries)]
+
+    def _delay(self, entry: dict) -> float:
+        return entry.get("latency_ms", 0) / 1000 * self.latency_scale
+
+    # DB calls
+
+    def record_db(self, query: str, params: dict, rows: list[dict], latency_ms: float) -> None:
+        """Append one execute_readonly_query result."""
+        self._append({
+            "kind": "db",
+            "key": db_key(query, params),
+            "latency_ms": round(latency_ms, 3),
+            "rows": [{column: _encode(value) for column, value in row.items()} for row in rows],
+        })
+
+    async def replay_db(self, query: str, params: dict) -> list[dict]:
+        """Serve a recorded execute_readonly_query result."""
+        entry = self._next("db", db_key(query, params))
+        delay = self._delay(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return [{column: _decode(value) for column, value in row.items()} for row in entry["rows"]]
+
+    # LLM calls
+
+    def wrap_model(self, model, model_name: str):
+        """Return a model whose generate_content records (record mode) or replays (replay mode)."""
+        return RecordingModel(self, model, model_name)
+
+    def close(self) -> None:
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+
+class RecordingModel:
+    """Wraps a Gemini model; only generate_content is intercepted."""
+
+    def __init__(self, journal: ReplayJournal, model, model_name: str):
+        self._journal = journal
+        self._model = model
+        self._model_name = model_name
+
+    def generate_content(self, prompt: str, *args, **kwargs):
+        key = prompt_key(self._model_name, prompt)
+        if self._journal.mode == MODE_REPLAY:
+            entry = self._journal._next("llm", key)
+            delay = self._journal._delay(entry)
+            if delay > 0:
+                time.sleep(delay)  # Runs in an executor thread, like the real call
+            return ReplayResponse(entry["text"])
+
+        started = time.perf_counter()
+        response = self._model.generate_content(prompt, *args, **kwargs)
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._journal._append({
+            "kind": "llm",
+            "key": key,
+            "latency_ms": round(latency_ms, 3),
+            "prompt_chars": len(prompt),
+            "text": response.text,
+        })
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+_journal: Optional[ReplayJournal] = None
+
+
+def get_replay_journal() -> Optional[ReplayJournal]:
+    """The process-wide journal, or None when REPLAY_MODE is off."""
+    global _journal
+    if _journal is not None:
+        return _journal
+    settings = get_settings()
+    if settings.REPLAY_MODE == MODE_OFF:
+        return None
+    _journal = ReplayJournal(settings.REPLAY_MODE, settings.REPLAY_JOURNAL_PATH, settings.REPLAY_LATENCY_SCALE)
+    return _journal
+
+
+def set_replay_journal(journal: Optional[ReplayJournal]) -> None:
+    """Install a journal explicitly (benchmarks and tests)."""
+    global _journal
+    _journal = journal
+
+
+def close_replay_journal() -> None:
+    """Flush and close the record journal (called on shutdown)."""
+    if _journal is not None:
+        _journal.close()
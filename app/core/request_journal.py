@@ -0,0 +1,453 @@
+"""
+Request Journal: one compact, queryable record per /mvp/query and /mvp/user-data request.
+
+Each record holds the masked mobile, mode and intent, the context sections
+returned, DB statements and rows, LLM calls with prompt/completion tokens and
+estimated cost, per-stage latencies and whether the HTTP cache answered. Stage
+timings, rows, tokens and cache hits are read from the request's trace when it
+finishes, so no extra timing runs on the request path; without
+TRACING_ENABLED the record only carries totals and handler notes.
+
+Records are queued to a background thread that inserts them in batches into
+a local SQLite file (REQUEST_JOURNAL_PATH). When the file grows past
+REQUEST_JOURNAL_MAX_BYTES it is rotated to `.1`, `.2`, ... keeping
+REQUEST_JOURNAL_BACKUPS old files. Errors and requests slower than
+REQUEST_JOURNAL_SLOW_MS are always kept; the rest are sampled at
+REQUEST_JOURNAL_SAMPLE_RATE.
+
+Top-N report across the current and rotated files:
+    python -m app.core.request_journal --by cost --group user -n 10
+    python -m app.core.request_journal --by latency --group intent --since 3600
+"""
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+from app.config import get_settings
+from app.core.metrics import request_labels
+from app.core.tracing import current_trace, Trace
+
+logger = logging.getLogger(__name__)
+
+JOURNALED_PATHS = ("/mvp/query", "/mvp/user-data")
+
+COLUMNS = (
+    "ts", "trace_id", "endpoint", "method", "status", "user", "mode", "intent", "error",
+    "sections", "db_queries", "db_rows", "db_ms", "llm_calls", "prompt_tokens", "completion_tokens",
+    "llm_ms", "cost_usd", "cache_hit", "total_ms", "stages",
+)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    ts REAL NOT NULL,
+    trace_id TEXT,
+    endpoint TEXT NOT NULL,
+    method TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    user TEXT,
+    mode TEXT,
+    intent TEXT,
+    error TEXT,
+    sections TEXT,
+    db_queries INTEGER NOT NULL,
+    db_rows INTEGER NOT NULL,
+    db_ms REAL NOT NULL,
+    llm_calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    llm_ms REAL NOT NULL,
+    cost_usd REAL NOT NULL,
+    cache_hit INTEGER,
+    total_ms REAL NOT NULL,
+    stages TEXT
+)
+"""
+_INSERT = f"INSERT INTO requests ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+
+
+# Handler notes for the current request (user, sections, error)
+
+_notes: ContextVar[Optional[dict]] = ContextVar("flyshop_journal_notes", default=None)
+
+
+def journal_note(**fields) -> None:
+    """Attach fields such as the masked user or returned sections to the current request's record."""
+    current = _notes.get()
+    if current is not None:
+        current.update(fields)
+
+
+def llm_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost at the configured per-million-token prices."""
+    settings = get_settings()
+    return (prompt_tokens * settings.LLM_PRICE_INPUT_PER_M + completion_tokens * settings.LLM_PRICE_OUTPUT_PER_M) / 1e6
+
+
+def trace_summary(trace: Optional[Trace]) -> dict:
+    """DB, LLM, cache and per-stage totals from a request's finished child spans."""
+    summary = {
+        "db_queries": 0, "db_rows": 0, "db_ms": 0.0, "llm_calls": 0, "prompt_tokens": 0,
+        "completion_tokens": 0, "llm_ms": 0.0, "cache_hit": None, "stages": {},
+    }
+    if trace is None:
+        return summary
+    stages = summary["stages"]
+    for child in trace.spans[1:]:
+        if child.duration_ns is None:
+            continue
+        ms = child.duration_ns / 1e6
+        stages[child.name] = stages.get(child.name, 0.0) + ms
+        attributes = child.attributes
+        if child.name == "db.query":
+            summary["db_queries"] += 1
+            summary["db_rows"] += attributes.get("db.rows") or 0
+            summary["db_ms"] += ms
+        elif child.name == "llm.generate":
+            # Exact usage when the API reported it, else the ~4 chars/token estimate
+            summary["llm_calls"] += 1
+            summary["prompt_tokens"] += (
+                attributes.get("llm.prompt_tokens") or attributes.get("llm.prompt_tokens_estimate") or 0
+            )
+            summary["completion_tokens"] += (
+                attributes.get("llm.completion_tokens") or (attributes.get("llm.response_chars") or 0) // 4
+            )
+            summary["llm_ms"] += ms
+        elif child.name == "cache.revalidate" and "cache.hit" in attributes:
+            summary["cache_hit"] = bool(attributes["cache.hit"])
+    summary["stages"] = {name: round(ms, 2) for name, ms in stages.items()}
+    return summary
+
+
+def build_record(endpoint: str, method: str, status: int, total_ms: float, labels: dict, notes: dict,
+                 trace: Optional[Trace]) -> dict:
+    """One journal row (column name -> value)."""
+    summary = trace_summary(trace)
+    sections = notes.get("sections")
+    return {
+        "ts": time.time(),
+        "trace_id": trace.trace_id if trace else None,
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "user": notes.get("user"),
+        "mode": labels.get("mode") or None,
+        "intent": labels.get("intent") or None,
+        "error": notes.get("error"),
+        "sections": ",".join(sections) if sections else None,
+        "db_queries": summary["db_queries"],
+        "db_rows": summary["db_rows"],
+        "db_ms": round(summary["db_ms"], 2),
+        "llm_calls": summary["llm_calls"],
+        "prompt_tokens": summary["prompt_tokens"],
+        "completion_tokens": summary["completion_tokens"],
+        "llm_ms": round(summary["llm_ms"], 2),
+        "cost_usd": llm_cost(summary["prompt_tokens"], summary["completion_tokens"]),
+        "cache_hit": summary["cache_hit"],
+        "total_ms": round(total_ms, 2),
+        "stages": json.dumps(summary["stages"], separators=(",", ":")) if summary["stages"] else None,
+    }
+
+
+def should_record(record: dict, sample_rate: float, slow_ms: float) -> bool:
+    """Errors and slow requests are always kept; the rest are sampled."""
+    if record["status"] >= 500 or record["error"] or record["total_ms"] >= slow_ms:
+        return True
+    return sample_rate >= 1.0 or random.random() < sample_rate
+
+
+def journal_files(path: str) -> list[Path]:
+    """The current journal file and its rotated backups, newest first."""
+    base = Path(path)
+    candidates = [base] + sorted(
+        base.parent.glob(f"{base.name}.*"),
+        key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0,
+    )
+    return [p for p in candidates if p.exists() and (p == base or p.suffix[1:].isdigit())]
+
+
+class RequestJournal:
+    """Batches records into a rotating SQLite file on a background thread."""
+
+    _STOP = object()
+
+    def __init__(self, path: str, max_bytes: int = 50 * 2**20, backups: int = 5,
+                 batch_size: int = 200, flush_interval: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {"written": 0, "dropped": 0, "failed": 0, "rotations": 0}
+        self._queue: queue.Queue = queue.Queue(maxsize=10_000)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._thread = threading.Thread(target=self._run, name="request-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, record: dict) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(SCHEMA)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS requests_ts ON requests (ts)")
+        return self._connection
+
+    def _write(self, batch: list[dict]) -> None:
+        connection = self._connect()
+        with connection:
+            connection.executemany(_INSERT, [tuple(record[c] for c in COLUMNS) for record in batch])
+        self.stats["written"] += len(batch)
+        if self._size() >= self.max_bytes:
+            self._rotate()
+
+    def _size(self) -> int:
+        """Database plus write-ahead log, since recent rows live in the WAL until a checkpoint."""
+        wal = f"{self.path}-wal"
+        return os.path.getsize(self.path) + (os.path.getsize(wal) if os.path.exists(wal) else 0)
+
+    def _rotate(self) -> None:
+        """path -> path.1 -> path.2 ...; the oldest beyond `backups` is deleted."""
+        self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._connection.close()
+        self._connection = None
+        base = Path(self.path)
+        if self.backups:
+            Path(f"{self.path}.{self.backups}").unlink(missing_ok=True)
+            for index in range(self.backups - 1, 0, -1):
+                source = Path(f"{self.path}.{index}")
+                if source.exists():
+                    source.replace(f"{self.path}.{index + 1}")
+            base.replace(f"{self.path}.1")
+        else:
+            base.unlink()
+        for suffix in ("-wal", "-shm"):
+            Path(self.path + suffix).unlink(missing_ok=True)
+        self.stats["rotations"] += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            flushed = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed.append(item)
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.stats["failed"] += len(batch)
+                    logger.warning("Request journal write failed: %s", e)
+            for event in flushed:
+                event.set()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until records queued so far are written (tests, CLI on a live file)."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def shutdown(self) -> None:
+        """Write queued records and stop the thread."""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=10)
+
+
+_journal: Optional[RequestJournal] = None
+
+
+def get_request_journal() -> Optional[RequestJournal]:
+    """The process-wide journal, or None when REQUEST_JOURNAL_ENABLED is off."""
+    global _journal
+    if _journal is None:
+        settings = get_settings()
+        if settings.REQUEST_JOURNAL_ENABLED:
+            _journal = RequestJournal(
+                settings.REQUEST_JOURNAL_PATH,
+                settings.REQUEST_JOURNAL_MAX_BYTES,
+                settings.REQUEST_JOURNAL_BACKUPS,
+            )
+    return _journal
+
+
+def set_request_journal(journal: Optional[RequestJournal]) -> None:
+    """Install a journal explicitly (tests)."""
+    global _journal
+    _journal = journal
+
+
+def shutdown_request_journal() -> None:
+    """Flush and stop the journal (called on shutdown)."""
+    global _journal
+    if _journal is not None:
+        _journal.shutdown()
+        _journal = None
+
+
+class JournalMiddleware:
+    """
+    ASGI middleware: journal /mvp/query and /mvp/user-data requests.
+
+    Must run inside TracingMiddleware and MetricsMiddleware to see the trace
+    and the mode/intent labels.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(JOURNALED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        journal = get_request_journal()
+        if journal is None:
+            await self.app(scope, receive, send)
+            return
+
+        notes: dict = {}
+        token = _notes.set(notes)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            notes.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            _notes.reset(token)
+            settings = get_settings()
+            endpoint = getattr(scope.get("route"), "path", None) or scope["path"]
+            record = build_record(
+                endpoint, scope["method"], status, (time.perf_counter() - started) * 1000,
+                request_labels(), notes, current_trace(),
+            )
+            if should_record(record, settings.REQUEST_JOURNAL_SAMPLE_RATE, settings.REQUEST_JOURNAL_SLOW_MS):
+                journal.record(record)
+
+
+# Aggregation CLI
+
+GROUPS = {"user": "user", "intent": "intent", "mode": "mode", "endpoint": "endpoint"}
+ORDERINGS = {
+    "latency": "avg_ms",
+    "max-latency": "max_ms",
+    "cost": "cost_usd",
+    "tokens": "tokens",
+    "count": "requests",
+}
+_AGGREGATE = """
+SELECT COALESCE({group}, '-') AS key, COUNT(*), SUM(total_ms), MAX(total_ms), SUM(db_ms), SUM(llm_ms),
+       SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd), SUM(status >= 500 OR error IS NOT NULL)
+FROM requests WHERE ts >= ? GROUP BY key
+"""
+
+
+def aggregate(paths: list[Path], group: str, since: float = 0.0) -> list[dict]:
+    """Per-group totals across journal files (sums are merged, so rotation does not split groups)."""
+    totals: dict[str, list] = {}
+    for path in paths:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(_AGGREGATE.format(group=GROUPS[group]), (since,)).fetchall()
+        except sqlite3.DatabaseError as e:
+            logger.warning("Skipping %s: %s", path, e)
+            continue
+        finally:
+            connection.close()
+        for key, *values in rows:
+            entry = totals.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0, 0, 0, 0.0, 0])
+            for index, value in enumerate(values):
+                entry[index] = max(entry[index], value) if index == 2 else entry[index] + (value or 0)
+    return [
+        {
+            group: key,
+            "requests": n,
+            "avg_ms": round(total_ms / n, 1),
+            "max_ms": round(max_ms, 1),
+            "avg_db_ms": round(db_ms / n, 1),
+            "avg_llm_ms": round(llm_ms / n, 1),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens": prompt_tokens + completion_tokens,
+            "cost_usd": round(cost, 6),
+            "errors": errors,
+        }
+        for key, (n, total_ms, max_ms, db_ms, llm_ms, prompt_tokens, completion_tokens, cost, errors)
+        in totals.items()
+    ]
+
+
+def top(paths: list[Path], by: str, group: str, limit: int = 10, since: float = 0.0) -> list[dict]:
+    """The top `limit` groups ordered by `by` (descending)."""
+    rows = aggregate(paths, group, since)
+    rows.sort(key=lambda row: row[ORDERINGS[by]], reverse=True)
+    return rows[:limit]
+
+
+def format_table(rows: list[dict], group: str) -> str:
+    header = f"{group:<24} {'requests':>8} {'avg ms':>9} {'max ms':>9} {'db ms':>8} {'llm ms':>8} " \
+             f"{'tokens':>10} {'cost $':>10} {'errors':>6}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{str(row[group])[:24]:<24} {row['requests']:>8} {row['avg_ms']:>9.1f} {row['max_ms']:>9.1f} "
+            f"{row['avg_db_ms']:>8.1f} {row['avg_llm_ms']:>8.1f} {row['tokens']:>10} {row['cost_usd']:>10.4f} "
+            f"{row['errors']:>6}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-N slow or expensive users, intents and modes from the request journal")
+    parser.add_argument("--path", default=None, help="Journal file (default: REQUEST_JOURNAL_PATH)")
+    parser.add_argument("--by", choices=list(ORDERINGS), default="latency")
+    parser.add_argument("--group", choices=list(GROUPS), default="user")
+    parser.add_argument("-n", "--limit", type=int, default=10)
+    parser.add_argument("--since", type=float, default=None, help="Only the last N seconds")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    paths = journal_files(args.path or get_settings().REQUEST_JOURNAL_PATH)
+    if not paths:
+        parser.error("no journal files found")
+    since = time.time() - args.since if args.since else 0.0
+    rows = top(paths, args.by, args.group, args.limit, since)
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows, args.group))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,23 @@ from typing import Optional, Any
 from datetime import datetime, date
 import logging
 
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
 from app.models.responses import QueryResponse, QueryMetadata, ErrorResponse, ErrorCode
+from app.core.results import Rows, RowView
 
 logger = logging.getLogger(__name__)
 
+# Cell types format_row_value / format_data_recursively change; other values pass through
+_FORMATTED_TYPES = (datetime, date, bytes, dict, list)
+
+# jsonable_encoder has no notion of compact results
+_COMPACT_ENCODERS = {
+    Rows: lambda rows: jsonable_encoder(rows.to_dicts()),
+    RowView: lambda row: jsonable_encoder(row.to_dict()),
+}
+
 
 def format_row_value(value: Any) -> Any:
     """
@@ -33,11 +46,33 @@ def format_data_recursively(data: Any) -> Any:
     if isinstance(data, dict):
         return {k: format_data_recursively(v) for k, v in data.items()}
     elif isinstance(data, list):
+        if not any(isinstance(item, _FORMATTED_TYPES) for item in data):
+            return list(data)  # Nothing to format (e.g. a column of numbers)
         return [format_data_recursively(item) for item in data]
+    elif isinstance(data, Rows):
+        return format_row_values(data).to_dicts()
+    elif isinstance(data, RowView):
+        return format_data_recursively(data.to_dict())
     else:
         return format_row_value(data)
 
 
+def format_row_values(rows: Rows) -> Rows:
+    """
+    Format a compact result column by column: only columns that hold a
+    value needing it are converted, and the header is shared throughout.
+    """
+    if not rows.rows or not rows.columns:
+        return rows
+    columns = list(zip(*rows.rows))
+    changed = False
+    for position, values in enumerate(columns):
+        if any(isinstance(value, _FORMATTED_TYPES) for value in values):
+            columns[position] = [format_data_recursively(value) for value in values]
+            changed = True
+    return Rows(rows.columns, list(zip(*columns))) if changed else rows
+
+
 def format_rows(rows: list[dict]) -> list[dict]:
     """
     Format all rows for JSON serialization.
@@ -55,7 +90,8 @@ def create_success_response(
     entities: dict,
     data: Any,
     sanitized_sql: str,
-    summary: Optional[str] = None
+    summary: Optional[str] = None,
+    next_cursor: Optional[str] = None
 ) -> QueryResponse:
     """
     Create a successful query response.
@@ -66,6 +102,7 @@ def create_success_response(
         data: Query result data (can be list or dict)
         sanitized_sql: Sanitized SQL for metadata
         summary: Optional human-friendly summary
+        next_cursor: Cursor for the next page (list answers)
         
     Returns:
         QueryResponse object
@@ -88,11 +125,20 @@ def create_success_response(
         summary=summary,
         metadata=QueryMetadata(
             rows=row_count,
-            sql=sanitized_sql
+            sql=sanitized_sql,
+            next_cursor=next_cursor
         )
     )
 
 
+def render_json_response(payload: Any) -> JSONResponse:
+    """
+    Encode a handler's dict payload into a finished JSONResponse (same JSON
+    FastAPI would produce), so large payloads can be encoded off the loop.
+    """
+    return JSONResponse(content=jsonable_encoder(payload, custom_encoder=_COMPACT_ENCODERS))
+
+
 def create_error_response(error_code: ErrorCode, message: str) -> ErrorResponse:
     """
     Create an error response.
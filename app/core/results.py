@@ -0,0 +1,128 @@
+"""
+Compact query results: value tuples under one shared header.
+
+execute_readonly_query returns one dict per row by default. Every dict
+repeats the column names and costs several times the memory of the row's
+values, and code downstream re-walks all of them. Callers that handle many
+rows can ask for a compact form instead (the `result` argument):
+
+- RESULT_ROWS:    a Rows - the driver's value tuples plus one header.
+                  Iterating or indexing gives RowViews, read-only mappings
+                  over a tuple that become dicts only when to_dict() is called
+- RESULT_COLUMNS: {column: [values...]}, one list per column
+
+Rows go through the serialization helpers (response_formatter,
+offload.encode_json and payload_cells) without being turned into dicts
+first. Field-level security drops columns from the header once with
+without(), instead of deleting keys row by row.
+"""
+from collections.abc import Mapping
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Sequence
+
+RESULT_DICTS = "dicts"
+RESULT_ROWS = "rows"
+RESULT_COLUMNS = "columns"
+RESULT_MODES = (RESULT_DICTS, RESULT_ROWS, RESULT_COLUMNS)
+
+
+class RowView(Mapping):
+    """One row of a Rows, read through the shared header; no dict is built until to_dict()."""
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index: dict[str, int], values: Sequence):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, column: str) -> Any:
+        return self._values[self._index[column]]
+
+    def get(self, column: str, default: Any = None) -> Any:
+        position = self._index.get(column)
+        return default if position is None else self._values[position]
+
+    def __contains__(self, column: object) -> bool:
+        return column in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._index, self._values))
+
+    def __repr__(self) -> str:
+        return f"RowView({self.to_dict()!r})"
+
+
+class Rows:
+    """Value tuples (or SQLAlchemy Row objects) in `columns` order, sharing one header."""
+
+    __slots__ = ("columns", "rows", "_index")
+
+    def __init__(self, columns: Iterable[str], rows: list):
+        self.columns = tuple(columns)
+        self.rows = rows
+        self._index = {column: position for position, column in enumerate(self.columns)}
+
+    @classmethod
+    def from_dicts(cls, rows: list[dict]) -> "Rows":
+        """Rows from dicts that all have the first one's keys in the same order (a DB result)."""
+        if not rows:
+            return cls((), [])
+        return cls(rows[0].keys(), [tuple(row.values()) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[RowView]:
+        index = self._index
+        return (RowView(index, row) for row in self.rows)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return Rows(self.columns, self.rows[position])
+        return RowView(self._index, self.rows[position])
+
+    def __repr__(self) -> str:
+        return f"Rows({len(self.rows)} x {list(self.columns)})"
+
+    def column(self, name: str) -> list:
+        """All values of one column."""
+        return list(map(itemgetter(self._index[name]), self.rows))
+
+    def to_dicts(self) -> list[dict]:
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def to_columns(self) -> dict[str, list]:
+        """{column: [values...]} (RESULT_COLUMNS)."""
+        if not self.rows:
+            return {column: [] for column in self.columns}
+        return {column: list(values) for column, values in zip(self.columns, zip(*self.rows))}
+
+    def without(self, columns: Iterable[str]) -> "Rows":
+        """A projection without the given columns (self when none of them is present)."""
+        drop = set(columns)
+        keep = [position for position, column in enumerate(self.columns) if column not in drop]
+        if len(keep) == len(self.columns):
+            return self
+        if not keep:
+            return Rows((), [() for _ in self.rows])
+        pick = itemgetter(*keep)
+        rows = [(pick(row),) for row in self.rows] if len(keep) == 1 else [pick(row) for row in self.rows]
+        return Rows((self.columns[position] for position in keep), rows)
+
+
+def shape_result(rows: Rows, result: str) -> Any:
+    """A Rows in the form asked of execute_readonly_query."""
+    if result == RESULT_DICTS:
+        return rows.to_dicts()
+    if result == RESULT_ROWS:
+        return rows
+    if result == RESULT_COLUMNS:
+        return rows.to_columns()
+    raise ValueError(f"Unknown result mode {result!r}; expected one of {', '.join(RESULT_MODES)}")
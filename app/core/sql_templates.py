@@ -2,9 +2,20 @@
 SQL Template Catalog: Pre-defined SQL templates for each supported intent.
 All templates use parameter binding - no string interpolation.
 Updated to use real database table names (snake_case).
+
+List intents also carry a "keyset_query" variant: the same projection ordered by
+(sort key, unique id) with a {seek} slot for the cursor predicate, so deep pages
+are a range seek instead of OFFSET scan-and-discard. The offset query stays as a fallback.
+"keyset_sanitized" is the query shape reported for keyset pages.
+
+Templates whose MySQL cannot be translated statement by statement (see
+app.db.postgres) carry hand-written variants under "dialects"; template_sql
+picks the one for DB_BACKEND.
 """
 from typing import Optional
+from app.config import get_settings
 from app.models.responses import Intent
+from app.core.pagination import keyset_where
 
 
 # SQL Templates mapped by intent
@@ -49,6 +60,24 @@ SQL_TEMPLATES: dict[str, dict] = {
             ORDER BY qf.departure_datetime DESC
             LIMIT :limit OFFSET :offset
         """,
+        "keyset_query": """
+            SELECT 
+                qf.id, qf.query_id, qf.pnr, qf.is_roundtrip,
+                qf.flight_number, qf.airline,
+                qf.from_location, qf.to_location,
+                qf.departure_datetime, qf.arrival_datetime
+            FROM query_flight_manages qf
+            JOIN query_masters qm ON qf.query_id = qm.query_id
+            WHERE qm.user_mobile = :mobile
+              {seek}
+            ORDER BY qf.departure_datetime DESC, qf.id DESC
+            LIMIT :limit
+        """,
+        "keyset": {
+            "sort_column": "qf.departure_datetime", "sort_key": "departure_datetime",
+            "id_column": "qf.id", "id_key": "id", "direction": "DESC",
+        },
+        "keyset_sanitized": "SELECT qf.* FROM query_flight_manages qf JOIN query_masters qm ON ... WHERE qm.user_mobile = ? AND (qf.departure_datetime, qf.id) < (?, ?) LIMIT ?",
         "sanitized": "SELECT qf.* FROM query_flight_manages qf JOIN query_masters qm ON ... WHERE qm.user_mobile = ? LIMIT ? OFFSET ?"
     },
     
@@ -75,6 +104,25 @@ SQL_TEMPLATES: dict[str, dict] = {
             GROUP BY qm.user_mobile 
             LIMIT 1
         """,
+        "dialects": {
+            # Aggregates instead of MySQL's bare columns under GROUP BY; ordered string_agg
+            "postgresql": {
+                "query": """
+                    SELECT 
+                        MAX(qm.user_name) as user_name, qm.user_mobile, MAX(qm.user_email) as user_email,
+                        COUNT(DISTINCT qm.query_id) as total_trips_planned,
+                        (SELECT SUM(recieved_amount) FROM query_payments qp JOIN query_masters qm2 ON qp.query_id = qm2.query_id WHERE qm2.user_mobile = :mobile) as total_spent,
+                        (SELECT string_agg('#' || query_id || ' ' || destination_name || ' (' || to_char(created_at, 'YYYY-MM-DD') || ')', ' | ' ORDER BY created_at DESC NULLS LAST)
+                         FROM (SELECT * FROM query_masters WHERE user_mobile = :mobile ORDER BY created_at DESC NULLS LAST LIMIT 5) as sub_q) as recent_queries,
+                        (SELECT string_agg(airline || ' ' || flight_number || ' ' || from_location || '-' || to_location, ' | ' ORDER BY departure_datetime DESC NULLS LAST)
+                         FROM (SELECT qf.* FROM query_flight_manages qf JOIN query_masters qm3 ON qf.query_id = qm3.query_id WHERE qm3.user_mobile = :mobile ORDER BY departure_datetime DESC NULLS LAST LIMIT 5) as sub_f) as recent_flights
+                    FROM query_masters qm
+                    WHERE qm.user_mobile = :mobile
+                    GROUP BY qm.user_mobile 
+                    LIMIT 1
+                """,
+            },
+        },
         "sanitized": "SELECT user_name, total_trips, total_spent... FROM query_masters WHERE user_mobile = ?"
     },
     
@@ -95,6 +143,24 @@ SQL_TEMPLATES: dict[str, dict] = {
             ORDER BY qm.created_at DESC
             LIMIT :limit OFFSET :offset
         """,
+        "keyset_query": """
+            SELECT 
+                qm.query_id, qm.user_name, qm.user_email, qm.user_mobile,
+                qm.destination_name, qm.from_date, qm.to_date,
+                qm.adult, qm.child, qm.infant,
+                qm.query_stage, qm.service_name, qm.priority,
+                qm.created_at
+            FROM query_masters qm
+            WHERE qm.user_mobile = :mobile
+              {seek}
+            ORDER BY qm.created_at DESC, qm.query_id DESC
+            LIMIT :limit
+        """,
+        "keyset": {
+            "sort_column": "qm.created_at", "sort_key": "created_at",
+            "id_column": "qm.query_id", "id_key": "query_id", "direction": "DESC",
+        },
+        "keyset_sanitized": "SELECT qm.* FROM query_masters qm WHERE qm.user_mobile = ? AND (qm.created_at, qm.query_id) < (?, ?) LIMIT ?",
         "sanitized": "SELECT qm.* FROM query_masters qm WHERE qm.user_mobile = ? LIMIT ? OFFSET ?"
     },
     
@@ -130,6 +196,22 @@ SQL_TEMPLATES: dict[str, dict] = {
             ORDER BY qq.sent_at DESC
             LIMIT :limit OFFSET :offset
         """,
+        "keyset_query": """
+            SELECT 
+                qq.quotation_id, qq.query_id, qq.price, qq.currency,
+                qq.status, qq.sent_at, qq.confirm_at
+            FROM query_quotations qq
+            JOIN query_masters qm ON qq.query_id = qm.query_id
+            WHERE qm.user_mobile = :mobile
+              {seek}
+            ORDER BY qq.sent_at DESC, qq.quotation_id DESC
+            LIMIT :limit
+        """,
+        "keyset": {
+            "sort_column": "qq.sent_at", "sort_key": "sent_at",
+            "id_column": "qq.quotation_id", "id_key": "quotation_id", "direction": "DESC",
+        },
+        "keyset_sanitized": "SELECT qq.* FROM query_quotations qq JOIN query_masters qm ON ... WHERE qm.user_mobile = ? AND (qq.sent_at, qq.quotation_id) < (?, ?) LIMIT ?",
         "sanitized": "SELECT qq.* FROM query_quotations qq JOIN query_masters qm ON ... WHERE qm.user_mobile = ?"
     },
     
@@ -166,6 +248,22 @@ SQL_TEMPLATES: dict[str, dict] = {
             ORDER BY qp.id DESC
             LIMIT :limit OFFSET :offset
         """,
+        "keyset_query": """
+            SELECT 
+                qp.id, qp.query_id, qp.pending_amount, qp.recieved_amount,
+                qp.total_amount, qp.grand_total_amount, qp.discount
+            FROM query_payments qp
+            JOIN query_masters qm ON qp.query_id = qm.query_id
+            WHERE qm.user_mobile = :mobile
+              {seek}
+            ORDER BY qp.id DESC
+            LIMIT :limit
+        """,
+        "keyset": {
+            "sort_column": "qp.id", "sort_key": "id",
+            "id_column": "qp.id", "id_key": "id", "direction": "DESC",
+        },
+        "keyset_sanitized": "SELECT qp.* FROM query_payments qp JOIN query_masters qm ON ... WHERE qm.user_mobile = ? AND qp.id < ? LIMIT ?",
         "sanitized": "SELECT qp.* FROM query_payments qp JOIN query_masters qm ON ... WHERE qm.user_mobile = ?"
     },
     
@@ -273,3 +371,28 @@ def get_required_entities(intent: str) -> list[str]:
     """Get required entities for an intent."""
     template = SQL_TEMPLATES.get(intent)
     return template["required_entities"] if template else []
+
+
+def template_sql(template: dict, key: str = "query") -> str:
+    """A template's SQL ("query" or "keyset_query") for the configured DB_BACKEND."""
+    variant = template.get("dialects", {}).get(get_settings().DB_BACKEND, {})
+    return variant.get(key) or template[key]
+
+
+def render_keyset_query(template: dict, cursor: Optional[str] = None) -> tuple[str, dict, Optional[str]]:
+    """
+    Fill the {seek} slot of a template's keyset query.
+    Only column identifiers from the template are inserted - cursor values stay bound parameters.
+    
+    Returns:
+        (sql, cursor bind params, block the query seeks in - see app/core/pagination)
+    
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    keyset = template["keyset"]
+    predicate, params, block = keyset_where(
+        cursor, keyset["sort_column"], keyset["id_column"], keyset["direction"]
+    )
+    seek = f"AND {predicate}" if predicate else ""
+    return template_sql(template, "keyset_query").replace("{seek}", seek), params, block
@@ -93,6 +93,7 @@ def validate_parameters(params: dict) -> dict:
                     value = int(value)
                 except (ValueError, TypeError):
                     raise SQLValidationError(f"Invalid offset value: {value}")
+            value = min(value, settings.MAX_OFFSET)
             value = max(value, 0)
         
         # String values - ensure they're actual strings and not SQL injection attempts
@@ -0,0 +1,420 @@
+"""
+Request Tracing: Request-scoped spans for every pipeline stage, DB statement and LLM call.
+
+TracingMiddleware opens a root span per HTTP request and keeps the trace in a
+contextvar, so `span()` calls anywhere below it (including asyncio.gather
+fan-outs) nest under the right parent without passing anything around.
+Outside a request `span()` is a no-op.
+
+Every response carries a `Server-Timing` header with the per-stage totals, so
+browser devtools show the breakdown. Completed traces are exported in the
+OTLP/JSON format (one ExportTraceServiceRequest per line) to a file
+(TRACE_EXPORTER=file) or POSTed to an OTLP/HTTP collector (TRACE_EXPORTER=otlp)
+from a background thread, off the request path.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "flyshop-ai-chatbot"
+
+# OTLP SpanKind / StatusCode values
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation with attributes; durations use the monotonic clock."""
+
+    is_recording = True
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "kind",
+        "start_unix_ns", "_start_perf_ns", "duration_ns", "attributes", "status", "status_message",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = KIND_INTERNAL,
+                 attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_unix_ns = time.time_ns()
+        self._start_perf_ns = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def elapsed_ms(self) -> float:
+        if self.duration_ns is not None:
+            return self.duration_ns / 1e6
+        return (time.perf_counter_ns() - self._start_perf_ns) / 1e6
+
+    def end(self) -> None:
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self._start_perf_ns
+
+
+class _NoopSpan:
+    """Returned by span() when no trace is active."""
+
+    is_recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans of one request, in start order."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+
+    def start_span(self, name: str, parent: Optional[Span], kind: int = KIND_INTERNAL,
+                   attributes: Optional[dict] = None) -> Span:
+        new_span = Span(name, self.trace_id, parent.span_id if parent else None, kind, attributes)
+        self.spans.append(new_span)
+        return new_span
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("flyshop_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("flyshop_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, attributes: Optional[dict] = None, kind: int = KIND_INTERNAL) -> Iterator[Any]:
+    """
+    Time the enclosed block as a child of the current span.
+
+    Yields the span so attributes known only afterwards (rows, bytes) can be
+    added. Exceptions mark the span as failed and propagate.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield NOOP_SPAN
+        return
+    new_span = trace.start_span(name, _current_span.get(), kind, attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.record_error(e)
+        raise
+    finally:
+        new_span.end()
+        _current_span.reset(token)
+
+
+# Attribute helpers
+
+_TABLE_RE = re.compile(r"\bFROM\s+`?(\w+)`?", re.IGNORECASE)
+
+
+def statement_table(query: str) -> str:
+    """First table named in a FROM clause ("" if none)."""
+    match = _TABLE_RE.search(query)
+    return match.group(1) if match else ""
+
+
+def statement_attributes(query: str) -> dict:
+    """db.* attributes for a SQL statement (first table in FROM, operation, statement text)."""
+    statement = " ".join(query.split())
+    return {
+        "db.system": get_settings().DB_BACKEND,
+        "db.operation": statement.split(" ", 1)[0].upper() if statement else "",
+        "db.sql.table": statement_table(statement),
+        "db.statement": statement[:500],
+    }
+
+
+def result_attributes(rows: list) -> dict:
+    """Row count and an estimate of the text/binary payload size of a result (row dicts or value tuples)."""
+    text_bytes = sum(
+        len(value)
+        for row in rows for value in (row.values() if isinstance(row, dict) else row)
+        if isinstance(value, (str, bytes))
+    )
+    return {"db.rows": len(rows), "db.response_bytes_estimate": text_bytes}
+
+
+def prompt_attributes(prompt: str, operation: str) -> dict:
+    """LLM request attributes; token counts are estimated (~4 chars per token) until the response reports them."""
+    return {
+        "llm.operation": operation,
+        "llm.prompt_chars": len(prompt),
+        "llm.prompt_tokens_estimate": len(prompt) // 4,
+    }
+
+
+def annotate_llm_response(llm_span, response) -> None:
+    """Add response size and, when the API reports it, exact token usage."""
+    text = getattr(response, "text", None) or ""
+    llm_span.set_attribute("llm.response_chars", len(text))
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        llm_span.set_attribute("llm.prompt_tokens", getattr(usage, "prompt_token_count", None))
+        llm_span.set_attribute("llm.completion_tokens", getattr(usage, "candidates_token_count", None))
+
+
+# Server-Timing
+
+def server_timing_header(trace: Trace) -> str:
+    """Per-stage totals of the finished child spans, plus the request total so far."""
+    totals: dict[str, list] = {}
+    for child in trace.spans[1:]:
+        if child.duration_ns is None:
+            continue
+        entry = totals.setdefault(child.name, [0.0, 0])
+        entry[0] += child.duration_ns / 1e6
+        entry[1] += 1
+    metrics = [
+        f'{name};dur={total:.2f}' + (f';desc="{count}x"' if count > 1 else "")
+        for name, (total, count) in totals.items()
+    ]
+    if trace.root is not None:
+        metrics.append(f"total;dur={trace.root.elapsed_ms():.2f}")
+    return ", ".join(metrics)
+
+
+# OTLP/JSON export
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": "" if value is None else str(value)}
+
+
+def _otlp_span(s: Span) -> dict:
+    result = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_unix_ns),
+        "endTimeUnixNano": str(s.start_unix_ns + (s.duration_ns or 0)),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+        "status": {"code": s.status, **({"message": s.status_message} if s.status_message else {})},
+    }
+    if s.parent_id:
+        result["parentSpanId"] = s.parent_id
+    return result
+
+
+def otlp_payload(traces: list[Trace]) -> dict:
+    """An OTLP ExportTraceServiceRequest (JSON encoding) for a batch of traces."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(s) for trace in traces for s in trace.spans],
+            }],
+        }]
+    }
+
+
+class FileSink:
+    """Appends one OTLP/JSON document per batch (the collector file exporter layout)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, payload: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        pass
+
+
+class OTLPHttpSink:
+    """POSTs batches to an OTLP/HTTP collector (`.../v1/traces`)."""
+
+    def __init__(self, endpoint: str):
+        import httpx
+        self.endpoint = endpoint
+        self._client = httpx.Client(timeout=5.0)
+
+    def write(self, payload: dict) -> None:
+        self._client.post(self.endpoint, json=payload).raise_for_status()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class SpanExporter:
+    """Batches finished traces on a background thread so export never blocks a request."""
+
+    _STOP = object()
+
+    def __init__(self, sink, sample_rate: float = 1.0, batch_size: int = 64, flush_interval: float = 1.0):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {"exported": 0, "dropped": 0, "failed": 0}
+        self._queue: queue.Queue = queue.Queue(maxsize=10_000)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self.sink.write(otlp_payload(batch))
+                    self.stats["exported"] += len(batch)
+                except Exception as e:
+                    self.stats["failed"] += len(batch)
+                    logger.warning("Span export failed: %s", e)
+        self.sink.close()
+
+    def shutdown(self) -> None:
+        """Flush queued traces and stop the thread."""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=10)
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def get_span_exporter() -> Optional[SpanExporter]:
+    """The process-wide exporter, or None when TRACE_EXPORTER is "none"."""
+    global _exporter
+    if _exporter is None:
+        settings = get_settings()
+        if settings.TRACE_EXPORTER == "file":
+            _exporter = SpanExporter(FileSink(settings.TRACE_EXPORT_PATH), settings.TRACE_SAMPLE_RATE)
+        elif settings.TRACE_EXPORTER == "otlp":
+            _exporter = SpanExporter(OTLPHttpSink(settings.TRACE_OTLP_ENDPOINT), settings.TRACE_SAMPLE_RATE)
+    return _exporter
+
+
+def set_span_exporter(exporter: Optional[SpanExporter]) -> None:
+    """Install an exporter explicitly (tests)."""
+    global _exporter
+    _exporter = exporter
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the exporter (called on shutdown)."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
+
+
+class TracingMiddleware:
+    """ASGI middleware: root span per HTTP request, Server-Timing header, export on completion."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not get_settings().TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        root = trace.start_span(
+            f"{scope['method']} {scope['path']}", None, KIND_SERVER,
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(trace).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)
+            root.end()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            exporter = get_span_exporter()
+            if exporter is not None:
+                exporter.export(trace)
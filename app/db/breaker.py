@@ -0,0 +1,133 @@
+"""
+Circuit breaker per pool class: stop sending queries to a database that is failing or timing out.
+
+Every live query reports its outcome. Errors that say the database is unwell
+(timeouts, connection and server errors) count as failures. Bad SQL does not,
+and neither does a PoolSaturatedError, which is our own load shedding. When
+at least DB_BREAKER_MIN_CALLS queries in the last DB_BREAKER_WINDOW_S include
+a DB_BREAKER_FAILURE_RATE share of failures, the breaker opens. Queries then
+raise CircuitOpenError at once instead of queuing behind a dead server, and
+endpoints answer degraded (cached context or an LLM-only reply).
+
+After DB_BREAKER_OPEN_S the breaker is half-open. One trial query goes
+through: success closes it, failure reopens it.
+"""
+from collections import deque
+from typing import Optional
+import asyncio
+import logging
+import time
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.config import get_settings
+from app.db.pools import DatabaseUnavailableError, PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+class CircuitOpenError(DatabaseUnavailableError):
+    """Raised instead of running a query while the pool's breaker is open."""
+    pass
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Whether an exception from a query says the database is unhealthy."""
+    if isinstance(error, (PoolSaturatedError, CircuitOpenError)):
+        return False
+    return isinstance(error, (DatabaseUnavailableError, OperationalError, InterfaceError, OSError,
+                              asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Failure rate over a sliding window of one-second buckets, with open and half-open states."""
+
+    def __init__(self, name: str, window_s: float, min_calls: int, failure_rate: float, open_seconds: float):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.stats = {"opened": 0, "rejected": 0}
+        self._buckets: deque = deque()  # [second, calls, failures]
+        self._opened_at = 0.0
+        self._trial_at: Optional[float] = None
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a query may run now."""
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._trial_at = None
+        # One trial at a time; a trial that never reported (cancelled) is replaced after open_seconds
+        if self.state == HALF_OPEN and (self._trial_at is None or now - self._trial_at >= self.open_seconds):
+            self._trial_at = now
+            return
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(f"{self.name} database circuit is open")
+
+    def record(self, failed: bool) -> None:
+        """Report a query's outcome."""
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            if failed:
+                self._open(now)
+            else:
+                logger.info("%s database circuit closed", self.name)
+                self.state = CLOSED
+                self._buckets.clear()
+            return
+        if self.state == OPEN:
+            return  # Queries admitted before it opened
+        second = int(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            bucket = self._buckets[-1]
+        else:
+            bucket = [second, 0, 0]
+            self._buckets.append(bucket)
+        bucket[1] += 1
+        bucket[2] += failed
+        while self._buckets[0][0] <= second - self.window_s:
+            self._buckets.popleft()
+        if not failed:
+            return
+        calls = sum(b[1] for b in self._buckets)
+        failures = sum(b[2] for b in self._buckets)
+        if calls >= self.min_calls and failures >= self.failure_rate * calls:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        if self.state != OPEN:
+            logger.error("%s database circuit opened for %gs", self.name, self.open_seconds)
+        self.state = OPEN
+        self._opened_at = now
+        self._buckets.clear()
+        self.stats["opened"] += 1
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(pool: str) -> CircuitBreaker:
+    """The breaker of a pool class (created from settings on first use)."""
+    breaker = _breakers.get(pool)
+    if breaker is None:
+        settings = get_settings()
+        breaker = _breakers[pool] = CircuitBreaker(
+            pool, settings.DB_BREAKER_WINDOW_S, settings.DB_BREAKER_MIN_CALLS,
+            settings.DB_BREAKER_FAILURE_RATE, settings.DB_BREAKER_OPEN_S,
+        )
+    return breaker
+
+
+def breakers() -> dict[str, CircuitBreaker]:
+    """Breakers created so far, by pool class."""
+    return dict(_breakers)
@@ -1,30 +1,73 @@
 """
 Read-only database connection with async SQLAlchemy.
-Uses connection pooling with limited connections for MVP.
+One engine per named pool (interactive, analytics, maintenance; see app.db.pools),
+each with its own size, checkout timeout and queue limit, per node: the primary
+and any read replicas (see app.db.replicas).
+Statements run under their pool's deadline and circuit breaker (see app.db.breaker).
+Connections are pinged only after sitting idle, not on every checkout (see app.db.liveness).
+The MySQL driver is chosen with DB_DRIVER (see app.db.drivers).
 Lazy initialization to allow app to load without valid DB URL.
 Updated to use separate DB config parameters to handle special characters in password.
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine, AsyncConnection
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import text
-from sqlalchemy.engine import URL
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
 from typing import AsyncGenerator, Optional
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
+import re
+import time
 
 from app.config import get_settings
+from app.core.replay import get_replay_journal, MODE_REPLAY
+from app.core.results import RESULT_DICTS, Rows, shape_result
+from app.core.tracing import span, statement_table, statement_attributes, result_attributes, KIND_CLIENT
+from app.core.metrics import (
+    DB_QUERY_SECONDS, DB_ROWS, DB_ERRORS, DB_CHECKOUT_SECONDS, DB_SLOW_QUERIES, DB_ROUTED_QUERIES,
+    DB_STATEMENT_TIMEOUTS,
+)
+from app.db.slow_queries import get_slow_query_log
+from app.db.pools import DatabaseUnavailableError, PoolSaturatedError, current_pool, get_pool_gate, pool_config
+from app.db.breaker import counts_as_failure, get_breaker
+from app.db.liveness import install_liveness
+from app.db.drivers import backend_driver, drivername, require_driver, row_shim
+from app.db.postgres import DEFAULT_PORT as PG_DEFAULT_PORT, install_postgres_shims, is_server_timeout
+from app.db.replicas import PRIMARY, Replica, get_replica_router
 
 logger = logging.getLogger(__name__)
 
-# Lazy-initialized engine
-_engine: Optional[AsyncEngine] = None
-_session_factory = None
+# Lazy-initialized engines and session factories, one per named pool (see app.db.pools),
+# keyed "pool" on the primary and "pool@replicaN" on a replica
+_engines: dict[str, AsyncEngine] = {}
+_session_factories: dict = {}
+
+# MySQL's error when MAX_EXECUTION_TIME stops a statement
+ER_QUERY_TIMEOUT = 3024
+_LEADING_SELECT = re.compile(r"^(\s*SELECT)\b", re.IGNORECASE)
+
+
+class StatementTimeoutError(DatabaseUnavailableError):
+    """A statement ran past its pool's deadline and was stopped."""
+    pass
+
+
+def with_max_execution_time(query: str, deadline_s: float) -> str:
+    """Add a MySQL MAX_EXECUTION_TIME hint (only a statement that starts with SELECT can carry one)."""
+    return _LEADING_SELECT.sub(rf"\1 /*+ MAX_EXECUTION_TIME({int(deadline_s * 1000)}) */", query, count=1)
 
 
 def build_database_url() -> URL:
     """Build database URL from separate config parameters to handle special chars in password."""
     settings = get_settings()
+    if settings.DB_BACKEND == "postgresql":
+        url = make_url(settings.DATABASE_URL)
+        if url.get_backend_name() != "postgresql":
+            raise ValueError("DB_BACKEND=postgresql needs DATABASE_URL to be a postgresql:// URL")
+        return url.set(drivername=drivername("asyncpg"))
     
     # Try separate DB2 params first (handles special chars better)
     db_host = settings.DB2_HOST
@@ -34,9 +77,9 @@ def build_database_url() -> URL:
     db_database = settings.DB2_DATABASE
     
     if all([db_host, db_user, db_password, db_database]):
-        logger.info(f"Using separate DB2 config: {db_host}:{db_port}/{db_database}")
+        logger.info("Using separate DB2 config: %s:%s/%s", db_host, db_port, db_database)
         return URL.create(
-            drivername="mysql+aiomysql",
+            drivername=drivername(settings.DB_DRIVER),
             username=db_user,
             password=db_password,
             host=db_host,
@@ -44,44 +87,97 @@ def build_database_url() -> URL:
             database=db_database
         )
     
-    # Fall back to DATABASE_URL
+    # Fall back to DATABASE_URL, on the configured driver
     logger.info("Falling back to DATABASE_URL")
-    return settings.DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == "mysql":
+        url = url.set(drivername=drivername(settings.DB_DRIVER))
+    return url
+
 
+def driver_row_shim():
+    """Row converter for the configured driver (None when its rows need none)."""
+    settings = get_settings()
+    return None if settings.DB_BACKEND == "standin" else row_shim(backend_driver())
+
+
+def engine_key(pool: str, replica: Optional[Replica] = None) -> str:
+    return pool if replica is None else f"{pool}@{replica.name}"
 
-def get_engine() -> AsyncEngine:
-    """Get or create the database engine (lazy initialization)."""
-    global _engine
-    if _engine is None:
+
+def get_engine(pool: Optional[str] = None, replica: Optional[Replica] = None) -> AsyncEngine:
+    """Get or create the engine of a named pool (default: the current pool class) on the primary or a replica."""
+    pool = pool or current_pool()
+    key = engine_key(pool, replica)
+    engine = _engines.get(key)
+    if engine is None:
         settings = get_settings()
-        db_url = build_database_url()
-        logger.info(f"Creating database engine for host: {os.environ.get('DB_HOST', 'from URL')}")
-        _engine = create_async_engine(
-            db_url,
-            pool_size=settings.DB_POOL_SIZE,
-            pool_recycle=settings.DB_POOL_RECYCLE,
-            pool_pre_ping=True,
-            echo=False,
-        )
-    return _engine
+        config = pool_config(pool)
+        if settings.DB_BACKEND == "standin":
+            from app.db.standin import create_standin_engine
+            if replica is not None:
+                # A replica is an existing copy; never build a fresh one in its place
+                if not os.path.exists(replica.target):
+                    raise FileNotFoundError(f"Stand-in replica not found: {replica.target}")
+                engine = create_standin_engine(replica.target, rebuild=False)
+            else:
+                # Every pool opens the same file; only the first engine (re)builds it
+                rebuild = not settings.STANDIN_DB_PATH and not _engines
+                engine = create_standin_engine(settings.STANDIN_DB_PATH, rebuild=rebuild)
+        else:
+            postgres = settings.DB_BACKEND == "postgresql"
+            require_driver(backend_driver())
+            db_url = build_database_url()
+            host = os.environ.get('DB_HOST', 'from URL')
+            if replica is not None:
+                db_url = make_url(db_url)
+                host, port = replica.host_port(db_url.port or (PG_DEFAULT_PORT if postgres else 3306))
+                db_url = db_url.set(host=host, port=port)
+            connect_args = {}
+            if postgres:
+                # The pool's deadline as the server-side statement_timeout (MySQL gets a per-statement hint)
+                connect_args = {
+                    "server_settings": {
+                        "statement_timeout": str(int(config["deadline"] * 1000)),
+                        "application_name": f"flyshop-{key}",
+                    },
+                    "prepared_statement_cache_size": settings.DB_PG_STATEMENT_CACHE_SIZE,
+                }
+            logger.info("Creating %s database engine for host: %s", key, host)
+            engine = create_async_engine(
+                db_url,
+                pool_size=config["size"],
+                max_overflow=config["max_overflow"],
+                pool_timeout=config["timeout"],
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                connect_args=connect_args,
+                echo=False,
+            )
+            if postgres:
+                install_postgres_shims(engine)
+        install_liveness(engine, key, settings.DB_POOL_PING_IDLE_S)
+        _engines[key] = engine
+    return engine
 
 
-def get_session_factory():
-    """Get or create the session factory."""
-    global _session_factory
-    if _session_factory is None:
-        _session_factory = sessionmaker(
-            get_engine(),
+def get_session_factory(pool: Optional[str] = None, replica: Optional[Replica] = None):
+    """Get or create the session factory of a named pool on the primary or a replica."""
+    pool = pool or current_pool()
+    key = engine_key(pool, replica)
+    factory = _session_factories.get(key)
+    if factory is None:
+        factory = _session_factories[key] = sessionmaker(
+            get_engine(pool, replica),
             class_=AsyncSession,
             expire_on_commit=False,
         )
-    return _session_factory
+    return factory
 
 
 @asynccontextmanager
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
-    """Get an async database session."""
-    factory = get_session_factory()
+async def get_db_session(pool: Optional[str] = None) -> AsyncGenerator[AsyncSession, None]:
+    """Get an async database session from a named pool (default: the current pool class)."""
+    factory = get_session_factory(pool)
     async with factory() as session:
         try:
             yield session
@@ -89,16 +185,205 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-async def execute_readonly_query(query: str, params: dict) -> list[dict]:
+async def dispose_engines() -> None:
+    """Close every pool's connections (called on shutdown)."""
+    engines = list(_engines.values())
+    _engines.clear()
+    _session_factories.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+async def _checkout(
+    pool: str, replica: Optional[Replica]
+) -> tuple[AsyncSession, AsyncConnection, Optional[Replica]]:
+    """
+    A session holding a connection on the chosen node.
+    A replica that cannot be reached counts a failure and the primary is used instead.
+    """
+    if replica is not None:
+        session = None
+        try:
+            session = get_session_factory(pool, replica)()
+            return session, await session.connection(), replica
+        except Exception as e:
+            if session is not None:
+                await session.close()
+            get_replica_router().report_failure(replica, e)
+            logger.warning("Replica %s unavailable, using the primary: %s", replica.name, e)
+    session = get_session_factory(pool)()
+    try:
+        return session, await session.connection(), None
+    except BaseException:
+        await session.close()
+        raise
+
+
+async def _fetch(session: AsyncSession, statement, params: dict) -> tuple[list, list]:
+    result = await session.execute(statement, params)
+    return list(result.keys()), result.fetchall()
+
+
+async def _abandon(session: AsyncSession, connection: AsyncConnection, task: asyncio.Future) -> None:
+    """Stop an in-flight statement and discard its connection, which may be mid-protocol."""
+    interrupt = getattr(connection.sync_connection.connection.driver_connection, "interrupt", None)
+    if interrupt is not None:
+        await interrupt()  # aiosqlite runs the statement on a thread that task cancellation cannot stop
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await session.invalidate()
+
+
+async def _run_with_deadline(session: AsyncSession, connection: AsyncConnection, statement, params: dict,
+                             deadline: float) -> tuple[list, list]:
+    """
+    Run a statement, stopping it at the deadline or when the caller is cancelled
+    (client gone). A stopped statement's connection is invalidated, not pooled.
+    """
+    task = asyncio.ensure_future(_fetch(session, statement, params))
+    try:
+        done, _ = await asyncio.wait((task,), timeout=deadline)
+    except asyncio.CancelledError:
+        await _abandon(session, connection, task)
+        raise
+    if not done:
+        await _abandon(session, connection, task)
+        raise StatementTimeoutError(f"statement exceeded its {deadline:g}s deadline")
+    return task.result()
+
+
+async def _execute_live(query: str, params: dict, db_span, started: float) -> Rows:
+    """Run a query on the current pool class: breaker, admission gate, node choice, deadline."""
+    pool = current_pool()
+    breaker = get_breaker(pool)
+    breaker.before_call()
+    deadline = pool_config(pool)["deadline"]
+    router = get_replica_router()
+    replica = router.choose(pool) if router is not None else None
+    gate = get_pool_gate(pool)
+    admitted = False
+    session = None
+    try:
+        with span("db.pool_wait"):
+            await gate.acquire()
+            admitted = True
+            session, connection, replica = await _checkout(pool, replica)
+        node = replica.name if replica is not None else PRIMARY
+        if db_span.is_recording:
+            db_span.set_attributes({"db.pool": pool, "db.node": node})
+        DB_CHECKOUT_SECONDS.observe(time.perf_counter() - started, pool)
+        DB_ROUTED_QUERIES.inc(pool, node)
+        if get_settings().DB_BACKEND == "mysql":
+            query = with_max_execution_time(query, deadline)
+        try:
+            columns, rows = await _run_with_deadline(session, connection, text(query), params, deadline)
+        except DBAPIError as e:
+            if replica is not None and e.connection_invalidated:
+                router.report_failure(replica, e)
+            server_timeout = is_server_timeout(e) or (
+                isinstance(e, OperationalError) and getattr(e.orig, "args", (None,))[0] == ER_QUERY_TIMEOUT
+            )
+            if server_timeout:
+                raise StatementTimeoutError(f"statement exceeded its {deadline:g}s deadline (server)") from e
+            raise
+        shim = driver_row_shim()
+        if shim is not None:
+            rows = shim(rows)
+    except Exception as e:
+        if isinstance(e, StatementTimeoutError):
+            DB_STATEMENT_TIMEOUTS.inc(pool)
+        if not isinstance(e, PoolSaturatedError):
+            breaker.record(failed=counts_as_failure(e))
+        raise
+    finally:
+        if session is not None:
+            await session.close()
+        # After the session has returned its connection
+        if admitted:
+            gate.release()
+    breaker.record(failed=False)
+    return Rows(columns, rows)
+
+
+async def execute_readonly_query(query: str, params: dict, result: str = RESULT_DICTS):
     """
     Execute a read-only SQL query with parameter binding.
-    Returns list of row dictionaries.
+    Returns list of row dictionaries, or with `result` a compact form (see app.core.results).
+    Calls are recorded to / served from the replay journal when REPLAY_MODE is set.
+    """
+    table = statement_table(query)
+    started = time.perf_counter()
+    try:
+        with span("db.query", kind=KIND_CLIENT) as db_span:
+            if db_span.is_recording:
+                db_span.set_attributes(statement_attributes(query))
+            journal = get_replay_journal()
+            if journal is not None and journal.mode == MODE_REPLAY:
+                data = Rows.from_dicts(await journal.replay_db(query, params))
+                if db_span.is_recording:
+                    db_span.set_attributes({"db.replayed": True, **result_attributes(data.rows)})
+            else:
+                data = await _execute_live(query, params, db_span, started)
+                if journal is not None:
+                    journal.record_db(query, params, data.to_dicts(), (time.perf_counter() - started) * 1000)
+                if db_span.is_recording:
+                    db_span.set_attributes(result_attributes(data.rows))
+    except Exception:
+        DB_ERRORS.inc(table)
+        raise
+    elapsed = time.perf_counter() - started
+    DB_QUERY_SECONDS.observe(elapsed, table)
+    DB_ROWS.inc(table, amount=len(data))
+    slow_log = get_slow_query_log()
+    if elapsed * 1000 >= slow_log.threshold_ms:
+        DB_SLOW_QUERIES.inc(table)
+        slow_log.record(query, elapsed * 1000, len(data), table)
+    return shape_result(data, result)
+
+
+async def stream_readonly_query(
+    query: str, params: dict, batch_size: int = 1000, pool: Optional[str] = None, result: str = RESULT_DICTS
+) -> AsyncGenerator:
+    """
+    Execute a read-only SQL query through a server-side cursor.
+    Yields lists of row dictionaries (or batches in the `result` form, see
+    app.core.results) of at most `batch_size` rows, so memory
+    stays bounded no matter how large the result is. The pool slot is held
+    until the stream is exhausted or closed. Pass `pool` explicitly when the
+    stream is consumed outside the caller's context (a StreamingResponse body).
+    Streams are refused while the pool's breaker is open but have no deadline.
+    """
+    pool = pool or current_pool()
+    get_breaker(pool).before_call()
+    router = get_replica_router()
+    replica = router.choose(pool) if router is not None else None
+    async with get_pool_gate(pool).slot():
+        try:
+            conn = await get_engine(pool, replica).connect()
+        except Exception as e:
+            if replica is None:
+                raise
+            router.report_failure(replica, e)
+            replica = None
+            conn = await get_engine(pool).connect()
+        DB_ROUTED_QUERIES.inc(pool, replica.name if replica is not None else PRIMARY)
+        try:
+            cursor = await conn.stream(text(query).execution_options(yield_per=batch_size), params)
+            columns = list(cursor.keys())
+            shim = driver_row_shim()
+            async for partition in cursor.partitions(batch_size):
+                if shim is not None:
+                    partition = shim(partition)
+                yield shape_result(Rows(columns, partition), result)
+        finally:
+            await conn.close()
+
+
+MOBILE_EXISTS_SQL = """
+        SELECT EXISTS(
+            SELECT 1 FROM query_masters WHERE user_mobile LIKE :m_wild
+        ) as exists_flag
     """
-    async with get_db_session() as session:
-        result = await session.execute(text(query), params)
-        rows = result.fetchall()
-        columns = result.keys()
-        return [dict(zip(columns, row)) for row in rows]
 
 
 async def validate_mobile_exists(mobile: str) -> bool:
@@ -109,12 +394,6 @@ async def validate_mobile_exists(mobile: str) -> bool:
     # Extract last 10 digits for robust matching
     mobile_plain = mobile[-10:] if len(mobile) >= 10 else mobile
     
-    query = """
-        SELECT EXISTS(
-            SELECT 1 FROM query_masters WHERE user_mobile LIKE :m_wild
-        ) as exists_flag
-    """
-    async with get_db_session() as session:
-        result = await session.execute(text(query), {"m_wild": f"%{mobile_plain}"})
-        row = result.fetchone()
-        return bool(row and row[0])
+    with span("validate_mobile"):
+        rows = await execute_readonly_query(MOBILE_EXISTS_SQL, {"m_wild": f"%{mobile_plain}"})
+    return bool(rows and rows[0].get("exists_flag"))
@@ -0,0 +1,98 @@
+"""
+Async drivers (MySQL ones selectable with DB_DRIVER), and shims that make their rows look alike.
+
+- aiomysql (default): PyMySQL's pure-Python protocol code on asyncio; the
+  reference every other driver's values are shimmed to match
+- asyncmy: the same protocol and converters compiled with Cython; decodes
+  wide result sets markedly faster (benchmarks/mysql_drivers.py measures it)
+- asyncpg: always used with DB_BACKEND=postgresql (see app.db.postgres)
+
+A driver other than the reference gets its values canonicalized as rows are
+fetched, so response_formatter sees the same types whichever driver ran the
+query: bytes (never bytearray or memoryview), naive datetimes, Decimal for
+DECIMAL columns and str for JSON documents. The reference driver pays nothing.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+from uuid import UUID
+import importlib.util
+import json
+
+from app.config import get_settings
+
+REFERENCE_DRIVER = "aiomysql"
+
+# DB_DRIVER -> (SQLAlchemy drivername, importable module, pip package)
+DRIVERS = {
+    "aiomysql": ("mysql+aiomysql", "aiomysql", "aiomysql"),
+    "asyncmy": ("mysql+asyncmy", "asyncmy", "asyncmy"),
+    "asyncpg": ("postgresql+asyncpg", "asyncpg", "asyncpg"),
+}
+
+
+def driver_spec(name: str) -> tuple[str, str, str]:
+    try:
+        return DRIVERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown DB_DRIVER {name!r}; expected one of {', '.join(DRIVERS)}") from None
+
+
+def drivername(name: str) -> str:
+    """SQLAlchemy drivername for DB_DRIVER, e.g. "mysql+asyncmy"."""
+    return driver_spec(name)[0]
+
+
+def backend_driver() -> str:
+    """The driver the configured backend runs on (DB_DRIVER only chooses among the MySQL ones)."""
+    settings = get_settings()
+    return "asyncpg" if settings.DB_BACKEND == "postgresql" else settings.DB_DRIVER
+
+
+def driver_available(name: str) -> bool:
+    return importlib.util.find_spec(driver_spec(name)[1]) is not None
+
+
+def require_driver(name: str) -> None:
+    """Fail with an actionable message when the configured driver is not installed."""
+    if not driver_available(name):
+        package = driver_spec(name)[2]
+        raise RuntimeError(f"The {name} driver needs the {package!r} package (pip install {package})")
+
+
+def _naive(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Exact type -> canonical form; everything else passes through unchanged
+_CANONICAL: dict[type, Callable[[Any], Any]] = {
+    bytearray: bytes,
+    memoryview: bytes,
+    datetime: _naive,
+    dict: lambda value: json.dumps(value, ensure_ascii=False),
+    list: lambda value: json.dumps(value, ensure_ascii=False),
+    UUID: str,
+}
+
+
+def canonical_value(value: Any) -> Any:
+    """One value as the reference driver returns it."""
+    convert = _CANONICAL.get(type(value))
+    return value if convert is None else convert(value)
+
+
+def canonical_rows(rows: list) -> list[tuple]:
+    """Rows with every value canonicalized (see canonical_value)."""
+    canonical = _CANONICAL
+    return [
+        tuple(value if (convert := canonical.get(type(value))) is None else convert(value) for value in row)
+        for row in rows
+    ]
+
+
+def row_shim(name: str) -> Optional[Callable[[list], list]]:
+    """The row converter a driver needs, or None for the reference driver."""
+    driver_spec(name)
+    return None if name == REFERENCE_DRIVER else canonical_rows
+
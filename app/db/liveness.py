@@ -0,0 +1,251 @@
+"""
+Connection liveness without a round trip on every checkout, and pool warmup before readiness.
+
+pool_pre_ping pings each connection as it is checked out, and a customer
+chat checks out about eleven (fetch_universal_context runs two queries, then
+its nine sections concurrently), so every request paid eleven extra round
+trips to the database host. Instead:
+
+- a checkout pings only a connection that sat idle for more than
+  DB_POOL_PING_IDLE_S (the ones a server or NAT timeout may have closed);
+  a failed ping raises DisconnectionError, so the pool quietly reconnects;
+- a disconnect error during a statement invalidates that connection and
+  every older one in its pool (SQLAlchemy's default), and is counted;
+- every DB_POOL_KEEPALIVE_INTERVAL_S a background task cycles the idle
+  connections of each pool oldest first, pinging those past the idle age
+  (all of them after a disconnect), then tops the pool up to its minimum
+  size, so request checkouts rarely find a stale or missing connection;
+- at startup every pool is opened to its *_MIN_SIZE concurrently, paying
+  the TCP, TLS and auth handshakes before traffic; GET /ready answers 503
+  until the primary's pools are warm. With USE_MOCK_DATA there is no
+  database to warm or keep alive, and the app is ready at once.
+"""
+from typing import Optional
+import asyncio
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.util import greenlet_spawn
+
+from app.config import get_settings
+from app.db.pools import POOLS, pool_config
+
+logger = logging.getLogger(__name__)
+
+# Keys in each pooled connection's record.info
+LAST_USED = "flyshop_last_used"
+IDLE_AT_CHECKOUT = "flyshop_idle_at_checkout"
+
+# Per engine key ("pool" or "pool@replicaN"): pings, failed pings, disconnects seen by statements
+_stats: dict[str, dict] = {}
+# Engine keys that saw a disconnect since the keeper's last round
+_reopen: set[str] = set()
+_state = {"ready": False, "warmed_at": None, "error": None}
+
+
+def liveness_stats() -> dict[str, dict]:
+    return {key: dict(stats) for key, stats in _stats.items()}
+
+
+def install_liveness(engine: AsyncEngine, key: str, idle_ping_s: float) -> None:
+    """Ping connections idle longer than `idle_ping_s` on checkout; count disconnects."""
+    sync_engine = engine.sync_engine
+    dialect = sync_engine.dialect
+    stats = _stats.setdefault(key, {"pings": 0, "failed_pings": 0, "disconnects": 0})
+
+    def mark_used(dbapi_connection, record):
+        record.info[LAST_USED] = time.monotonic()
+
+    def on_checkout(dbapi_connection, record, proxy):
+        now = time.monotonic()
+        idle = now - record.info.get(LAST_USED, now)
+        record.info[IDLE_AT_CHECKOUT] = idle
+        if idle <= idle_ping_s:
+            return
+        stats["pings"] += 1
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            stats["failed_pings"] += 1
+            logger.info("Idle %s connection failed its ping after %.0fs, reconnecting: %s", key, idle, e)
+            raise DisconnectionError() from e  # The pool replaces the connection and retries the checkout
+
+    def on_error(context):
+        if context.is_disconnect:
+            stats["disconnects"] += 1
+            _reopen.add(key)
+            logger.warning("Disconnect on %s, its pooled connections will be reopened: %s",
+                           key, context.original_exception)
+
+    event.listen(sync_engine, "connect", mark_used)
+    event.listen(sync_engine, "checkin", mark_used)
+    event.listen(sync_engine, "checkout", on_checkout)
+    event.listen(sync_engine, "handle_error", on_error)
+
+
+def open_connections(pool) -> int:
+    """Connections the pool holds now, checked in or out."""
+    return pool.checkedin() + pool.checkedout()
+
+
+def _cycle_idle(pool, idle_s: float, everything: bool) -> int:
+    """
+    Check out and return idle connections oldest first (QueuePool hands out
+    the longest-idle one), so the checkout listener pings the stale ones.
+    Stops at the first connection that did not need a ping, unless `everything`.
+    Runs inside greenlet_spawn: the async drivers' pings await on the loop.
+    """
+    cycled = 0
+    for _ in range(pool.checkedin()):
+        connection = pool.connect()
+        try:
+            stale = connection.info.get(IDLE_AT_CHECKOUT, 0.0) > idle_s
+        finally:
+            connection.close()
+        if not (stale or everything):
+            break
+        cycled += 1
+    return cycled
+
+
+async def fill_pool(engine: AsyncEngine, min_size: int) -> int:
+    """Open connections concurrently until the pool holds `min_size`; returns how many were opened."""
+    missing = min_size - open_connections(engine.sync_engine.pool)
+    if missing <= 0:
+        return 0
+    connections = [engine.connect() for _ in range(missing)]
+    results = await asyncio.gather(*(connection.start() for connection in connections), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, BaseException)]
+    await asyncio.gather(*(
+        connection.close() for connection, result in zip(connections, results) if result not in failures
+    ))
+    if failures:
+        raise failures[0]
+    return missing
+
+
+async def warm_pools(timeout: Optional[float] = None) -> bool:
+    """
+    Open every pool to its minimum size, on the primary and (best effort) on
+    in-rotation replicas. Readiness follows the primary's pools.
+    """
+    from app.db.database import get_engine
+    from app.db.replicas import get_replica_router
+
+    timeout = get_settings().DB_POOL_WARMUP_TIMEOUT_S if timeout is None else timeout
+    started = time.perf_counter()
+    router = get_replica_router()
+    replicas = [r for r in router.replicas if r.ejected_until <= time.monotonic()] if router is not None else []
+
+    async def warm(pool, replica=None):
+        return await fill_pool(get_engine(pool, replica), pool_config(pool)["min_size"])
+
+    primary = [warm(pool) for pool in POOLS]
+    secondary = [warm(pool, replica) for replica in replicas for pool in POOLS]
+    try:
+        opened, replica_results = await asyncio.wait_for(asyncio.gather(
+            asyncio.gather(*primary), asyncio.gather(*secondary, return_exceptions=True),
+        ), timeout)
+    except Exception as e:
+        _state.update(ready=False, error=f"{type(e).__name__}: {e}")
+        logger.warning("Connection warmup incomplete after %.1fs: %s", time.perf_counter() - started, e)
+        return False
+    for result in replica_results:
+        if isinstance(result, BaseException):
+            logger.warning("Replica connection warmup failed: %s", result)
+    _state.update(ready=True, warmed_at=time.time(), error=None)
+    logger.info("Opened %d connections in %.0f ms", sum(opened), (time.perf_counter() - started) * 1000)
+    return True
+
+
+def readiness() -> dict:
+    """Whether the pools are warm, with the connections each one holds."""
+    from app.db import database
+    return {
+        **_state,
+        "pools": {
+            key: {"open": open_connections(engine.sync_engine.pool),
+                  "min_size": pool_config(key.partition("@")[0])["min_size"]}
+            for key, engine in database._engines.items()
+        },
+    }
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+class PoolKeeper:
+    """Background task: ping idle connections past their age and keep each pool at its minimum size."""
+
+    def __init__(self, interval: float, idle_s: float):
+        self.interval = interval
+        self.idle_s = idle_s
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        from app.db import database
+        if not _state["ready"]:
+            await warm_pools()
+        seen = set()
+        for key, engine in list(database._engines.items()):
+            if id(engine) in seen:
+                continue
+            seen.add(id(engine))
+            everything = key in _reopen
+            _reopen.discard(key)
+            try:
+                await greenlet_spawn(_cycle_idle, engine.sync_engine.pool, self.idle_s, everything)
+                await fill_pool(engine, pool_config(key.partition("@")[0])["min_size"])
+            except Exception as e:
+                logger.warning("Keepalive of %s failed: %s", key, e)
+
+    def start(self) -> None:
+        """Start on the running loop (call from a coroutine)."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+
+_keeper: Optional[PoolKeeper] = None
+
+
+def get_pool_keeper() -> PoolKeeper:
+    global _keeper
+    if _keeper is None:
+        settings = get_settings()
+        _keeper = PoolKeeper(settings.DB_POOL_KEEPALIVE_INTERVAL_S, settings.DB_POOL_PING_IDLE_S)
+    return _keeper
+
+
+async def start_pool_keeper() -> PoolKeeper:
+    """Warm the pools, then keep them alive in the background (called on startup, after the replica router)."""
+    keeper = get_pool_keeper()
+    if get_settings().USE_MOCK_DATA:
+        _state.update(ready=True, warmed_at=time.time(), error=None)
+        return keeper
+    if keeper._task is None:
+        await warm_pools()
+        keeper.start()
+    return keeper
+
+
+async def stop_pool_keeper() -> None:
+    """Stop the keepalive task (called on shutdown, before the engines are disposed)."""
+    if _keeper is not None:
+        await _keeper.stop()
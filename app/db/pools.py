@@ -0,0 +1,179 @@
+"""
+Connection-pool bulkheads: named pools per traffic class, each with its own size, wait timeout and queue limit.
+
+- interactive: customer chats, side panels and the admin user inspector
+- analytics:   admin global context (full-table SUMs and GROUP BYs) and exports
+- maintenance: /debug endpoints and other operator tooling
+
+Code picks its pool by class, not by engine: `with use_pool(POOL_ANALYTICS):`
+or the `@pool_class(POOL_ANALYTICS)` decorator sets a contextvar that
+execute_readonly_query and stream_readonly_query read (asyncio.gather
+children inherit it). Everything else runs on the interactive pool.
+
+Each pool has a PoolGate in front of its engine. It admits at most
+size + max_overflow concurrent checkouts, lets at most `queue_limit` callers
+wait, and each waits at most `timeout` seconds. Beyond that, PoolSaturatedError
+is raised at once, so a burst of analytics work queues and fails inside its
+own pool and never holds connections that customer chats are waiting for.
+"""
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+import asyncio
+import functools
+
+from app.config import get_settings
+
+POOL_INTERACTIVE = "interactive"
+POOL_ANALYTICS = "analytics"
+POOL_MAINTENANCE = "maintenance"
+POOLS = (POOL_INTERACTIVE, POOL_ANALYTICS, POOL_MAINTENANCE)
+
+
+class DatabaseUnavailableError(RuntimeError):
+    """The database could not serve a query in time; callers may answer degraded instead."""
+    pass
+
+
+class PoolSaturatedError(DatabaseUnavailableError):
+    """Raised when a pool's wait queue is full or a checkout waited longer than the pool timeout."""
+    pass
+
+
+def pool_config(name: str) -> dict:
+    """
+    Size, minimum open connections, overflow, checkout timeout, queue limit,
+    replica lag bound and statement deadline (s) of a named pool.
+    """
+    settings = get_settings()
+    if name == POOL_ANALYTICS:
+        return {"size": settings.DB_ANALYTICS_POOL_SIZE, "max_overflow": 0,
+                "min_size": min(settings.DB_ANALYTICS_POOL_MIN_SIZE, settings.DB_ANALYTICS_POOL_SIZE),
+                "timeout": settings.DB_ANALYTICS_POOL_TIMEOUT, "queue_limit": settings.DB_ANALYTICS_QUEUE_LIMIT,
+                "max_lag": settings.DB_ANALYTICS_REPLICA_MAX_LAG_S, "deadline": settings.DB_ANALYTICS_STATEMENT_TIMEOUT_S}
+    if name == POOL_MAINTENANCE:
+        return {"size": settings.DB_MAINTENANCE_POOL_SIZE, "max_overflow": 0,
+                "min_size": min(settings.DB_MAINTENANCE_POOL_MIN_SIZE, settings.DB_MAINTENANCE_POOL_SIZE),
+                "timeout": settings.DB_MAINTENANCE_POOL_TIMEOUT, "queue_limit": settings.DB_MAINTENANCE_QUEUE_LIMIT,
+                "max_lag": settings.DB_MAINTENANCE_REPLICA_MAX_LAG_S,
+                "deadline": settings.DB_MAINTENANCE_STATEMENT_TIMEOUT_S}
+    if name == POOL_INTERACTIVE:
+        return {"size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+                "min_size": min(settings.DB_POOL_MIN_SIZE, settings.DB_POOL_SIZE),
+                "timeout": settings.DB_POOL_TIMEOUT, "queue_limit": settings.DB_POOL_QUEUE_LIMIT,
+                "max_lag": settings.DB_REPLICA_MAX_LAG_S, "deadline": settings.DB_STATEMENT_TIMEOUT_S}
+    raise ValueError(f"Unknown pool: {name}")
+
+
+class PoolGate:
+    """
+    Admission control for one pool: bounded concurrency, bounded wait queue, bounded wait.
+
+    Waiters are plain futures on the running loop rather than an
+    asyncio.Semaphore, so a gate outlives event loops (tests, reloads).
+    """
+
+    def __init__(self, name: str, capacity: int, queue_limit: int, timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.in_use = 0
+        self.stats = {"admitted": 0, "queue_full": 0, "timeout": 0}
+        self._waiters: deque = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_use < self.capacity and not self._waiters:
+            self.in_use += 1
+            self.stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.queue_limit:
+            self.stats["queue_full"] += 1
+            raise PoolSaturatedError(f"{self.name} pool is saturated ({self.queue_limit} requests already waiting)")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                self.release()  # The slot was handed over just as the wait ended: pass it on
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["timeout"] += 1
+                raise PoolSaturatedError(f"{self.name} pool checkout timed out after {self.timeout:g}s") from None
+            raise
+        self.stats["admitted"] += 1
+
+    def release(self) -> None:
+        """Hand the slot to the oldest live waiter, else free it."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_gates: dict[str, PoolGate] = {}
+
+
+def get_pool_gate(name: str) -> PoolGate:
+    """The gate of a named pool (created from settings on first use)."""
+    gate = _gates.get(name)
+    if gate is None:
+        config = pool_config(name)
+        gate = _gates[name] = PoolGate(
+            name, config["size"] + config["max_overflow"], config["queue_limit"], config["timeout"]
+        )
+    return gate
+
+
+def pool_gates() -> dict[str, PoolGate]:
+    """Gates created so far, by pool name."""
+    return dict(_gates)
+
+
+# Routing: the current request's pool class
+
+_current_pool: ContextVar[str] = ContextVar("flyshop_db_pool", default=POOL_INTERACTIVE)
+
+
+def current_pool() -> str:
+    return _current_pool.get()
+
+
+@contextmanager
+def use_pool(name: str) -> Iterator[None]:
+    """Run the enclosed block's queries on the named pool."""
+    if name not in POOLS:
+        raise ValueError(f"Unknown pool: {name}")
+    token = _current_pool.set(name)
+    try:
+        yield
+    finally:
+        _current_pool.reset(token)
+
+
+def pool_class(name: str) -> Callable:
+    """Decorator: run an async function (endpoint or fetch helper) on the named pool."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with use_pool(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,307 @@
+"""
+PostgreSQL backend (DB_BACKEND=postgresql, on asyncpg).
+
+The app's SQL is written for MySQL. Like the stand-in's shims, every
+statement is translated just before it is sent (cached per statement text):
+
+- GROUP_CONCAT(expr [ORDER BY ...] SEPARATOR 'x') -> string_agg(CAST(expr AS TEXT), 'x' [ORDER BY ...])
+- CONCAT(a, b, ...) -> (CAST(a AS TEXT) || CAST(b AS TEXT) ...), NULL if any part is NULL as in MySQL
+- DATE_FORMAT(x, '%Y-%m-%d') -> to_char(x, 'YYYY-MM-DD')
+- ORDER BY items get MySQL's NULL placement (NULLS FIRST ascending, NULLS
+  LAST descending), which keyset cursors rely on (see app.core.pagination).
+  The two are reverses of each other, so one index per sort key declared
+  `(sort_column NULLS FIRST, id)` serves both directions.
+
+MySQL-only semantics that translation cannot fix (GROUP BY with
+non-aggregated columns) get a hand-written variant in SQL_TEMPLATES (see
+template_sql). asyncpg prepares every statement; SQLAlchemy keeps the
+prepared statements per connection (DB_PG_STATEMENT_CACHE_SIZE), so the
+constant-text hot statements are parsed and planned once per connection.
+
+A customer's whole context (profile, agent and every CONTEXT_SECTIONS
+section) is one statement returning one JSON document per section
+(CONTEXT_JSON_SQL): asyncpg has no pipeline mode, so this is how the
+sections go out in a single round trip on a single connection instead of
+two sequential queries and nine parallel checkouts.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+import json
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.context_sections import CONTEXT_SECTIONS, USER_QUERY_IDS_SQL
+
+# Query cancelled by statement_timeout (the server-side deadline)
+PG_QUERY_CANCELED = "57014"
+DEFAULT_PORT = 5432
+# GROUP_CONCAT's separator when none is given
+DEFAULT_SEPARATOR = "','"
+
+_CALL_RE = re.compile(r"\b(GROUP_CONCAT|CONCAT|DATE_FORMAT)\s*\(", re.IGNORECASE)
+_ORDER_BY_RE = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+_CLAUSE_END_RE = re.compile(r"\b(LIMIT|OFFSET|FETCH|FOR|UNION|INTERSECT|EXCEPT|SEPARATOR)\b", re.IGNORECASE)
+_DIRECTION_RE = re.compile(r"\s+(ASC|DESC)$", re.IGNORECASE)
+_NULLS_RE = re.compile(r"\bNULLS\s+(FIRST|LAST)\b", re.IGNORECASE)
+_GROUP_CONCAT_RE = re.compile(
+    r"^\s*(DISTINCT\s+)?(.*?)(?:\s+ORDER\s+BY\s+(.*?))?(?:\s+SEPARATOR\s+('(?:[^']|'')*'))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# MySQL DATE_FORMAT specifiers -> to_char patterns
+_TO_CHAR_MAP = {
+    "%Y": "YYYY", "%y": "YY", "%m": "MM", "%c": "FMMM", "%d": "DD", "%e": "FMDD", "%H": "HH24",
+    "%h": "HH12", "%i": "MI", "%s": "SS", "%S": "SS", "%p": "AM", "%M": "FMMonth", "%b": "Mon",
+    "%W": "FMDay", "%a": "Dy", "%j": "DDD", "%T": "HH24:MI:SS",
+}
+
+
+def _blank(statement: str) -> str:
+    """
+    The statement with string literal contents and comments replaced by
+    spaces, same length, so structure can be scanned without being fooled
+    by quotes, parentheses or keywords inside them.
+    """
+    out, i, n = list(statement), 0, len(statement)
+    while i < n:
+        if statement.startswith("--", i):
+            end = statement.find("\n", i)
+            end = n if end < 0 else end
+            out[i:end] = " " * (end - i)
+            i = end
+        elif statement.startswith("/*", i):
+            end = statement.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            out[i:end] = " " * (end - i)
+            i = end
+        elif statement[i] == "'":
+            j = i + 1
+            while j < n:
+                if statement[j] == "'":
+                    if statement.startswith("''", j):
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out[i + 1:j] = " " * (j - i - 1)
+            i = j + 1
+        else:
+            i += 1
+    return "".join(out)
+
+
+def _closing_paren(code: str, open_index: int) -> int:
+    depth = 0
+    for i in range(open_index, len(code)):
+        if code[i] == "(":
+            depth += 1
+        elif code[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _split_top_level(statement: str, code: str) -> list[str]:
+    """Split on commas outside parentheses, quotes and comments."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(code):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(statement[start:i])
+            start = i + 1
+    parts.append(statement[start:])
+    return parts
+
+
+def _to_char_format(literal: str) -> Optional[str]:
+    """'%Y-%m-%d' -> 'YYYY-MM-DD'; literal letters are double-quoted so to_char keeps them."""
+    if len(literal) < 2 or literal[0] != "'" or literal[-1] != "'":
+        return None
+    fmt, out, i = literal[1:-1].replace("''", "'"), [], 0
+    while i < len(fmt):
+        token = fmt[i:i + 2]
+        if token in _TO_CHAR_MAP:
+            out.append(_TO_CHAR_MAP[token])
+            i += 2
+        elif token == "%%":
+            out.append("%")
+            i += 2
+        elif fmt[i].isalpha():
+            end = i
+            while end < len(fmt) and fmt[end].isalpha():
+                end += 1
+            out.append(f'"{fmt[i:end]}"')
+            i = end
+        else:
+            out.append(fmt[i])
+            i += 1
+    return "'" + "".join(out).replace("'", "''") + "'"
+
+
+def _as_text(expr: str) -> str:
+    is_literal = expr.startswith("'") and expr.endswith("'") and "'" not in _blank(expr)[1:-1]
+    return expr if is_literal else f"CAST({expr} AS TEXT)"
+
+
+def _translate_call(name: str, inner: str) -> Optional[str]:
+    name = name.upper()
+    if name == "CONCAT":
+        args = _split_top_level(inner, _blank(inner))
+        return "(" + " || ".join(_as_text(arg.strip()) for arg in args) + ")"
+    if name == "DATE_FORMAT":
+        args = _split_top_level(inner, _blank(inner))
+        pattern = _to_char_format(args[1].strip()) if len(args) == 2 else None
+        return None if pattern is None else f"to_char({args[0].strip()}, {pattern})"
+    distinct, expr, order_by, separator = _GROUP_CONCAT_RE.match(inner).groups()
+    order = f" ORDER BY {order_by}" if order_by else ""
+    return f"string_agg({distinct or ''}{_as_text(expr)}, {separator or DEFAULT_SEPARATOR}{order})"
+
+
+def _translate_functions(statement: str) -> str:
+    position = 0
+    while True:
+        code = _blank(statement)
+        match = _CALL_RE.search(code, position)
+        if match is None:
+            return statement
+        close = _closing_paren(code, match.end() - 1)
+        inner = _translate_functions(statement[match.end():close])
+        replacement = _translate_call(match.group(1), inner)
+        if replacement is None:  # Left as written (e.g. a DATE_FORMAT with a bound format)
+            replacement = statement[match.start():match.end()] + inner + ")"
+        statement = statement[:match.start()] + replacement + statement[close + 1:]
+        position = match.start() + len(replacement)
+
+
+def _order_item(item: str) -> str:
+    body = item.rstrip()
+    if not body.strip() or _NULLS_RE.search(body):
+        return item
+    trailing = item[len(body):]
+    direction = _DIRECTION_RE.search(body)
+    nulls = "NULLS LAST" if direction and direction.group(1).upper() == "DESC" else "NULLS FIRST"
+    return f"{body} {nulls}{trailing}"
+
+
+def _mysql_null_order(statement: str) -> str:
+    """Give every ORDER BY item MySQL's NULL placement."""
+    code = _blank(statement)
+    clauses = []
+    for match in _ORDER_BY_RE.finditer(code):
+        depth, end = 0, len(code)
+        for i in range(match.end(), len(code)):
+            char = code[i]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    end = i
+                    break
+                depth -= 1
+            elif char == ";" and depth == 0:
+                end = i
+                break
+            elif depth == 0 and char.isalpha() and not (code[i - 1].isalnum() or code[i - 1] == "_"):
+                if _CLAUSE_END_RE.match(code, i):
+                    end = i
+                    break
+        clauses.append((match.end(), end))
+    for start, end in reversed(clauses):
+        items = _split_top_level(statement[start:end], code[start:end])
+        statement = statement[:start] + ",".join(_order_item(item) for item in items) + statement[end:]
+    return statement
+
+
+@lru_cache(maxsize=2048)
+def translate_mysql_sql(statement: str) -> str:
+    """Rewrite the MySQL-isms the app uses into PostgreSQL (see module docstring)."""
+    if _CALL_RE.search(statement):
+        statement = _translate_functions(statement)
+    if _ORDER_BY_RE.search(statement):
+        statement = _mysql_null_order(statement)
+    return statement
+
+
+def install_postgres_shims(engine: AsyncEngine) -> None:
+    """Translate every statement on this engine before it is prepared."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute", retval=True)
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        return translate_mysql_sql(statement), parameters
+
+
+def is_server_timeout(error: BaseException) -> bool:
+    """A statement cancelled by statement_timeout."""
+    orig = getattr(error, "orig", None)
+    return PG_QUERY_CANCELED in (getattr(orig, "sqlstate", None), getattr(orig, "pgcode", None))
+
+
+async def postgres_replica_lag(conn) -> Optional[float]:
+    """Seconds since the last replayed transaction, or None when this node is not replaying."""
+    row = (await conn.execute(text(
+        "SELECT pg_is_in_recovery() AS replica, "
+        "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS lag"
+    ))).first()
+    if row is None or not row[0]:
+        return None
+    # No transaction replayed yet (idle primary since start) reads as in sync
+    return 0.0 if row[1] is None else max(0.0, float(row[1]))
+
+
+def _section_json(name: str, spec: dict) -> str:
+    sort = spec["sort"]
+    order = ""
+    if sort:
+        nulls = "NULLS LAST" if sort[1] == "DESC" else "NULLS FIRST"
+        order = f" ORDER BY {sort[0]} {sort[1]} {nulls}"
+    agg_order = f" ORDER BY s.{sort[0]} {sort[1]} {nulls}" if sort else ""
+    return (
+        f"(SELECT COALESCE(json_agg(s{agg_order}), '[]'::json) FROM ("
+        f"SELECT * FROM {spec['table']} WHERE query_id IN (SELECT query_id FROM user_queries)"
+        f"{order} LIMIT {spec['limit']}) s) AS {name}"
+    )
+
+
+def build_context_json_query() -> str:
+    """
+    One statement for a customer's whole context: the profile (latest
+    query_masters row), the assigned agent and every CONTEXT_SECTIONS
+    section, each as a JSON column. Binds :m_wild.
+    """
+    sections = ",\n  ".join(_section_json(name, spec) for name, spec in CONTEXT_SECTIONS.items())
+    return (
+        f"WITH user_queries AS ({USER_QUERY_IDS_SQL}),\n"
+        "profile AS (SELECT * FROM query_masters WHERE user_mobile LIKE :m_wild "
+        "ORDER BY created_at DESC NULLS LAST LIMIT 1)\n"
+        "SELECT\n"
+        "  (SELECT row_to_json(p) FROM profile p) AS profile,\n"
+        "  (SELECT row_to_json(a) FROM master_admins a WHERE a.m_code = (SELECT admin_ref FROM profile) LIMIT 1)"
+        " AS agent_info,\n"
+        f"  {sections}"
+    )
+
+
+CONTEXT_JSON_SQL = build_context_json_query()
+
+def decode_context_row(row: dict) -> dict:
+    """
+    The CONTEXT_JSON_SQL row as fetch_universal_context's dict. Numbers with
+    a fraction come back as Decimal like the DECIMAL columns of the row
+    path; timestamps are ISO strings, as response_formatter renders them.
+    """
+    decoded = {
+        name: json.loads(value, parse_float=Decimal) if isinstance(value, (str, bytes)) else value
+        for name, value in row.items()
+    }
+    return {
+        "profile": decoded.get("profile") or {},
+        **{name: decoded.get(name) or [] for name in CONTEXT_SECTIONS},
+        "agent_info": decoded.get("agent_info") or {},
+    }
@@ -0,0 +1,228 @@
+"""
+Read-replica routing: spread read-only queries over weighted replicas, within a lag bound per pool class.
+
+DB_REPLICAS lists the replicas as comma-separated "host[:port][=weight]"
+entries (with DB_BACKEND=standin, SQLite file paths), sharing the primary's
+credentials and database name. Everything this service runs is a read, so
+any query may go to a replica:
+
+- a background task probes every replica each DB_REPLICA_PROBE_INTERVAL_S
+  for its replication lag (SHOW REPLICA STATUS on MySQL, the replay
+  timestamp on PostgreSQL);
+- a query picks among replicas whose last probe is fresh and whose lag is
+  within its pool's bound (interactive reads must be near-current, analytics
+  can be a minute behind), weighted by DB_REPLICAS weight;
+- when none qualifies it runs on the primary;
+- a replica that fails DB_REPLICA_EJECT_AFTER_FAILURES connects or probes in
+  a row is out of rotation for DB_REPLICA_EJECT_SECONDS, and a query whose
+  replica fails to connect is retried once on the primary.
+
+Until the first probe finishes every query runs on the primary.
+"""
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import random
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.config import get_settings
+from app.db.pools import POOL_MAINTENANCE, pool_config
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+# A lag reading older than this many probe intervals no longer qualifies a replica
+STALE_PROBES = 3
+
+
+class Replica:
+    """One replica endpoint with its routing weight and last observed health."""
+
+    def __init__(self, name: str, target: str, weight: float = 1.0):
+        self.name = name
+        self.target = target
+        self.weight = weight
+        self.lag_s: Optional[float] = None
+        self.probed_at = 0.0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.stats = {"routed": 0, "failures": 0, "ejections": 0}
+
+    def host_port(self, default_port: int) -> tuple[str, int]:
+        host, _, port = self.target.partition(":")
+        return host, int(port) if port else default_port
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "target": self.target,
+            "weight": self.weight,
+            "lag_s": self.lag_s,
+            "probe_age_s": round(now - self.probed_at, 1) if self.probed_at else None,
+            "ejected_for_s": round(self.ejected_until - now, 1) if self.ejected_until > now else 0,
+            **self.stats,
+        }
+
+
+def parse_replicas(spec: str) -> list[Replica]:
+    """Parse DB_REPLICAS ("db-r1:3306=2,db-r2") into named replicas (replica1, replica2, ...)."""
+    replicas = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        target, weight = entry, 1.0
+        if "=" in entry:
+            target, _, raw = entry.rpartition("=")
+            weight = float(raw)
+        if not target or weight <= 0:
+            raise ValueError(f"Invalid DB_REPLICAS entry: {entry!r}")
+        replicas.append(Replica(f"replica{len(replicas) + 1}", target, weight))
+    return replicas
+
+
+async def mysql_replica_lag(conn) -> Optional[float]:
+    """Seconds behind the source, or None when replication is not running."""
+    for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                              ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+        try:
+            result = await conn.execute(text(statement))
+        except DBAPIError:
+            continue  # Pre-8.0.22 servers only know the old spelling
+        row = result.mappings().first()
+        if row is None or row.get(column) is None:
+            return None
+        return float(row[column])
+    raise RuntimeError("replica status is not readable (needs REPLICATION CLIENT)")
+
+
+class ReplicaRouter:
+    """Chooses the node for each query and keeps replica lag and health current."""
+
+    def __init__(self, replicas: list[Replica], probe_interval: float, eject_after: int, eject_seconds: float,
+                 lag_probe: Callable[..., Awaitable[Optional[float]]] = mysql_replica_lag,
+                 rng: Optional[random.Random] = None):
+        self.replicas = replicas
+        self.probe_interval = probe_interval
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.lag_probe = lag_probe
+        self._rng = rng or random.Random()
+        self._task: Optional[asyncio.Task] = None
+
+    def choose(self, pool: str) -> Optional[Replica]:
+        """A replica for a query of this pool class, or None for the primary."""
+        max_lag = pool_config(pool)["max_lag"]
+        now = time.monotonic()
+        fresh_after = now - STALE_PROBES * self.probe_interval
+        candidates = [
+            replica for replica in self.replicas
+            if replica.ejected_until <= now and replica.lag_s is not None
+            and replica.lag_s <= max_lag and replica.probed_at >= fresh_after
+        ]
+        if not candidates:
+            return None
+        replica = self._rng.choices(candidates, weights=[r.weight for r in candidates])[0]
+        replica.stats["routed"] += 1
+        return replica
+
+    def report_success(self, replica: Replica) -> None:
+        replica.failures = 0
+
+    def report_failure(self, replica: Replica, error: BaseException) -> None:
+        """Count a failed connect or probe; enough in a row takes the replica out of rotation."""
+        replica.failures += 1
+        replica.stats["failures"] += 1
+        if replica.failures >= self.eject_after:
+            replica.failures = 0
+            replica.ejected_until = time.monotonic() + self.eject_seconds
+            replica.stats["ejections"] += 1
+            logger.warning("Replica %s (%s) out of rotation for %gs: %s",
+                           replica.name, replica.target, self.eject_seconds, error)
+
+    async def probe(self, replica: Replica) -> None:
+        """Measure one replica's lag over its maintenance connection."""
+        from app.db.database import get_engine
+        try:
+            async with get_engine(POOL_MAINTENANCE, replica).connect() as conn:
+                lag = await asyncio.wait_for(self.lag_probe(conn), self.probe_interval)
+        except Exception as e:
+            replica.lag_s = None
+            self.report_failure(replica, e)
+            return
+        replica.lag_s = lag
+        replica.probed_at = time.monotonic()
+        self.report_success(replica)
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self.probe(replica) for replica in self.replicas))
+
+    def start(self) -> None:
+        """Start probing on the running loop (call from a coroutine)."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.probe_interval)
+
+    def status(self) -> list[dict]:
+        return [replica.status() for replica in self.replicas]
+
+
+_router: Optional[ReplicaRouter] = None
+
+
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """The process-wide router, or None when DB_REPLICAS is empty (everything on the primary)."""
+    global _router
+    if _router is None:
+        settings = get_settings()
+        replicas = parse_replicas(settings.DB_REPLICAS)
+        if not replicas:
+            return None
+        lag_probe = mysql_replica_lag
+        if settings.DB_BACKEND == "standin":
+            from app.db.standin import standin_replica_lag
+            lag_probe = standin_replica_lag
+        elif settings.DB_BACKEND == "postgresql":
+            from app.db.postgres import postgres_replica_lag
+            lag_probe = postgres_replica_lag
+        _router = ReplicaRouter(
+            replicas, settings.DB_REPLICA_PROBE_INTERVAL_S, settings.DB_REPLICA_EJECT_AFTER_FAILURES,
+            settings.DB_REPLICA_EJECT_SECONDS, lag_probe,
+        )
+    return _router
+
+
+def set_replica_router(router: Optional[ReplicaRouter]) -> None:
+    """Replace the process-wide router (tests, benchmarks)."""
+    global _router
+    _router = router
+
+
+async def start_replica_router() -> Optional[ReplicaRouter]:
+    """Probe once, then keep probing in the background (called on startup)."""
+    router = get_replica_router()
+    if router is not None and router._task is None:
+        await router.probe_all()
+        router.start()
+        logger.info("Routing reads over %d replicas: %s", len(router.replicas),
+                    ", ".join(f"{r.name}={r.target}" for r in router.replicas))
+    return router
+
+
+async def stop_replica_router() -> None:
+    """Stop probing (called on shutdown)."""
+    if _router is not None:
+        await _router.stop()
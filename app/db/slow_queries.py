@@ -0,0 +1,97 @@
+"""
+Slow-statement log: statements over SLOW_QUERY_MS are logged and aggregated by fingerprint.
+
+A fingerprint is the statement with literals, bind parameters and IN lists
+replaced by placeholders, so `... IN ('1','2')` and `... IN ('7')` from two
+users count as one statement. GET /debug/slow-queries lists the aggregates by
+total time; `python -m app.db.index_advisor` explains where the time goes.
+"""
+from functools import lru_cache
+from typing import Optional
+import hashlib
+import logging
+import re
+import time
+
+from app.config import get_settings
+
+logger = logging.getLogger("app.db.slow")
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"(?<!:):\w+")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalize a statement: no comments/literals/params, collapsed IN lists and whitespace."""
+    normalized = _COMMENT_RE.sub(" ", statement)
+    normalized = _STRING_RE.sub("?", normalized)
+    normalized = _PARAM_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (?+)", normalized)
+    normalized = _SPACE_RE.sub(" ", normalized).strip()
+    return normalized
+
+
+def fingerprint_id(statement: str) -> str:
+    """Short stable id for a statement's fingerprint."""
+    return hashlib.sha1(fingerprint(statement).encode("utf-8")).hexdigest()[:12]
+
+
+class SlowQueryLog:
+    """Per-fingerprint aggregates of statements slower than the threshold."""
+
+    def __init__(self, threshold_ms: float, critical_ms: float, max_fingerprints: int = 500):
+        self.threshold_ms = threshold_ms
+        self.critical_ms = critical_ms
+        self.max_fingerprints = max_fingerprints
+        self._entries: dict[str, dict] = {}
+
+    def record(self, statement: str, duration_ms: float, rows: Optional[int], table: str = "") -> None:
+        """Log and aggregate one execution at or above threshold_ms."""
+        fp = fingerprint(statement)
+        fp_id = fingerprint_id(statement)
+        level = logging.ERROR if duration_ms >= self.critical_ms else logging.WARNING
+        logger.log(level, "Slow statement %s %.1f ms rows=%s table=%s: %s", fp_id, duration_ms, rows, table, fp[:300])
+
+        entry = self._entries.get(fp_id)
+        if entry is None:
+            if len(self._entries) >= self.max_fingerprints:
+                return
+            entry = self._entries[fp_id] = {
+                "fingerprint": fp, "table": table, "count": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "rows_max": 0, "last_seen": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["rows_max"] = max(entry["rows_max"], rows or 0)
+        entry["last_seen"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def report(self, limit: int = 50) -> list[dict]:
+        """Aggregates sorted by total time spent."""
+        entries = [
+            {"id": fp_id, **entry, "total_ms": round(entry["total_ms"], 1), "max_ms": round(entry["max_ms"], 1),
+             "mean_ms": round(entry["total_ms"] / entry["count"], 1)}
+            for fp_id, entry in self._entries.items()
+        ]
+        return sorted(entries, key=lambda e: e["total_ms"], reverse=True)[:limit]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_slow_log: Optional[SlowQueryLog] = None
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Get the process-wide slow-statement log."""
+    global _slow_log
+    if _slow_log is None:
+        settings = get_settings()
+        _slow_log = SlowQueryLog(settings.SLOW_QUERY_MS, settings.SLOW_QUERY_CRITICAL_MS)
+    return _slow_log
@@ -0,0 +1,287 @@
+"""
+Stand-in database backend: a local SQLite (aiosqlite) copy of the CRM schema
+built from db_schema_and_samples.json, so the real context fetches and
+SQL_TEMPLATES can run offline at full speed for benchmarks and load tests.
+
+Enabled with DB_BACKEND=standin. The file is rebuilt when the engine is created.
+MySQL-isms used by the app are handled by small dialect shims:
+GROUP_CONCAT(... SEPARATOR 'x') is rewritten before execution, and
+CONCAT / DATE_FORMAT / NOW are registered as SQLite functions.
+"""
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from datetime import datetime, date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional
+import json
+import logging
+import re
+import sqlite3
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_PATH = Path(__file__).resolve().parents[2] / "db_schema_and_samples.json"
+DEFAULT_DB_PATH = Path(tempfile.gettempdir()) / "flyshop_standin.db"
+
+# Indexes the production read paths rely on: user lookups, per-query child rows
+# in section order (keyset pages seek on (query_id, sort, id)) and agent lookups.
+STANDIN_INDEXES: list[tuple[str, tuple[str, ...]]] = [
+    ("query_masters", ("user_mobile", "created_at")),
+    ("query_masters", ("query_id",)),
+    ("query_masters", ("created_at",)),
+    ("query_masters", ("admin_ref",)),
+    ("query_masters", ("query_stage",)),
+    ("master_admins", ("m_code",)),
+    ("query_flight_manages", ("query_id", "departure_datetime", "id")),
+    ("query_flight_manages", ("departure_datetime",)),
+    ("query_payments", ("query_id", "id")),
+    ("query_quotations", ("query_id", "sent_at", "id")),
+    ("query_quotations", ("query_id", "quotation_id")),
+    ("query_activities", ("query_id", "date", "id")),
+    ("query_activities", ("date",)),
+    ("query_payment_schedulers", ("query_id", "payment_date", "id")),
+    ("query_activity_markups", ("query_id", "id")),
+]
+
+_SEPARATOR_RE = re.compile(r"\s+SEPARATOR\s+('(?:[^']|'')*')", re.IGNORECASE)
+# SELECT GROUP_CONCAT(DISTINCT x SEPARATOR s) [AS alias] FROM ... as the whole select list
+_DISTINCT_SELECT_RE = re.compile(
+    r"SELECT\s+GROUP_CONCAT\(\s*DISTINCT\s+(.+?)\s+SEPARATOR\s+('(?:[^']|'')*')\s*\)(\s+AS\s+\w+)?\s+FROM\s",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# MySQL DATE_FORMAT specifiers -> strftime
+_DATE_FORMAT_MAP = {
+    "%Y": "%Y", "%y": "%y", "%m": "%m", "%d": "%d", "%H": "%H", "%h": "%I",
+    "%i": "%M", "%s": "%S", "%S": "%S", "%p": "%p", "%M": "%B", "%b": "%b",
+    "%W": "%A", "%a": "%a", "%j": "%j", "%T": "%H:%M:%S", "%%": "%%",
+}
+
+
+def load_schema(path: Optional[Path] = None) -> dict:
+    """Load the table definitions (columns, total_rows, sample_rows), without _meta."""
+    with open(path or DEFAULT_SCHEMA_PATH, encoding="utf-8") as f:
+        schema = json.load(f)
+    return {table: spec for table, spec in schema.items() if not table.startswith("_")}
+
+
+def column_affinity(column: str, values: Iterable[Any]) -> str:
+    """
+    Pick a SQLite column type that compares like the MySQL column does.
+    Key columns are NUMERIC so '460102' and 460102 match as they do in MySQL
+    (the context query quotes query_ids); non-numeric text in them stays text.
+    """
+    non_null = [value for value in values if value is not None]
+    if column == "id" or column.endswith("_id"):
+        return "NUMERIC"
+    if any(isinstance(value, str) for value in non_null):
+        return "TEXT"
+    if non_null:
+        return "NUMERIC"
+    return ""
+
+
+def create_table_sql(table: str, spec: dict) -> str:
+    """CREATE TABLE for one schema entry; `id` becomes the rowid primary key."""
+    definitions = []
+    for column in spec["columns"]:
+        if column == "id":
+            definitions.append("id INTEGER PRIMARY KEY")
+            continue
+        affinity = column_affinity(column, (row.get(column) for row in spec["sample_rows"]))
+        definitions.append(f"{column} {affinity}".strip())
+    return f"CREATE TABLE {table} ({', '.join(definitions)})"
+
+
+def create_index_sql(table: str, columns: tuple[str, ...]) -> str:
+    """CREATE INDEX statement with a stable name."""
+    return f"CREATE INDEX IF NOT EXISTS ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+def create_standin_tables(conn: sqlite3.Connection, schema: dict) -> None:
+    """Create every table of the schema (no indexes, so bulk loads stay fast)."""
+    for table, spec in schema.items():
+        conn.execute(create_table_sql(table, spec))
+
+
+def create_standin_indexes(conn: sqlite3.Connection, schema: dict) -> None:
+    """Create the production read-path indexes and refresh planner statistics."""
+    for table, columns in STANDIN_INDEXES:
+        if table in schema and all(column in schema[table]["columns"] for column in columns):
+            conn.execute(create_index_sql(table, columns))
+    conn.execute("ANALYZE")
+
+
+def insert_rows(conn: sqlite3.Connection, table: str, columns: list[str], rows: Iterable[tuple]) -> None:
+    """Bulk insert value tuples given in column order."""
+    placeholders = ", ".join("?" for _ in columns)
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def build_standin_database(db_path: Path, schema: Optional[dict] = None) -> Path:
+    """
+    (Re)create the stand-in database file with the schema's sample rows.
+
+    Args:
+        db_path: SQLite file to create (replaced if present)
+        schema: Table definitions from load_schema (defaults to the bundled JSON)
+
+    Returns:
+        The database path
+    """
+    schema = schema or load_schema()
+    db_path = Path(db_path)
+    db_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        create_standin_tables(conn, schema)
+        for table, spec in schema.items():
+            columns = spec["columns"]
+            insert_rows(conn, table, columns, (tuple(row.get(c) for c in columns) for row in spec["sample_rows"]))
+        create_standin_indexes(conn, schema)
+        conn.commit()
+    finally:
+        conn.close()
+
+    logger.info("Built stand-in database at %s (%d tables)", db_path, len(schema))
+    return db_path
+
+
+def _select_end(statement: str, start: int) -> int:
+    """Index of the ')' closing the SELECT that contains `start` (or the end of the statement)."""
+    depth, i = 0, start
+    while i < len(statement):
+        char = statement[i]
+        if char == "'":
+            i = statement.find("'", i + 1)
+            if i < 0:
+                break
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            if depth == 0:
+                return i
+            depth -= 1
+        elif char == ";" and depth == 0:
+            return i
+        i += 1
+    return len(statement)
+
+
+@lru_cache(maxsize=1024)
+def rewrite_mysql_sql(statement: str) -> str:
+    """Rewrite MySQL-only syntax into its SQLite equivalent."""
+    if "SEPARATOR" not in statement.upper():
+        return statement
+    # SQLite's DISTINCT aggregates take one argument: pick the distinct values in a
+    # subquery, then join them with the separator (values may contain it, so no REPLACE).
+    # Elsewhere GROUP_CONCAT(DISTINCT x, s) is left for SQLite to reject.
+    while match := _DISTINCT_SELECT_RE.search(statement):
+        end = _select_end(statement, match.end())
+        expression, separator, alias = match.group(1), match.group(2), match.group(3) or ""
+        statement = (
+            f"{statement[:match.start()]}SELECT GROUP_CONCAT(distinct_value, {separator}){alias} "
+            f"FROM (SELECT DISTINCT {expression} AS distinct_value FROM {statement[match.end():end]})"
+            f"{statement[end:]}"
+        )
+    return _SEPARATOR_RE.sub(r", \1", statement)
+
+
+def _concat(*args):
+    """MySQL CONCAT: NULL if any argument is NULL."""
+    if any(arg is None for arg in args):
+        return None
+    return "".join(str(arg) for arg in args)
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    """Parse a stored date/datetime value (ISO or dd-mm-YYYY as in query_activities)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    text = str(value)
+    for parse in (datetime.fromisoformat, lambda v: datetime.strptime(v, "%d-%m-%Y")):
+        try:
+            return parse(text)
+        except ValueError:
+            continue
+    return None
+
+
+def _date_format(value, fmt):
+    """MySQL DATE_FORMAT on top of strftime."""
+    parsed = _parse_datetime(value)
+    if parsed is None or fmt is None:
+        return None
+    result, i = [], 0
+    while i < len(fmt):
+        token = fmt[i:i + 2]
+        if token in _DATE_FORMAT_MAP:
+            result.append(parsed.strftime(_DATE_FORMAT_MAP[token]))
+            i += 2
+        elif token == "%e":
+            result.append(str(parsed.day))
+            i += 2
+        elif token == "%c":
+            result.append(str(parsed.month))
+            i += 2
+        else:
+            result.append(fmt[i])
+            i += 1
+    return "".join(result)
+
+
+def register_mysql_functions(dbapi_connection) -> None:
+    """Register the MySQL scalar functions the app's SQL uses."""
+    dbapi_connection.create_function("CONCAT", -1, _concat, deterministic=True)
+    dbapi_connection.create_function("DATE_FORMAT", 2, _date_format, deterministic=True)
+    dbapi_connection.create_function("NOW", 0, lambda: datetime.now().isoformat(sep=" ", timespec="seconds"))
+    dbapi_connection.create_function("CURDATE", 0, lambda: date.today().isoformat())
+
+
+def install_mysql_shims(engine: AsyncEngine) -> None:
+    """Attach the function registrations and the statement rewrite to an engine."""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        register_mysql_functions(dbapi_connection)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute", retval=True)
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        return rewrite_mysql_sql(statement), parameters
+
+
+def create_standin_engine(db_path: Optional[str] = None, rebuild: bool = True) -> AsyncEngine:
+    """
+    Create an aiosqlite engine over the stand-in database.
+
+    Args:
+        db_path: SQLite file (defaults to a file in the temp directory)
+        rebuild: Rebuild the file from db_schema_and_samples.json first
+    """
+    path = Path(db_path) if db_path else DEFAULT_DB_PATH
+    if rebuild or not path.exists():
+        build_standin_database(path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", echo=False)
+    install_mysql_shims(engine)
+    return engine
+
+
+async def standin_replica_lag(conn) -> Optional[float]:
+    """
+    Replication lag of a stand-in replica file (see app.db.replicas).
+
+    A copy has no replication, so it reports no lag unless it contains a
+    one-row `replica_status (lag_seconds)` table, which tests and load runs
+    update to simulate a replica falling behind (NULL: replication stopped).
+    """
+    found = await conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'replica_status'"))
+    if found.first() is None:
+        return 0.0
+    row = (await conn.execute(text("SELECT lag_seconds FROM replica_status"))).first()
+    return None if row is None or row[0] is None else float(row[0])
@@ -2,27 +2,33 @@
 FlyShop AI ChatBot - MVP Query API
 FastAPI application entry point with CORS, logging, and route registration.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 import logging
-import sys
 import os
 
 from app.api.query import router as query_router
 from app.api.debug import router as debug_router
+from app.api.export import router as export_router
+from app.api.metrics import router as metrics_router
 from app.config import get_settings
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from app.core.http_cache import CachedStaticFiles, static_asset_response, HTML_CACHE_CONTROL
+from app.core.replay import close_replay_journal
+from app.core.tracing import TracingMiddleware, shutdown_tracing
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.request_journal import JournalMiddleware, shutdown_request_journal
+from app.core.loop_monitor import start_loop_monitor, stop_loop_monitor
+from app.core.offload import shutdown_offload
+from app.core.memory import start_tracing
+from app.core.logs import configure_logging
+from app.db.database import dispose_engines
+from app.db.replicas import start_replica_router, stop_replica_router
+from app.db.liveness import start_pool_keeper, stop_pool_keeper
+
+# Configure logging (queued: records are written by a background thread)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -63,39 +69,63 @@ app.add_middleware(
     trusted_hosts="*"
 )
 
+# Request metrics and tracing - outermost, so they cover the whole request.
+# Profiling sits inside tracing so a profile is keyed by the request's trace id;
+# the request journal sits innermost so it sees the finished trace and labels.
+app.add_middleware(JournalMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 
-# Mount static files
+# Mount static files (served from memory with strong ETags and gzip variants)
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
 if os.path.exists(static_dir):
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    app.mount("/static", CachedStaticFiles(directory=static_dir), name="static")
 
 # Register routers
 app.include_router(query_router, tags=["Query"])
 app.include_router(debug_router, tags=["Debug"])
+app.include_router(export_router, tags=["Export"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup."""
     logger.info("FlyShop AI ChatBot starting up...")
-    logger.info(f"Log level: {settings.LOG_LEVEL}")
-    logger.info(f"Max query limit: {settings.MAX_LIMIT}")
+    logger.info("Log level: %s", settings.LOG_LEVEL)
+    logger.info("Max query limit: %s", settings.MAX_LIMIT)
+    await start_loop_monitor()
+    await start_replica_router()
+    await start_pool_keeper()
+    if start_tracing():
+        logger.info("tracemalloc is tracing allocations")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run on application shutdown."""
     logger.info("FlyShop AI ChatBot shutting down...")
+    close_replay_journal()
+    shutdown_tracing()
+    shutdown_request_journal()
+    await stop_loop_monitor()
+    shutdown_offload()
+    await stop_replica_router()
+    await stop_pool_keeper()
+    await dispose_engines()
 
 
 # Chat UI route
 @app.get("/chat")
-async def chat_ui():
+async def chat_ui(request: Request):
     """Serve the chat UI."""
     html_path = os.path.join(static_dir, "index.html")
-    if os.path.exists(html_path):
-        return FileResponse(html_path)
-    return {"error": "Chat UI not found"}
+    try:
+        return static_asset_response(request, html_path, endpoint="/chat", cache_control=HTML_CACHE_CONTROL)
+    except FileNotFoundError:
+        return {"error": "Chat UI not found"}
 
 
 # Root endpoint
@@ -112,6 +142,8 @@ async def root():
             "query": "POST /mvp/query",
             "chat_ui": "GET /chat",
             "health": "GET /health",
+            "ready": "GET /ready",
+            "metrics": "GET /metrics",
             "intents": "GET /intents"
         }
     }
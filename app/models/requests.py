@@ -5,6 +5,8 @@ from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 import re
 
+from app.config import get_settings
+
 
 class QueryRequest(BaseModel):
     """Request model for POST /mvp/query endpoint."""
@@ -40,7 +42,13 @@ class QueryRequest(BaseModel):
     offset: int = Field(
         default=0,
         ge=0,
-        description="Offset for pagination"
+        le=get_settings().MAX_OFFSET,
+        description="Offset for pagination of list answers (fallback; prefer cursor for deep pages)"
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        max_length=512,
+        description="metadata.next_cursor of the previous list page, to fetch the next one"
     )
     mode: str = Field(
         default="user",
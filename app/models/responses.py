@@ -22,6 +22,7 @@ class QueryMetadata(BaseModel):
     """Metadata about the query result."""
     rows: int = Field(description="Number of rows returned")
     sql: Optional[str] = Field(default=None, description="Sanitized query shape (placeholders shown)")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor for the next page of a list answer, if any")
 
 
 class QueryResponse(BaseModel):
@@ -32,6 +33,9 @@ class QueryResponse(BaseModel):
     data: Optional[Union[list[dict[str, Any]], dict[str, Any]]] = Field(default=None, description="Query result data")
     summary: Optional[str] = Field(default=None, description="Human-friendly summary")
     metadata: Optional[QueryMetadata] = Field(default=None, description="Query metadata")
+    degraded: Optional[str] = Field(
+        default=None, description="Set when answered without a live DB read: 'cached' (last context served) or 'llm_only'"
+    )
 
 
 class ErrorResponse(BaseModel):
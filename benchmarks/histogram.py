@@ -0,0 +1,111 @@
+"""
+Latency histogram with the HdrHistogram bucket layout and .hgrm output.
+
+Values are recorded as integer microseconds into log-linear buckets with
+2048 sub-buckets per power of two, so every value is kept to within ~0.1%
+(3 significant digits) in constant memory. percentile_distribution() writes
+the HdrHistogram text format, which the standard HdrHistogram plotters read.
+"""
+from typing import Iterable, Optional
+import math
+
+SUB_BUCKET_BITS = 11  # 2048 sub-buckets: 3 significant decimal digits
+
+
+class LatencyHistogram:
+    """Sparse log-linear histogram of latencies (recorded in microseconds)."""
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+
+    @staticmethod
+    def _lowest_equivalent(value: int) -> int:
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (value >> shift) << shift
+
+    @staticmethod
+    def _highest_equivalent(lowest: int) -> int:
+        shift = max(0, lowest.bit_length() - SUB_BUCKET_BITS)
+        return lowest + (1 << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        """Record one latency given in seconds."""
+        value = max(0, int(round(seconds * 1_000_000)))
+        key = self._lowest_equivalent(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = max(self.max_us, value)
+        self._sum += value
+        self._sum_squares += value * value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's counts into this one."""
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+        self._sum += other._sum
+        self._sum_squares += other._sum_squares
+
+    def percentile_us(self, percentile: float) -> int:
+        """Value (microseconds) at or below which `percentile` % of samples fall."""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(round(percentile / 100 * self.total, 6)))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                return min(self._highest_equivalent(key), self.max_us)
+        return self.max_us
+
+    def mean_us(self) -> float:
+        return self._sum / self.total if self.total else 0.0
+
+    def stddev_us(self) -> float:
+        if not self.total:
+            return 0.0
+        mean = self.mean_us()
+        return math.sqrt(max(0.0, self._sum_squares / self.total - mean * mean))
+
+    def summary_ms(self, percentiles: Iterable[float] = (50, 95, 99, 99.9)) -> dict:
+        """Count, mean, max and percentiles in milliseconds."""
+        result = {"count": self.total, "mean_ms": round(self.mean_us() / 1000, 3), "max_ms": round(self.max_us / 1000, 3)}
+        for p in percentiles:
+            label = f"p{p:g}".replace(".", "")
+            result[f"{label}_ms"] = round(self.percentile_us(p) / 1000, 3)
+        return result
+
+    def percentile_distribution(self, ticks_per_half_distance: int = 5, unit_scale: float = 1000.0) -> str:
+        """
+        HdrHistogram percentile distribution text (.hgrm), values in milliseconds by default.
+        """
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        if self.total:
+            next_percentile = 0.0
+            seen = 0
+            for key in sorted(self.counts):
+                seen += self.counts[key]
+                value = min(self._highest_equivalent(key), self.max_us) / unit_scale
+                while next_percentile < 100 and seen / self.total * 100 >= next_percentile:
+                    fraction = next_percentile / 100
+                    lines.append(f"{value:12.3f} {fraction:14.12f} {seen:10d} {1 / (1 - fraction):14.2f}")
+                    half_distance = 2 ** (int(math.log2(100 / (100 - next_percentile))) + 1)
+                    next_percentile += 100 / (ticks_per_half_distance * half_distance)
+                    if seen == self.total:
+                        break  # Ticks approach 100% geometrically; the final line closes it
+            lines.append(f"{self.max_us / unit_scale:12.3f} {1.0:14.12f} {self.total:10d}")
+        lines.append(
+            f"#[Mean    = {self.mean_us() / unit_scale:12.3f}, StdDeviation   = {self.stddev_us() / unit_scale:12.3f}]"
+        )
+        lines.append(f"#[Max     = {self.max_us / unit_scale:12.3f}, Total count    = {self.total:12d}]")
+        lines.append(f"#[Buckets = {len(self.counts):12d}, SubBuckets     = {2 ** SUB_BUCKET_BITS:12d}]")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,132 @@
+"""
+Benchmark: page-N latency of LIMIT/OFFSET vs keyset pagination for list intents.
+
+Builds a synthetic query_masters table (default one million rows, most of them
+belonging to one heavy user) in a temporary SQLite file and runs the real
+LIST_QUERIES templates from app/core/sql_templates.py against it.
+
+Usage:
+    python -m benchmarks.keyset_pagination --rows 1000000 --page-size 50
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from app.core.sql_templates import SQL_TEMPLATES, render_keyset_query
+from app.core.pagination import encode_cursor, VALUE_BLOCK
+from app.models.responses import Intent
+
+HEAVY_MOBILE = "+919820301212"
+
+
+def build_table(conn: sqlite3.Connection, rows: int, heavy_share: float) -> None:
+    """Create and fill query_masters with the indexes the list templates need."""
+    conn.execute("""
+        CREATE TABLE query_masters (
+            id INTEGER PRIMARY KEY, query_id INTEGER, user_name TEXT, user_email TEXT,
+            user_mobile TEXT, destination_name TEXT, from_date TEXT, to_date TEXT,
+            adult INT, child INT, infant INT, query_stage INT, service_name TEXT,
+            priority TEXT, created_at TEXT
+        )
+    """)
+    rng = random.Random(42)
+    destinations = ["Dubai", "Manali", "Goa", "Bali", "Singapore", None]
+    base = time.mktime((2023, 1, 1, 0, 0, 0, 0, 0, -1))
+
+    def generate():
+        for i in range(1, rows + 1):
+            mobile = HEAVY_MOBILE if rng.random() < heavy_share else f"+91{rng.randrange(7000000000, 9999999999)}"
+            created = None if rng.random() < 0.02 else time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(base + rng.randrange(0, 3 * 365 * 86400))
+            )
+            yield (i, 100000 + i, "User", "user@example.com", mobile, rng.choice(destinations),
+                   None, None, 2, 0, 0, rng.randrange(1, 12), "Flight", None, created)
+
+    conn.executemany("INSERT INTO query_masters VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", generate())
+    conn.execute("CREATE INDEX idx_qm_mobile_created ON query_masters (user_mobile, created_at, query_id)")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def time_query(conn: sqlite3.Connection, sql: str, params: dict, repeat: int) -> tuple[float, int]:
+    """Median wall time (ms) and row count of a query."""
+    timings, count = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(conn.execute(sql, params).fetchall())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), count
+
+
+def run(rows: int, page_size: int, pages: list[int], heavy_share: float, repeat: int) -> dict:
+    template = SQL_TEMPLATES[Intent.LIST_QUERIES]
+    keyset = template["keyset"]
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        build_table(conn, rows, heavy_share)
+        build_seconds = time.perf_counter() - started
+        heavy_rows = conn.execute(
+            "SELECT COUNT(*) FROM query_masters WHERE user_mobile = ?", (HEAVY_MOBILE,)
+        ).fetchone()[0]
+
+        results = []
+        for page in pages:
+            offset = (page - 1) * page_size
+            if offset >= heavy_rows:
+                continue
+            offset_ms, offset_count = time_query(
+                conn, template["query"], {"mobile": HEAVY_MOBILE, "limit": page_size, "offset": offset}, repeat
+            )
+
+            # Cursor = last row of the previous page (found once, not timed)
+            cursor = None
+            if offset:
+                order = f"{keyset['sort_column']} DESC, {keyset['id_column']} DESC"
+                prev = conn.execute(
+                    f"SELECT qm.created_at, qm.query_id FROM query_masters qm WHERE qm.user_mobile = ? "
+                    f"ORDER BY {order} LIMIT 1 OFFSET ?", (HEAVY_MOBILE, offset - 1)
+                ).fetchone()
+                cursor = encode_cursor(VALUE_BLOCK, prev[0], prev[1])
+            sql, cursor_params, _ = render_keyset_query(template, cursor)
+            keyset_ms, keyset_count = time_query(
+                conn, sql, {"mobile": HEAVY_MOBILE, "limit": page_size, **cursor_params}, repeat
+            )
+            results.append({
+                "page": page,
+                "offset_ms": round(offset_ms, 3),
+                "keyset_ms": round(keyset_ms, 3),
+                "speedup": round(offset_ms / keyset_ms, 1) if keyset_ms else None,
+                "rows": [offset_count, keyset_count],
+            })
+        conn.close()
+
+    return {
+        "table_rows": rows,
+        "heavy_user_rows": heavy_rows,
+        "page_size": page_size,
+        "build_seconds": round(build_seconds, 1),
+        "pages": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=str, default="1,10,100,1000,5000")
+    parser.add_argument("--heavy-share", type=float, default=0.5, help="Fraction of rows owned by the heavy user")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = run(args.rows, args.page_size, [int(p) for p in args.pages.split(",")], args.heavy_share, args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Load generator: replays the test corpora against the API under concurrency.
+
+Corpora: tests/automated_test_cases.json, test_comprehensive.TEST_CASES and
+tests/test_real_data.ALL_TESTS. Queries are grouped into multi-turn
+conversations per mobile; each turn sends the conversation_context the chat UI
+would send (last 10 "role: content" lines, including the previous answers).
+A share of panel reads (GET /mvp/user-data) is mixed in.
+
+Workloads:
+    closed loop  --users N        N virtual users, each starts a new conversation when one ends
+    open loop    --rate R         conversations arrive as a Poisson process at R/s; first-turn
+                                  latency is measured from the scheduled arrival, so a slow
+                                  server cannot hide queueing (no coordinated omission)
+
+Reports throughput, p50/p95/p99/p99.9 and error rates overall, per endpoint and
+per intent (the corpus' expected intent), as JSON with stable keys, and writes
+HdrHistogram .hgrm files.
+
+Usage:
+    python -m benchmarks.load_generator --base-url http://127.0.0.1:8000 --users 20 --duration 60
+    python -m benchmarks.load_generator --in-process --rate 5 --duration 30 --out run.json --hgrm-dir hgrm/
+    python -m benchmarks.load_generator --in-process --users 10 --compare baseline.json
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.histogram import LatencyHistogram
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_MOBILE = "+919820301212"
+QUERY_ENDPOINT = "POST /mvp/query"
+PANEL_ENDPOINT = "GET /mvp/user-data"
+CONTEXT_MESSAGES = 10
+CONTEXT_MAX_CHARS = 2000
+
+
+@dataclass
+class Turn:
+    """One request of a conversation."""
+    query: str
+    intent: str
+    mobile: str
+
+
+@dataclass
+class Conversation:
+    """Sequence of turns sent one after another by the same user."""
+    mobile: str
+    turns: list[Turn]
+
+
+def load_corpus() -> list[Turn]:
+    """Collect the queries of the existing sequential test runners."""
+    turns = []
+    with open(REPO_ROOT / "tests" / "automated_test_cases.json", encoding="utf-8") as f:
+        for category in json.load(f):
+            for test in category["tests"]:
+                turns.append(Turn(test["input"], test.get("expected_intent") or "unknown", test["mobile"]))
+
+    sys.path.insert(0, str(REPO_ROOT))
+    try:
+        import test_comprehensive
+        from tests import test_real_data
+    finally:
+        sys.path.pop(0)
+    for case in test_comprehensive.TEST_CASES:
+        turns.append(Turn(case["query"], case.get("expected_intent") or "unknown", DEFAULT_MOBILE))
+    for case in test_real_data.ALL_TESTS:
+        turns.append(Turn(case["query"], case.get("expected_intent") or "unknown", case["mobile"]))
+    return turns
+
+
+def build_conversations(corpus: list[Turn], turns_per_conversation: int, seed: int) -> list[Conversation]:
+    """Group the corpus into multi-turn conversations per mobile, in a shuffled order."""
+    rng = random.Random(seed)
+    by_mobile: dict[str, list[Turn]] = {}
+    for turn in corpus:
+        by_mobile.setdefault(turn.mobile, []).append(turn)
+
+    conversations = []
+    for mobile, turns in by_mobile.items():
+        turns = list(turns)
+        rng.shuffle(turns)
+        for start in range(0, len(turns), turns_per_conversation):
+            conversations.append(Conversation(mobile, turns[start:start + turns_per_conversation]))
+    rng.shuffle(conversations)
+    return conversations
+
+
+def conversation_context(history: list[dict]) -> Optional[str]:
+    """The context string the chat UI sends: last 10 messages as 'role: content'."""
+    if not history:
+        return None
+    text = "\n".join(f"{m['role']}: {m['content']}" for m in history[-CONTEXT_MESSAGES:])
+    return text[-CONTEXT_MAX_CHARS:]
+
+
+@dataclass
+class Stats:
+    """Latency histogram and outcome counters for one endpoint or intent."""
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: int = 0
+    app_errors: int = 0
+
+    def report(self, elapsed: float) -> dict:
+        count = self.histogram.total
+        return {
+            **self.histogram.summary_ms(),
+            "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "app_errors": self.app_errors,
+        }
+
+
+class Recorder:
+    """Collects outcomes per endpoint and per intent."""
+
+    def __init__(self):
+        self.overall = Stats()
+        self.endpoints: dict[str, Stats] = {}
+        self.intents: dict[str, Stats] = {}
+
+    def record(self, endpoint: str, intent: Optional[str], latency: float, ok: bool, app_ok: bool) -> None:
+        targets = [self.overall, self.endpoints.setdefault(endpoint, Stats())]
+        if intent:
+            targets.append(self.intents.setdefault(intent, Stats()))
+        for stats in targets:
+            stats.histogram.record(latency)
+            stats.errors += 0 if ok else 1
+            stats.app_errors += 0 if app_ok else 1
+
+    def report(self, elapsed: float, meta: dict) -> dict:
+        return {
+            "meta": meta,
+            "overall": self.overall.report(elapsed),
+            "endpoints": {name: s.report(elapsed) for name, s in sorted(self.endpoints.items())},
+            "intents": {name: s.report(elapsed) for name, s in sorted(self.intents.items())},
+        }
+
+
+class LoadGenerator:
+    """Runs conversations against an httpx client and records the outcomes."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        conversations: list[Conversation],
+        panel_share: float = 0.2,
+        think_time: float = 0.0,
+        mode: str = "user",
+        seed: int = 42,
+    ):
+        self.client = client
+        self.conversations = conversations
+        self.panel_share = panel_share
+        self.think_time = think_time
+        self.mode = mode
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+        self.dropped = 0
+        self._next = 0
+
+    def next_conversation(self) -> Conversation:
+        conversation = self.conversations[self._next % len(self.conversations)]
+        self._next += 1
+        return conversation
+
+    async def _send(self, endpoint: str, intent: Optional[str], request, started: float) -> Optional[dict]:
+        try:
+            response = await request
+            body = response.json() if response.content else {}
+            ok = response.status_code < 400
+            app_ok = ok and not (isinstance(body, dict) and body.get("success") is False)
+        except (httpx.HTTPError, ValueError):
+            body, ok, app_ok = None, False, False
+        self.recorder.record(endpoint, intent, time.perf_counter() - started, ok, app_ok)
+        return body if ok else None
+
+    async def run_conversation(self, conversation: Conversation, scheduled: Optional[float] = None) -> None:
+        """Send every turn in order; `scheduled` backdates the first turn to its arrival time."""
+        history: list[dict] = []
+        for index, turn in enumerate(conversation.turns):
+            if self.rng.random() < self.panel_share:
+                started = time.perf_counter()
+                await self._send(PANEL_ENDPOINT, None, self.client.get(
+                    "/mvp/user-data", params={"mobile": conversation.mobile, "mode": self.mode}
+                ), started)
+
+            payload = {
+                "mobile": conversation.mobile,
+                "query": turn.query,
+                "conversation_context": conversation_context(history),
+                "mode": self.mode,
+            }
+            started = scheduled if index == 0 and scheduled is not None else time.perf_counter()
+            body = await self._send(QUERY_ENDPOINT, turn.intent, self.client.post("/mvp/query", json=payload), started)
+            history.append({"role": "user", "content": turn.query})
+            history.append({"role": "assistant", "content": (body or {}).get("summary") or "Response sent"})
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+
+    async def closed_loop(self, users: int, duration: float) -> float:
+        """N users, each running conversations back to back until the deadline."""
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.run_conversation(self.next_conversation())
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(users)))
+        return time.perf_counter() - started
+
+    async def open_loop(self, rate: float, duration: float, max_in_flight: int = 1000) -> float:
+        """Poisson conversation arrivals at `rate`/s, independent of response times."""
+        started = time.perf_counter()
+        in_flight: set[asyncio.Task] = set()
+        next_arrival = started
+        while next_arrival < started + duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) < max_in_flight:
+                task = asyncio.create_task(self.run_conversation(self.next_conversation(), scheduled=next_arrival))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            else:
+                self.dropped += 1
+            next_arrival += self.rng.expovariate(rate)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        return time.perf_counter() - started
+
+
+def compare_reports(current: dict, baseline: dict) -> dict:
+    """Per-endpoint percentile deltas (ms and %) against a previous run."""
+    deltas = {}
+    for name, stats in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        deltas[name] = {
+            key: {
+                "baseline": base[key],
+                "current": stats[key],
+                "change_pct": round((stats[key] - base[key]) / base[key] * 100, 1) if base[key] else None,
+            }
+            for key in ("p50_ms", "p95_ms", "p99_ms", "p999_ms", "throughput_rps", "error_rate")
+        }
+    return deltas
+
+
+def write_hgrm(recorder: Recorder, directory: Path) -> list[str]:
+    """One .hgrm file for the whole run and one per endpoint."""
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    targets = {"overall": recorder.overall, **recorder.endpoints}
+    for name, stats in targets.items():
+        path = directory / f"{name.replace(' ', '_').replace('/', '_').strip('_')}.hgrm"
+        path.write_text(stats.histogram.percentile_distribution(), encoding="utf-8")
+        written.append(str(path))
+    return written
+
+
+async def run(args) -> dict:
+    conversations = build_conversations(load_corpus(), args.turns, args.seed)
+    limits = httpx.Limits(max_connections=max(args.users or 0, 100))
+    if args.in_process:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits)
+
+    async with client:
+        generator = LoadGenerator(client, conversations, args.panel_share, args.think_time, args.mode, args.seed)
+        if args.rate:
+            elapsed = await generator.open_loop(args.rate, args.duration)
+        else:
+            elapsed = await generator.closed_loop(args.users, args.duration)
+
+    meta = {
+        "workload": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "users": None if args.rate else args.users,
+        "duration_s": args.duration,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_conversation": args.turns,
+        "panel_share": args.panel_share,
+        "target": "in-process" if args.in_process else args.base_url,
+        "conversations": len(conversations),
+        "seed": args.seed,
+        "dropped_arrivals": generator.dropped,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    report = generator.recorder.report(elapsed, meta)
+    if args.hgrm_dir:
+        report["hgrm_files"] = write_hgrm(generator.recorder, Path(args.hgrm_dir))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://127.0.0.1:8000")
+    target.add_argument("--in-process", action="store_true", help="Drive app.main:app through ASGI (no server)")
+    workload = parser.add_mutually_exclusive_group()
+    workload.add_argument("--users", type=int, default=10, help="Closed loop: concurrent virtual users")
+    workload.add_argument("--rate", type=float, default=None, help="Open loop: conversation arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per conversation")
+    parser.add_argument("--panel-share", type=float, default=0.2, help="Chance of a panel read before each turn")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between turns")
+    parser.add_argument("--mode", choices=["user", "admin"], default="user")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, default=None, help="Write the JSON report here")
+    parser.add_argument("--hgrm-dir", type=str, default=None, help="Write HdrHistogram .hgrm files here")
+    parser.add_argument("--compare", type=Path, default=None, help="Previous JSON report to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.compare:
+        report["comparison"] = compare_reports(report, json.loads(args.compare.read_text(encoding="utf-8")))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
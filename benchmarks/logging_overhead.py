@@ -0,0 +1,145 @@
+"""
+Benchmark: request latency with logging disabled, synchronous and queued.
+
+Drives the load generator's closed-loop workload against the benchmark suite's
+fixture (stand-in database, fake LLM) once per logging mode:
+
+- off:          logging.disable(), the floor
+- sync:         a StreamHandler written from the caller (the old basicConfig)
+- queued:       app.core.logs with the text formatter
+- queued-json:  app.core.logs with the JSON formatter
+
+Log output goes to a temporary file. --write-delay-ms adds a delay per write,
+like a slow terminal or a log shipper pipe that is not being drained.
+--level DEBUG includes the raw context and Gemini answers. Modes are run
+round-robin for --rounds rounds, so slow drift affects every mode alike.
+
+Usage:
+    python -m benchmarks.logging_overhead --duration 20 --users 10
+    python -m benchmarks.logging_overhead --write-delay-ms 2 --level DEBUG
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import io
+import json
+import logging
+import tempfile
+import time
+
+from app.core.logs import configure_logging, shutdown_logging, log_stats
+from benchmarks.histogram import LatencyHistogram
+from benchmarks.load_generator import LoadGenerator
+from benchmarks.soak import soak_conversations
+from benchmarks.suite import PipelineFixture
+
+MODES = ("off", "sync", "queued", "queued-json")
+
+
+class LogSink(io.TextIOWrapper):
+    """A file that optionally sleeps on every write."""
+
+    def __init__(self, path: Path, delay_s: float):
+        super().__init__(open(path, "ab", buffering=0), encoding="utf-8", write_through=True)
+        self.delay_s = delay_s
+
+    def write(self, text):
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        return super().write(text)
+
+
+def apply_mode(mode: str, level: str, sink) -> None:
+    logging.disable(logging.NOTSET)
+    if mode == "off":
+        shutdown_logging()
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync":
+        configure_logging(level=level, fmt="text", stream=sink, queued=False)
+    else:
+        configure_logging(level=level, fmt="json" if mode == "queued-json" else "text", stream=sink)
+
+
+async def run(args) -> dict:
+    histograms = {mode: LatencyHistogram() for mode in args.modes}
+    lines = dict.fromkeys(args.modes, 0)
+    dropped = dict.fromkeys(args.modes, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        async with PipelineFixture(args.queries) as fixture:
+            conversations = soak_conversations(args.turns, args.seed)
+            # Warm caches, pools and lazy imports before any mode is timed
+            await LoadGenerator(fixture.client, conversations, seed=args.seed).closed_loop(args.users, 2.0)
+            for round_index in range(args.rounds):
+                for mode in args.modes:
+                    path = Path(tmp) / f"{mode}.log"
+                    sink = LogSink(path, args.write_delay_ms / 1000)
+                    apply_mode(mode, args.level, sink)
+                    generator = LoadGenerator(
+                        fixture.client, conversations, args.panel_share, mode="user", seed=args.seed + round_index
+                    )
+                    await generator.closed_loop(args.users, args.duration / args.rounds)
+                    if mode != "off":
+                        stats = log_stats()
+                        dropped[mode] += stats.get("queue_full", 0) + stats.get("rate_limited", 0)
+                    shutdown_logging()  # Drains the queue, so the next mode starts clean
+                    sink.close()
+                    histograms[mode].merge(generator.recorder.overall.histogram)
+                    lines[mode] = len(path.read_bytes().splitlines())
+    logging.disable(logging.NOTSET)
+    configure_logging()
+
+    floor = histograms[args.modes[0]].summary_ms()
+    results = {}
+    for mode in args.modes:
+        summary = histograms[mode].summary_ms()
+        results[mode] = {
+            **summary,
+            "requests": histograms[mode].total,
+            "log_lines": lines[mode],
+            "records_dropped": dropped[mode],
+            "p50_vs_first_ms": round(summary["p50_ms"] - floor["p50_ms"], 3),
+            "p99_vs_first_ms": round(summary["p99_ms"] - floor["p99_ms"], 3),
+        }
+    return {
+        "meta": {
+            "modes": args.modes,
+            "level": args.level,
+            "users": args.users,
+            "duration_s": args.duration,
+            "rounds": args.rounds,
+            "write_delay_ms": args.write_delay_ms,
+            "queries": args.queries,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", type=lambda s: s.split(","), default=list(MODES),
+                        help=f"Comma-separated, first is the reference ({','.join(MODES)})")
+    parser.add_argument("--level", default="INFO")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per mode (split across rounds)")
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users (closed loop)")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per conversation")
+    parser.add_argument("--panel-share", type=float, default=0.2, help="Chance of a panel read before each turn")
+    parser.add_argument("--write-delay-ms", type=float, default=0.0, help="Delay per log write (slow stdout)")
+    parser.add_argument("--queries", type=int, default=2000, help="Synthetic query_masters rows in the stand-in")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: per-request cost of pool_pre_ping vs idle-only pings, and of a cold pool vs a warmed one.
+
+Runs /mvp/query requests against the benchmark suite's fixture (stand-in
+database, fake LLM) with the engine configured two ways:
+
+- pre_ping:   pool_pre_ping=True, a ping on every checkout (the old engine)
+- idle_ping:  app.db.liveness, a ping only after DB_POOL_PING_IDLE_S idle
+
+The stand-in is local, so the network is simulated: every statement and every
+ping waits --rtt-ms on the event loop, and every new connection waits
+--connect-ms (TCP, TLS and auth handshakes). Per mode, the first request is
+timed on a cold pool and on one opened to --min-size by fill_pool, then
+--requests requests are timed sequentially; modes alternate for --rounds rounds.
+
+Usage:
+    python -m benchmarks.pool_liveness --rtt-ms 1 --connect-ms 30
+    python -m benchmarks.pool_liveness --rtt-ms 20 --requests 50 --out liveness.json
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only
+
+from app.db import database
+from app.db.liveness import fill_pool, install_liveness
+from app.db.pools import POOLS
+from app.db.standin import install_mysql_shims
+from benchmarks.histogram import LatencyHistogram
+from benchmarks.suite import PipelineFixture, HEAVY_MOBILE
+
+MODES = ("pre_ping", "idle_ping")
+BODY = {"mobile": HEAVY_MOBILE, "query": "Show my payments"}
+
+
+def make_engine(url, mode: str, args, counts: dict):
+    """A stand-in engine with simulated network latency, counting round trips."""
+    engine = create_async_engine(url, pool_pre_ping=mode == "pre_ping", pool_size=args.min_size, max_overflow=10)
+    install_mysql_shims(engine)
+    if mode == "idle_ping":
+        install_liveness(engine, f"bench-{mode}", args.idle_s)
+    sync_engine = engine.sync_engine
+    dialect = sync_engine.dialect
+    ping = dialect.do_ping
+
+    def slow_ping(dbapi_connection):
+        counts["pings"] += 1
+        await_only(asyncio.sleep(args.rtt_ms / 1000))
+        return ping(dbapi_connection)
+
+    def slow_statement(*_):
+        counts["statements"] += 1
+        await_only(asyncio.sleep(args.rtt_ms / 1000))
+
+    def slow_connect(*_):
+        counts["connects"] += 1
+        await_only(asyncio.sleep(args.connect_ms / 1000))
+
+    def checkout(*_):
+        counts["checkouts"] += 1
+
+    dialect.do_ping = slow_ping
+    event.listen(sync_engine, "before_cursor_execute", slow_statement)
+    event.listen(sync_engine, "connect", slow_connect)
+    event.listen(sync_engine, "checkout", checkout)
+    return engine
+
+
+async def timed_request(client) -> float:
+    started = time.perf_counter()
+    response = await client.post("/mvp/query", json=BODY)
+    elapsed = time.perf_counter() - started
+    assert response.json()["success"], response.text
+    return elapsed
+
+
+async def run_mode(fixture, mode: str, args, warm: bool) -> tuple[float, LatencyHistogram, dict]:
+    counts = {"pings": 0, "statements": 0, "connects": 0, "checkouts": 0}
+    engine = make_engine(fixture.engine.url, mode, args, counts)
+    database._engines.update(dict.fromkeys(POOLS, engine))
+    database._session_factories.clear()
+    try:
+        if warm:
+            await fill_pool(engine, args.min_size)
+        first = await timed_request(fixture.client)
+        for key in counts:
+            counts[key] = 0
+        histogram = LatencyHistogram()
+        for _ in range(args.requests):
+            histogram.record(await timed_request(fixture.client))
+    finally:
+        await engine.dispose()
+    return first, histogram, counts
+
+
+async def run(args) -> dict:
+    histograms = {mode: LatencyHistogram() for mode in MODES}
+    first = {(mode, warm): [] for mode in MODES for warm in (False, True)}
+    totals = {mode: {"pings": 0, "statements": 0, "connects": 0, "checkouts": 0} for mode in MODES}
+    async with PipelineFixture(args.queries) as fixture:
+        await timed_request(fixture.client)  # Lazy imports and caches, before anything is timed
+        fixture._patch(database, "_engines", dict(database._engines))
+        fixture._patch(database, "_session_factories", {})
+        for _ in range(args.rounds):
+            for mode in MODES:
+                for warm in (False, True):
+                    cold_ms, histogram, counts = await run_mode(fixture, mode, args, warm)
+                    first[(mode, warm)].append(cold_ms * 1000)
+                    histograms[mode].merge(histogram)
+                    for key, value in counts.items():
+                        totals[mode][key] += value
+
+    requests = args.requests * args.rounds * 2
+    results = {}
+    for mode in MODES:
+        results[mode] = {
+            **histograms[mode].summary_ms(),
+            "mean_ms": round(histograms[mode].mean_us() / 1000, 3),
+            **{f"{key}_per_request": round(value / requests, 2) for key, value in totals[mode].items()},
+            "first_request_cold_ms": round(min(first[(mode, False)]), 1),
+            "first_request_warmed_ms": round(min(first[(mode, True)]), 1),
+        }
+    saved = results["pre_ping"]["mean_ms"] - results["idle_ping"]["mean_ms"]
+    return {
+        "meta": {
+            "rtt_ms": args.rtt_ms,
+            "connect_ms": args.connect_ms,
+            "idle_s": args.idle_s,
+            "min_size": args.min_size,
+            "requests": args.requests,
+            "rounds": args.rounds,
+            "queries": args.queries,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "saved_per_request_ms": round(saved, 3),
+        "saved_by_warmup_ms": round(
+            results["idle_ping"]["first_request_cold_ms"] - results["idle_ping"]["first_request_warmed_ms"], 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="Simulated round trip per statement and ping")
+    parser.add_argument("--connect-ms", type=float, default=30.0, help="Simulated cost of opening a connection")
+    parser.add_argument("--idle-s", type=float, default=30.0, help="Idle age before a checkout pings (idle_ping)")
+    parser.add_argument("--min-size", type=int, default=10, help="Pool size, and connections opened by the warmup")
+    parser.add_argument("--requests", type=int, default=30, help="Timed requests per mode and round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=2000, help="Synthetic query_masters rows in the stand-in")
+    parser.add_argument("--out", type=Path, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: memory and CPU of execute_readonly_query's result modes on large results.
+
+Runs `SELECT * FROM query_masters` (45 columns) limited to --rows rows
+against the benchmark suite's stand-in database and compares the three
+forms a caller can ask for (app.core.results):
+
+- dicts:    one dict per row (the default)
+- rows:     the driver's tuples under one shared header (Rows / RowView)
+- columns:  {column: [values...]}
+
+Per mode:
+
+- fetch_ms:     execute_readonly_query end to end, best of --repeat
+- retained_kb:  memory the returned result keeps alive (tracemalloc)
+- peak_kb:      peak allocation while fetching and shaping it
+- then, on an already fetched result, best of --repeat:
+  aggregate_ms  rows per query_stage and total adults
+  sanitize_ms   drop the admin-only columns (sanitize_for_user_mode / Rows.without)
+  format_ms     format_data_recursively (the response formatter)
+  encode_ms     encode_json (prompt and NDJSON serialization)
+
+Usage:
+    python -m benchmarks.result_modes
+    python -m benchmarks.result_modes --rows 50000 --queries 60000 --out modes.json
+"""
+from collections import Counter
+from pathlib import Path
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import time
+import tracemalloc
+
+from app.api.query import SENSITIVE_KEYS, sanitize_for_user_mode
+from app.core.offload import encode_json
+from app.core.response_formatter import format_data_recursively
+from app.core.results import RESULT_COLUMNS, RESULT_DICTS, RESULT_ROWS
+from app.db.database import execute_readonly_query
+from benchmarks.suite import PipelineFixture
+
+MODES = (RESULT_DICTS, RESULT_ROWS, RESULT_COLUMNS)
+SQL = "SELECT * FROM query_masters ORDER BY id LIMIT :n"
+
+
+def aggregate(result, mode: str) -> tuple[Counter, int]:
+    """Rows per query_stage and total adults, the way each form is best read."""
+    if mode == RESULT_DICTS:
+        stages, adults = Counter(), 0
+        for row in result:
+            stages[row["query_stage"]] += 1
+            adults += row["adult"] or 0
+        return stages, adults
+    columns = result if mode == RESULT_COLUMNS else {name: result.column(name) for name in ("query_stage", "adult")}
+    return Counter(columns["query_stage"]), sum(value or 0 for value in columns["adult"])
+
+
+def sanitize(result, mode: str):
+    if mode == RESULT_DICTS:
+        data = {"rows": result}
+        sanitize_for_user_mode(data)  # Deletes keys from every row dict in place
+        return data["rows"]
+    if mode == RESULT_COLUMNS:
+        return {name: values for name, values in result.items() if name not in SENSITIVE_KEYS}
+    return result.without(SENSITIVE_KEYS)
+
+
+def best_ms(func, repeat: int, setup=None) -> float:
+    """Best wall time of func(setup()) over repeat runs; setup is not timed."""
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 2)
+
+
+async def measure_memory(mode: str, params: dict) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = await execute_readonly_query(SQL, params, result=mode)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return (retained - before) // 1024, (peak - before) // 1024
+
+
+async def run_mode(mode: str, args) -> dict:
+    params = {"n": args.rows}
+    fetch = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = await execute_readonly_query(SQL, params, result=mode)
+        fetch.append(time.perf_counter() - started)
+    retained_kb, peak_kb = await measure_memory(mode, params)
+    # sanitize_for_user_mode edits row dicts in place, so every dicts run gets a fresh copy
+    fresh = (lambda: copy.copy(result)) if mode != RESULT_DICTS else (lambda: [dict(row) for row in result])
+    return {
+        "rows": len(result) if mode != RESULT_COLUMNS else len(next(iter(result.values()))),
+        "fetch_ms": round(min(fetch) * 1000, 2),
+        "retained_kb": retained_kb,
+        "peak_kb": peak_kb,
+        "aggregate_ms": best_ms(lambda _: aggregate(result, mode), args.repeat),
+        "sanitize_ms": best_ms(lambda data: sanitize(data, mode), args.repeat, setup=fresh),
+        "format_ms": best_ms(lambda _: format_data_recursively(result), args.repeat),
+        "encode_ms": best_ms(lambda _: encode_json(result), args.repeat),
+    }
+
+
+async def run(args) -> dict:
+    async with PipelineFixture(args.queries) as fixture:
+        await execute_readonly_query(SQL, {"n": 10})  # Connection and statement caches, before anything is timed
+        results = {mode: await run_mode(mode, args) for mode in MODES}
+    dicts = results[RESULT_DICTS]
+    return {
+        "meta": {
+            "rows": args.rows,
+            "queries": args.queries,
+            "repeat": args.repeat,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "retained_vs_dicts": {
+            mode: round(results[mode]["retained_kb"] / max(1, dicts["retained_kb"]), 2) for mode in MODES
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per result")
+    parser.add_argument("--queries", type=int, default=12000, help="Synthetic query_masters rows in the stand-in")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--out", type=Path, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+    if args.queries < args.rows:
+        parser.error("--queries must be at least --rows")
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
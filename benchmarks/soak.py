@@ -0,0 +1,211 @@
+"""
+Soak test: sustained load against the in-process app to catch memory growth.
+
+Runs the load generator's closed-loop workload for a long time against the
+same fixture as the benchmark suite: a synthetic stand-in database and a fake
+LLM, so no network and no quota. Every --interval seconds it collects garbage
+and samples four cheap counters: RSS, pymalloc's allocated blocks, tracemalloc's
+traced bytes and the number of GC-tracked objects.
+
+Every --snapshot-interval seconds it takes a tracemalloc snapshot and diffs it
+against the first snapshot after --warmup (caches, pools and lazy imports
+settled). The top growing allocation sites are recorded over time. Analysing
+a snapshot of a busy process takes seconds, so it runs in a thread and is
+kept infrequent. --frames sets the traceback depth; deeper tracebacks
+slow every allocation.
+
+Growth is a least-squares slope per hour over the post-warmup samples. The
+run fails (exit status 1) when the RSS or block slope is above its limit.
+
+Usage:
+    python -m benchmarks.soak --duration 14400 --users 20 --out soak.json
+    python -m benchmarks.soak --duration 600 --interval 10 --max-rss-mb-per-hour 50
+"""
+from pathlib import Path
+from typing import Optional
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from app.core.memory import rss_bytes, AllocationTracker
+from benchmarks.load_generator import LoadGenerator, Conversation, Turn, load_corpus, build_conversations
+from benchmarks.suite import PipelineFixture, HEAVY_MOBILE
+
+SLOPE_KEYS = ("rss_bytes", "blocks", "traced_bytes", "gc_objects")
+
+
+def slope_per_hour(samples: list[dict], key: str) -> Optional[float]:
+    """Least-squares growth of samples[key] per hour (None with fewer than 3 samples)."""
+    points = [(s["elapsed_s"] / 3600, s[key]) for s in samples if s.get(key) is not None]
+    if len(points) < 3:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var_x:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def soak_conversations(turns: int, seed: int) -> list[Conversation]:
+    """Corpus conversations, re-addressed to the synthetic database's heavy user."""
+    conversations = build_conversations(load_corpus(), turns, seed)
+    return [
+        Conversation(HEAVY_MOBILE, [Turn(t.query, t.intent, HEAVY_MOBILE) for t in c.turns])
+        for c in conversations
+    ]
+
+
+class Sampler:
+    """Periodic memory counters plus tracemalloc diffs against the post-warmup baseline."""
+
+    def __init__(self, generator: LoadGenerator, warmup: float, snapshot_interval: float, top: int):
+        self.generator = generator
+        self.warmup = warmup
+        self.snapshot_interval = snapshot_interval
+        self.top = top
+        self.tracker = AllocationTracker()
+        self.samples: list[dict] = []
+        self.growth: list[dict] = []
+        self.started = time.perf_counter()
+        self._next_snapshot: Optional[float] = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def sample(self) -> dict:
+        gc.collect()
+        elapsed = self.elapsed()
+        sample = {
+            "elapsed_s": round(elapsed, 1),
+            "requests": self.generator.recorder.overall.histogram.total,
+            "rss_bytes": rss_bytes(),
+            "blocks": sys.getallocatedblocks(),
+            "traced_bytes": tracemalloc.get_traced_memory()[0],
+            "gc_objects": len(gc.get_objects()),
+            "warmup": self.tracker.baseline is None,
+        }
+        self.samples.append(sample)
+        print(
+            f"[soak] t={sample['elapsed_s']:>8.0f}s requests={sample['requests']:>7} "
+            f"rss={(sample['rss_bytes'] or 0) / 2**20:7.1f} MiB blocks={sample['blocks']} objects={sample['gc_objects']}",
+            file=sys.stderr,
+        )
+        return sample
+
+    async def snapshot(self) -> None:
+        """Baseline on the first call, then record the top growth since it."""
+        if self.tracker.baseline is None:
+            await asyncio.to_thread(self.tracker.snapshot)
+            # A throwaway diff reaches the analysis' own RSS high-water mark before steady samples start
+            await asyncio.to_thread(self.tracker.snapshot)
+            return
+        top = await asyncio.to_thread(self.tracker.snapshot, self.top)
+        if top:
+            self.growth.append({"elapsed_s": round(self.elapsed(), 1), "top": top})
+            print(f"[soak] top growth: {top[0]['site']} +{top[0]['size_diff_kib']} KiB", file=sys.stderr)
+
+    async def run(self, interval: float, done: asyncio.Event) -> None:
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            # The baseline is taken before the first steady sample, so its cost is not counted as growth
+            if self.elapsed() >= self.warmup and (self._next_snapshot is None or self.elapsed() >= self._next_snapshot):
+                await self.snapshot()
+                self._next_snapshot = self.elapsed() + self.snapshot_interval
+            self.sample()
+
+
+def evaluate(samples: list[dict], max_rss_mb_per_hour: float, max_blocks_per_hour: float) -> dict:
+    """Slopes over post-warmup samples and the limit violations."""
+    steady = [s for s in samples if not s["warmup"]]
+    slopes = {key: slope_per_hour(steady, key) for key in SLOPE_KEYS}
+    violations = []
+    rss_slope = slopes["rss_bytes"]
+    if rss_slope is not None and rss_slope / 2**20 > max_rss_mb_per_hour:
+        violations.append(f"RSS grows {rss_slope / 2**20:.1f} MiB/h (limit {max_rss_mb_per_hour})")
+    if slopes["blocks"] is not None and slopes["blocks"] > max_blocks_per_hour:
+        violations.append(f"Allocated blocks grow {slopes['blocks']:.0f}/h (limit {max_blocks_per_hour:.0f})")
+    return {
+        "steady_samples": len(steady),
+        "slopes_per_hour": {k: round(v, 1) if v is not None else None for k, v in slopes.items()},
+        "violations": violations,
+        "passed": not violations,
+    }
+
+
+async def run(args) -> dict:
+    tracemalloc.start(args.frames)
+    async with PipelineFixture(args.queries) as fixture:
+        generator = LoadGenerator(
+            fixture.client, soak_conversations(args.turns, args.seed), args.panel_share, mode=args.mode, seed=args.seed
+        )
+        sampler = Sampler(generator, args.warmup, args.snapshot_interval, args.top)
+        done = asyncio.Event()
+        sampling = asyncio.create_task(sampler.run(args.interval, done))
+        elapsed = await generator.closed_loop(args.users, args.duration)
+        done.set()
+        await sampling
+        await sampler.snapshot()
+    tracemalloc.stop()
+
+    verdict = evaluate(sampler.samples, args.max_rss_mb_per_hour, args.max_blocks_per_hour)
+    return {
+        "meta": {
+            "duration_s": args.duration,
+            "elapsed_s": round(elapsed, 1),
+            "users": args.users,
+            "queries": args.queries,
+            "interval_s": args.interval,
+            "snapshot_interval_s": args.snapshot_interval,
+            "warmup_s": args.warmup,
+            "tracemalloc_frames": args.frames,
+            "limits": {"rss_mb_per_hour": args.max_rss_mb_per_hour, "blocks_per_hour": args.max_blocks_per_hour},
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        **verdict,
+        "top_growth": sampler.growth[-1]["top"] if sampler.growth else [],
+        "growth_over_time": sampler.growth,
+        "samples": sampler.samples,
+        "load": generator.recorder.report(elapsed, {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=600.0, help="Seconds of sustained load")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users (closed loop)")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per conversation")
+    parser.add_argument("--panel-share", type=float, default=0.2, help="Chance of a panel read before each turn")
+    parser.add_argument("--mode", choices=["user", "admin"], default="user")
+    parser.add_argument("--queries", type=int, default=2000, help="Synthetic query_masters rows in the stand-in")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between memory samples")
+    parser.add_argument("--warmup", type=float, default=60.0, help="Seconds excluded from slopes; then baseline snapshot")
+    parser.add_argument("--snapshot-interval", type=float, default=600.0, help="Seconds between tracemalloc diffs")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc traceback depth (1 = allocation line)")
+    parser.add_argument("--top", type=int, default=15, help="Growing allocation sites to report")
+    parser.add_argument("--max-rss-mb-per-hour", type=float, default=20.0)
+    parser.add_argument("--max-blocks-per-hour", type=float, default=50_000.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+    print(output)
+    for violation in report["violations"]:
+        print(f"[soak] FAIL: {violation}", file=sys.stderr)
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
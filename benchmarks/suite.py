@@ -0,0 +1,284 @@
+"""
+Benchmark suite: per-function and end-to-end timings of the query pipeline.
+
+Runs in-process with no network. The DB is a synthetic stand-in (see
+app/db/synthetic.py) and Gemini is replaced by a fake model whose intent answers
+need JSON repair (markdown fence, single quotes, Python booleans). End-to-end
+cases drive app.main:app through httpx's ASGI transport.
+
+Each case is calibrated to ~--round-ms per round and timed over --rounds
+rounds (median/min per call). A separate tracemalloc pass records the peak and
+retained memory of a single call. Results can be stored as a named baseline and
+later runs compared against it; slowdowns beyond --threshold are flagged.
+
+Usage:
+    python -m benchmarks.suite --save-baseline main
+    python -m benchmarks.suite --baseline main --threshold 0.2 --fail-on-regression
+    python -m benchmarks.suite --only sanitize_for_user_mode,repair_gemini_json
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+import argparse
+import asyncio
+import copy
+import gc
+import inspect
+import json
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+HEAVY_MOBILE = "+919820301212"
+
+FAKE_INTENT_ANSWER = """```json
+{'intent': 'list_payments', 'entities': {'query_id': '817118', 'status': ''},
+ 'response_language': 'en', 'needs_data': True, 'clarification_needed': False,
+ 'friendly_message': 'Here are your payments', 'missing_params': [],}
+```"""
+FAKE_SUMMARY = "You have 3 upcoming trips and 2 pending payments totalling INR 48,500."
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """Deterministic Gemini stand-in: JSON needing repair for intent prompts, prose otherwise."""
+
+    def generate_content(self, prompt: str, *args, **kwargs):
+        if "YOUR JSON RESPONSE" in prompt:
+            return FakeResponse(FAKE_INTENT_ANSWER)
+        return FakeResponse(FAKE_SUMMARY)
+
+
+@dataclass
+class BenchCase:
+    """A benchmarked callable; `setup(n)` prepares one argument per call outside the timer."""
+    name: str
+    func: Callable[..., Any]
+    setup: Optional[Callable[[int], list]] = None
+    kind: str = "function"
+
+    async def call_many(self, n: int) -> float:
+        """Run n calls and return the elapsed seconds (setup excluded)."""
+        args = self.setup(n) if self.setup else [None] * n
+        started = time.perf_counter()
+        for arg in args:
+            result = self.func(arg) if self.setup else self.func()
+            if inspect.isawaitable(result):
+                await result
+        return time.perf_counter() - started
+
+
+async def measure(case: BenchCase, rounds: int, round_ms: float) -> dict:
+    """Calibrate, time `rounds` rounds and take a tracemalloc pass."""
+    await case.call_many(1)  # warm-up (connections, caches, imports)
+    single = max(await case.call_many(1), 1e-7)
+    number = max(1, int(round_ms / 1000 / single))
+
+    per_call = []
+    gc.collect()
+    for _ in range(rounds):
+        per_call.append(await case.call_many(number) / number)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    await case.call_many(1)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "kind": case.kind,
+        "calls_per_round": number,
+        "rounds": rounds,
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "min_us": round(min(per_call) * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(per_call) * 1e6, 3),
+        "peak_kib": round((peak - before) / 1024, 2),
+        "retained_kib": round((after - before) / 1024, 2),
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float, memory_threshold: float) -> list[dict]:
+    """Cases whose median time or peak memory grew beyond the thresholds."""
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        checks = [("median_us", threshold), ("peak_kib", memory_threshold)]
+        for metric, limit in checks:
+            if base[metric] > 0 and result[metric] > base[metric] * (1 + limit):
+                regressions.append({
+                    "case": name,
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": result[metric],
+                    "change_pct": round((result[metric] - base[metric]) / base[metric] * 100, 1),
+                })
+    return regressions
+
+
+def check(response: httpx.Response) -> None:
+    """Fail the run on HTTP or application errors so a broken path is never timed as fast."""
+    response.raise_for_status()
+    body = response.json()
+    if isinstance(body, dict) and body.get("success") is False:
+        raise RuntimeError(f"{response.request.url.path}: {body.get('error')}")
+
+
+class PipelineFixture:
+    """Stand-in database, fake LLM and ASGI client shared by all cases."""
+
+    def __init__(self, queries: int):
+        self.queries = queries
+        self._tmp = tempfile.TemporaryDirectory()
+        self._patched: list[tuple[Any, str, Any]] = []
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def _patch(self, target, name: str, value) -> None:
+        self._patched.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    async def __aenter__(self):
+        from app.config import get_settings
+        from app.db import database
+        from app.db.pools import POOLS
+        from app.db.standin import create_standin_engine
+        from app.db.synthetic import generate
+        from app.core import intent_extractor
+        from app.api import query as query_module
+        from app.main import app
+
+        db_path = Path(self._tmp.name) / "bench.db"
+        generate(self.queries, db_path=db_path, seed=1)
+        self.engine = create_standin_engine(str(db_path), rebuild=False)
+        self._patch(database, "_engines", dict.fromkeys(POOLS, self.engine))
+        self._patch(database, "_session_factories", {})
+        fake = FakeModel()
+        self._patch(intent_extractor.settings, "GEMINI_API_KEY", intent_extractor.settings.GEMINI_API_KEY or "bench")
+        self._patch(intent_extractor, "get_model", lambda: fake)
+        self._patch(query_module, "get_model", lambda: fake)
+        # Journal rows go to the temporary directory with the database
+        self._patch(get_settings(), "REQUEST_JOURNAL_PATH", str(Path(self._tmp.name) / "journal.sqlite"))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        return self
+
+    async def __aexit__(self, *exc):
+        from app.core.request_journal import shutdown_request_journal
+        await self.client.aclose()
+        await self.engine.dispose()
+        shutdown_request_journal()
+        for target, name, value in reversed(self._patched):
+            setattr(target, name, value)
+        self._tmp.cleanup()
+
+
+async def build_cases(fixture: PipelineFixture) -> list[BenchCase]:
+    """All suite cases; inputs come from the stand-in so sizes are realistic."""
+    from app.api.query import fetch_universal_context, fetch_global_context, sanitize_for_user_mode
+    from app.core.response_formatter import format_data_recursively, create_success_response
+    from app.core.sql_validator import validate_parameters
+    from app.core.intent_extractor import build_intent_prompt, repair_gemini_json, extract_intent_and_entities
+
+    context = await fetch_universal_context(HEAVY_MOBILE)
+    context_copies = lambda n: [copy.deepcopy(context) for _ in range(n)]
+    history = "\n".join(f"user: question {i}\nassistant: answer {i}" for i in range(5))
+    params = {"mobile": HEAVY_MOBILE, "query_id": " 817118 ", "limit": "50", "offset": 0, "status": "pending"}
+    client = fixture.client
+
+    async def post_query():
+        check(await client.post("/mvp/query", json={"mobile": HEAVY_MOBILE, "query": "Show my payments", "conversation_context": history}))
+
+    async def get_panel():
+        check(await client.get("/mvp/user-data", params={"mobile": HEAVY_MOBILE}))
+
+    async def get_section():
+        check(await client.get("/mvp/user-data/recent_quotations", params={"mobile": HEAVY_MOBILE, "limit": 20}))
+
+    return [
+        BenchCase("fetch_universal_context", lambda: fetch_universal_context(HEAVY_MOBILE)),
+        BenchCase("fetch_global_context", fetch_global_context),
+        BenchCase("sanitize_for_user_mode", sanitize_for_user_mode, setup=context_copies),
+        BenchCase("format_data_recursively", lambda: format_data_recursively(context)),
+        BenchCase("create_success_response", lambda: create_success_response(
+            intent="universal_query", entities={}, data=context, sanitized_sql="[UNIVERSAL FETCH]", summary=FAKE_SUMMARY
+        )),
+        BenchCase("validate_parameters", lambda: validate_parameters(params)),
+        BenchCase("build_intent_prompt", lambda: build_intent_prompt("और इसकी payment?", history, "hinglish")),
+        BenchCase("repair_gemini_json", lambda: repair_gemini_json(FAKE_INTENT_ANSWER)),
+        BenchCase("extract_intent_and_entities", lambda: extract_intent_and_entities("Show my payments", history)),
+        BenchCase("POST /mvp/query", post_query, kind="endpoint"),
+        BenchCase("GET /mvp/user-data", get_panel, kind="endpoint"),
+        BenchCase("GET /mvp/user-data/{section}", get_section, kind="endpoint"),
+    ]
+
+
+async def run_suite(
+    queries: int = 20_000,
+    rounds: int = 7,
+    round_ms: float = 50.0,
+    only: Optional[set[str]] = None,
+) -> dict:
+    """Run the (selected) cases and return {case name: measurements}."""
+    async with PipelineFixture(queries) as fixture:
+        results = {}
+        for case in await build_cases(fixture):
+            if only and case.name not in only:
+                continue
+            results[case.name] = await measure(case, rounds, round_ms)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20_000, help="Synthetic query_masters rows in the stand-in")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--round-ms", type=float, default=50.0, help="Target duration of one timed round")
+    parser.add_argument("--only", type=str, default=None, help="Comma-separated case names")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against benchmarks/baselines/<name>.json")
+    parser.add_argument("--save-baseline", type=str, default=None, help="Store this run as benchmarks/baselines/<name>.json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed median slowdown (0.25 = +25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.5, help="Allowed peak memory growth")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)  # Request logging would dominate the hot paths
+
+    only = set(args.only.split(",")) if args.only else None
+    results = asyncio.run(run_suite(args.queries, args.rounds, args.round_ms, only))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "queries": args.queries,
+            "rounds": args.rounds,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    if args.baseline:
+        baseline = json.loads((BASELINE_DIR / f"{args.baseline}.json").read_text(encoding="utf-8"))
+        report["regressions"] = compare_results(results, baseline["results"], args.threshold, args.memory_threshold)
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        (BASELINE_DIR / f"{args.save_baseline}.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.fail_on_regression and report.get("regressions"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
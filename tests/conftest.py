@@ -0,0 +1,45 @@
+"""
+Shared fixtures.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import get_settings
+from app.core.request_journal import shutdown_request_journal
+from app.db import database
+from app.db.pools import POOLS
+from app.db.standin import create_standin_engine
+
+
+@pytest.fixture(autouse=True)
+def request_journal_path(tmp_path, monkeypatch):
+    """Requests through app.main write their journal rows under the test's tmp_path."""
+    path = tmp_path / "request_journal.sqlite"
+    monkeypatch.setattr(get_settings(), "REQUEST_JOURNAL_PATH", str(path))
+    yield path
+    shutdown_request_journal()
+
+
+def _use_engine(engine, monkeypatch):
+    """Serve every pool from `engine`, with no session factory cached for the previous one."""
+    monkeypatch.setattr(database, "_engines", dict.fromkeys(POOLS, engine))
+    monkeypatch.setattr(database, "_session_factories", {})
+
+
+@pytest.fixture
+async def standin_engine(tmp_path, monkeypatch):
+    """Point the shared engine at a freshly built stand-in database."""
+    engine = create_standin_engine(str(tmp_path / "standin.db"))
+    _use_engine(engine, monkeypatch)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def sqlite_engine(tmp_path, monkeypatch):
+    """Point the shared engine at an empty file-backed SQLite database; yields its path for the test to fill."""
+    path = tmp_path / "test.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    _use_engine(engine, monkeypatch)
+    yield path
+    await engine.dispose()
@@ -0,0 +1,72 @@
+"""
+Tests for the in-process benchmark suite.
+"""
+import json
+import pytest
+
+from benchmarks.suite import BenchCase, FakeModel, FAKE_INTENT_ANSWER, measure, compare_results, run_suite
+from app.core.intent_extractor import repair_gemini_json, build_intent_prompt
+
+
+class TestHelpers:
+    """The prompt/repair helpers the suite benchmarks."""
+
+    def test_fake_answer_needs_repair(self):
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(FAKE_INTENT_ANSWER)
+        data = json.loads(repair_gemini_json(FAKE_INTENT_ANSWER))
+        assert data["intent"] == "list_payments"
+        assert data["needs_data"] is True
+
+    def test_fake_model_routes_on_prompt(self):
+        model = FakeModel()
+        assert model.generate_content(build_intent_prompt("hi")).text == FAKE_INTENT_ANSWER
+        assert model.generate_content("summarise this").text != FAKE_INTENT_ANSWER
+
+    def test_prompt_includes_context_and_language(self):
+        prompt = build_intent_prompt("payment?", "user: my trip", "hi")
+        assert "user: my trip" in prompt
+        assert "payment?" in prompt
+
+
+class TestMeasure:
+    """Timing and regression checks."""
+
+    async def test_setup_runs_once_per_call(self):
+        seen = []
+        case = BenchCase("append", seen.append, setup=lambda n: list(range(n)))
+        result = await measure(case, rounds=2, round_ms=1)
+        assert result["rounds"] == 2
+        assert result["median_us"] >= 0
+        assert len(seen) == 2 + 2 * result["calls_per_round"] + 1
+
+    async def test_coroutines_from_lambdas_are_awaited(self):
+        calls = []
+
+        async def work():
+            calls.append(1)
+
+        await measure(BenchCase("async", lambda: work()), rounds=1, round_ms=1)
+        assert calls
+
+    def test_compare_flags_slowdowns_beyond_threshold(self):
+        baseline = {"a": {"median_us": 100.0, "peak_kib": 10.0}, "b": {"median_us": 100.0, "peak_kib": 10.0}}
+        current = {
+            "a": {"median_us": 120.0, "peak_kib": 10.0},
+            "b": {"median_us": 140.0, "peak_kib": 30.0},
+            "new": {"median_us": 1.0, "peak_kib": 1.0},
+        }
+        regressions = compare_results(current, baseline, threshold=0.25, memory_threshold=0.5)
+        assert {(r["case"], r["metric"]) for r in regressions} == {("b", "median_us"), ("b", "peak_kib")}
+        assert regressions[0]["change_pct"] == 40.0
+
+
+class TestSuite:
+    """A tiny end-to-end run against the stand-in and fake LLM."""
+
+    async def test_selected_cases_run(self):
+        only = {"sanitize_for_user_mode", "extract_intent_and_entities", "GET /mvp/user-data/{section}"}
+        results = await run_suite(queries=200, rounds=1, round_ms=1, only=only)
+        assert set(results) == only
+        assert results["GET /mvp/user-data/{section}"]["kind"] == "endpoint"
+        assert all(r["peak_kib"] >= 0 for r in results.values())
@@ -0,0 +1,151 @@
+"""
+Tests for statement deadlines, cancellation, the DB circuit breaker and degraded answers.
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.config import get_settings
+from app.core import degraded
+from app.db import breaker, database, pools
+from app.db.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, counts_as_failure, get_breaker
+from app.db.database import StatementTimeoutError, with_max_execution_time
+from app.db.pools import POOL_INTERACTIVE, PoolSaturatedError
+from benchmarks.suite import PipelineFixture, HEAVY_MOBILE
+
+# Counts to 50 million inside SQLite: many seconds unless interrupted
+RUNAWAY_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 50000000) "
+    "SELECT COUNT(*) AS n FROM c"
+)
+
+
+@pytest.fixture
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(breaker, "_breakers", {})
+
+
+class TestCircuitBreaker:
+    """Failure rate over a window, then open, half-open and closed again."""
+
+    def make(self, monkeypatch, now):
+        monkeypatch.setattr(breaker.time, "monotonic", lambda: now[0])
+        return CircuitBreaker("interactive", window_s=10, min_calls=4, failure_rate=0.5, open_seconds=5)
+
+    def test_opens_on_failure_rate_with_enough_calls(self, monkeypatch):
+        now = [100.0]
+        cb = self.make(monkeypatch, now)
+        cb.record(failed=True)
+        cb.record(failed=True)
+        assert cb.state == CLOSED  # Below min_calls
+        cb.record(failed=False)
+        cb.record(failed=True)
+        assert cb.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            cb.before_call()
+        assert cb.stats == {"opened": 1, "rejected": 1}
+
+    def test_old_failures_leave_the_window(self, monkeypatch):
+        now = [100.0]
+        cb = self.make(monkeypatch, now)
+        for _ in range(3):
+            cb.record(failed=True)
+        now[0] += 11
+        cb.record(failed=True)
+        assert cb.state == CLOSED
+
+    def test_half_open_trial(self, monkeypatch):
+        now = [100.0]
+        cb = self.make(monkeypatch, now)
+        for _ in range(4):
+            cb.record(failed=True)
+        now[0] += 5
+        cb.before_call()  # The trial
+        assert cb.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            cb.before_call()  # Only one at a time
+        cb.record(failed=True)
+        assert cb.state == OPEN and cb.stats["opened"] == 2
+        now[0] += 5
+        cb.before_call()
+        cb.record(failed=False)
+        assert cb.state == CLOSED
+        cb.before_call()
+
+    def test_what_counts(self):
+        assert counts_as_failure(StatementTimeoutError("slow"))
+        assert counts_as_failure(OperationalError("SELECT 1", {}, Exception("gone away")))
+        assert not counts_as_failure(ProgrammingError("SELECT", {}, Exception("syntax")))
+        assert not counts_as_failure(PoolSaturatedError("busy"))
+
+
+class TestDeadlines:
+    """Client-side interruption and the server-side hint."""
+
+    def test_max_execution_time_hint(self):
+        hinted = with_max_execution_time("\n  select id FROM t", 2.5)
+        assert hinted == "\n  select /*+ MAX_EXECUTION_TIME(2500) */ id FROM t"
+        cte = "WITH x AS (SELECT 1) SELECT * FROM x"
+        assert with_max_execution_time(cte, 1) == cte  # Only a leading SELECT can carry the hint
+
+    @pytest.fixture
+    def standin(self, standin_engine, monkeypatch, fresh_breakers):
+        monkeypatch.setattr(pools, "_gates", {})
+        monkeypatch.setattr(get_settings(), "DB_STATEMENT_TIMEOUT_S", 0.2)
+        return standin_engine
+
+    async def test_deadline_interrupts_and_releases(self, standin):
+        started = time.perf_counter()
+        with pytest.raises(StatementTimeoutError):
+            await database.execute_readonly_query(RUNAWAY_SQL, {})
+        assert time.perf_counter() - started < 2
+        assert pools.get_pool_gate(POOL_INTERACTIVE).in_use == 0
+        assert standin.sync_engine.pool.checkedout() == 0
+        assert await database.validate_mobile_exists(HEAVY_MOBILE) in (True, False)  # The pool still works
+        assert get_breaker(POOL_INTERACTIVE).stats == {"opened": 0, "rejected": 0}
+
+    async def test_cancelled_caller_releases_connection(self, standin, monkeypatch):
+        monkeypatch.setattr(get_settings(), "DB_STATEMENT_TIMEOUT_S", 60.0)
+        task = asyncio.create_task(database.execute_readonly_query(RUNAWAY_SQL, {}))
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert time.perf_counter() - started < 2
+        assert pools.get_pool_gate(POOL_INTERACTIVE).in_use == 0
+        assert standin.sync_engine.pool.checkedout() == 0
+
+
+class TestDegradedAnswers:
+    """With the breaker open, answers come back at once from cached context or without data."""
+
+    async def test_cached_then_llm_only(self, monkeypatch, fresh_breakers):
+        monkeypatch.setattr(degraded, "_cache", None)
+        async with PipelineFixture(queries=200) as fixture:
+            body = {"mobile": HEAVY_MOBILE, "query": "Show my payments"}
+            live = (await fixture.client.post("/mvp/query", json=body)).json()
+            assert live["success"] and live["degraded"] is None
+            panel = (await fixture.client.get("/mvp/user-data", params={"mobile": HEAVY_MOBILE})).json()
+
+            interactive = get_breaker(POOL_INTERACTIVE)
+            for _ in range(200):  # The successful reads above are in the window too
+                interactive.record(failed=True)
+                if interactive.state == OPEN:
+                    break
+            assert interactive.state == OPEN
+
+            started = time.perf_counter()
+            cached = (await fixture.client.post("/mvp/query", json=body)).json()
+            assert time.perf_counter() - started < 1
+            assert cached["success"] and cached["degraded"] == "cached"
+            assert cached["data"]["profile"] == live["data"]["profile"]
+
+            unknown = (await fixture.client.post("/mvp/query", json={**body, "mobile": "+919000000001"})).json()
+            assert unknown["success"] and unknown["degraded"] == "llm_only" and not unknown["data"]
+
+            stale_panel = (await fixture.client.get("/mvp/user-data", params={"mobile": HEAVY_MOBILE})).json()
+            assert stale_panel["degraded"] == "cached" and stale_panel["data"] == panel["data"]
+            assert interactive.stats["rejected"] >= 3
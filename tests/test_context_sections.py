@@ -0,0 +1,103 @@
+"""
+Tests for the context section registry and incremental panel refreshes.
+"""
+import pytest
+
+from app.core.context_sections import (
+    CONTEXT_SECTIONS,
+    build_section_query,
+    encode_watermark,
+    decode_watermark,
+    diff_section,
+)
+
+
+class TestSectionRegistry:
+    """Tests for section query building."""
+
+    def test_section_query_matches_context_shape(self):
+        """Section queries keep the original ORDER BY and LIMIT."""
+        sql = build_section_query("recent_quotations", "'1','2'")
+        assert sql == "SELECT * FROM query_quotations WHERE query_id IN ('1','2') ORDER BY sent_at DESC LIMIT 5"
+
+    def test_unordered_section(self):
+        """Sections without an ordering have no ORDER BY."""
+        assert "ORDER BY" not in build_section_query("markups", "NULL")
+
+
+class TestWatermark:
+    """Tests for the opaque watermark token."""
+
+    def test_round_trip(self):
+        """A token decodes back for the same user and mode."""
+        token = encode_watermark("+919820301212", "user", {"query_masters": [3, 9, None]}, {"recent_queries": [9]})
+        payload = decode_watermark(token, "+919820301212", "user")
+        assert payload["t"]["query_masters"] == [3, 9, None]
+        assert payload["ids"]["recent_queries"] == [9]
+
+    def test_rejects_other_user_or_mode(self):
+        """Tokens are bound to the user and the security mode."""
+        token = encode_watermark("+919820301212", "user", {}, {})
+        assert decode_watermark(token, "+918530955786", "user") is None
+        assert decode_watermark(token, "+919820301212", "admin") is None
+
+    def test_rejects_garbage(self):
+        """Malformed tokens fall back to a full fetch."""
+        assert decode_watermark("not-a-token!!", "+919820301212", "user") is None
+
+
+class TestDiffSection:
+    """Tests for section diffs."""
+
+    def test_new_changed_and_removed_rows(self):
+        """New rows and updated rows are upserted, dropped rows are tombstoned."""
+        rows = [
+            {"id": 12, "updated_at": None},
+            {"id": 10, "updated_at": "2026-01-02 00:00:00"},
+            {"id": 9, "updated_at": "2026-01-01 00:00:00"},
+        ]
+        delta = diff_section(rows, [10, 9, 8], [3, 10, "2026-01-01 00:00:00"])
+        assert [row["id"] for row in delta["upserts"]] == [12, 10]
+        assert delta["tombstones"] == [8]
+        assert delta["order"] == [12, 10, 9]
+
+
+class TestFetchContextDelta:
+    """Tests for the delta fetch against a fake database."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_tables_cost_only_the_watermark(self, monkeypatch):
+        """Only sections whose table watermark moved are re-read."""
+        from app.api import query as query_module
+
+        executed = []
+
+        async def fake_query(sql, params):
+            executed.append(sql)
+            if sql.startswith("SELECT * FROM query_masters WHERE user_mobile"):
+                return [{"id": 1, "query_id": 817118, "admin_ref": None}]
+            if sql.startswith("SELECT query_id"):
+                return [{"query_id": 817118}]
+            if "query_payments" in sql:
+                return [{"id": 7, "updated_at": None}, {"id": 5, "updated_at": None}]
+            return []
+
+        monkeypatch.setattr(query_module, "execute_readonly_query", fake_query)
+
+        tables = {spec["table"]: [1, 1, None] for spec in CONTEXT_SECTIONS.values()}
+        tables["master_admins"] = [0, None, None]
+        tables["query_payments"] = [1, 5, None]
+        since = {"t": dict(tables), "ids": {"recent_payments": [5]}}
+        tables["query_payments"] = [2, 7, None]
+        watermark_rows = [
+            {"section": table, "row_count": wm[0], "max_id": wm[1], "max_updated": wm[2]}
+            for table, wm in tables.items()
+        ]
+
+        delta = await query_module.fetch_context_delta("+919820301212", since, watermark_rows)
+
+        assert list(delta["sections"]) == ["recent_payments"]
+        assert [row["id"] for row in delta["sections"]["recent_payments"]["upserts"]] == [7]
+        assert delta["shown_ids"]["recent_payments"] == [7, 5]
+        section_reads = [sql for sql in executed if "WHERE query_id IN" in sql]
+        assert len(section_reads) == 1
@@ -0,0 +1,59 @@
+"""
+Tests for the pluggable MySQL driver layer: URL selection and row shims.
+"""
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.config import get_settings
+from app.core.response_formatter import format_rows
+from app.db import database, drivers
+from app.db.drivers import canonical_rows, canonical_value, drivername, require_driver, row_shim
+
+
+class TestSelection:
+    def test_url_uses_configured_driver(self, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "DB_DRIVER", "asyncmy")
+        assert database.build_database_url().drivername == "mysql+asyncmy"
+        monkeypatch.setattr(settings, "DB2_HOST", None)  # Falls back to DATABASE_URL
+        monkeypatch.setattr(settings, "DATABASE_URL", "mysql+aiomysql://u:p@db:3306/crm")
+        url = database.build_database_url()
+        assert url.drivername == "mysql+asyncmy" and url.host == "db" and url.database == "crm"
+
+    def test_unknown_and_missing_drivers(self, monkeypatch):
+        with pytest.raises(ValueError, match="Unknown DB_DRIVER"):
+            drivername("mysqlclient")
+        monkeypatch.setattr(drivers.importlib.util, "find_spec", lambda name: None)
+        with pytest.raises(RuntimeError, match="pip install asyncmy"):
+            require_driver("asyncmy")
+
+    def test_only_other_drivers_pay_for_a_shim(self, monkeypatch):
+        settings = get_settings()
+        assert row_shim("aiomysql") is None and row_shim("asyncmy") is canonical_rows
+        monkeypatch.setattr(settings, "DB_BACKEND", "mysql")
+        monkeypatch.setattr(settings, "DB_DRIVER", "asyncmy")
+        assert database.driver_row_shim() is canonical_rows
+        monkeypatch.setattr(settings, "DB_BACKEND", "standin")
+        assert database.driver_row_shim() is None
+
+
+class TestShim:
+    """Whatever the driver returns, response_formatter sees the reference driver's types."""
+
+    def test_values(self):
+        aware = datetime(2025, 3, 1, 10, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+        assert canonical_value(aware) == datetime(2025, 3, 1, 5, 0)
+        assert canonical_value(bytearray(b"\x01")) == b"\x01" and type(canonical_value(memoryview(b"ab"))) is bytes
+        assert canonical_value({"tags": ["family"]}) == '{"tags": ["family"]}'
+        for value in (Decimal("12.50"), date(2025, 1, 2), timedelta(hours=9), "Goa", 3, None):
+            assert canonical_value(value) is value
+
+    def test_formatter_output_identical(self):
+        columns = ("amount", "created_at", "token", "meta")
+        reference = [(Decimal("99.90"), datetime(2025, 1, 2, 3, 4, 5), b"\x07", '{"source": "web"}')]
+        other = [(Decimal("99.90"), datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc), bytearray(b"\x07"),
+                  {"source": "web"})]
+        as_dicts = lambda rows: [dict(zip(columns, row)) for row in rows]
+        assert format_rows(as_dicts(canonical_rows(other))) == format_rows(as_dicts(reference))
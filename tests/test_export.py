@@ -0,0 +1,99 @@
+"""
+Tests for streaming NDJSON/CSV exports.
+"""
+import csv
+import io
+import json
+import os
+import resource
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.export import export_rows
+from app.config import get_settings
+
+# Set FLYSHOP_EXPORT_ROWS to a smaller number for a quick local run
+EXPORT_ROWS = int(os.environ.get("FLYSHOP_EXPORT_ROWS", "1000000"))
+TOKEN = "export-secret"
+ADMIN = {"X-Profile-Token": TOKEN}
+
+
+def _build_bookings(path, rows: int):
+    """Synthetic query_flight_manages table with an admin-only column."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE query_flight_manages (id INTEGER PRIMARY KEY, query_id INT, "
+        "airline TEXT, departure_datetime TEXT, supplier_price REAL, selling_price REAL)"
+    )
+    conn.executemany(
+        "INSERT INTO query_flight_manages VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, 800000 + i % 5000, "Air India, AI-101", "2026-03-01 10:00:00", 4100.5, 5200.0)
+         for i in range(1, rows + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(get_settings(), "PROFILE_TOKEN", TOKEN)
+
+
+class TestStreamingExport:
+    """Exports stream in batches instead of materializing the result."""
+
+    async def test_large_export_has_bounded_memory(self, sqlite_engine):
+        """Peak RSS grows by far less than the size of the exported file."""
+        _build_bookings(sqlite_engine, EXPORT_ROWS)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        lines = exported_bytes = 0
+        async for chunk in export_rows("bookings", "ndjson", admin=False, batch_size=1000):
+            lines += chunk.count(b"\n")
+            exported_bytes += len(chunk)
+        peak_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - rss_before
+
+        assert lines == EXPORT_ROWS
+        assert peak_growth < max(64 * 1024 * 1024, exported_bytes // 4)
+
+    def test_csv_export_strips_sensitive_fields(self, sqlite_engine, admin_token):
+        """User-mode CSV has a header row and no admin-only columns."""
+        _build_bookings(sqlite_engine, 2500)
+        from app.main import app
+
+        response = TestClient(app).get("/admin/export/bookings", params={"format": "csv"}, headers=ADMIN)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 2500
+        assert "supplier_price" not in rows[0]
+        assert rows[0]["airline"] == "Air India, AI-101"
+
+    def test_admin_ndjson_keeps_all_fields(self, sqlite_engine, admin_token):
+        """Admin exports keep supplier pricing."""
+        _build_bookings(sqlite_engine, 3)
+        from app.main import app
+
+        response = TestClient(app).get("/admin/export/bookings", params={"mode": "admin"}, headers=ADMIN)
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == [1, 2, 3]
+        assert rows[0]["supplier_price"] == 4100.5
+
+    def test_unknown_dataset_and_format(self, sqlite_engine, admin_token):
+        """Unknown datasets are a 404, unknown formats a 400."""
+        from app.main import app
+
+        client = TestClient(app)
+        assert client.get("/admin/export/nope", headers=ADMIN).status_code == 404
+        assert client.get("/admin/export/bookings", params={"format": "xml"}, headers=ADMIN).status_code == 400
+
+    def test_requires_admin_token(self, sqlite_engine, admin_token):
+        """Without the token nothing is exported, whatever mode= says."""
+        _build_bookings(sqlite_engine, 3)
+        from app.main import app
+
+        client = TestClient(app)
+        assert client.get("/admin/export/bookings").status_code == 403
+        wrong = {"X-Profile-Token": "wrong"}
+        assert client.get("/admin/export/bookings", params={"mode": "admin"}, headers=wrong).status_code == 403
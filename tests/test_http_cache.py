@@ -0,0 +1,108 @@
+"""
+Tests for HTTP conditional caching.
+"""
+import gzip
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import http_cache
+from app.core.http_cache import (
+    make_etag,
+    etag_matches,
+    choose_encoding,
+    WatermarkCache,
+    get_cache_stats,
+    reset_cache_stats,
+)
+
+
+class TestETagHelpers:
+    """Tests for ETag generation and comparison."""
+
+    def test_etag_is_strong_and_stable(self):
+        """Same content should give the same quoted strong ETag."""
+        etag = make_etag("users", [{"max_id": 5}])
+        assert etag == make_etag("users", [{"max_id": 5}])
+        assert etag.startswith('"') and not etag.startswith("W/")
+
+    def test_etag_changes_with_watermark(self):
+        """A different watermark should give a different ETag."""
+        assert make_etag("users", [{"max_id": 5}]) != make_etag("users", [{"max_id": 6}])
+
+    def test_if_none_match_list_and_weak(self):
+        """If-None-Match uses weak comparison over a list of tags."""
+        etag = make_etag(b"body")
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+
+    def test_choose_encoding(self):
+        """Client preferences select the precompressed variant."""
+        variants = {"gzip": b"x"}
+        assert choose_encoding("gzip, deflate", variants) == "gzip"
+        assert choose_encoding("gzip;q=0", variants) is None
+        assert choose_encoding("identity", variants) is None
+
+    def test_watermark_cache_expires(self):
+        """Entries older than the TTL should be dropped."""
+        cache = WatermarkCache(ttl_seconds=0)
+        cache.set("k", '"abc"')
+        assert cache.get("k") is None
+
+
+class TestConditionalEndpoints:
+    """Tests for 304 handling on the data and static endpoints."""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from app.main import app
+        from app.api import query as query_module
+
+        calls = []
+
+        async def fake_query(sql, params):
+            calls.append(sql)
+            if "row_count" in sql:
+                return [{"section": "master_admins", "row_count": 1, "max_id": 1, "max_updated": None}]
+            return [{"name": "Flyshop", "mobile": "9650639634"}]
+
+        monkeypatch.setattr(query_module, "execute_readonly_query", fake_query)
+        http_cache.get_watermark_cache().clear()
+        reset_cache_stats()
+        client = TestClient(app)
+        client.calls = calls
+        return client
+
+    def test_admins_revalidates_without_full_query(self, client):
+        """Second request with If-None-Match should be a 304 with no DB round-trip."""
+        first = client.get("/admins")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert len(client.calls) == 2  # watermark + full query
+
+        second = client.get("/admins", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert len(client.calls) == 2
+
+        # Once the in-memory ETag is gone, only the watermark query runs
+        http_cache.get_watermark_cache().clear()
+        third = client.get("/admins", headers={"If-None-Match": etag})
+        assert third.status_code == 304
+        assert len(client.calls) == 3
+
+        stats = get_cache_stats()["/admins"]
+        assert stats["requests"] == 3
+        assert stats["not_modified"] == 2
+        assert stats["db_skipped"] == 1
+
+    def test_chat_ui_gzip_and_304(self, client):
+        """Chat UI should be served precompressed and revalidate by ETag."""
+        first = client.get("/chat", headers={"Accept-Encoding": "gzip"})
+        assert first.status_code == 200
+        assert first.headers["content-encoding"] == "gzip"
+        assert first.headers["cache-control"] == "no-cache"
+        assert b"<html" in first.content or b"<html" in gzip.decompress(first.content)
+
+        second = client.get("/chat", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 304
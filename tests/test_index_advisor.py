@@ -0,0 +1,121 @@
+"""
+Tests for the slow-statement log and the EXPLAIN-based index advisor.
+"""
+import logging
+
+import pytest
+
+from app.db.slow_queries import SlowQueryLog, fingerprint, fingerprint_id
+from app.db.index_advisor import (
+    SQLiteExplainer,
+    advise,
+    index_candidate,
+    suggested_indexes,
+    table_aliases,
+    FULL_SCAN,
+    LEADING_WILDCARD,
+)
+from app.db.standin import load_schema
+
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory):
+    """Advisor report for a small synthetic database with only primary keys."""
+    from app.db.synthetic import generate
+    db_path = tmp_path_factory.mktemp("advisor") / "synthetic.db"
+    generate(300, db_path=db_path, seed=7)
+    explainer = SQLiteExplainer(db_path, bare=True, timeout_s=2.0)
+    try:
+        yield advise(explainer, load_schema())
+    finally:
+        explainer.close()
+
+
+class TestSlowQueryLog:
+    """Fingerprinting, logging levels and aggregation."""
+
+    def test_fingerprint_normalizes_literals(self):
+        a = fingerprint("SELECT * FROM query_masters WHERE query_id IN ('1', '2') AND id = 7 -- note")
+        b = fingerprint("SELECT *\n  FROM query_masters WHERE query_id IN ('9') AND id = :id")
+        assert a == b == "SELECT * FROM query_masters WHERE query_id IN (?+) AND id = ?"
+        assert fingerprint_id("SELECT 1") == fingerprint_id("SELECT   2")
+
+    def test_levels_follow_thresholds(self, caplog):
+        log = SlowQueryLog(threshold_ms=100, critical_ms=1000)
+        with caplog.at_level(logging.WARNING, logger="app.db.slow"):
+            log.record("SELECT 1 FROM a", 150.0, 1, "a")
+            log.record("SELECT 1 FROM b", 1500.0, 1, "b")
+        assert [r.levelno for r in caplog.records] == [logging.WARNING, logging.ERROR]
+
+    def test_report_aggregates_by_total_time(self):
+        log = SlowQueryLog(threshold_ms=100, critical_ms=1000)
+        log.record("SELECT * FROM a WHERE id = 1", 300.0, 5, "a")
+        log.record("SELECT * FROM a WHERE id = 2", 500.0, 9, "a")
+        log.record("SELECT * FROM b", 600.0, 1, "b")
+        report = log.report()
+        assert [e["table"] for e in report] == ["a", "b"]
+        assert report[0]["count"] == 2
+        assert report[0]["total_ms"] == 800.0
+        assert report[0]["mean_ms"] == 400.0
+        assert report[0]["max_ms"] == 500.0
+        assert report[0]["rows_max"] == 9
+
+    def test_fingerprint_cap(self):
+        log = SlowQueryLog(threshold_ms=1, critical_ms=10, max_fingerprints=1)
+        log.record("SELECT * FROM a", 5.0, 0, "a")
+        log.record("SELECT * FROM b", 5.0, 0, "b")
+        assert [e["table"] for e in log.report()] == ["a"]
+
+
+class TestIndexAdvisor:
+    """Statement parsing helpers and an advisor run on a bare stand-in copy."""
+
+    def test_table_aliases_skip_keywords(self):
+        sql = "SELECT * FROM query_masters qm LEFT JOIN query_payments AS qp ON qp.query_id = qm.query_id WHERE 1"
+        aliases = table_aliases(sql, {"query_masters", "query_payments"})
+        assert aliases == {
+            "query_masters": "query_masters", "qm": "query_masters",
+            "query_payments": "query_payments", "qp": "query_payments",
+        }
+        assert table_aliases("SELECT * FROM query_masters WHERE x = 1", {"query_masters"}) == {
+            "query_masters": "query_masters",
+        }
+
+    def test_index_candidate_equality_then_order(self):
+        sql = "SELECT * FROM query_payments WHERE query_id IN ('1') AND status = :s ORDER BY created_at DESC LIMIT 5"
+        aliases = table_aliases(sql, {"query_payments"})
+        columns = {"query_id", "status", "created_at", "amount"}
+        assert index_candidate(sql, "query_payments", aliases, columns) == ["query_id", "status", "created_at"]
+
+    def test_index_candidate_needs_qualifier_with_joins(self):
+        sql = "SELECT * FROM a x JOIN b y ON y.a_id = x.id WHERE status = 1 ORDER BY y.created_at"
+        aliases = table_aliases(sql, {"a", "b"})
+        assert index_candidate(sql, "b", aliases, {"a_id", "status", "created_at"}) == ["a_id", "created_at"]
+
+    def test_bare_schema_reports_scans_and_wildcards(self, report):
+        by_name = {entry["name"]: entry for entry in report}
+        assert not [entry for entry in report if entry.get("error")]
+        kinds = {f["kind"] for f in by_name["validate_mobile"]["findings"]}
+        assert {FULL_SCAN, LEADING_WILDCARD} <= kinds
+        assert any(rec.get("note") for rec in by_name["validate_mobile"]["recommendations"])
+        # Findings are de-duplicated per statement
+        keys = [(f["kind"], f["table"], f["detail"]) for f in by_name["watermark:user"]["findings"]]
+        assert len(keys) == len(set(keys))
+
+    def test_recommendations_are_measured(self, report):
+        measured = [rec for entry in report for rec in entry["recommendations"] if rec.get("estimated_gain")]
+        assert measured
+        assert all(rec["ddl"].startswith(f"CREATE INDEX idx_{rec['table']}_") for rec in measured)
+        assert all({"before_ms", "after_ms", "speedup"} <= set(rec["estimated_gain"]) for rec in measured)
+        # Primary keys are never suggested again
+        assert not [rec for rec in measured if rec["columns"] == ["id"]]
+
+    def test_suggestions_fold_prefixes(self, report):
+        suggestions = suggested_indexes(report)
+        assert suggestions
+        columns = [ddl.split("(", 1)[1].rstrip(")") for ddl in suggestions]
+        tables = [ddl.split(" ON ")[1].split(" ")[0] for ddl in suggestions]
+        for i, (table, cols) in enumerate(zip(tables, columns)):
+            for j, (other_table, other_cols) in enumerate(zip(tables, columns)):
+                if i != j and table == other_table:
+                    assert not other_cols.startswith(cols + ",")
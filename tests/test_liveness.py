@@ -0,0 +1,146 @@
+"""
+Tests for connection liveness: idle-only pings, transparent reconnects, keepalive and warmup readiness.
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.util import greenlet_spawn
+
+from app.config import get_settings
+from app.db import database, liveness, pools
+from app.db.liveness import PoolKeeper, fill_pool, install_liveness, open_connections, warm_pools
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(liveness.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+async def engine(tmp_path, monkeypatch):
+    """A stand-in engine with liveness installed and its ping counted."""
+    from app.db.standin import create_standin_engine
+    monkeypatch.setattr(liveness, "_stats", {})
+    monkeypatch.setattr(liveness, "_reopen", set())
+    engine = create_standin_engine(str(tmp_path / "standin.db"))
+    install_liveness(engine, "interactive", idle_ping_s=30)
+    yield engine
+    await engine.dispose()
+
+
+async def select_one(engine):
+    async with engine.connect() as conn:
+        return (await conn.execute(text("SELECT 1"))).scalar()
+
+
+class TestIdlePing:
+    """A checkout pings only a connection idle past the threshold."""
+
+    async def test_busy_connections_are_not_pinged(self, engine, clock):
+        for _ in range(5):
+            clock[0] += 1
+            await select_one(engine)
+        assert liveness.liveness_stats()["interactive"]["pings"] == 0
+
+        clock[0] += 31
+        await select_one(engine)
+        assert liveness.liveness_stats()["interactive"]["pings"] == 1
+
+    async def test_failed_ping_reconnects_transparently(self, engine, clock, monkeypatch):
+        await select_one(engine)
+        dialect = engine.sync_engine.dialect
+
+        def dead(dbapi_connection):
+            raise ConnectionResetError("server closed the connection")
+
+        monkeypatch.setattr(dialect, "do_ping", dead)
+        clock[0] += 60
+        assert await select_one(engine) == 1  # Served on a fresh connection, no ping needed
+        assert liveness.liveness_stats()["interactive"] == {"pings": 1, "failed_pings": 1, "disconnects": 0}
+
+    def test_engines_no_longer_pre_ping(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "DB_BACKEND", "mysql")
+        monkeypatch.setattr(database, "_engines", {})
+        assert database.get_engine(pools.POOL_INTERACTIVE).sync_engine.pool._pre_ping is False
+
+
+class TestKeepalive:
+    """The background round pings stale idle connections and refills the pool."""
+
+    async def test_cycles_only_stale_connections(self, engine, clock):
+        await fill_pool(engine, 3)
+        pool = engine.sync_engine.pool
+        assert open_connections(pool) == 3
+        clock[0] += 31
+        cycled = await greenlet_spawn(liveness._cycle_idle, pool, 30, False)
+        assert cycled == 3 and liveness.liveness_stats()["interactive"]["pings"] == 3
+        # All were just used: the next round stops at the first one
+        assert await greenlet_spawn(liveness._cycle_idle, pool, 30, False) == 0
+
+    async def test_round_refills_to_min_size(self, engine, clock, monkeypatch):
+        monkeypatch.setattr(get_settings(), "DB_POOL_MIN_SIZE", 4)
+        monkeypatch.setattr(database, "_engines", {pools.POOL_INTERACTIVE: engine})
+        monkeypatch.setitem(liveness._state, "ready", True)
+        await select_one(engine)
+        engine.sync_engine.pool.dispose()  # As after a failover: every connection closed
+        await PoolKeeper(interval=15, idle_s=30).run_once()
+        assert open_connections(engine.sync_engine.pool) == 4
+
+
+class TestWarmup:
+    """Pools open to their minimum size before /ready reports ready."""
+
+    @pytest.fixture
+    async def standin(self, tmp_path, monkeypatch):
+        from app.db.standin import create_standin_engine
+        path = tmp_path / "standin.db"
+        await create_standin_engine(str(path)).dispose()
+        settings = get_settings()
+        for name, value in {
+            "DB_BACKEND": "standin", "STANDIN_DB_PATH": str(path), "DB_REPLICAS": "",
+            "DB_POOL_MIN_SIZE": 3, "DB_ANALYTICS_POOL_MIN_SIZE": 1, "DB_MAINTENANCE_POOL_MIN_SIZE": 0,
+        }.items():
+            monkeypatch.setattr(settings, name, value)
+        monkeypatch.setattr(database, "_engines", {})
+        monkeypatch.setattr(database, "_session_factories", {})
+        monkeypatch.setattr(liveness, "_state", {"ready": False, "warmed_at": None, "error": None})
+        yield
+        await database.dispose_engines()
+
+    async def test_ready_after_warmup(self, standin):
+        from app.api.query import readiness_check
+        from fastapi import Response
+
+        response = Response()
+        assert not (await readiness_check(response))["ready"] and response.status_code == 503
+
+        assert await warm_pools()
+        status = liveness.readiness()
+        assert status["ready"] and status["error"] is None
+        assert status["pools"]["interactive"] == {"open": 3, "min_size": 3}
+        assert status["pools"]["analytics"]["open"] == 1
+
+        response = Response()
+        assert (await readiness_check(response))["ready"] and response.status_code == 200
+
+    async def test_unreachable_database_is_not_ready(self, standin, monkeypatch):
+        monkeypatch.setattr(get_settings(), "STANDIN_DB_PATH", "/nonexistent/dir/standin.db")
+        assert not await warm_pools(timeout=2)
+        assert not liveness.is_ready() and liveness.readiness()["error"]
+
+    async def test_mock_mode_is_ready_without_a_database(self, standin, monkeypatch):
+        from app.api.query import readiness_check
+        from fastapi import Response
+
+        async def no_warmup(timeout=None):
+            raise AssertionError("mock mode must not open connections")
+
+        monkeypatch.setattr(get_settings(), "USE_MOCK_DATA", True)
+        monkeypatch.setattr(liveness, "warm_pools", no_warmup)
+        monkeypatch.setattr(liveness, "_keeper", None)
+        keeper = await liveness.start_pool_keeper()
+        assert keeper._task is None and database._engines == {}
+
+        response = Response()
+        assert (await readiness_check(response))["ready"] and response.status_code == 200
@@ -0,0 +1,120 @@
+"""
+Tests for the load generator and its latency histogram.
+"""
+import asyncio
+import json
+import random
+import pytest
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.histogram import LatencyHistogram
+from benchmarks.load_generator import (
+    LoadGenerator,
+    Conversation,
+    Turn,
+    load_corpus,
+    build_conversations,
+    conversation_context,
+    compare_reports,
+    write_hgrm,
+)
+
+
+def fake_api(contexts: list) -> FastAPI:
+    """Tiny app with the two endpoints the generator drives."""
+    app = FastAPI()
+
+    @app.post("/mvp/query")
+    async def query(payload: dict):
+        contexts.append(payload.get("conversation_context"))
+        await asyncio.sleep(0.005)
+        if "fail" in payload["query"]:
+            return {"success": False, "error": "nope"}
+        return {"success": True, "summary": f"answer {len(contexts)}"}
+
+    @app.get("/mvp/user-data")
+    async def panel(mobile: str):
+        return {"success": True, "data": {}}
+
+    return app
+
+
+class TestLatencyHistogram:
+    """The HDR-style histogram keeps ~3 significant digits."""
+
+    def test_percentiles_match_exact_values(self):
+        rng = random.Random(1)
+        values = [rng.lognormvariate(-3, 1) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        values.sort()
+        for p in (50, 95, 99, 99.9):
+            exact = values[int(len(values) * p / 100) - 1] * 1_000_000
+            assert histogram.percentile_us(p) == pytest.approx(exact, rel=0.002)
+
+    def test_hgrm_format(self, tmp_path):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.record(ms / 1000)
+        text = histogram.percentile_distribution()
+        lines = text.splitlines()
+        assert lines[0].split() == ["Value", "Percentile", "TotalCount", "1/(1-Percentile)"]
+        assert lines[-1].startswith("#[Buckets")
+        assert "Total count    =          100" in text
+        assert lines[-4].split()[:3] == ["100.000", "1.000000000000", "100"]
+
+
+class TestLoadGenerator:
+    """Workloads against an in-process fake API."""
+
+    def test_corpus_and_conversations(self):
+        """All three runner corpora load and group into per-mobile conversations."""
+        corpus = load_corpus()
+        conversations = build_conversations(corpus, 3, seed=1)
+        assert len(corpus) > 100
+        assert all(len({t.mobile for t in c.turns}) == 1 and len(c.turns) <= 3 for c in conversations)
+        assert sum(len(c.turns) for c in conversations) == len(corpus)
+
+    async def test_closed_loop_multi_turn(self, tmp_path):
+        """Later turns carry the earlier exchange as conversation_context."""
+        contexts = []
+        conversations = [Conversation("+919820301212", [
+            Turn("show my bookings", "list_bookings", "+919820301212"),
+            Turn("and payments", "list_payments", "+919820301212"),
+            Turn("please fail", "list_payments", "+919820301212"),
+        ])]
+        transport = httpx.ASGITransport(app=fake_api(contexts))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            generator = LoadGenerator(client, conversations, panel_share=0.5)
+            elapsed = await generator.closed_loop(users=4, duration=0.2)
+
+        report = generator.recorder.report(elapsed, {})
+        assert contexts[0] is None or contexts[0].startswith("user:")
+        assert any(c and "user: show my bookings\nassistant: answer" in c for c in contexts)
+        assert report["endpoints"]["POST /mvp/query"]["count"] == len(contexts)
+        assert report["intents"]["list_payments"]["app_errors"] > 0
+        assert report["endpoints"]["POST /mvp/query"]["errors"] == 0
+        assert "GET /mvp/user-data" in report["endpoints"]
+        assert set(report["overall"]) >= {"p50_ms", "p95_ms", "p99_ms", "p999_ms", "throughput_rps", "error_rate"}
+
+        files = write_hgrm(generator.recorder, tmp_path)
+        assert any(f.endswith("POST__mvp_query.hgrm") for f in files)
+        assert compare_reports(report, json.loads(json.dumps(report)))["POST /mvp/query"]["p50_ms"]["change_pct"] == 0.0
+
+    async def test_open_loop_rate(self):
+        """Arrivals follow the requested rate regardless of response times."""
+        contexts = []
+        conversations = [Conversation("+1", [Turn("hi", "greeting", "+1")])]
+        transport = httpx.ASGITransport(app=fake_api(contexts))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            generator = LoadGenerator(client, conversations, panel_share=0.0)
+            await generator.open_loop(rate=200, duration=0.5)
+        assert 60 <= len(contexts) <= 160
+
+    def test_context_matches_chat_ui(self):
+        """Only the last 10 messages are sent, as role: content lines."""
+        history = [{"role": "user", "content": str(i)} for i in range(12)]
+        assert conversation_context(history).splitlines() == [f"user: {i}" for i in range(2, 12)]
+        assert conversation_context([]) is None
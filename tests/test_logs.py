@@ -0,0 +1,136 @@
+"""
+Tests for queued logging: lazy formatting, rate limiting, sampling and the JSON formatter.
+"""
+import io
+import json
+import logging
+import queue
+import sys
+import time
+
+import pytest
+
+from app.config import get_settings
+from app.core import logs, tracing
+from app.core.logs import RateLimitFilter, NonBlockingQueueHandler, JsonFormatter, configure_logging, shutdown_logging
+from app.core.tracing import Trace
+
+logger = logging.getLogger("tests.logs")
+
+
+class SlowStream(io.StringIO):
+    """A stream whose writes take `delay` seconds, like a blocked pipe."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+@pytest.fixture
+def restore_logging():
+    yield
+    configure_logging()
+
+
+def make_record(msg="hello %s", args=("world",), level=logging.INFO, lineno=10):
+    return logging.LogRecord("tests.logs", level, "/app/x.py", lineno, msg, args, None)
+
+
+class TestQueueHandler:
+    """Records are enqueued unformatted and written off the caller's thread."""
+
+    def test_immutable_args_stay_lazy(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        record = handler.prepare(make_record())
+        assert record.msg == "hello %s" and record.args == ("world",)
+
+        mutable = [1]
+        record = handler.prepare(make_record("data %s %s", (mutable, "x")))
+        mutable.append(2)
+        assert record.getMessage() == "data [1] x"
+        mapping = {"a": 1}
+        record = handler.prepare(make_record("data %s", (mapping,)))
+        mapping["a"] = 2
+        assert record.getMessage() == "data {'a': 1}"
+
+    def test_trace_id_and_exception_captured_on_caller(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        trace = Trace()
+        token = tracing._current_trace.set(trace)
+        try:
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                record = logger.makeRecord("tests.logs", logging.ERROR, "x.py", 1, "failed", (), sys.exc_info())
+            record = handler.prepare(record)
+        finally:
+            tracing._current_trace.reset(token)
+        line = json.loads(JsonFormatter().format(record))
+        assert line["trace_id"] == trace.trace_id
+        assert line["level"] == "ERROR"
+        assert "ValueError: boom" in line["exc"]
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(make_record())
+        handler.handle(make_record())
+        assert handler.dropped == 1
+
+    def test_slow_output_does_not_block_caller(self, restore_logging):
+        stream = SlowStream(delay=0.05)
+        configure_logging(level="INFO", fmt="text", stream=stream)
+        started = time.perf_counter()
+        for i in range(5):
+            logger.info("request %d", i)
+        assert time.perf_counter() - started < 0.05
+        shutdown_logging()
+        lines = [l for l in stream.getvalue().splitlines() if "tests.logs" in l]
+        assert len(lines) == 5 and lines[-1].endswith("request 4")
+
+
+class TestRateLimit:
+    """Per-call-site token buckets and sampling."""
+
+    def test_bucket_per_call_site_reports_suppressed(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(logs.time, "monotonic", lambda: now[0])
+        limiter = RateLimitFilter(rate_per_s=2)
+        passed = [limiter.filter(make_record()) for _ in range(10)]
+        assert passed.count(True) == 2
+        assert limiter.filter(make_record(lineno=11))  # Another call site has its own bucket
+        now[0] += 1.0
+        record = make_record()
+        assert limiter.filter(record)
+        assert record.suppressed == 8
+        assert limiter.stats["rate_limited"] == 8
+
+    def test_errors_are_never_dropped(self):
+        limiter = RateLimitFilter(rate_per_s=1, sample_rate=0.0)
+        assert all(limiter.filter(make_record(level=logging.ERROR)) for _ in range(5))
+
+    def test_sampling_applies_to_info_and_below(self):
+        limiter = RateLimitFilter(rate_per_s=0, sample_rate=0.0)
+        assert not limiter.filter(make_record())
+        assert limiter.filter(make_record(level=logging.WARNING))
+        record = make_record()
+        record.sample_rate = 1.0  # Per-record override via extra={"sample_rate": ...}
+        assert limiter.filter(record)
+
+
+class TestJsonOutput:
+    """End to end through configure_logging."""
+
+    def test_json_lines(self, restore_logging, monkeypatch):
+        monkeypatch.setattr(get_settings(), "LOG_RATE_LIMIT_PER_S", 0)
+        stream = io.StringIO()
+        configure_logging(level="INFO", fmt="json", stream=stream)
+        logger.debug("hidden %s", "x")
+        logger.info("Universal Query from %s: %.5s...", "+91******1212", "Show my payments")
+        shutdown_logging()
+        entries = [json.loads(l) for l in stream.getvalue().splitlines()]
+        entries = [e for e in entries if e["logger"] == "tests.logs"]
+        assert [e["msg"] for e in entries] == ["Universal Query from +91******1212: Show ..."]
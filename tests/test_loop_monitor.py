@@ -0,0 +1,105 @@
+"""
+Tests for the event-loop lag monitor and serialization offload.
+"""
+import asyncio
+import contextvars
+import datetime
+import decimal
+import json
+import threading
+import time
+
+from app.config import get_settings
+from app.core.loop_monitor import LoopLagMonitor
+from app.core.metrics import LOOP_BLOCKS, OFFLOAD_TASKS
+from app.core.offload import offload, payload_cells, encode_json
+
+
+def _blocking_section():
+    time.sleep(0.25)
+
+
+class TestLoopLagMonitor:
+    """Stall detection and attribution."""
+
+    async def test_stall_is_attributed_to_blocking_code(self):
+        monitor = LoopLagMonitor(interval_ms=10, block_threshold_ms=50)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_section()
+            await asyncio.sleep(0.05)
+        finally:
+            await monitor.stop()
+        report = monitor.report()
+        assert report
+        site = report[0]
+        assert site["site"].endswith(":_blocking_section")
+        assert site["count"] == 1
+        assert site["max_ms"] >= 150
+        assert any("_blocking_section" in frame for frame in site["stack"])
+        assert LOOP_BLOCKS.value(site["site"]) >= 1
+
+    async def test_idle_loop_records_nothing(self):
+        monitor = LoopLagMonitor(interval_ms=10, block_threshold_ms=100)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+        assert monitor.report() == []
+
+
+class TestOffload:
+    """Size-based inline/pool dispatch and the row-wise JSON encoder."""
+
+    def test_encode_json_matches_json_dumps(self):
+        data = {
+            "profile": {"name": "Asha", "created_at": datetime.datetime(2025, 1, 2, 3, 4)},
+            "recent_payments": [{"amount": decimal.Decimal("10.50"), "note": "ü", "paid": None}],
+            "agent_info": {},
+            "markups": [],
+            7: [1, 2.5, True],
+        }
+        assert encode_json(data) == json.dumps(data, default=str)
+        assert encode_json([]) == "[]"
+
+    def test_payload_cells(self):
+        data = {"profile": {"a": 1, "b": 2}, "rows": [{"x": 1, "y": 2, "z": 3}] * 4, "n": 5}
+        assert payload_cells(data) == 2 + 12 + 1
+
+    async def test_small_payload_runs_inline(self):
+        threshold = get_settings().OFFLOAD_MIN_CELLS
+        before = OFFLOAD_TASKS.value("test", "inline")
+        thread = await offload("test", threshold - 1, threading.get_ident)
+        assert thread == threading.get_ident()
+        assert OFFLOAD_TASKS.value("test", "inline") == before + 1
+
+    async def test_large_payload_runs_in_pool_with_context(self):
+        var = contextvars.ContextVar("offload_test", default=None)
+        var.set("request-1")
+        threshold = get_settings().OFFLOAD_MIN_CELLS
+        thread, value = await offload("test", threshold, lambda: (threading.get_ident(), var.get()))
+        assert thread != threading.get_ident()
+        assert value == "request-1"
+        assert OFFLOAD_TASKS.value("test", "pool") >= 1
+
+    async def test_pool_keeps_loop_responsive(self):
+        """Python-level work in the pool lets the loop's timers run meanwhile."""
+        def heavy():
+            deadline = time.perf_counter() + 0.2
+            while time.perf_counter() < deadline:
+                encode_json([{"i": i} for i in range(50)])
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await offload("test", get_settings().OFFLOAD_MIN_CELLS, heavy)
+        task.cancel()
+        assert ticks >= 5
@@ -0,0 +1,105 @@
+"""
+Tests for memory instrumentation, the admin memory endpoint and soak-test evaluation.
+"""
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.config import get_settings
+from app.core.memory import AllocationTracker, memory_stats
+from app.api.debug import router as debug_router
+from benchmarks.soak import slope_per_hour, evaluate, soak_conversations
+from benchmarks.suite import HEAVY_MOBILE
+
+TOKEN = "admin-token"
+
+
+@pytest.fixture
+def tracing():
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(1)
+    yield
+    if started:
+        tracemalloc.stop()
+
+
+def _leak(store: list, n: int) -> None:
+    store.extend(bytearray(1024) for _ in range(n))
+
+
+class TestMemoryStats:
+    """Point-in-time stats and allocation diffs."""
+
+    def test_stats_without_tracemalloc(self):
+        if tracemalloc.is_tracing():
+            pytest.skip("tracemalloc already tracing")
+        stats = memory_stats(top=5)
+        assert stats["peak_rss_bytes"] > 0
+        assert stats["allocated_blocks"] > 0
+        assert stats["gc_objects"] > 0
+        assert stats["tracemalloc"] is None
+        assert "top_allocators" not in stats
+
+    def test_stats_with_tracemalloc(self, tracing):
+        stats = memory_stats(top=5)
+        assert stats["tracemalloc"]["current_bytes"] >= 0
+        assert len(stats["top_allocators"]) <= 5
+
+    def test_tracker_finds_growing_site(self, tracing):
+        store = []
+        tracker = AllocationTracker()
+        assert tracker.snapshot() == []
+        _leak(store, 500)
+        growth = tracker.snapshot(limit=3)
+        assert growth
+        top = growth[0]
+        assert top["size_diff_kib"] >= 400
+        assert top["count_diff"] >= 500
+        assert "test_memory.py" in top["site"]
+
+
+class TestMemoryEndpoint:
+    """GET /debug/memory is admin-only."""
+
+    @pytest.fixture
+    async def client(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "PROFILE_TOKEN", TOKEN)
+        app = FastAPI()
+        app.include_router(debug_router)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            yield c
+
+    async def test_requires_token(self, client):
+        assert (await client.get("/debug/memory")).status_code == 403
+        response = await client.get("/debug/memory", headers={"X-Profile-Token": TOKEN})
+        assert response.status_code == 200
+        assert response.json()["rss_bytes"] is None or response.json()["rss_bytes"] > 0
+
+
+class TestSoakEvaluation:
+    """Slopes and pass/fail limits."""
+
+    def test_slope_per_hour(self):
+        samples = [{"elapsed_s": t, "blocks": 1000 + t * 10} for t in (0, 60, 120, 180)]
+        assert slope_per_hour(samples, "blocks") == pytest.approx(36000)
+        assert slope_per_hour(samples[:2], "blocks") is None
+
+    def test_evaluate_flags_growth(self):
+        samples = [
+            {"elapsed_s": t, "warmup": t == 0, "rss_bytes": 100 * 2**20 + t * 2**20 // 60,
+             "blocks": 5000 + t, "traced_bytes": 0, "gc_objects": 10}
+            for t in (0, 600, 1200, 1800, 2400)
+        ]
+        verdict = evaluate(samples, max_rss_mb_per_hour=20, max_blocks_per_hour=50_000)
+        assert verdict["steady_samples"] == 4
+        assert not verdict["passed"]
+        assert verdict["violations"][0].startswith("RSS grows 60.0 MiB/h")
+        assert evaluate(samples, max_rss_mb_per_hour=100, max_blocks_per_hour=50_000)["passed"]
+
+    def test_conversations_target_heavy_user(self):
+        conversations = soak_conversations(turns=2, seed=1)
+        assert conversations
+        assert {turn.mobile for c in conversations for turn in c.turns} == {HEAVY_MOBILE}
@@ -0,0 +1,87 @@
+"""
+Tests for the Prometheus metrics registry, middleware and /metrics endpoint.
+"""
+import httpx
+from fastapi import FastAPI
+
+from app.core.metrics import Registry, Histogram, MetricsMiddleware, label_request, HTTP_REQUEST_SECONDS
+
+
+class TestRegistry:
+    """Text exposition of counters, gauges and histograms."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        hist = registry.histogram("t_seconds", "test", ("table",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            hist.observe(value, "payments")
+        text = registry.render()
+        assert '# TYPE t_seconds histogram' in text
+        assert 't_seconds_bucket{table="payments",le="0.1"} 1' in text
+        assert 't_seconds_bucket{table="payments",le="1.0"} 3' in text
+        assert 't_seconds_bucket{table="payments",le="+Inf"} 4' in text
+        assert 't_seconds_count{table="payments"} 4' in text
+        assert 't_seconds_sum{table="payments"} 6.05' in text
+
+    def test_counter_gauge_and_escaping(self):
+        registry = Registry()
+        counter = registry.counter("t_total", "test", ("endpoint",))
+        counter.inc('/a"b')
+        counter.inc('/a"b', amount=2)
+        gauge = registry.gauge("t_in_flight", "test")
+        gauge.inc()
+        gauge.dec()
+        text = registry.render()
+        assert 't_total{endpoint="/a\\"b"} 3' in text
+        assert "t_in_flight 0" in text
+
+    def test_empty_families_and_collectors(self):
+        registry = Registry()
+        registry.counter("t_unused", "never incremented")
+        extra = Histogram("t_collected", "from a collector", buckets=(1.0,))
+        extra.observe(0.5)
+        registry.add_collector(lambda: [extra])
+        text = registry.render()
+        assert "t_unused" not in text
+        assert "t_collected_count 1" in text
+
+
+class TestMiddleware:
+    """Latency samples labelled by route template, mode and intent."""
+
+    async def test_labels_from_handler(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/things/{thing_id}")
+        async def thing(thing_id: int):
+            label_request(mode="admin", intent="list_things")
+            return {"id": thing_id}
+
+        before = HTTP_REQUEST_SECONDS.count("/things/{thing_id}", "GET", "200", "admin", "list_things")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/things/1")
+            await client.get("/things/2")
+            await client.get("/nowhere")
+        assert HTTP_REQUEST_SECONDS.count("/things/{thing_id}", "GET", "200", "admin", "list_things") == before + 2
+        assert HTTP_REQUEST_SECONDS.count("unmatched", "GET", "404", "", "") >= 1
+
+    def test_label_request_outside_request_is_ignored(self):
+        label_request(mode="user")
+
+
+class TestEndpoint:
+    """GET /metrics on the real app with the stand-in database."""
+
+    async def test_pool_db_and_request_metrics(self, standin_engine):
+        from app.main import app
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/mvp/user-data/recent_payments", params={"mobile": "+919820301212"})
+            response = await client.get("/metrics")
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert 'flyshop_db_pool_connections{pool="interactive",node="primary",state="size"}' in text
+        assert 'flyshop_db_query_duration_seconds_count{table="query_payments"}' in text
+        assert 'flyshop_db_rows_total{table="query_payments"}' in text
+        assert 'endpoint="/mvp/user-data/{section}",method="GET",status="200",mode="user",intent="section:recent_payments"' in text
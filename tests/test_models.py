@@ -3,6 +3,7 @@ Tests for request models.
 """
 import pytest
 from pydantic import ValidationError
+from app.config import get_settings
 from app.models.requests import QueryRequest
 
 
@@ -55,3 +56,8 @@ class TestQueryRequest:
         """Offset must be non-negative."""
         with pytest.raises(ValidationError):
             QueryRequest(mobile="+919999999999", query="test", offset=-1)
+    
+    def test_offset_bounded(self):
+        """Offsets beyond MAX_OFFSET are rejected."""
+        with pytest.raises(ValidationError):
+            QueryRequest(mobile="+919999999999", query="test", offset=get_settings().MAX_OFFSET + 1)
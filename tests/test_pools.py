@@ -0,0 +1,181 @@
+"""
+Tests for per-class connection pools: admission gates, routing and isolation under load.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.config import get_settings
+from app.db import database, pools
+from app.db.pools import (
+    POOL_ANALYTICS,
+    POOL_INTERACTIVE,
+    POOL_MAINTENANCE,
+    PoolGate,
+    PoolSaturatedError,
+    current_pool,
+    pool_class,
+    use_pool,
+)
+
+MOBILE = "+919820301212"
+# A CPU-bound full scan stand-in: counts to :n inside SQLite (~0.1 s for n=400000)
+ANALYTICS_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) "
+    "SELECT COUNT(*) AS n FROM c"
+)
+
+
+class TestPoolGate:
+    """Bounded concurrency, bounded queue, bounded wait."""
+
+    async def test_queue_limit_rejects_at_once(self):
+        gate = PoolGate("analytics", capacity=1, queue_limit=1, timeout=5)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+        with pytest.raises(PoolSaturatedError, match="saturated"):
+            await gate.acquire()
+        gate.release()
+        await waiter
+        assert gate.in_use == 1 and gate.stats == {"admitted": 2, "queue_full": 1, "timeout": 0}
+
+    async def test_wait_times_out(self):
+        gate = PoolGate("maintenance", capacity=1, queue_limit=5, timeout=0.01)
+        await gate.acquire()
+        with pytest.raises(PoolSaturatedError, match="timed out"):
+            await gate.acquire()
+        assert gate.waiting == 0 and gate.stats["timeout"] == 1
+        gate.release()
+        assert gate.in_use == 0
+
+    async def test_release_hands_slot_to_oldest_waiter(self):
+        gate = PoolGate("interactive", capacity=1, queue_limit=5, timeout=5)
+        order = []
+
+        async def worker(name):
+            async with gate.slot():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await gate.acquire()
+        tasks = [asyncio.create_task(worker(n)) for n in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        tasks[1].cancel()  # A cancelled waiter must not swallow the slot
+        gate.release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert order == ["a", "c"]
+        assert gate.in_use == 0 and gate.waiting == 0
+
+
+class TestRouting:
+    """Pool class is a contextvar set per block or per function."""
+
+    async def test_use_pool_and_decorator(self):
+        @pool_class(POOL_MAINTENANCE)
+        async def operator_tool():
+            return current_pool()
+
+        assert current_pool() == POOL_INTERACTIVE
+        assert await operator_tool() == POOL_MAINTENANCE
+        with use_pool(POOL_ANALYTICS):
+            # asyncio.gather children inherit the class
+            assert await asyncio.gather(asyncio.sleep(0, current_pool())) == [POOL_ANALYTICS]
+        assert current_pool() == POOL_INTERACTIVE
+        with pytest.raises(ValueError):
+            with use_pool("reporting"):
+                pass
+
+    async def test_endpoints_route_by_class(self, monkeypatch):
+        from app.api import query, debug
+        seen = []
+
+        async def record_pool(sql, params, **options):
+            seen.append(current_pool())
+            return []
+
+        monkeypatch.setattr(query, "execute_readonly_query", record_pool)
+        monkeypatch.setattr(debug, "execute_readonly_query", record_pool)
+        await query.fetch_global_context()
+        await debug.get_test_users()
+        assert set(seen[:-1]) == {POOL_ANALYTICS} and seen[-1] == POOL_MAINTENANCE
+
+
+@pytest.fixture
+async def standin_pools(tmp_path, monkeypatch):
+    """One stand-in engine per pool (as in production), small pools, fresh gates."""
+    from app.db.standin import create_standin_engine
+
+    path = tmp_path / "standin.db"
+    await create_standin_engine(str(path)).dispose()  # Build the file once
+    settings = get_settings()
+    for name, value in {
+        "DB_BACKEND": "standin", "STANDIN_DB_PATH": str(path),
+        "DB_POOL_SIZE": 4, "DB_POOL_MAX_OVERFLOW": 0,
+        "DB_ANALYTICS_POOL_SIZE": 2, "DB_ANALYTICS_QUEUE_LIMIT": 8,
+        "SLOW_QUERY_MS": 60000.0,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(database, "_engines", {})
+    monkeypatch.setattr(database, "_session_factories", {})
+    monkeypatch.setattr(pools, "_gates", {})
+    yield
+    await database.dispose_engines()
+
+
+async def interactive_p99_ms(samples: int = 60) -> float:
+    """p99 of sequential customer mobile checks, in ms."""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        assert await database.validate_mobile_exists(MOBILE)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[int(len(timings) * 0.99) - 1]
+
+
+async def saturate(pool: str, workers: int, stop: asyncio.Event, outcomes: dict) -> None:
+    """Run slow aggregate queries on `pool` from `workers` concurrent callers until stopped."""
+    async def worker():
+        with use_pool(pool):
+            while not stop.is_set():
+                try:
+                    await database.execute_readonly_query(ANALYTICS_SQL, {"n": 400_000})
+                    outcomes["done"] += 1
+                except PoolSaturatedError:
+                    outcomes["rejected"] += 1
+                    await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[worker() for _ in range(workers)])
+
+
+class TestBulkhead:
+    """Analytics saturating its own pool leaves customer latency alone."""
+
+    async def run_under_load(self, load_pool: str, samples: int = 60) -> tuple[float, dict]:
+        stop = asyncio.Event()
+        outcomes = {"done": 0, "rejected": 0}
+        load = asyncio.create_task(saturate(load_pool, 12, stop, outcomes))
+        await asyncio.sleep(0.3)  # Let the load fill its pool and queue
+        p99 = await interactive_p99_ms(samples)
+        stop.set()
+        await load
+        return p99, outcomes
+
+    async def test_customer_p99_flat_while_analytics_saturated(self, standin_pools):
+        baseline = await interactive_p99_ms()
+        loaded, outcomes = await self.run_under_load(POOL_ANALYTICS)
+
+        gate = pools.get_pool_gate(POOL_ANALYTICS)
+        assert outcomes["done"] > 0 and outcomes["rejected"] > 0  # Analytics really was saturated
+        assert gate.stats["queue_full"] == outcomes["rejected"]
+        assert pools.get_pool_gate(POOL_INTERACTIVE).stats["queue_full"] == 0
+        assert loaded < baseline + 50, f"customer p99 {loaded:.1f} ms vs {baseline:.1f} ms idle"
+
+    async def test_shared_pool_would_not_be_flat(self, standin_pools):
+        """Control: the same load on the customer pool does move customer p99."""
+        baseline = await interactive_p99_ms()
+        loaded, _ = await self.run_under_load(POOL_INTERACTIVE, samples=3)
+        assert loaded > baseline + 50
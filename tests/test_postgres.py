@@ -0,0 +1,132 @@
+"""
+Tests for the PostgreSQL backend: MySQL-to-PostgreSQL translation, dialect
+template variants, URL building and the single-statement context fetch.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+import base64
+import json
+
+import pytest
+
+from app.api import query as query_api
+from app.config import get_settings
+from app.core.context_sections import CONTEXT_SECTIONS, build_section_page_query
+from app.core.pagination import CursorError, decode_cursor, encode_cursor, split_page
+from app.core.sql_templates import SQL_TEMPLATES, template_sql
+from app.db import database
+from app.db.drivers import backend_driver
+from app.db.postgres import CONTEXT_JSON_SQL, decode_context_row, is_server_timeout, translate_mysql_sql
+
+
+class TestTranslation:
+    def test_functions(self):
+        sql = translate_mysql_sql(
+            "SELECT GROUP_CONCAT(CONCAT('#', query_id, ' (', DATE_FORMAT(created_at, '%Y-%m-%d'), ')') "
+            "SEPARATOR ' | ') FROM query_masters"
+        )
+        assert sql == (
+            "SELECT string_agg(CAST(('#' || CAST(query_id AS TEXT) || ' (' || "
+            "CAST(to_char(created_at, 'YYYY-MM-DD') AS TEXT) || ')') AS TEXT), ' | ') FROM query_masters"
+        )
+        assert translate_mysql_sql("SELECT DATE_FORMAT(d, '%d %b at %H:%i') FROM t") == (
+            "SELECT to_char(d, 'DD Mon \"at\" HH24:MI') FROM t"
+        )
+
+    def test_mysql_null_ordering(self):
+        """NULLs sort first ascending and last descending, as keyset cursors expect."""
+        assert translate_mysql_sql("SELECT * FROM t ORDER BY a DESC, b LIMIT :n") == (
+            "SELECT * FROM t ORDER BY a DESC NULLS LAST, b NULLS FIRST LIMIT :n"
+        )
+        assert translate_mysql_sql("SELECT * FROM (SELECT * FROM t ORDER BY x ASC) s ORDER BY y NULLS LAST") == (
+            "SELECT * FROM (SELECT * FROM t ORDER BY x ASC NULLS FIRST) s ORDER BY y NULLS LAST"
+        )
+
+    def test_literals_and_comments_left_alone(self):
+        sql = "SELECT 'CONCAT(a) ORDER BY (' AS note -- ORDER BY ( CONCAT(\nFROM t WHERE id = 1"
+        assert translate_mysql_sql(sql) == sql
+
+    def test_server_timeout(self):
+        class Canceled(Exception):
+            sqlstate = "57014"
+
+        error = Exception()
+        error.orig = Canceled()
+        assert is_server_timeout(error) and not is_server_timeout(Exception())
+
+
+class TestKeysetCursors:
+    """asyncpg types a cursor parameter from its column, so it must be bound as that Python type."""
+
+    def test_sort_values_bound_with_their_type(self):
+        departure = datetime(2026, 3, 1, 10, 30)
+        rows = [{"id": 9, "departure_datetime": departure}, {"id": 8, "departure_datetime": departure}]
+        _, cursor = split_page(rows, 1, "departure_datetime", "id", "DESC")
+        _, params, _ = build_section_page_query("recent_bookings", cursor)
+        assert params["cursor_sort"] == departure and type(params["cursor_sort"]) is datetime
+        for value in (date(2026, 3, 1), Decimal("1500.50"), "2026-03-01", 42):
+            sort_value = decode_cursor(encode_cursor("v", value, 1))[1]
+            assert sort_value == value and type(sort_value) is type(value)
+
+    def test_bad_type_tag(self):
+        token = lambda position: base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+        for position in (["v", "yesterday", 1, "dt"], ["v", "2026-03-01", 1, "uuid"], ["v", 5, 1, "dec"]):
+            with pytest.raises(CursorError):
+                decode_cursor(token(position))
+
+
+class TestConfiguration:
+    def test_url_and_driver(self, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "DB_BACKEND", "postgresql")
+        monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://crm:pw@pg:5432/crm")
+        url = database.build_database_url()
+        assert url.drivername == "postgresql+asyncpg" and url.host == "pg" and url.database == "crm"
+        assert backend_driver() == "asyncpg"
+        monkeypatch.setattr(settings, "DATABASE_URL", "mysql+aiomysql://u:p@db/crm")
+        with pytest.raises(ValueError, match="postgresql://"):
+            database.build_database_url()
+
+    def test_template_variant(self, monkeypatch):
+        settings = get_settings()
+        template = SQL_TEMPLATES["my_profile"]
+        assert "GROUP_CONCAT" in template_sql(template)
+        monkeypatch.setattr(settings, "DB_BACKEND", "postgresql")
+        assert "string_agg" in template_sql(template) and "MAX(qm.user_name)" in template_sql(template)
+        # Templates without a variant are shared
+        other = next(t for t in SQL_TEMPLATES.values() if "dialects" not in t)
+        assert template_sql(other) == other["query"]
+
+
+class TestSingleStatementContext:
+    def test_decode(self):
+        row = {
+            "profile": json.dumps({"query_id": 7, "admin_ref": "A1", "created_at": "2025-01-02T03:04:05"}),
+            "agent_info": None,
+            **{name: "[]" for name in CONTEXT_SECTIONS},
+            "recent_payments": '[{"id": 3, "recieved_amount": 1500.50}]',
+        }
+        context = decode_context_row(row)
+        assert list(context) == ["profile", *CONTEXT_SECTIONS, "agent_info"]
+        assert context["recent_payments"] == [{"id": 3, "recieved_amount": Decimal("1500.50")}]
+        assert context["profile"]["query_id"] == 7 and context["agent_info"] == {}
+        assert decode_context_row({})["markups"] == []
+
+    async def test_fetch_is_one_statement(self, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "DB_BACKEND", "postgresql")
+        calls = []
+
+        async def fake_execute(query, params):
+            calls.append((query, params))
+            if not settings.DB_PG_SINGLE_STATEMENT_CONTEXT:
+                return []
+            return [{"profile": '{"query_id": 1}', "agent_info": None, **{name: "[]" for name in CONTEXT_SECTIONS}}]
+
+        monkeypatch.setattr(query_api, "execute_readonly_query", fake_execute)
+        context = await query_api.fetch_universal_context("+919820301212")
+        assert calls == [(CONTEXT_JSON_SQL, {"m_wild": "%9820301212"})]
+        assert context["profile"] == {"query_id": 1}
+        monkeypatch.setattr(settings, "DB_PG_SINGLE_STATEMENT_CONTEXT", False)
+        await query_api.fetch_universal_context("+919820301212")
+        assert len(calls) > 2
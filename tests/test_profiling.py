@@ -0,0 +1,121 @@
+"""
+Tests for admin-authorized per-request profiling.
+"""
+import asyncio
+import pstats
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.config import get_settings
+from app.core.profiling import ProfilingMiddleware, list_profiles, profile_path
+from app.core.tracing import TracingMiddleware
+from app.api.debug import router as debug_router
+
+TOKEN = "s3cret-admin-token"
+
+
+def busy_work(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def profiled_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(TracingMiddleware)
+    app.include_router(debug_router)
+
+    @app.post("/mvp/query")
+    async def query():
+        await asyncio.sleep(0.01)
+        return {"total": busy_work(200_000)}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    return app
+
+
+@pytest.fixture
+def profile_settings(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 2)
+    return settings
+
+
+@pytest.fixture
+async def client(profile_settings):
+    transport = httpx.ASGITransport(app=profiled_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+class TestProfilingMiddleware:
+    """Authorization, stored formats and retention."""
+
+    async def test_cprofile_is_stored_and_downloadable(self, client):
+        response = await client.post("/mvp/query", headers={"X-Profile-Token": TOKEN})
+        assert response.status_code == 200
+        assert response.headers["x-profile-status"] == "recorded"
+        profile_id = response.headers["x-profile-id"]
+        path = profile_path(profile_id)
+        assert path is not None and path.suffix == ".pstats"
+        functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+        assert "busy_work" in functions
+
+        download = await client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile-Token": TOKEN})
+        assert download.status_code == 200
+        assert download.content == path.read_bytes()
+
+    async def test_sampling_mode_writes_folded_stacks(self, client):
+        response = await client.post(f"/mvp/query?profile_token={TOKEN}&profile_mode=sample")
+        path = profile_path(response.headers["x-profile-id"])
+        assert path.suffix == ".collapsed"
+        lines = path.read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) >= 1 and ";" in stack
+
+    async def test_unauthorized_requests_are_not_profiled(self, client, profile_settings):
+        response = await client.post("/mvp/query", headers={"X-Profile-Token": "wrong"})
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+        assert (await client.get("/debug/profiles", headers={"X-Profile-Token": "wrong"})).status_code == 403
+
+        profile_settings.PROFILE_TOKEN = ""  # Disabled: no token is valid
+        response = await client.post("/mvp/query", headers={"X-Profile-Token": ""})
+        assert "x-profile-id" not in response.headers
+        assert list_profiles() == []
+
+    async def test_other_paths_are_ignored(self, client):
+        response = await client.get("/health", headers={"X-Profile-Token": TOKEN})
+        assert "x-profile-id" not in response.headers
+
+    async def test_retention_keeps_newest(self, client):
+        ids = []
+        for _ in range(3):
+            response = await client.post("/mvp/query", headers={"X-Profile-Token": TOKEN})
+            ids.append(response.headers["x-profile-id"])
+            await asyncio.sleep(0.01)
+        listed = (await client.get("/debug/profiles", headers={"X-Profile-Token": TOKEN})).json()["profiles"]
+        assert [p["id"] for p in listed] == ids[:0:-1]
+        assert profile_path(ids[0]) is None
+
+    async def test_download_rejects_bad_ids(self, client):
+        response = await client.get("/debug/profiles/..%2Fsecrets", headers={"X-Profile-Token": TOKEN})
+        assert response.status_code == 404
+
+
+class TestAdminOnlyDebugEndpoints:
+    """Statement fingerprints, loop-block stacks and cache stats need the admin token too."""
+
+    @pytest.mark.parametrize("path", ["/debug/slow-queries", "/debug/loop-blocks", "/debug/cache-stats"])
+    async def test_requires_token(self, client, path):
+        assert (await client.get(path)).status_code == 403
+        assert (await client.get(path, headers={"X-Profile-Token": "wrong"})).status_code == 403
+        assert (await client.get(path, headers={"X-Profile-Token": TOKEN})).status_code == 200
+        assert (await client.get(path, params={"profile_token": TOKEN})).status_code == 200
@@ -62,3 +62,84 @@ class TestCreateQueryPlan:
         assert isinstance(result, QueryPlan)
         assert result.params["limit"] == 25
         assert result.params["offset"] == 10
+
+
+class TestKeysetPagination:
+    """Tests for cursor-based pagination of list intents."""
+    
+    def test_first_page_uses_keyset(self):
+        """List intents without an offset are planned as keyset pages."""
+        extraction = IntentExtractionResult(intent="list_queries", entities={})
+        result = create_query_plan(extraction, mobile="+919999999999", limit=20)
+        
+        assert isinstance(result, QueryPlan)
+        assert result.pagination == "keyset"
+        assert result.params["limit"] == 21  # one extra row to detect the next page
+        assert "offset" not in result.params
+        assert "OFFSET" not in result.sql
+        assert "{seek}" not in result.sql
+        assert "OFFSET" not in result.sanitized_sql and "LIMIT ?" in result.sanitized_sql
+    
+    def test_cursor_continues_after_last_row(self):
+        """The next_cursor from one page seeks past its last row."""
+        extraction = IntentExtractionResult(intent="list_quotations", entities={})
+        first = create_query_plan(extraction, mobile="+919999999999", limit=2)
+        rows = [
+            {"quotation_id": "QT3", "sent_at": "2026-01-03"},
+            {"quotation_id": "QT2", "sent_at": "2026-01-02"},
+            {"quotation_id": "QT1", "sent_at": "2026-01-01"},
+        ]
+        page, cursor = first.paginate(rows)
+        assert [r["quotation_id"] for r in page] == ["QT3", "QT2"]
+        assert cursor is not None
+        
+        second = create_query_plan(extraction, mobile="+919999999999", limit=2, cursor=cursor)
+        assert isinstance(second, QueryPlan)
+        assert second.params["cursor_sort"] == "2026-01-02"
+        assert second.params["cursor_id"] == "QT2"
+        assert "(qq.sent_at, qq.quotation_id) < (:cursor_sort, :cursor_id)" in second.sql
+    
+    def test_explicit_offset_falls_back(self):
+        """An explicit offset keeps the LIMIT/OFFSET template."""
+        extraction = IntentExtractionResult(intent="list_bookings", entities={})
+        result = create_query_plan(extraction, mobile="+919999999999", offset=50)
+        
+        assert isinstance(result, QueryPlan)
+        assert result.pagination == "offset"
+        assert "OFFSET :offset" in result.sql
+        assert "OFFSET ?" in result.sanitized_sql
+    
+    def test_invalid_cursor_returns_error(self):
+        """A tampered cursor is a validation error."""
+        extraction = IntentExtractionResult(intent="list_payments", entities={})
+        result = create_query_plan(extraction, mobile="+919999999999", cursor="garbage!!")
+        
+        assert isinstance(result, QueryPlanError)
+        assert result.error_code == ErrorCode.VALIDATION_ERROR
+
+
+class TestQueryEndpointPages:
+    """POST /mvp/query answers list intents page by page when the client pages."""
+    
+    async def test_pages_follow_next_cursor(self):
+        """Cursor pages do not overlap and report the keyset query shape."""
+        from benchmarks.suite import PipelineFixture, HEAVY_MOBILE
+        
+        async with PipelineFixture(queries=200) as fixture:
+            body = {"mobile": HEAVY_MOBILE, "query": "Show my payments", "limit": 3}
+            first = (await fixture.client.post("/mvp/query", json=body)).json()
+            assert first["intent"] == "list_payments" and len(first["data"]) == 3
+            assert first["metadata"]["next_cursor"].startswith("list_payments.")
+            assert "OFFSET" not in first["metadata"]["sql"]
+            assert "gross_profit" not in first["data"][0]
+            
+            cursor = first["metadata"]["next_cursor"]
+            second = (await fixture.client.post("/mvp/query", json={**body, "cursor": cursor})).json()
+            ids = [row["id"] for row in first["data"] + second["data"]]
+            assert len(second["data"]) == 3 and ids == sorted(set(ids), reverse=True)
+            
+            bad = (await fixture.client.post("/mvp/query", json={**body, "cursor": "list_bookings.x"})).json()
+            assert not bad["success"] and bad["error_code"] == ErrorCode.VALIDATION_ERROR
+            
+            chat = (await fixture.client.post("/mvp/query", json={"mobile": HEAVY_MOBILE, "query": "Show my payments"}))
+            assert chat.json()["intent"] == "universal_query"
@@ -0,0 +1,86 @@
+"""
+Tests for the DB/Gemini record-replay journal.
+"""
+from datetime import datetime, date
+from decimal import Decimal
+import time
+import pytest
+
+from app.core import replay
+from app.core.replay import ReplayJournal, ReplayMissError, MODE_RECORD, MODE_REPLAY
+
+
+class FakeGemini:
+    """Slow fake model with the generate_content surface the app uses."""
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    def generate_content(self, prompt):
+        time.sleep(0.05)
+        return self.Response(f"answer to {len(prompt)} chars")
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    yield str(tmp_path / "journal.jsonl.gz")
+    replay.set_replay_journal(None)
+
+
+class TestReplayJournal:
+    """Recorded calls replay identically without the backend."""
+
+    async def test_db_round_trip_keeps_types(self, journal_path, monkeypatch):
+        """Rows come back with datetimes and Decimals intact, with no DB session opened."""
+        from app.db import database
+
+        rows = [{"id": 1, "created_at": datetime(2026, 1, 2, 3, 4, 5), "amount": Decimal("10.50"), "day": date(2026, 1, 2)}]
+
+        recorder = ReplayJournal(MODE_RECORD, journal_path)
+        recorder.record_db("SELECT  *\n FROM t WHERE id = :id", {"id": 1}, rows, latency_ms=12.0)
+        recorder.close()
+
+        def no_db(*args):
+            raise AssertionError("replay must not touch the database")
+
+        monkeypatch.setattr(database, "get_session_factory", no_db)
+        replay.set_replay_journal(ReplayJournal(MODE_REPLAY, journal_path, latency_scale=0))
+        assert await database.execute_readonly_query("SELECT * FROM t WHERE id = :id", {"id": 1}) == rows
+
+        with pytest.raises(ReplayMissError):
+            await database.execute_readonly_query("SELECT * FROM t WHERE id = :id", {"id": 2})
+
+    async def test_records_through_execute_readonly_query(self, journal_path, standin_engine, monkeypatch):
+        """Record mode captures real stand-in queries that replay to the same context."""
+        from app.db import database
+        from app.api.query import fetch_universal_context
+
+        recorder = ReplayJournal(MODE_RECORD, journal_path)
+        replay.set_replay_journal(recorder)
+        live = await fetch_universal_context("+919820301212")
+        recorder.close()
+        await standin_engine.dispose()
+        assert recorder.stats["recorded"] >= 9
+
+        replay.set_replay_journal(ReplayJournal(MODE_REPLAY, journal_path, latency_scale=0))
+        monkeypatch.setattr(database, "_engines", {})
+        monkeypatch.setattr(database, "get_session_factory", None)
+        assert await fetch_universal_context("+919820301212") == live
+
+    def test_llm_replay_with_scaled_latency(self, journal_path):
+        """Gemini answers replay by prompt hash, 10x faster at latency_scale=0.1."""
+        recorder = ReplayJournal(MODE_RECORD, journal_path)
+        recorded = recorder.wrap_model(FakeGemini(), "gemini-test").generate_content("hello")
+        recorder.close()
+
+        player = ReplayJournal(MODE_REPLAY, journal_path, latency_scale=0.1)
+        model = player.wrap_model(None, "gemini-test")
+        started = time.perf_counter()
+        replayed = model.generate_content("hello")
+        elapsed = time.perf_counter() - started
+
+        assert replayed.text == recorded.text
+        assert elapsed < 0.03
+        with pytest.raises(ReplayMissError):
+            model.generate_content("a prompt that was never recorded")
@@ -0,0 +1,134 @@
+"""
+Tests for read-replica routing: weights, per-class lag bounds, ejection, and stand-in replicas.
+"""
+import random
+import shutil
+import sqlite3
+
+import pytest
+
+from app.config import get_settings
+from app.db import database, pools, replicas
+from app.db.pools import POOL_ANALYTICS, POOL_INTERACTIVE, use_pool
+from app.db.replicas import Replica, ReplicaRouter, parse_replicas, get_replica_router, set_replica_router
+
+# 1 on a stand-in replica (it has a replica_status table), 0 on the primary
+ON_REPLICA_SQL = "SELECT COUNT(*) AS n FROM sqlite_master WHERE name = 'replica_status'"
+
+
+def make_router(*weights, lag=0.0):
+    nodes = [Replica(f"replica{i + 1}", f"db-r{i + 1}", weight) for i, weight in enumerate(weights)]
+    for node in nodes:
+        node.lag_s = lag
+        node.probed_at = replicas.time.monotonic()
+    return ReplicaRouter(nodes, probe_interval=5, eject_after=3, eject_seconds=30, rng=random.Random(7))
+
+
+class TestParse:
+    def test_weights_ports_and_paths(self):
+        nodes = parse_replicas(" db-r1:3307=3, db-r2 ,/tmp/replica.db=0.5,")
+        assert [(n.name, n.target, n.weight) for n in nodes] == [
+            ("replica1", "db-r1:3307", 3.0), ("replica2", "db-r2", 1.0), ("replica3", "/tmp/replica.db", 0.5),
+        ]
+        assert nodes[0].host_port(3306) == ("db-r1", 3307) and nodes[1].host_port(3306) == ("db-r2", 3306)
+        with pytest.raises(ValueError):
+            parse_replicas("db-r1=0")
+
+
+class TestRouter:
+    """Choice among replicas by weight, lag bound and health."""
+
+    def test_weighted_choice(self):
+        router = make_router(3, 1)
+        picks = [router.choose(POOL_INTERACTIVE).name for _ in range(4000)]
+        assert 0.7 < picks.count("replica1") / len(picks) < 0.8
+
+    def test_lag_bound_is_per_pool_class(self):
+        router = make_router(1, lag=10.0)  # Over the interactive bound, within analytics'
+        assert router.choose(POOL_INTERACTIVE) is None
+        assert router.choose(POOL_ANALYTICS).name == "replica1"
+        router.replicas[0].lag_s = None  # Replication stopped
+        assert router.choose(POOL_ANALYTICS) is None
+
+    def test_stale_probe_falls_back_to_primary(self):
+        router = make_router(1)
+        router.replicas[0].probed_at -= 60
+        assert router.choose(POOL_ANALYTICS) is None
+
+    def test_ejection_and_return(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(replicas.time, "monotonic", lambda: now[0])
+        router = make_router(1, 1)
+        bad = router.replicas[0]
+        bad.probed_at = router.replicas[1].probed_at = now[0]
+        for _ in range(2):
+            router.report_failure(bad, OSError("refused"))
+        router.report_success(bad)  # A success in between resets the streak
+        for _ in range(3):
+            router.report_failure(bad, OSError("refused"))
+        assert bad.stats == {"routed": 0, "failures": 5, "ejections": 1}
+        assert {router.choose(POOL_INTERACTIVE).name for _ in range(50)} == {"replica2"}
+        now[0] += 31
+        bad.probed_at = router.replicas[1].probed_at = now[0]
+        assert "replica1" in {router.choose(POOL_INTERACTIVE).name for _ in range(50)}
+
+
+@pytest.fixture
+async def standin_replica(tmp_path, monkeypatch):
+    """A stand-in primary and one replica copy, routed through settings."""
+    from app.db.standin import create_standin_engine
+
+    primary = tmp_path / "primary.db"
+    await create_standin_engine(str(primary)).dispose()
+    replica = tmp_path / "replica.db"
+    shutil.copy(primary, replica)
+    with sqlite3.connect(replica) as conn:
+        conn.execute("CREATE TABLE replica_status (lag_seconds REAL)")
+        conn.execute("INSERT INTO replica_status VALUES (0)")
+    settings = get_settings()
+    monkeypatch.setattr(settings, "DB_BACKEND", "standin")
+    monkeypatch.setattr(settings, "STANDIN_DB_PATH", str(primary))
+    monkeypatch.setattr(settings, "DB_REPLICAS", str(replica))
+    monkeypatch.setattr(database, "_engines", {})
+    monkeypatch.setattr(database, "_session_factories", {})
+    monkeypatch.setattr(pools, "_gates", {})
+    set_replica_router(None)
+    yield replica
+    set_replica_router(None)
+    await database.dispose_engines()
+
+
+async def on_replica(pool: str = POOL_INTERACTIVE) -> bool:
+    with use_pool(pool):
+        rows = await database.execute_readonly_query(ON_REPLICA_SQL, {})
+    return rows[0]["n"] == 1
+
+
+class TestStandinReplicas:
+    """End to end through execute_readonly_query against SQLite copies."""
+
+    async def test_routes_by_measured_lag(self, standin_replica):
+        router = get_replica_router()
+        assert not await on_replica()  # Nothing probed yet: primary
+        await router.probe_all()
+        assert router.replicas[0].lag_s == 0.0
+        assert await on_replica()
+
+        with sqlite3.connect(standin_replica) as conn:
+            conn.execute("UPDATE replica_status SET lag_seconds = 10")
+        await router.probe_all()
+        assert not await on_replica(POOL_INTERACTIVE)
+        assert await on_replica(POOL_ANALYTICS)
+
+    async def test_unreachable_replica_falls_back_and_is_ejected(self, standin_replica, monkeypatch):
+        router = get_replica_router()
+        await router.probe_all()
+        node = router.replicas[0]
+        node.target = str(standin_replica.parent / "gone" / "replica.db")
+        monkeypatch.setattr(database, "_engines", {})
+        monkeypatch.setattr(database, "_session_factories", {})
+
+        for _ in range(3):
+            assert not await on_replica()  # Still answered, by the primary
+        assert node.stats["ejections"] == 1
+        assert router.choose(POOL_INTERACTIVE) is None
@@ -0,0 +1,114 @@
+"""
+Tests for the structured request journal: records, sampling, rotation and the top-N report.
+"""
+import logging
+import sqlite3
+
+import pytest
+
+from app.core.request_journal import (
+    RequestJournal, build_record, should_record, trace_summary, journal_files, top, llm_cost,
+    get_request_journal,
+)
+from app.core.tracing import Trace, KIND_SERVER
+from benchmarks.suite import PipelineFixture, HEAVY_MOBILE
+
+
+def finished_trace() -> Trace:
+    trace = Trace()
+    trace.start_span("POST /mvp/query", None, KIND_SERVER)
+    spans = [
+        ("db.query", {"db.rows": 3}),
+        ("db.query", {"db.rows": 4}),
+        ("llm.generate", {"llm.prompt_tokens": 1000, "llm.completion_tokens": 200}),
+        ("llm.generate", {"llm.prompt_tokens_estimate": 50, "llm.response_chars": 40}),
+        ("cache.revalidate", {"cache.hit": True}),
+    ]
+    for name, attributes in spans:
+        trace.start_span(name, trace.root, attributes=attributes).end()
+    return trace
+
+
+def record(user="+91******0001", intent="universal_query", total_ms=100.0, prompt_tokens=0, status=200) -> dict:
+    entry = build_record("/mvp/query", "POST", status, total_ms, {"mode": "user", "intent": intent},
+                         {"user": user}, None)
+    entry.update(prompt_tokens=prompt_tokens, cost_usd=llm_cost(prompt_tokens, 0))
+    return entry
+
+
+class TestRecords:
+    """Span totals, cost and sampling."""
+
+    def test_summary_from_trace(self):
+        summary = trace_summary(finished_trace())
+        assert summary["db_queries"] == 2 and summary["db_rows"] == 7
+        assert summary["llm_calls"] == 2
+        assert summary["prompt_tokens"] == 1050  # Exact usage, then the estimate
+        assert summary["completion_tokens"] == 210
+        assert summary["cache_hit"] is True
+        assert set(summary["stages"]) == {"db.query", "llm.generate", "cache.revalidate"}
+
+    def test_record_prices_tokens(self):
+        entry = build_record("/mvp/query", "POST", 200, 12.5, {"mode": "admin", "intent": ""},
+                             {"user": "+91******1212", "sections": ["profile", "markups"]}, finished_trace())
+        assert entry["sections"] == "profile,markups"
+        assert entry["intent"] is None
+        assert entry["cost_usd"] == pytest.approx(llm_cost(1050, 210))
+        assert llm_cost(1_000_000, 0) == pytest.approx(0.30)
+
+    def test_sampling_keeps_errors_and_slow_requests(self):
+        assert not should_record(record(), sample_rate=0.0, slow_ms=1000)
+        assert should_record(record(total_ms=1500), sample_rate=0.0, slow_ms=1000)
+        assert should_record(record(status=502), sample_rate=0.0, slow_ms=1000)
+        assert should_record(record(), sample_rate=1.0, slow_ms=1000)
+
+
+class TestJournalFile:
+    """Batched writes, rotation and aggregation across rotated files."""
+
+    def test_rotation_and_top(self, tmp_path):
+        path = str(tmp_path / "journal.sqlite")
+        journal = RequestJournal(path, max_bytes=16 * 1024, backups=2, batch_size=50)
+        for i in range(600):
+            journal.record(record(user=f"user-{i % 3}", total_ms=float(i % 3 * 100), prompt_tokens=i % 3 * 1000))
+        journal.shutdown()
+
+        files = journal_files(path)
+        assert journal.stats["written"] == 600 and journal.stats["rotations"] >= 2
+        assert {p.name for p in files} <= {"journal.sqlite", "journal.sqlite.1", "journal.sqlite.2"}
+        assert "journal.sqlite.3" not in {p.name for p in tmp_path.iterdir()}
+
+        kept = sum(sqlite3.connect(p).execute("SELECT COUNT(*) FROM requests").fetchone()[0] for p in files)
+        by_cost = top(files, "cost", "user", limit=2)
+        assert [row["user"] for row in by_cost] == ["user-2", "user-1"]
+        assert by_cost[0]["avg_ms"] == 200.0
+        assert sum(row["requests"] for row in top(files, "count", "user")) == kept
+
+
+class TestJournalEndToEnd:
+    """Requests through the app produce one row each."""
+
+    async def test_query_and_panel_rows(self, caplog):
+        async with PipelineFixture(queries=200) as fixture:
+            with caplog.at_level(logging.INFO, logger="app.api.query"):
+                response = await fixture.client.post("/mvp/query", json={"mobile": HEAVY_MOBILE, "query": "Show my payments"})
+            assert response.status_code == 200
+            assert (await fixture.client.get("/mvp/user-data", params={"mobile": HEAVY_MOBILE})).status_code == 200
+            journal = get_request_journal()
+            assert journal.flush()
+            connection = sqlite3.connect(journal.path)
+            connection.row_factory = sqlite3.Row
+            rows = [dict(r) for r in connection.execute("SELECT * FROM requests ORDER BY ts")]
+            connection.close()
+
+        assert "GEMINI RAW RESPONSE" not in caplog.text
+        query_row, panel_row = rows
+        assert query_row["endpoint"] == "/mvp/query"
+        assert query_row["user"] == "+91******1212"
+        assert (query_row["mode"], query_row["intent"]) == ("user", "universal_query")
+        assert "profile" in query_row["sections"].split(",")
+        assert query_row["db_queries"] > 0 and query_row["llm_calls"] == 1
+        assert query_row["prompt_tokens"] > 0 and query_row["cost_usd"] > 0
+        assert "context.fetch" in query_row["stages"]
+        assert panel_row["intent"] == "side_panel" and panel_row["cache_hit"] == 0
+        assert panel_row["llm_calls"] == 0
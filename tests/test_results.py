@@ -0,0 +1,97 @@
+"""
+Tests for compact query results: Rows, RowView, the result modes of
+execute_readonly_query and the serializers that accept them.
+"""
+from datetime import datetime
+from decimal import Decimal
+import json
+import sqlite3
+
+import pytest
+
+from app.api.query import sanitize_for_user_mode
+from app.core.offload import encode_json, payload_cells
+from app.core.response_formatter import format_data_recursively, format_rows, render_json_response
+from app.core.results import RESULT_COLUMNS, RESULT_DICTS, RESULT_ROWS, Rows, RowView
+
+COLUMNS = ("id", "airline", "supplier_price", "departure_datetime", "token")
+ROWS = [
+    (1, "Air India", Decimal("4100.50"), datetime(2026, 3, 1, 10, 0), b"x"),
+    (2, "IndiGo", None, None, None),
+]
+
+
+def as_dicts():
+    return [dict(zip(COLUMNS, row)) for row in ROWS]
+
+
+class TestRows:
+    def test_views_read_through_the_header(self):
+        rows = Rows(COLUMNS, list(ROWS))
+        first = rows[0]
+        assert isinstance(first, RowView) and first["airline"] == "Air India"
+        assert first.get("missing", "-") == "-" and "token" in first and len(first) == 5
+        assert first == as_dicts()[0] and first.to_dict() == as_dicts()[0]
+        assert [row["id"] for row in rows] == [1, 2] and len(rows[1:]) == 1
+        with pytest.raises(KeyError):
+            first["missing"]
+
+    def test_columns_and_projection(self):
+        rows = Rows(COLUMNS, list(ROWS))
+        assert rows.column("airline") == ["Air India", "IndiGo"]
+        assert rows.to_columns()["id"] == [1, 2] and Rows(COLUMNS, []).to_columns()["id"] == []
+        projected = rows.without({"supplier_price", "unknown"})
+        assert projected.columns == ("id", "airline", "departure_datetime", "token")
+        assert projected.rows[1] == (2, "IndiGo", None, None)
+        assert rows.without({"unknown"}) is rows
+        assert rows.without(set(COLUMNS) - {"id"}).rows == [(1,), (2,)]
+        assert Rows.from_dicts(as_dicts()).to_dicts() == as_dicts()
+
+
+class TestSerialization:
+    """Compact results serialize exactly like the row dicts they stand for."""
+
+    def test_same_output_as_dicts(self):
+        rows = Rows(COLUMNS, list(ROWS))
+        assert format_data_recursively({"a": rows}) == {"a": format_rows(as_dicts())}
+        assert encode_json({"a": rows, "b": 1}) == json.dumps({"a": as_dicts(), "b": 1}, default=str)
+        assert payload_cells({"a": rows, "b": 1}) == payload_cells({"a": as_dicts(), "b": 1}) == 11
+        assert render_json_response({"data": rows}).body == render_json_response({"data": as_dicts()}).body
+
+    def test_sanitize_drops_columns(self):
+        data = {"recent_bookings": Rows(COLUMNS, list(ROWS))}
+        sanitize_for_user_mode(data)
+        assert "supplier_price" not in data["recent_bookings"].columns
+
+
+@pytest.fixture
+def bookings(sqlite_engine):
+    """100 rows in a bookings table of the shared SQLite database."""
+    conn = sqlite3.connect(sqlite_engine)
+    conn.execute("CREATE TABLE bookings (id INTEGER PRIMARY KEY, airline TEXT, amount REAL)")
+    conn.executemany("INSERT INTO bookings VALUES (?, ?, ?)", [(i, f"AI-{i}", i * 1.5) for i in range(1, 101)])
+    conn.commit()
+    conn.close()
+
+
+class TestResultModes:
+    async def test_modes_hold_the_same_result(self, bookings):
+        from app.db.database import execute_readonly_query
+
+        sql, params = "SELECT * FROM bookings WHERE id <= :n ORDER BY id", {"n": 50}
+        dicts = await execute_readonly_query(sql, params)
+        rows = await execute_readonly_query(sql, params, result=RESULT_ROWS)
+        columns = await execute_readonly_query(sql, params, result=RESULT_COLUMNS)
+        assert dicts == await execute_readonly_query(sql, params, result=RESULT_DICTS) and len(dicts) == 50
+        assert rows.to_dicts() == dicts and columns["airline"] == [row["airline"] for row in dicts]
+        with pytest.raises(ValueError, match="Unknown result mode"):
+            await execute_readonly_query(sql, params, result="frames")
+
+    async def test_stream_batches(self, bookings):
+        from app.db.database import stream_readonly_query
+
+        batches = [batch async for batch in stream_readonly_query(
+            "SELECT * FROM bookings ORDER BY id", {}, batch_size=40, result=RESULT_ROWS
+        )]
+        assert [len(batch) for batch in batches] == [40, 40, 20]
+        assert batches[0].columns == ("id", "airline", "amount") and batches[2][-1]["id"] == 100
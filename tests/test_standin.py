@@ -0,0 +1,107 @@
+"""
+Tests for the local stand-in database backend.
+"""
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+
+from app.core.sql_templates import SQL_TEMPLATES
+from app.db.standin import (
+    rewrite_mysql_sql,
+    _date_format,
+    _concat,
+)
+
+MOBILE = "+919820301212"
+
+
+class TestDialectShims:
+    """Tests for the MySQL compatibility shims."""
+
+    def test_group_concat_separator(self):
+        """SEPARATOR becomes SQLite's second GROUP_CONCAT argument."""
+        sql = "SELECT GROUP_CONCAT(CONCAT(a, ' ', b) SEPARATOR ' | ') FROM t"
+        assert rewrite_mysql_sql(sql) == "SELECT GROUP_CONCAT(CONCAT(a, ' ', b), ' | ') FROM t"
+
+    def test_distinct_group_concat(self):
+        """DISTINCT values are picked in a subquery, then joined with the separator."""
+        sql = "SELECT GROUP_CONCAT(DISTINCT name SEPARATOR '; ') FROM t"
+        assert rewrite_mysql_sql(sql) == (
+            "SELECT GROUP_CONCAT(distinct_value, '; ') FROM (SELECT DISTINCT name AS distinct_value FROM t)"
+        )
+
+    def test_distinct_group_concat_keeps_commas_in_values(self):
+        """A value containing a comma comes back as MySQL returns it."""
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(
+            "CREATE TABLE o (id INTEGER); INSERT INTO o VALUES (1), (2);"
+            "CREATE TABLE t (oid INTEGER, name TEXT);"
+            "INSERT INTO t VALUES (1, 'Air India, AI-101'), (1, 'Air India, AI-101'), (1, 'IndiGo'), (2, 'Vistara');"
+        )
+        sql = (
+            "SELECT id, (SELECT GROUP_CONCAT(DISTINCT name SEPARATOR ' | ') AS names FROM t "
+            "WHERE t.oid = o.id) AS airlines FROM o ORDER BY id"
+        )
+        rows = conn.execute(rewrite_mysql_sql(sql)).fetchall()
+        conn.close()
+        assert rows == [(1, "Air India, AI-101 | IndiGo"), (2, "Vistara")]
+
+    def test_functions(self):
+        """CONCAT is NULL-propagating and DATE_FORMAT understands MySQL specifiers."""
+        assert _concat("#", 5, " x") == "#5 x"
+        assert _concat("a", None) is None
+        assert _date_format("2026-03-01 10:05:00", "%Y-%m-%d %H:%i") == "2026-03-01 10:05"
+        assert _date_format("24-12-2025", "%e %M") == "24 December"
+
+
+class TestStandinBackend:
+    """The real fetch paths run unchanged against the stand-in."""
+
+    async def test_universal_context(self, standin_engine):
+        """The per-user context resolves the profile through the LIKE lookup."""
+        from app.api.query import fetch_universal_context
+
+        context = await fetch_universal_context(MOBILE)
+        assert context["profile"]["user_name"] == "Mitul Pandya"
+        assert context["profile"]["query_id"] == 817118
+
+    async def test_quoted_and_numeric_ids_match(self, standin_engine):
+        """Key columns compare like MySQL: '460102' and 460102 are the same query_id."""
+        from app.db.database import execute_readonly_query
+
+        quoted = await execute_readonly_query("SELECT id FROM query_activities WHERE query_id IN ('460102')", {})
+        numeric = await execute_readonly_query("SELECT id FROM query_quotations WHERE query_id IN ('460102')", {})
+        assert len(quoted) == 1
+        assert len(numeric) == 10
+
+    async def test_global_context_and_watermarks(self, standin_engine):
+        """Global context aggregates and the watermark UNION ALL queries run."""
+        from app.api.query import fetch_global_context, fetch_user_watermark
+        from app.db.database import execute_readonly_query
+        from app.api.query import GLOBAL_WATERMARK_SQL
+
+        context = await fetch_global_context()
+        assert context["stats"]["total_revenue"] is not None
+        assert len(await execute_readonly_query(GLOBAL_WATERMARK_SQL, {})) == 4
+        assert await fetch_user_watermark(MOBILE)
+
+    @pytest.mark.parametrize("intent", list(SQL_TEMPLATES))
+    async def test_every_template_executes(self, standin_engine, intent):
+        """Every SQL template, including the GROUP_CONCAT profile, is valid on the stand-in."""
+        from app.db.database import execute_readonly_query
+
+        template = SQL_TEMPLATES[intent]
+        params = {"mobile": MOBILE, "query_id": 817118, "limit": 10, "offset": 0}
+        await execute_readonly_query(template["query"], params)
+        if "keyset_query" in template:
+            await execute_readonly_query(template["keyset_query"].replace("{seek}", ""), params)
+
+    async def test_section_reads_use_indexes(self, standin_engine):
+        """Per-query child rows are served by an index, not a table scan."""
+        async with standin_engine.connect() as conn:
+            plan = (await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM query_quotations "
+                "WHERE query_id IN ('817118') ORDER BY sent_at DESC LIMIT 5"
+            ))).fetchall()
+        assert any("USING INDEX" in str(row[-1]) for row in plan)
@@ -0,0 +1,119 @@
+"""
+Tests for the synthetic CRM data generator.
+"""
+import sqlite3
+import pytest
+
+from app.db.standin import create_standin_tables, load_schema
+from app.db.synthetic import generate, HEAVY_MOBILE, MySQLWriter
+
+CHILD_TABLES = [
+    "query_quotations", "query_flight_manages", "query_payments",
+    "query_payment_schedulers", "query_activities", "query_activity_markups",
+]
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    """A small generated stand-in database."""
+    path = tmp_path_factory.mktemp("synthetic") / "crm.db"
+    report = generate(20_000, db_path=path, users=2_000, skew=1.1, seed=7, chunk_size=6_000)
+    conn = sqlite3.connect(path)
+    yield conn, report
+    conn.close()
+
+
+class TestSyntheticGenerator:
+    """Generated data is consistent, skewed and usable by the app."""
+
+    def test_row_counts(self, dataset):
+        """Counts in the report match the tables; children scale with queries."""
+        conn, report = dataset
+        for table, expected in report["rows"].items():
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == expected
+        assert report["rows"]["query_masters"] == 20_000
+        assert report["rows"]["query_quotations"] > 20_000
+
+    @pytest.mark.parametrize("table", CHILD_TABLES)
+    def test_no_orphans(self, dataset, table):
+        """Every child row points at an existing query and agent."""
+        conn, _ = dataset
+        orphans = conn.execute(
+            f"SELECT COUNT(*) FROM {table} c LEFT JOIN query_masters qm ON qm.query_id = c.query_id "
+            f"WHERE qm.id IS NULL"
+        ).fetchone()[0]
+        assert orphans == 0
+        unknown_agents = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE admin_ref NOT IN (SELECT m_code FROM master_admins)"
+        ).fetchone()[0]
+        assert unknown_agents == 0
+
+    def test_heavy_tail_user(self, dataset):
+        """The documented test user is the heaviest, with hundreds of quotations."""
+        conn, _ = dataset
+        top_mobile, _ = conn.execute(
+            "SELECT user_mobile, COUNT(*) c FROM query_masters GROUP BY user_mobile ORDER BY c DESC LIMIT 1"
+        ).fetchone()
+        quotations = conn.execute(
+            "SELECT COUNT(*) FROM query_quotations WHERE query_id IN "
+            "(SELECT query_id FROM query_masters WHERE user_mobile = ?)", (HEAVY_MOBILE,)
+        ).fetchone()[0]
+        assert top_mobile == HEAVY_MOBILE
+        assert quotations >= 300
+
+    def test_deterministic(self, tmp_path):
+        """The same seed generates the same data."""
+        first = generate(500, db_path=tmp_path / "a.db", seed=3)
+        second = generate(500, db_path=tmp_path / "b.db", seed=3)
+        rows = [
+            sqlite3.connect(tmp_path / name).execute("SELECT * FROM query_quotations ORDER BY id").fetchall()
+            for name in ("a.db", "b.db")
+        ]
+        assert first["rows"] == second["rows"]
+        assert rows[0] == rows[1]
+
+
+class SQLiteAsPyMySQL:
+    """The slice of a pymysql connection MySQLWriter uses, over a SQLite file."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.closed = False
+
+    def cursor(self):
+        conn = self.conn
+
+        class Cursor:
+            def __enter__(self):
+                self.cursor = conn.cursor()
+                return self.cursor
+
+            def __exit__(self, *exc):
+                self.cursor.close()
+
+        return Cursor()
+
+    def close(self):
+        self.closed = True
+        self.conn.close()
+
+
+class TestMySQLWriter:
+    def test_refuses_tables_with_rows(self, tmp_path, monkeypatch):
+        """Loading into a filled schema fails before any row is written."""
+        import pymysql
+
+        empty = tmp_path / "empty.db"
+        with sqlite3.connect(empty) as conn:
+            create_standin_tables(conn, load_schema())
+        filled = tmp_path / "filled.db"
+        generate(50, db_path=filled, seed=1)
+
+        connections = {}
+        monkeypatch.setattr(
+            pymysql, "connect", lambda database, **kwargs: connections.setdefault(database, SQLiteAsPyMySQL(database))
+        )
+        MySQLWriter(f"mysql+pymysql://u:p@localhost/{empty}")
+        with pytest.raises(ValueError, match="query_masters"):
+            MySQLWriter(f"mysql+pymysql://u:p@localhost/{filled}")
+        assert connections[str(filled)].closed
@@ -0,0 +1,171 @@
+"""
+Tests for request tracing, Server-Timing and OTLP/JSON export.
+"""
+import asyncio
+import json
+import pytest
+import httpx
+from fastapi import FastAPI
+
+from app.core import tracing
+from app.core.tracing import (
+    TracingMiddleware,
+    SpanExporter,
+    FileSink,
+    Trace,
+    span,
+    otlp_payload,
+    server_timing_header,
+    statement_attributes,
+    NOOP_SPAN,
+    KIND_SERVER,
+    STATUS_ERROR,
+)
+
+
+def traced_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    async def stage(name: str, delay: float):
+        with span(name, {"stage.delay": delay}):
+            await asyncio.sleep(delay)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        with span("context.fetch"):
+            await asyncio.gather(stage("db.query", 0.01), stage("db.query", 0.01))
+        with span("llm.generate") as llm:
+            llm.set_attribute("llm.prompt_chars", 42)
+        return {"id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        with span("context.fetch"):
+            raise ValueError("db down")
+
+    return app
+
+
+class RecordingSink:
+    def __init__(self):
+        self.payloads = []
+
+    def write(self, payload):
+        self.payloads.append(payload)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def exporter():
+    sink = RecordingSink()
+    installed = SpanExporter(sink, flush_interval=0.05)
+    tracing.set_span_exporter(installed)
+    yield installed, sink
+    installed.shutdown()
+    tracing.set_span_exporter(None)
+
+
+class TestSpans:
+    """Span nesting and no-op behavior."""
+
+    def test_noop_outside_request(self):
+        with span("db.query") as s:
+            s.set_attribute("db.rows", 1)
+        assert s is NOOP_SPAN
+        assert not s.is_recording
+
+    def test_statement_attributes(self):
+        attrs = statement_attributes("SELECT *\n  FROM   query_payments WHERE id = :id")
+        assert attrs["db.sql.table"] == "query_payments"
+        assert attrs["db.operation"] == "SELECT"
+        assert attrs["db.statement"] == "SELECT * FROM query_payments WHERE id = :id"
+
+    def test_server_timing_aggregates_by_name(self):
+        trace = Trace()
+        root = trace.start_span("GET /x", None, KIND_SERVER)
+        for _ in range(3):
+            child = trace.start_span("db.query", root)
+            child.duration_ns = 2_000_000
+        header = server_timing_header(trace)
+        assert 'db.query;dur=6.00;desc="3x"' in header
+        assert header.split(", ")[-1].startswith("total;dur=")
+
+
+class TestMiddleware:
+    """Root spans, Server-Timing header and export through the middleware."""
+
+    async def test_server_timing_and_export(self, exporter):
+        installed, sink = exporter
+        transport = httpx.ASGITransport(app=traced_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/items/7")
+        assert response.status_code == 200
+        timing = response.headers["server-timing"]
+        assert 'db.query;dur=' in timing and 'desc="2x"' in timing
+        assert "context.fetch;dur=" in timing and "total;dur=" in timing
+
+        installed.shutdown()
+        spans = sink.payloads[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        by_name = {}
+        for s in spans:
+            by_name.setdefault(s["name"], []).append(s)
+        root = by_name["GET /items/{item_id}"][0]
+        assert root["kind"] == KIND_SERVER and "parentSpanId" not in root
+        fetch = by_name["context.fetch"][0]
+        assert fetch["parentSpanId"] == root["spanId"]
+        assert all(q["parentSpanId"] == fetch["spanId"] for q in by_name["db.query"])
+        assert {s["traceId"] for s in spans} == {root["traceId"]}
+        llm_attrs = {a["key"]: a["value"] for a in by_name["llm.generate"][0]["attributes"]}
+        assert llm_attrs["llm.prompt_chars"] == {"intValue": "42"}
+
+    async def test_errors_mark_spans(self, exporter):
+        installed, sink = exporter
+        transport = httpx.ASGITransport(app=traced_app(), raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/boom")
+        assert response.status_code == 500
+        installed.shutdown()
+        spans = {s["name"]: s for s in sink.payloads[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+        assert spans["context.fetch"]["status"]["code"] == STATUS_ERROR
+        assert "db down" in spans["context.fetch"]["status"]["message"]
+
+    async def test_db_spans_from_standin(self, standin_engine):
+        """execute_readonly_query reports table, rows and pool wait under the request."""
+        from app.db import database
+
+        trace = Trace()
+        root = trace.start_span("GET /test", None, KIND_SERVER)
+        trace_token = tracing._current_trace.set(trace)
+        span_token = tracing._current_span.set(root)
+        try:
+            assert await database.validate_mobile_exists("+919820301212")
+        finally:
+            tracing._current_span.reset(span_token)
+            tracing._current_trace.reset(trace_token)
+        names = [s.name for s in trace.spans]
+        assert names == ["GET /test", "validate_mobile", "db.query", "db.pool_wait"]
+        query_span = trace.spans[2]
+        assert query_span.attributes["db.sql.table"] == "query_masters"
+        assert query_span.attributes["db.rows"] == 1
+
+
+class TestFileSink:
+    """OTLP/JSON lines on disk."""
+
+    def test_one_document_per_batch(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        trace = Trace()
+        root = trace.start_span("GET /x", None, KIND_SERVER, {"http.status_code": 200, "ok": True})
+        root.end()
+        sink = FileSink(str(path))
+        sink.write(otlp_payload([trace]))
+        sink.write(otlp_payload([trace]))
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        exported = json.loads(lines[0])["resourceSpans"][0]
+        assert exported["resource"]["attributes"][0]["value"]["stringValue"] == tracing.SERVICE_NAME
+        attrs = {a["key"]: a["value"] for a in exported["scopeSpans"][0]["spans"][0]["attributes"]}
+        assert attrs == {"http.status_code": {"intValue": "200"}, "ok": {"boolValue": True}}
@@ -0,0 +1,126 @@
+"""
+Tests for per-section lazy loading of the user data panel.
+"""
+import asyncio
+import sqlite3
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.context_sections import build_section_page_query, section_sort
+from app.core.pagination import split_page, encode_cursor, decode_cursor, CursorError
+
+
+def _page_through(conn: sqlite3.Connection, section: str, limit: int) -> list[int]:
+    """Walk every page of a section with the real keyset SQL."""
+    seen, cursor = [], None
+    sort_column, direction = section_sort(section)
+    while True:
+        sql, params, block = build_section_page_query(section, cursor)
+        conn.row_factory = sqlite3.Row
+        rows = [dict(r) for r in conn.execute(sql, {"m_wild": "%9820301212", "page_size": limit + 1, **params})]
+        page, cursor = split_page(rows, limit, sort_column, "id", direction, block)
+        seen.extend(row["id"] for row in page)
+        if cursor is None:
+            return seen
+
+
+class TestKeysetSections:
+    """Keyset pages must visit every row once, in ORDER BY order, NULLs included."""
+
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE query_masters (id INTEGER PRIMARY KEY, query_id INT, user_mobile TEXT, created_at TEXT)")
+        conn.execute("CREATE TABLE query_quotations (id INTEGER PRIMARY KEY, query_id INT, sent_at TEXT)")
+        conn.execute("CREATE TABLE query_payment_schedulers (id INTEGER PRIMARY KEY, query_id INT, payment_date TEXT)")
+        conn.execute("INSERT INTO query_masters VALUES (1, 817118, '+919820301212', NULL), (2, 1, '+910000000000', NULL)")
+        for i in range(1, 24):
+            sent_at = None if i % 4 == 0 else f"2026-01-{(i % 7) + 1:02d}"
+            conn.execute("INSERT INTO query_quotations VALUES (?, 817118, ?)", (i, sent_at))
+            conn.execute("INSERT INTO query_payment_schedulers VALUES (?, 817118, ?)", (i, sent_at))
+        conn.execute("INSERT INTO query_quotations VALUES (99, 1, '2026-02-01')")
+        return conn
+
+    @pytest.mark.parametrize("section", ["recent_quotations", "payment_schedules"])
+    def test_pages_match_full_ordering(self, conn, section):
+        """Paging 5 at a time returns the same sequence as one full ordered read."""
+        sort_column, direction = section_sort(section)
+        table = "query_quotations" if section == "recent_quotations" else "query_payment_schedulers"
+        expected = [r[0] for r in conn.execute(
+            f"SELECT id FROM {table} WHERE query_id = 817118 ORDER BY {sort_column} {direction}, id {direction}"
+        )]
+        assert _page_through(conn, section, limit=5) == expected
+        assert 99 not in expected
+
+    def test_cursor_round_trip_and_garbage(self):
+        """Cursors are opaque but decode back; garbage is rejected."""
+        assert decode_cursor(encode_cursor("v", "2026-01-01", 7)) == ("v", "2026-01-01", 7)
+        with pytest.raises(CursorError):
+            decode_cursor("%%%")
+
+
+class TestTimeToFirstRender:
+    """The profile section must render well before the full context arrives."""
+
+    DB_LATENCY = 0.03
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from app.main import app
+        from app.api import query as query_module
+        from app.core import http_cache
+
+        statements = []
+
+        async def slow_query(sql, params):
+            statements.append(sql)
+            await asyncio.sleep(self.DB_LATENCY)
+            if "row_count" in sql:
+                return []
+            if "FROM query_masters" in sql and "LIMIT 1" in sql:
+                return [{"id": 1, "query_id": 817118, "admin_ref": "PROP0001", "user_name": "Mitul"}]
+            if "FROM master_admins" in sql:
+                return [{"name": "Agent", "m_code": "PROP0001"}]
+            if sql.startswith("SELECT query_id"):
+                return [{"query_id": 817118}]
+            return []
+
+        async def exists(mobile):
+            await asyncio.sleep(self.DB_LATENCY)
+            return True
+
+        monkeypatch.setattr(query_module, "execute_readonly_query", slow_query)
+        monkeypatch.setattr(query_module, "validate_mobile_exists", exists)
+        http_cache.get_watermark_cache().clear()
+        client = TestClient(app)
+        client.statements = statements
+        return client
+
+    def test_profile_first_render_is_faster_than_full_panel(self, client):
+        """Profile only touches query_masters and master_admins, in two round-trips."""
+        started = time.perf_counter()
+        profile = client.get("/mvp/user-data/profile", params={"mobile": "+919820301212"})
+        time_to_first_render = time.perf_counter() - started
+        profile_statements = list(client.statements)
+
+        client.statements.clear()
+        started = time.perf_counter()
+        full = client.get("/mvp/user-data", params={"mobile": "+919820301212"})
+        time_to_full_panel = time.perf_counter() - started
+
+        assert profile.json()["data"]["profile"]["user_name"] == "Mitul"
+        assert full.json()["success"] is True
+        assert len(profile_statements) == 2
+        assert len(client.statements) > len(profile_statements)
+        assert time_to_first_render < time_to_full_panel
+
+    def test_markups_hidden_in_user_mode(self, client):
+        """Admin-only sections are refused in user mode."""
+        response = client.get("/mvp/user-data/markups", params={"mobile": "+919820301212"})
+        assert response.status_code == 403
+
+    def test_unknown_section(self, client):
+        """Unknown sections are a 404."""
+        response = client.get("/mvp/user-data/nope", params={"mobile": "+919820301212"})
+        assert response.status_code == 404